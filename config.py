@@ -43,6 +43,10 @@ CURRENCY_SYMBOL = {
 # إعدادات الواجهة
 ENABLE_MONTHLY_STATS = True  # تفعيل إحصائيات الشهر
 
+# إعدادات الـ Cache في الذاكرة (utils/performance_cache.py)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))  # الحد الأقصى لعدد الإدخالات
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "64"))  # الحد الأقصى التقريبي للحجم بالميغابايت
+
 # إعدادات رسائل الواتساب
 DEFAULT_WHATSAPP_TEMPLATE = """🔧 تحديث حالة طلب الصيانة
 رقم التتبع: {tracking_code}
@@ -120,3 +124,18 @@ DEBTS_PASSWORD = os.getenv("DEBTS_PASSWORD", "")  # كلمة مرور صفحة 
 REPORTS_PASSWORD = os.getenv("REPORTS_PASSWORD", "")  # كلمة مرور صفحة التقارير
 ADMIN_DEFAULT_PASSWORD = os.getenv("ADMIN_DEFAULT_PASSWORD", "admin123")  # كلمة مرور المستخدم الافتراضي
 REMOTE_ACCESS_PASSWORD = os.getenv("REMOTE_ACCESS_PASSWORD", "")  # كلمة مرور الوصول عن بُعد
+
+# مفتاح توقيع جلسات الويب - إذا لم يُعيّن يُنشأ مرة ويُحفظ في SECRET_KEY_FILE (ثابت بين العمليات وإعادة التشغيل)
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+SECRET_KEY_FILE = os.getenv("SECRET_KEY_FILE", os.path.join(BASE_DIR, ".secret_key"))
+
+# خادم الويب للإنتاج (web_server.py)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))  # عدد العمليات - 0 = عدد أنوية المعالج
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))  # خيوط كل عملية للطلبات المتزامنة
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))  # ثوانٍ لإنهاء الطلبات الجارية عند الإيقاف/إعادة التحميل
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")  # orjson (أسرع، إذا كان مثبتاً) أو default (مزود Flask)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # أصغر رد (بايت) يُضغط بـ gzip/brotli
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1.0"))  # ثوانٍ بين فحوص change_log لكل اتصال /api/events
+EVENTS_HEARTBEAT = int(os.getenv("EVENTS_HEARTBEAT", "15"))  # ثوانٍ - تعليق فارغ يبقي الاتصال مفتوحاً عبر الوكلاء
+EVENTS_MAX_DURATION = int(os.getenv("EVENTS_MAX_DURATION", "300"))  # ثوانٍ - بعدها يُغلق الاتصال ويعيد العميل الاتصال
+EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", "0"))  # اتصالات /api/events لكل عملية - 0 = نصف WEB_THREADS
@@ -0,0 +1,210 @@
+"""
+إشعار التغييرات بين العمليات (change_log)
+
+واجهة سطح المكتب (main.py) و web_app.py تعملان على نفس ملف SQLite، ولكل منهما
+app_cache خاص بها. كل كتابة في MaintenanceService تسجّل صفاً في change_log داخل
+نفس المعاملة، وكل عملية تستعلم دورياً عن الصفوف بعد آخر إصدار رأته:
+
+    watcher = ChangeWatcher(engine)
+    changes = watcher.poll()      # SELECT MAX(id) فقط إذا لم يتغير شيء
+    if changes:
+        ...                       # تم إبطال وسوم app_cache تلقائياً
+
+رقم آخر إصدار (latest_version) هو أيضاً إصدار البيانات لـ ETag في web_app.py،
+ورقم الصف هو id الحدث في /api/events (services/job_event_service.py).
+
+PostgreSQL وغيره: الرقم يُحجز عند الإدراج لا عند commit، فمعاملة برقم N قد
+تنتهي بعد ظهور N+1. القراءة تتوقف عند أول رقم ناقص (committed_changes) حتى
+يظهر، أو حتى يمضي COMMIT_GRACE_SECONDS على ما بعده (معاملة أُلغيت).
+
+تنظيف السجلات القديمة:
+    python -m database.change_log
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Set
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from database.models import ChangeLog
+
+ENTITY_JOBS = "jobs"
+ENTITY_PAYMENTS = "payments"
+ENTITY_CUSTOMERS = "customers"
+# إعدادات النظام: لا تؤثر في قوائم الواجهة، فقط في إصدار البيانات
+ENTITY_SETTINGS = "settings"
+
+ACTION_INSERT = "insert"
+ACTION_UPDATE = "update"
+ACTION_DELETE = "delete"
+# تغيير حالة طلب (مثل update للـ cache، وحدث status-changed مستقل لـ /api/events)
+ACTION_STATUS = "status"
+
+# أكثر من هذا العدد من التغييرات دفعة واحدة = إعادة تحميل كاملة بدلاً من التعديل صفاً بصف
+MAX_CHANGES_PER_POLL = 1000
+
+# مدة الاحتفاظ بالسجل
+RETENTION_DAYS = 7
+
+# أقصى مدة بين record_change و commit - رقم ناقص بعدها = معاملة أُلغيت
+COMMIT_GRACE_SECONDS = 5
+
+
+def latest_version(conn) -> int:
+    """آخر رقم في change_log (اتصال أو جلسة) - SELECT MAX(id) على المفتاح الأساسي"""
+    return conn.execute(func.max(ChangeLog.id).select()).scalar() or 0
+
+
+def commits_in_id_order(bind) -> bool:
+    """الأرقام تظهر بترتيب commit - SQLite (كاتب واحد في كل لحظة)"""
+    return bind.dialect.name == "sqlite"
+
+
+def committed_changes(rows, since: int, latest: int, ordered: bool):
+    """صفوف change_log (مرتبة، بعد since) التي يمكن تطبيقها الآن، والإصدار الجديد
+
+    ordered=False: حتى أول رقم ناقص فقط، إلا إذا كان الصف بعده أقدم من
+    COMMIT_GRACE_SECONDS. الرقم الناقص يُقرأ في الاستعلام التالي حين يظهر.
+    """
+    if ordered:
+        return rows, latest
+    cutoff = datetime.utcnow() - timedelta(seconds=COMMIT_GRACE_SECONDS)
+    version = since
+    for index, row in enumerate(rows):
+        if row.id != version + 1 and row.changed_at > cutoff:
+            return rows[:index], version
+        version = row.id
+    return rows, version
+
+
+def record_change(db: Session, entity: str, entity_ids: Iterable[int], action: str = ACTION_UPDATE) -> None:
+    """تسجيل تغيير داخل المعاملة الحالية - بدون commit"""
+    now = datetime.utcnow()
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "action": action, "changed_at": now}
+        for entity_id in entity_ids
+        if entity_id is not None
+    ]
+    if rows:
+        db.execute(ChangeLog.__table__.insert(), rows)
+
+
+def prune_change_log(bind: Engine, keep_days: int = RETENTION_DAYS) -> int:
+    """حذف السجلات الأقدم من keep_days (العمليات المتأخرة أكثر من ذلك تعيد التحميل بالكامل)"""
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    with bind.begin() as conn:
+        result = conn.execute(ChangeLog.__table__.delete().where(ChangeLog.changed_at < cutoff))
+    return result.rowcount or 0
+
+
+class ChangeSet:
+    """التغييرات منذ آخر استعلام، مجمّعة حسب النوع"""
+
+    def __init__(self, version: int, full_reload: bool = False):
+        self.version = version
+        self.full_reload = full_reload
+        self.jobs: Set[int] = set()
+        self.new_jobs: Set[int] = set()
+        self.deleted_jobs: Set[int] = set()
+        self.customers: Set[int] = set()
+        self.entities: Set[str] = set()
+
+    def add(self, entity: str, entity_id: int, action: str) -> None:
+        self.entities.add(entity)
+        if entity == ENTITY_SETTINGS:
+            return
+        if entity == ENTITY_CUSTOMERS:
+            self.customers.add(entity_id)
+        elif action == ACTION_DELETE and entity == ENTITY_JOBS:
+            self.deleted_jobs.add(entity_id)
+            self.jobs.discard(entity_id)
+            self.new_jobs.discard(entity_id)
+        elif entity_id not in self.deleted_jobs:
+            self.jobs.add(entity_id)
+            if action == ACTION_INSERT:
+                self.new_jobs.add(entity_id)
+
+    def __bool__(self) -> bool:
+        return self.full_reload or bool(self.entities)
+
+    def __repr__(self) -> str:
+        return (f"ChangeSet(version={self.version}, full_reload={self.full_reload}, "
+                f"jobs={len(self.jobs)}, deleted_jobs={len(self.deleted_jobs)}, customers={len(self.customers)})")
+
+
+class ChangeWatcher:
+    """متابعة change_log لعملية واحدة
+
+    poll() يبطل وسوم app_cache المقابلة (jobs / payments / customers) ويعيد
+    ChangeSet فارغاً إذا لم يتغير شيء. min_interval يمنع الاستعلام أكثر من مرة
+    خلال الفترة المحددة (مثلاً عند استدعائه قبل كل طلب HTTP).
+    """
+
+    def __init__(self, bind: Engine, min_interval: float = 0.0):
+        self.bind = bind
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self._ordered = commits_in_id_order(bind)
+        self.version = self._latest_version()
+
+    def _latest_version(self) -> int:
+        with self.bind.connect() as conn:
+            return latest_version(conn)
+
+    def poll(self) -> ChangeSet:
+        """التغييرات منذ آخر استدعاء"""
+        from utils.performance_cache import app_cache
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_poll < self.min_interval:
+                return ChangeSet(self.version)
+            self._last_poll = now
+
+            since = self.version
+            table = ChangeLog.__table__
+            with self.bind.connect() as conn:
+                oldest, latest = conn.execute(func.min(table.c.id).select().add_columns(func.max(table.c.id))).one()
+                if not latest or latest <= since:
+                    return ChangeSet(since)
+
+                rows = conn.execute(
+                    table.select()
+                    .with_only_columns(table.c.id, table.c.entity, table.c.entity_id, table.c.action,
+                                       table.c.changed_at)
+                    .where(table.c.id > since, table.c.id <= latest)
+                    .order_by(table.c.id)
+                    .limit(MAX_CHANGES_PER_POLL + 1)
+                ).all()
+
+            # عدد كبير جداً، أو حُذفت سجلات بعد آخر إصدار بالتنظيف - إعادة تحميل كاملة
+            full_reload = len(rows) > MAX_CHANGES_PER_POLL or oldest > since + 1
+            if not full_reload:
+                rows, latest = committed_changes(rows, since, latest, self._ordered)
+                if latest == since:
+                    return ChangeSet(since)
+            changes = ChangeSet(latest, full_reload=full_reload)
+            if full_reload:
+                changes.entities.update((ENTITY_JOBS, ENTITY_PAYMENTS, ENTITY_CUSTOMERS))
+            else:
+                for row in rows:
+                    changes.add(row.entity, row.entity_id, row.action)
+            self.version = latest
+
+        if changes.entities:
+            app_cache.bump(*changes.entities)
+        return changes
+
+
+if __name__ == "__main__":
+    from database.connection import engine, init_db
+
+    print("🚀 تنظيف سجل التغييرات...")
+    init_db()
+    deleted = prune_change_log(engine)
+    print(f"✅ اكتمل! ({deleted} سجل محذوف)")
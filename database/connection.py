@@ -2,6 +2,9 @@
 إعدادات اتصال قاعدة البيانات
 """
 
+import threading
+from typing import Any, Dict
+
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -111,6 +114,49 @@ else:
 # إنشاء جلسة قاعدة البيانات
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class PoolMetrics:
+    """إشغال مجموعة الاتصالات: المستخدم الآن وأعلى قيمة منذ التشغيل
+
+    اتصال لا يعود للمجموعة (جلسة لم تُغلق) يظهر كـ in_use يزداد ولا ينقص.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+
+    def on_checkout(self, dbapi_conn, connection_record, connection_proxy):
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, dbapi_conn, connection_record):
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            status = {
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "pool": type(engine.pool).__name__,
+            }
+        # NullPool (PostgreSQL) ليس له حجم ثابت
+        for name in ("size", "checkedin", "overflow"):
+            method = getattr(engine.pool, name, None)
+            if callable(method):
+                status[name] = method()
+        return status
+
+
+pool_metrics = PoolMetrics()
+event.listen(engine, "checkout", pool_metrics.on_checkout)
+event.listen(engine, "checkin", pool_metrics.on_checkin)
+
 # القاعدة للتعريفات
 Base = declarative_base()
 
@@ -124,6 +170,9 @@ def get_db():
     finally:
         db.close()
 
+# يُعيّن بعد init_db() في العملية الأم (web_server.py) حتى لا تهيئ كل عملية القاعدة بالتوازي
+DB_INITIALIZED_ENV = "ADR_DB_INITIALIZED"
+
 def init_db():
     """
     تهيئة قاعدة البيانات وإنشاء الجداول - محسّن لسرعة الفتح
@@ -135,3 +184,34 @@ def init_db():
     except Exception:
         # إذا فشل، استخدم الطريقة العادية
         Base.metadata.create_all(bind=engine)
+    
+    # create_all لا يضيف الأعمدة الجديدة لجداول موجودة
+    from database.customer_search import ensure_customer_phone_column
+    try:
+        ensure_customer_phone_column(engine)
+    except Exception as e:
+        print(f"⚠️ تعذر إضافة عمود الهاتف الموحّد: {e}")
+    
+    # create_all لا يضيف الفهارس الجديدة لجداول موجودة (مثل updated_at للتحديث التزايدي)
+    for table in (database.models.Customer.__table__, database.models.MaintenanceJob.__table__,
+                  database.models.StatusHistory.__table__):
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"⚠️ تعذر إنشاء الفهرس {index.name}: {e}")
+    
+    # فهرس البحث النصي (FTS5 على SQLite / pg_trgm على PostgreSQL)
+    from database.search_index import ensure_search_index
+    ensure_search_index(engine)
+    
+    # بناء جدول التجميع اليومي عند الترقية من نسخة سابقة
+    from database.daily_stats import ensure_daily_stats
+    ensure_daily_stats(engine)
+    
+    # حذف سجلات change_log الأقدم من مدة الاحتفاظ
+    from database.change_log import prune_change_log
+    try:
+        prune_change_log(engine)
+    except Exception as e:
+        print(f"⚠️ تعذر تنظيف سجل التغييرات: {e}")
@@ -0,0 +1,77 @@
+"""
+رقم الهاتف الموحّد للعملاء (customers.phone_normalized)
+
+نفس الرقم يُكتب بأشكال كثيرة: "70 123 456" و "070-123456" و "+961 70123456"
+و "٧٠١٢٣٤٥٦". العمود phone_normalized يحفظ الأرقام فقط بدون مفتاح الدولة
+والأصفار البادئة (70123456) مع فهرس، فمطابقة العميل عند الاستلام والبحث
+بالهاتف بحث على فهرس بدلاً من مقارنة النص كما كُتب.
+
+    python -m database.customer_search    # إضافة العمود وتعبئته لقاعدة موجودة
+"""
+
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from database.search_index import compact_search_text
+
+# مفتاح الدولة الافتراضي (نفس المستخدم في روابط WhatsApp)
+DEFAULT_COUNTRY_CODE = "961"
+
+# أطول رقم محلي - الأطول منه ويبدأ بمفتاح الدولة يُحذف منه المفتاح
+MAX_LOCAL_PHONE_LENGTH = 8
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize_phone(phone: Optional[str], partial: bool = False) -> str:
+    """الأرقام فقط بدون 00/مفتاح الدولة والأصفار البادئة - "" إذا لم يكن رقماً
+
+    partial=True لرقم قيد الكتابة ("+961 70"): مفتاح الدولة يُحذف مهما كان الطول
+    """
+    digits = "".join(ch for ch in compact_search_text(phone) if ch.isdigit())
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith(DEFAULT_COUNTRY_CODE) and (partial or len(digits) > MAX_LOCAL_PHONE_LENGTH):
+        digits = digits[len(DEFAULT_COUNTRY_CODE):]
+    return digits.lstrip("0")
+
+
+def ensure_customer_phone_column(bind: Engine) -> int:
+    """إضافة العمود لقاعدة من نسخة سابقة وتعبئة الصفوف الفارغة - يعيد عدد الصفوف المعبأة"""
+    columns = {column["name"] for column in inspect(bind).get_columns("customers")}
+    if "phone_normalized" not in columns:
+        with bind.begin() as conn:
+            conn.execute(text("ALTER TABLE customers ADD COLUMN phone_normalized VARCHAR(20)"))
+    return backfill_phone_normalized(bind)
+
+
+def backfill_phone_normalized(bind: Engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """تعبئة phone_normalized للعملاء الذين لم يُحسب لهم (دفعات بمعاملة لكل دفعة)"""
+    filled = 0
+    last_id = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, phone FROM customers "
+                     "WHERE phone_normalized IS NULL AND id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}
+            ).all()
+            if not rows:
+                return filled
+            conn.execute(
+                text("UPDATE customers SET phone_normalized = :phone_normalized WHERE id = :id"),
+                [{"id": row.id, "phone_normalized": normalize_phone(row.phone)} for row in rows]
+            )
+        filled += len(rows)
+        last_id = rows[-1].id
+
+
+if __name__ == "__main__":
+    from database.connection import engine, init_db
+
+    print("🚀 توحيد أرقام هواتف العملاء...")
+    init_db()
+    filled = ensure_customer_phone_column(engine)
+    print(f"✅ اكتمل! ({filled} عميل)")
@@ -0,0 +1,312 @@
+"""
+التجميع اليومي لطلبات الصيانة (job_daily_stats)
+
+بدلاً من إعادة حساب COUNT/SUM على جميع الطلبات عند كل تقرير أو تحديث للوحة
+التحكم، نحتفظ بجدول تجميعي مفتاحه (اليوم، بادئة الكود، الحالة، نوع الجهاز،
+حالة الدفع، طريقة الدفع). كل عملية كتابة في MaintenanceService تطبّق الفرق
+(قبل/بعد) على هذا الجدول داخل نفس المعاملة.
+
+إعادة البناء الكاملة:
+    python -m database.daily_stats
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from database.models import JobDailyStat, MaintenanceJob
+from database.tracking_sequences import parse_tracking_code
+
+BASIS_RECEIVED = "received"
+BASIS_DELIVERED = "delivered"
+
+KEY_FIELDS = ("basis", "day", "code_prefix", "status", "device_type", "payment_status", "payment_method")
+
+# الأعمدة اللازمة لحساب مساهمة طلب واحد في التجميع
+SNAPSHOT_COLUMNS = (
+    MaintenanceJob.id,
+    MaintenanceJob.tracking_code,
+    MaintenanceJob.status,
+    MaintenanceJob.device_type,
+    MaintenanceJob.payment_status,
+    MaintenanceJob.payment_method,
+    MaintenanceJob.final_cost,
+    MaintenanceJob.estimated_cost,
+    MaintenanceJob.received_at,
+    MaintenanceJob.delivered_at,
+)
+SNAPSHOT_FIELDS = tuple(column.key for column in SNAPSHOT_COLUMNS)
+
+
+def code_prefix_of(tracking_code: Optional[str]) -> str:
+    """بادئة كود التتبع (A15 -> A)"""
+    parsed = parse_tracking_code(tracking_code)
+    if parsed:
+        return parsed[0]
+    return (tracking_code or "").strip().upper()[:1]
+
+
+def _status_value(status: Any) -> str:
+    if status is None:
+        return ""
+    return status.value if hasattr(status, "value") else str(status)
+
+
+def job_snapshot(job: Any) -> Dict[str, Any]:
+    """أخذ نسخة من حقول الطلب المؤثرة في التجميع (من كائن ORM أو صف استعلام)"""
+    return {field: getattr(job, field, None) for field in SNAPSHOT_FIELDS}
+
+
+def load_snapshots(db: Session, job_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """جلب نسخ عدة طلبات باستعلام واحد"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return {}
+    rows = db.query(*SNAPSHOT_COLUMNS).filter(MaintenanceJob.id.in_(job_ids)).all()
+    return {row.id: job_snapshot(row) for row in rows}
+
+
+def _contributions(snapshot: Optional[Dict[str, Any]]) -> List[Tuple[tuple, float, float]]:
+    """صفوف التجميع التي يساهم فيها طلب واحد: [(المفتاح، الإيراد، الإيراد النهائي)]"""
+    if not snapshot:
+        return []
+
+    final_cost = snapshot.get("final_cost")
+    estimated_cost = snapshot.get("estimated_cost")
+    revenue = final_cost if final_cost is not None else (estimated_cost if estimated_cost is not None else 0.0)
+    final_revenue = final_cost if final_cost and final_cost > 0 else 0.0
+
+    status = _status_value(snapshot.get("status"))
+    dimensions = (
+        code_prefix_of(snapshot.get("tracking_code")),
+        status,
+        snapshot.get("device_type") or "",
+        snapshot.get("payment_status") or "",
+        snapshot.get("payment_method") or "",
+    )
+
+    result = []
+    received_at = snapshot.get("received_at")
+    if received_at:
+        result.append(((BASIS_RECEIVED, received_at.date()) + dimensions, revenue, final_revenue))
+    delivered_at = snapshot.get("delivered_at")
+    if status == "delivered" and delivered_at:
+        result.append(((BASIS_DELIVERED, delivered_at.date()) + dimensions, revenue, final_revenue))
+    return result
+
+
+def _upsert_statement(db: Session):
+    """عبارة INSERT ... ON CONFLICT تجمع الفرق مع الصف الموجود (ذرية بين العمليات)"""
+    dialect = db.get_bind().dialect.name
+    table = JobDailyStat.__table__
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(KEY_FIELDS),
+            set_={
+                "job_count": table.c.job_count + stmt.excluded.job_count,
+                "revenue": table.c.revenue + stmt.excluded.revenue,
+                "final_revenue": table.c.final_revenue + stmt.excluded.final_revenue,
+            }
+        )
+
+    from sqlalchemy.dialects.mysql import insert
+    stmt = insert(table)
+    return stmt.on_duplicate_key_update(
+        job_count=table.c.job_count + stmt.inserted.job_count,
+        revenue=table.c.revenue + stmt.inserted.revenue,
+        final_revenue=table.c.final_revenue + stmt.inserted.final_revenue,
+    )
+
+
+def apply_changes(db: Session, changes: Iterable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+    """تطبيق فروقات (قبل، بعد) لعدة طلبات على جدول التجميع - بدون commit
+
+    before=None لطلب جديد، و after=None لطلب محذوف
+    """
+    deltas: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for before, after in changes:
+        for key, revenue, final_revenue in _contributions(before):
+            delta = deltas[key]
+            delta[0] -= 1
+            delta[1] -= revenue
+            delta[2] -= final_revenue
+        for key, revenue, final_revenue in _contributions(after):
+            delta = deltas[key]
+            delta[0] += 1
+            delta[1] += revenue
+            delta[2] += final_revenue
+
+    params = [
+        dict(zip(KEY_FIELDS, key), job_count=count, revenue=revenue, final_revenue=final_revenue)
+        for key, (count, revenue, final_revenue) in deltas.items()
+        if count or revenue or final_revenue
+    ]
+    if params:
+        db.execute(_upsert_statement(db), params)
+
+
+def apply_job_change(db: Session, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """تطبيق فرق طلب واحد على جدول التجميع - بدون commit"""
+    apply_changes(db, [(before, after)])
+
+
+def rebuild_daily_stats(db: Session) -> int:
+    """إعادة بناء جدول التجميع بالكامل من جدول الطلبات
+
+    Returns:
+        عدد صفوف التجميع الناتجة
+    """
+    db.query(JobDailyStat).delete(synchronize_session=False)
+
+    totals: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for row in db.query(*SNAPSHOT_COLUMNS).yield_per(5000):
+        for key, revenue, final_revenue in _contributions(job_snapshot(row)):
+            total = totals[key]
+            total[0] += 1
+            total[1] += revenue
+            total[2] += final_revenue
+
+    if totals:
+        db.execute(JobDailyStat.__table__.insert(), [
+            dict(zip(KEY_FIELDS, key), job_count=count, revenue=revenue, final_revenue=final_revenue)
+            for key, (count, revenue, final_revenue) in totals.items()
+        ])
+    db.commit()
+    return len(totals)
+
+
+def ensure_daily_stats(bind) -> None:
+    """بناء جدول التجميع لأول مرة إذا كان فارغاً وهناك طلبات موجودة"""
+    from database.connection import SessionLocal
+
+    db = SessionLocal(bind=bind)
+    try:
+        has_stats = db.query(JobDailyStat.id).limit(1).first() is not None
+        has_jobs = db.query(MaintenanceJob.id).limit(1).first() is not None
+        if has_jobs and not has_stats:
+            rebuild_daily_stats(db)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ تعذر بناء جدول التجميع اليومي: {e}")
+    finally:
+        db.close()
+
+
+def day_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[date], Optional[date]]:
+    """تحويل نطاق [start, end) بالوقت إلى نطاق أيام شامل [first_day, last_day]"""
+    first_day = start_date.date() if start_date else None
+    last_day = (end_date - timedelta(microseconds=1)).date() if end_date else None
+    return first_day, last_day
+
+
+def stats_query(
+    db: Session,
+    basis: str,
+    *group_by,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    code_type: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """استعلام مجمّع على جدول التجميع: SUM(job_count), SUM(revenue), SUM(final_revenue) لكل مجموعة"""
+    query = db.query(
+        *group_by,
+        func.coalesce(func.sum(JobDailyStat.job_count), 0).label("job_count"),
+        func.coalesce(func.sum(JobDailyStat.revenue), 0.0).label("revenue"),
+        func.coalesce(func.sum(JobDailyStat.final_revenue), 0.0).label("final_revenue"),
+    ).filter(JobDailyStat.basis == basis)
+
+    first_day, last_day = day_range(start_date, end_date)
+    if first_day:
+        query = query.filter(JobDailyStat.day >= first_day)
+    if last_day:
+        query = query.filter(JobDailyStat.day <= last_day)
+    if code_type:
+        query = query.filter(JobDailyStat.code_prefix == code_type.upper().strip())
+    if status:
+        query = query.filter(JobDailyStat.status == status)
+    if group_by:
+        query = query.group_by(*group_by)
+    return query
+
+
+PERIOD_CURRENT = "current"
+PERIOD_PREVIOUS = "previous"
+
+
+def report_breakdown(
+    db: Session,
+    basis: str,
+    start_date: datetime,
+    end_date: datetime,
+    code_type: Optional[str] = None,
+    status: Optional[str] = None,
+    previous_range: Optional[Tuple[datetime, datetime]] = None
+):
+    """كل إجماليات التقرير في عبارة واحدة
+
+    صف لكل (الفترة، الحالة، نوع الجهاز، حالة الدفع، طريقة الدفع). الفترة السابقة
+    (للمقارنة) تُحسب دائماً على أساس received_at كما في التقرير الأصلي، وتُضاف
+    إلى نفس الاستعلام عبر CASE بدلاً من استعلام منفصل.
+    """
+    first_day, last_day = day_range(start_date, end_date)
+    current = and_(
+        JobDailyStat.basis == basis,
+        JobDailyStat.day >= first_day,
+        JobDailyStat.day <= last_day,
+    )
+    period_filter = current
+    period = case((current, PERIOD_CURRENT), else_=PERIOD_PREVIOUS).label("period")
+
+    if previous_range:
+        prev_first_day, prev_last_day = day_range(*previous_range)
+        period_filter = or_(current, and_(
+            JobDailyStat.basis == BASIS_RECEIVED,
+            JobDailyStat.day >= prev_first_day,
+            JobDailyStat.day <= prev_last_day,
+        ))
+
+    query = db.query(
+        period,
+        JobDailyStat.status,
+        JobDailyStat.device_type,
+        JobDailyStat.payment_status,
+        JobDailyStat.payment_method,
+        func.sum(JobDailyStat.job_count).label("job_count"),
+        func.sum(JobDailyStat.revenue).label("revenue"),
+    ).filter(period_filter)
+
+    if code_type:
+        query = query.filter(JobDailyStat.code_prefix == code_type.upper().strip())
+    if status:
+        query = query.filter(JobDailyStat.status == status)
+
+    return query.group_by(
+        period,
+        JobDailyStat.status,
+        JobDailyStat.device_type,
+        JobDailyStat.payment_status,
+        JobDailyStat.payment_method,
+    ).having(func.sum(JobDailyStat.job_count) != 0)
+
+
+if __name__ == "__main__":
+    from database.connection import SessionLocal, init_db
+
+    print("🚀 إعادة بناء جدول التجميع اليومي...")
+    init_db()
+    session = SessionLocal()
+    try:
+        count = rebuild_daily_stats(session)
+        print(f"✅ اكتمل! ({count} صف)")
+    finally:
+        session.close()
@@ -3,7 +3,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, DateTime, Enum, JSON
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, DateTime, Date, Enum, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -40,11 +40,12 @@ class Customer(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)
     phone = Column(String(20), nullable=False, index=True)
+    phone_normalized = Column(String(20), index=True)  # الأرقام فقط (database.customer_search.normalize_phone)
     email = Column(String(100), index=True)
     address = Column(Text)
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # العلاقات
     maintenance_jobs = relationship("MaintenanceJob", back_populates="customer")
@@ -85,7 +86,7 @@ class MaintenanceJob(Base):
     completed_at = Column(DateTime)
     delivered_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # للتحديث التزايدي
     
     # العلاقات
     customer = relationship("Customer", back_populates="maintenance_jobs")
@@ -94,6 +95,81 @@ class MaintenanceJob(Base):
     expenses = relationship("JobExpense", back_populates="job", cascade="all, delete-orphan")
     status_history = relationship("StatusHistory", back_populates="maintenance_job")
     payments = relationship("Payment", back_populates="maintenance_job")
+    
+    __table_args__ = (
+        # تقارير الطلبات المسلّمة: status = delivered وفترة delivered_at
+        Index("idx_jobs_status_delivered", "status", "delivered_at"),
+    )
+
+class TrackingCodeSequence(Base):
+    """تسلسل أرقام أكواد التتبع لكل بادئة (A, B, C, D)"""
+    __tablename__ = "tracking_code_sequences"
+    
+    prefix = Column(String(10), primary_key=True)  # بادئة الكود (A, B, C, D)
+    last_number = Column(Integer, nullable=False, default=0)  # آخر رقم تم حجزه
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DeviceCode(Base):
+    """سجل الأجهزة المعروفة (الرقم التسلسلي والباركود الملصق على الجهاز)
+    
+    نفس جدول device_codes الذي ينشئه CodeService - كل عمود فريد فالبحث عن
+    كود ممسوح بالماسح بحث على فهرس.
+    """
+    __tablename__ = "device_codes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    device_serial = Column(Text, unique=True)
+    barcode = Column(Text, unique=True)
+    device_type = Column(Text)
+    device_model = Column(Text)
+    customer_name = Column(Text)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    last_used_at = Column(DateTime)
+
+class JobDailyStat(Base):
+    """تجميع يومي لطلبات الصيانة (للتقارير ولوحة التحكم بدون مسح جدول الطلبات)
+    
+    كل طلب يُحسب مرة حسب يوم الاستلام (basis=received)، ومرة إضافية حسب يوم
+    التسليم (basis=delivered) إذا تم تسليمه. الأعمدة النصية لا تقبل NULL حتى
+    يعمل القيد الفريد مع ON CONFLICT.
+    """
+    __tablename__ = "job_daily_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    basis = Column(String(10), nullable=False)  # received أو delivered
+    day = Column(Date, nullable=False)
+    code_prefix = Column(String(10), nullable=False, default="")
+    status = Column(String(20), nullable=False, default="")
+    device_type = Column(String(100), nullable=False, default="")
+    payment_status = Column(String(20), nullable=False, default="")
+    payment_method = Column(String(20), nullable=False, default="")
+    job_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)  # COALESCE(final_cost, estimated_cost, 0)
+    final_revenue = Column(Float, nullable=False, default=0.0)  # final_cost > 0 فقط
+    
+    __table_args__ = (
+        UniqueConstraint(
+            "basis", "day", "code_prefix", "status", "device_type", "payment_status", "payment_method",
+            name="uq_job_daily_stats_key"
+        ),
+        Index("idx_job_daily_stats_basis_day", "basis", "day"),
+    )
+
+class ChangeLog(Base):
+    """سجل تغييرات للإشعار بين العمليات (واجهة سطح المكتب و web_app.py)
+    
+    سجل إضافي فقط: كل عملية كتابة في MaintenanceService تضيف صفاً داخل نفس
+    المعاملة، وكل عملية تسأل دورياً "ما الذي تغيّر بعد الإصدار N" (id أكبر من N).
+    """
+    __tablename__ = "change_log"
+    # AUTOINCREMENT حتى لا يُعاد استخدام رقم إصدار بعد حذف السجلات القديمة
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # رقم الإصدار
+    entity = Column(String(20), nullable=False)  # jobs, payments, customers
+    entity_id = Column(Integer, nullable=False)  # رقم الطلب (للطلبات والدفعات) أو رقم العميل
+    action = Column(String(10), nullable=False)  # insert, update, status, delete
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 class Part(Base):
     """نموذج قطع الغيار"""
@@ -151,6 +227,11 @@ class StatusHistory(Base):
     changed_by_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # سجل عدة طلبات دفعة واحدة (تاريخ الجهاز، الحذف) بدون مسح الجدول
+    __table_args__ = (
+        Index("idx_status_history_job_created", "maintenance_job_id", "created_at"),
+    )
+    
     # العلاقات
     maintenance_job = relationship("MaintenanceJob", back_populates="status_history")
     changed_by = relationship("User")
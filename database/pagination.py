@@ -0,0 +1,52 @@
+"""
+ترحيل بالمؤشر (keyset pagination) لقوائم الطلبات
+
+بدلاً من OFFSET (الذي يمسح ويتجاهل كل الصفوف السابقة فيبطؤ مع كل صفحة) نرسل
+مؤشراً يحمل (received_at, id) لآخر صف في الصفحة، والصفحة التالية تبدأ مباشرة
+بعده عبر الفهرس على received_at - زمن ثابت مهما كان رقم الصفحة.
+
+المؤشر نص base64 شفاف للعميل (لا يجب تفسيره أو بناؤه يدوياً).
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(received_at: datetime, job_id: int) -> str:
+    """بناء مؤشر للصف التالي بعد (received_at, id)"""
+    raw = f"{received_at.isoformat()}|{job_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """تحليل المؤشر إلى (received_at, id)
+
+    Raises:
+        ValueError: إذا كان المؤشر غير صالح
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        received_at, job_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(received_at), int(job_id)
+    except (ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError(f"مؤشر غير صالح: {cursor}") from e
+
+
+def keyset_after(received_at_column, id_column, cursor: Tuple[datetime, int]):
+    """شرط "بعد المؤشر" للترتيب التنازلي حسب (received_at, id)
+
+    الصيغة (a < x OR (a = x AND id < y)) تُترجم في SQLite إلى بحث نطاق على فهرس
+    received_at (الذي يتضمن id ضمنياً) بدلاً من مسح الصفوف السابقة.
+    """
+    received_at, job_id = cursor
+    return or_(
+        received_at_column < received_at,
+        and_(received_at_column == received_at, id_column < job_id),
+    )
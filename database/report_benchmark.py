@@ -0,0 +1,130 @@
+"""
+قياس زمن تقارير get_report_data على قاعدة بيانات مؤقتة ببيانات عشوائية
+
+الاستخدام:
+    python -m database.report_benchmark               # 100,000 و 1,000,000 طلب
+    python -m database.report_benchmark 50000         # أحجام مخصصة
+
+لا يلمس قاعدة البيانات الفعلية - يتم إنشاء ملف SQLite مؤقت وحذفه في النهاية.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.daily_stats import rebuild_daily_stats
+from database.models import Customer, MaintenanceJob, MaintenanceStatus
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+BATCH_SIZE = 20_000
+RUNS = 3
+
+DEVICE_TYPES = ["Inverter", "Battery", "UPS", "Charger", "Solar Panel", "Stabilizer"]
+STATUSES = list(MaintenanceStatus)
+CODE_TYPES = ["A", "B", "C", "D"]
+
+REPORTS = [
+    ("daily", None, "delivered"),
+    ("monthly", None, "delivered"),
+    ("monthly", "A", None),
+    ("yearly", None, "delivered"),
+    ("yearly", None, None),
+]
+
+
+def _generate(engine, job_count: int) -> None:
+    """تعبئة الجداول ببيانات عشوائية موزعة على آخر سنتين"""
+    rng = random.Random(job_count)
+    now = datetime.utcnow()
+    customer_count = max(1, job_count // 10)
+
+    with engine.begin() as conn:
+        conn.execute(Customer.__table__.insert(), [
+            {"id": i + 1, "name": f"عميل {i + 1}", "phone": f"70{i:06d}", "created_at": now}
+            for i in range(customer_count)
+        ])
+
+    numbers = {code: 0 for code in CODE_TYPES}
+    for offset in range(0, job_count, BATCH_SIZE):
+        rows = []
+        for _ in range(min(BATCH_SIZE, job_count - offset)):
+            code = rng.choice(CODE_TYPES)
+            numbers[code] += 1
+            status = rng.choice(STATUSES)
+            received_at = now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+            delivered = status == MaintenanceStatus.DELIVERED
+            paid = rng.random() < 0.6
+            rows.append({
+                "tracking_code": f"{code}{numbers[code]}",
+                "customer_id": rng.randint(1, customer_count),
+                "device_type": rng.choice(DEVICE_TYPES),
+                "issue_description": "-",
+                "status": status,
+                "estimated_cost": float(rng.randint(5, 200)),
+                "final_cost": float(rng.randint(5, 300)) if delivered else None,
+                "payment_status": "paid" if paid else "unpaid",
+                "payment_method": rng.choice(["cash", "wish_money"]) if paid else None,
+                "received_at": received_at,
+                "delivered_at": min(now, received_at + timedelta(days=rng.randint(0, 20))) if delivered else None,
+                "created_at": received_at,
+                "updated_at": received_at,
+            })
+        with engine.begin() as conn:
+            conn.execute(MaintenanceJob.__table__.insert(), rows)
+
+
+def run_benchmark(job_count: int) -> None:
+    """إنشاء قاعدة مؤقتة بالحجم المطلوب وقياس زمن كل تقرير"""
+    from services.maintenance_service import MaintenanceService
+    from utils.performance_cache import app_cache
+
+    handle, path = tempfile.mkstemp(suffix=".db", prefix="adr_report_benchmark_")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine)
+
+        print(f"\n📦 {job_count:,} طلب")
+        started = time.perf_counter()
+        _generate(engine, job_count)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        rebuild_daily_stats(db)
+        print(f"   تجهيز البيانات: {time.perf_counter() - started:.1f}s")
+
+        service = MaintenanceService(db)
+        for report_type, code_type, status in REPORTS:
+            timings = []
+            for _ in range(RUNS):
+                app_cache.clear()
+                started = time.perf_counter()
+                success, message, data = service.get_report_data(report_type, code_type=code_type, status=status)
+                timings.append(time.perf_counter() - started)
+                if not success:
+                    print(f"   ❌ {report_type}: {message}")
+                    break
+            else:
+                label = f"{report_type} / {code_type or 'الكل'} / {status or 'جميع الحالات'}"
+                print(
+                    f"   {label:<35} {min(timings) * 1000:8.1f} ms"
+                    f"  ({data['total_jobs']:,} طلب، {len(data['jobs']):,} صف تفاصيل)"
+                )
+        db.close()
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or list(DEFAULT_SIZES)
+    print("🚀 قياس زمن التقارير...")
+    for size in sizes:
+        run_benchmark(size)
+    print("\n✅ اكتمل!")
@@ -0,0 +1,243 @@
+"""
+فهرس البحث النصي لطلبات الصيانة
+
+- SQLite: جدول FTS5 (jobs_fts) بمقسّم trigram يدعم البحث الجزئي في الأرقام
+  التسلسلية وأرقام الهواتف، ويتم تحديثه تلقائياً عبر triggers عند الإضافة
+  والتعديل والحذف (حتى لو تم التعديل من عملية أخرى مثل web_app.py).
+- PostgreSQL: فهارس GIN مع pg_trgm حتى تستخدم ILIKE '%q%' الفهرس.
+
+النصوص العربية تُوحّد قبل الفهرسة والبحث (أ/إ/آ ← ا، ى ← ي، ة ← ه، إزالة
+التشكيل والتطويل، الأرقام الهندية ← أرقام عادية) حتى يطابق "احمد" الاسم "أحمد".
+"""
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+FTS_TABLE = "jobs_fts"
+
+# أقل طول للبحث عبر trigram (أقصر من ذلك يستخدم البحث العادي)
+MIN_FTS_QUERY_LENGTH = 3
+
+# الأرقام الهندية ← أرقام عادية
+ARABIC_DIGITS = [(chr(0x0660 + digit), str(digit)) for digit in range(10)]
+
+# جدول التوحيد - نفس الجدول يُستخدم في Python (للاستعلام) وفي SQL (للفهرسة)
+ARABIC_NORMALIZATION = [
+    ("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"),
+    ("ى", "ي"),
+    ("ة", "ه"),
+    ("ـ", ""),  # تطويل
+] + [
+    (chr(code), "") for code in range(0x064B, 0x0653)  # التشكيل
+] + ARABIC_DIGITS
+
+# رموز تُحذف من الهاتف والرقم التسلسلي وكود التتبع (70-123 456 == 70123456)
+COMPACT_CHARS = [" ", "-", "+", "/", "."]
+
+# translate() في PostgreSQL يعمل حرفاً بحرف
+_PG_TRANSLATE_FROM = "أإآٱىة"
+_PG_TRANSLATE_TO = "اااايه"
+
+
+# كل الاستبدالات حرف بحرف - str.translate أسرع من replace متتالية (فهرس الواجهة يوحّد آلاف الصفوف)
+_NORMALIZE_TABLE = str.maketrans({source: target for source, target in ARABIC_NORMALIZATION})
+_COMPACT_TABLE = str.maketrans({char: "" for char in COMPACT_CHARS})
+
+
+def normalize_search_text(value: Optional[str]) -> str:
+    """توحيد النص العربي واللاتيني للبحث"""
+    if not value:
+        return ""
+    return str(value).lower().strip().translate(_NORMALIZE_TABLE)
+
+
+def compact_search_text(value: Optional[str]) -> str:
+    """توحيد النص مع حذف المسافات والفواصل (للهواتف والأرقام التسلسلية)"""
+    return normalize_search_text(value).translate(_COMPACT_TABLE)
+
+
+def _sql_normalize(expression: str, compact: bool = False) -> str:
+    """بناء تعبير SQL مكافئ لـ normalize_search_text (بدون دوال Python)
+
+    نستخدم REPLACE متداخلة بدلاً من دالة مسجلة حتى تعمل الـ triggers من أي اتصال.
+    محلل SQLite لا يقبل أكثر من ~30 مستوى تداخل، لذلك أعمدة الأرقام (الهاتف،
+    الرقم التسلسلي، الكود) تأخذ الأرقام ورموز الفصل فقط. لا حاجة لـ LOWER لأن
+    مقسّم trigram غير حساس لحالة الأحرف.
+    """
+    pairs = ARABIC_DIGITS + [(char, "") for char in COMPACT_CHARS] if compact else ARABIC_NORMALIZATION
+    sql = expression
+    for source, target in pairs:
+        sql = f"REPLACE({sql}, '{source}', '{target}')"
+    return sql
+
+
+def _fts_select(job_alias: str, customer_alias: str) -> str:
+    """أعمدة صف الفهرس لطلب واحد"""
+    return ", ".join([
+        f"{job_alias}.id",
+        _sql_normalize(f"{job_alias}.tracking_code", compact=True),
+        _sql_normalize(f"{customer_alias}.name"),
+        _sql_normalize(f"{customer_alias}.phone", compact=True),
+        _sql_normalize(f"{job_alias}.device_type"),
+        _sql_normalize(f"{job_alias}.device_model"),
+        _sql_normalize(f"{job_alias}.serial_number", compact=True),
+    ])
+
+
+_FTS_COLUMNS = "rowid, tracking_code, customer_name, customer_phone, device_type, device_model, serial_number"
+
+
+def _sqlite_statements():
+    """عبارات إنشاء جدول FTS5 والـ triggers"""
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            tracking_code, customer_name, customer_phone,
+            device_type, device_model, serial_number,
+            tokenize = 'trigram'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_after_insert
+        AFTER INSERT ON maintenance_jobs BEGIN
+            INSERT INTO {FTS_TABLE}({_FTS_COLUMNS})
+            SELECT {_fts_select('NEW', 'c')} FROM customers c WHERE c.id = NEW.customer_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_after_update
+        AFTER UPDATE OF tracking_code, customer_id, device_type, device_model, serial_number
+        ON maintenance_jobs BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+            INSERT INTO {FTS_TABLE}({_FTS_COLUMNS})
+            SELECT {_fts_select('NEW', 'c')} FROM customers c WHERE c.id = NEW.customer_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_after_delete
+        AFTER DELETE ON maintenance_jobs BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS jobs_fts_customer_update
+        AFTER UPDATE OF name, phone ON customers BEGIN
+            UPDATE {FTS_TABLE}
+            SET customer_name = {_sql_normalize('NEW.name')},
+                customer_phone = {_sql_normalize('NEW.phone', compact=True)}
+            WHERE rowid IN (SELECT id FROM maintenance_jobs WHERE customer_id = NEW.id);
+        END
+        """,
+    ]
+
+
+def _postgres_statements():
+    """عبارات إنشاء فهارس pg_trgm"""
+    normalized_name = f"translate(lower(name), '{_PG_TRANSLATE_FROM}', '{_PG_TRANSLATE_TO}')"
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_tracking_trgm ON maintenance_jobs USING gin (tracking_code gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_device_type_trgm ON maintenance_jobs USING gin (device_type gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_device_model_trgm ON maintenance_jobs USING gin (device_model gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_serial_trgm ON maintenance_jobs USING gin (serial_number gin_trgm_ops)",
+        f"CREATE INDEX IF NOT EXISTS idx_customers_name_norm_trgm ON customers USING gin (({normalized_name}) gin_trgm_ops)",
+    ]
+
+
+def pg_normalized(column):
+    """تعبير SQLAlchemy لاسم موحّد في PostgreSQL (يطابق فهرس idx_customers_name_norm_trgm)"""
+    from sqlalchemy import func
+    return func.translate(func.lower(column), _PG_TRANSLATE_FROM, _PG_TRANSLATE_TO)
+
+
+def ensure_search_index(bind: Engine) -> bool:
+    """إنشاء فهرس البحث إذا لم يكن موجوداً (وتعبئته من البيانات الحالية)"""
+    dialect = bind.dialect.name
+    try:
+        with bind.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE}
+                ).scalar()
+                for statement in _sqlite_statements():
+                    conn.execute(text(statement))
+                if not exists:
+                    _populate(conn)
+            elif dialect == "postgresql":
+                for statement in _postgres_statements():
+                    conn.execute(text(statement))
+            else:
+                return False
+        return True
+    except Exception as e:
+        # SQLite قديم بدون trigram (أقدم من 3.34) أو صلاحيات غير كافية - نبقى على ILIKE
+        print(f"⚠️ تعذر إنشاء فهرس البحث: {e}")
+        return False
+
+
+def _populate(conn) -> None:
+    """تعبئة جدول FTS من جميع الطلبات الحالية"""
+    conn.execute(text(f"""
+        INSERT INTO {FTS_TABLE}({_FTS_COLUMNS})
+        SELECT {_fts_select('j', 'c')}
+        FROM maintenance_jobs j JOIN customers c ON c.id = j.customer_id
+    """))
+
+
+def rebuild_search_index(bind: Engine) -> bool:
+    """إعادة بناء فهرس البحث بالكامل (SQLite)"""
+    if bind.dialect.name != "sqlite":
+        return ensure_search_index(bind)
+    if not ensure_search_index(bind):
+        return False
+    with bind.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        _populate(conn)
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    return True
+
+
+_fts_available = {}
+
+
+def is_fts_available(bind: Engine) -> bool:
+    """هل جدول FTS5 موجود؟ (يُفحص مرة واحدة لكل محرك)"""
+    key = id(bind)
+    if key not in _fts_available:
+        if bind.dialect.name != "sqlite":
+            _fts_available[key] = False
+        else:
+            try:
+                with bind.connect() as conn:
+                    _fts_available[key] = bool(conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {"name": FTS_TABLE}
+                    ).scalar())
+            except Exception:
+                _fts_available[key] = False
+    return _fts_available[key]
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """تحويل نص البحث إلى تعبير MATCH لـ FTS5 أو None إذا كان قصيراً جداً"""
+    normalized = normalize_search_text(query)
+    if len(normalized) < MIN_FTS_QUERY_LENGTH:
+        return None
+    # عبارة حرفية (phrase) - مضاعفة علامات الاقتباس للهروب
+    match = '"' + normalized.replace('"', '""') + '"'
+    compact = compact_search_text(query)
+    if compact != normalized and len(compact) >= MIN_FTS_QUERY_LENGTH:
+        match += ' OR {tracking_code customer_phone serial_number}: "' + compact.replace('"', '""') + '"'
+    return match
+
+
+if __name__ == "__main__":
+    from database.connection import engine, init_db
+
+    print("🚀 إعادة بناء فهرس البحث...")
+    init_db()
+    if rebuild_search_index(engine):
+        print("✅ اكتمل!")
@@ -0,0 +1,151 @@
+"""
+مخزن تسلسل أكواد التتبع - حجز الرقم التالي لكل بادئة بدون مسح جدول الطلبات
+
+بدلاً من حساب MAX() على جميع أكواد التتبع عند كل استلام جديد (مسح كامل للجدول
+لأن الدوال حول العمود تمنع استخدام الفهرس)، نحتفظ بآخر رقم لكل بادئة في جدول
+tracking_code_sequences ونزيده بعبارة UPDATE واحدة على المفتاح الأساسي.
+
+عبارة UPDATE تحجز قفل الكتابة حتى نهاية المعاملة، لذلك يبقى الحجز ذرياً حتى عند
+إنشاء طلبات في نفس اللحظة من واجهة سطح المكتب ومن web_app.py.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.models import MaintenanceJob, TrackingCodeSequence
+
+# البادئة حروف فقط متبوعة بأرقام فقط (مثل A15 أو B7)
+_TRACKING_CODE_RE = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def normalize_prefix(code_type: str) -> str:
+    """توحيد بادئة الكود (أحرف كبيرة بدون مسافات)"""
+    return (code_type or "A").replace(" ", "").upper().strip()
+
+
+def parse_tracking_code(code: Optional[str]) -> Optional[Tuple[str, int]]:
+    """تحليل كود التتبع إلى (البادئة، الرقم) أو None إذا لم يكن بالصيغة المتوقعة"""
+    if not code:
+        return None
+    match = _TRACKING_CODE_RE.match(str(code).replace(" ", "").upper().strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def _scan_max_number(db: Session, prefix: str) -> int:
+    """حساب أكبر رقم مستخدم لبادئة من جدول الطلبات (مرة واحدة عند التهيئة فقط)"""
+    max_number = 0
+    codes = db.query(MaintenanceJob.tracking_code)\
+              .filter(MaintenanceJob.tracking_code.ilike(f'{prefix}%'))
+    for (code,) in codes.yield_per(1000):
+        parsed = parse_tracking_code(code)
+        if parsed and parsed[0] == prefix and parsed[1] > max_number:
+            max_number = parsed[1]
+    return max_number
+
+
+def _seed_prefix(db: Session, prefix: str) -> None:
+    """إنشاء صف التسلسل لبادئة جديدة انطلاقاً من الأكواد الموجودة"""
+    max_number = _scan_max_number(db, prefix)
+    try:
+        # savepoint حتى لا يُلغي تعارض الإدراج (عملية أخرى سبقتنا) المعاملة الحالية
+        with db.begin_nested():
+            db.add(TrackingCodeSequence(prefix=prefix, last_number=max_number))
+    except IntegrityError:
+        # تم إنشاء الصف من عملية أخرى في نفس اللحظة - لا مشكلة
+        pass
+
+
+def peek_next_number(db: Session, prefix: str) -> int:
+    """الرقم التالي المتوقع لبادئة بدون حجزه (للعرض في نموذج الإضافة)"""
+    prefix = normalize_prefix(prefix)
+    last_number = db.query(TrackingCodeSequence.last_number)\
+                    .filter(TrackingCodeSequence.prefix == prefix)\
+                    .scalar()
+    if last_number is None:
+        last_number = _scan_max_number(db, prefix)
+    return last_number + 1
+
+
+def allocate_next_number(db: Session, prefix: str) -> int:
+    """حجز الرقم التالي لبادئة بشكل ذري داخل المعاملة الحالية
+
+    لا يتم الـ commit هنا - يبقى القفل محجوزاً حتى يحفظ المستدعي الطلب الجديد
+    """
+    prefix = normalize_prefix(prefix)
+    params = {"prefix": prefix, "now": datetime.utcnow()}
+    increment = text("""
+        UPDATE tracking_code_sequences
+        SET last_number = last_number + 1, updated_at = :now
+        WHERE prefix = :prefix
+    """)
+
+    result = db.execute(increment, params)
+    if result.rowcount == 0:
+        _seed_prefix(db, prefix)
+        db.execute(increment, params)
+
+    return db.execute(
+        text("SELECT last_number FROM tracking_code_sequences WHERE prefix = :prefix"),
+        {"prefix": prefix}
+    ).scalar()
+
+
+def bump_to_at_least(db: Session, code: Optional[str]) -> None:
+    """رفع التسلسل إذا تم إدخال كود يدوياً برقم أكبر من آخر رقم محجوز"""
+    parsed = parse_tracking_code(code)
+    if not parsed:
+        return
+    prefix, number = parsed
+    db.execute(text("""
+        UPDATE tracking_code_sequences
+        SET last_number = :number, updated_at = :now
+        WHERE prefix = :prefix AND last_number < :number
+    """), {"prefix": prefix, "number": number, "now": datetime.utcnow()})
+
+
+def backfill_tracking_code_sequences(db: Session) -> Dict[str, int]:
+    """تعبئة جدول التسلسل من جميع الأكواد الموجودة (مسح واحد لكل البادئات)
+
+    آمن للتشغيل أكثر من مرة: لا يُنقص أي تسلسل موجود
+    """
+    max_numbers: Dict[str, int] = {}
+    for (code,) in db.query(MaintenanceJob.tracking_code).yield_per(1000):
+        parsed = parse_tracking_code(code)
+        if parsed and parsed[1] > max_numbers.get(parsed[0], 0):
+            max_numbers[parsed[0]] = parsed[1]
+
+    existing = {
+        row.prefix: row
+        for row in db.query(TrackingCodeSequence).all()
+    }
+    for prefix, number in max_numbers.items():
+        row = existing.get(prefix)
+        if row is None:
+            db.add(TrackingCodeSequence(prefix=prefix, last_number=number))
+        elif row.last_number < number:
+            row.last_number = number
+
+    db.commit()
+    return max_numbers
+
+
+if __name__ == "__main__":
+    from database.connection import SessionLocal, init_db
+
+    print("🚀 بدء تعبئة تسلسل أكواد التتبع...")
+    init_db()
+    session = SessionLocal()
+    try:
+        numbers = backfill_tracking_code_sequences(session)
+        for prefix, number in sorted(numbers.items()):
+            print(f"   {prefix}: آخر رقم {number}")
+        print("✅ اكتمل!")
+    finally:
+        session.close()
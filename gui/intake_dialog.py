@@ -0,0 +1,691 @@
+"""
+نافذة استلام جهاز جديد (إضافة طلب صيانة) - تُبنى مرة واحدة وتُعاد للاستخدام
+
+بناء النافذة (عشرات العناصر + ربط Enter + قراءة الكود التالي) كان يتكرر مع كل
+عميل. الآن:
+
+- تُبنى مخفية عند أول خمول للواجهة، وفتحها = مسح الحقول + deiconify.
+- الإغلاق يخفيها فقط (withdraw) ولا يهدمها.
+- الكود التالي لكل نوع (A/B/C/D) يُقرأ مسبقاً في الخلفية، وبعد الحفظ يُعرض
+  الكود التالي مباشرة من الكود المحجوز ثم يُصحح من القاعدة في الخلفية.
+- الحفظ نفسه يعمل في الخلفية (run_db_task) ولا ينتظر توليد أي كود.
+- مسح باركود/رقم تسلسلي ثم Enter يملأ بيانات العميل والجهاز من آخر طلب
+  للجهاز (DeviceLookupService - من الذاكرة مباشرة إذا بُحث عنه مؤخراً).
+- الكتابة في اسم العميل أو الهاتف تعرض اقتراحات العملاء (CustomerLookupService)
+  بعد توقف قصير عن الكتابة؛ السهم للأسفل ثم Enter أو النقر يملأ الاسم والهاتف.
+
+    dialog = IntakeDialog(frame, frame.run_db_task, on_created=..., on_save_contact=...)
+    dialog.open()
+"""
+
+import tkinter as tk
+from tkinter import messagebox
+from typing import Any, Callable, Dict, Optional
+
+import customtkinter as ctk
+
+from database.tracking_sequences import parse_tracking_code
+from services.customer_lookup_service import CustomerLookupService
+from services.device_lookup_service import DeviceLookupService
+
+# أنواع الأكواد المعروضة في القائمة المنسدلة
+CODE_TYPES = [
+    ("A", "انفرترات"),
+    ("B", "عده صناعيه"),
+    ("C", "مشكل"),
+    ("D", "شاشات"),
+]
+CODE_PREFIXES = tuple(prefix for prefix, _ in CODE_TYPES)
+
+# سعر الصرف المستخدم لعرض التحويل وتحويل السعر التقديري إلى دولار
+LBP_RATE = 90000
+
+WIDTH = 550
+HEIGHT = 750
+
+# يُعرض مكان الكود حتى تصل قيمته من الخلفية
+CODE_PLACEHOLDER = "..."
+
+# انتظار توقف الكتابة قبل طلب الاقتراحات (ms)
+SUGGEST_DELAY_MS = 150
+SUGGESTION_ROWS = 6
+
+# مفاتيح لا تغير النص - لا تعيد طلب الاقتراحات
+_NAVIGATION_KEYS = {"Return", "KP_Enter", "Up", "Down", "Escape", "Tab", "Left", "Right",
+                    "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+
+def _code_letter(selected_type: str) -> str:
+    """استخراج الحرف من نص القائمة (مثل "A - انفرترات" -> "A")"""
+    return selected_type.split(" - ")[0] if " - " in selected_type else selected_type
+
+
+class IntakeDialog(ctk.CTkToplevel):
+    """نموذج إضافة طلب صيانة قابل لإعادة الاستخدام
+
+    run_db_task(work(service), on_success, on_error, key) - تشغيل في الخلفية
+    on_created(job, values) - بعد نجاح الحفظ (تحديث القائمة والإحصائيات)
+    on_save_contact(name, phone) - زر "حفظ في الهاتف"
+    """
+
+    def __init__(
+        self,
+        master,
+        run_db_task: Callable,
+        on_created: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+        on_save_contact: Optional[Callable[[str, str], None]] = None
+    ):
+        super().__init__(master)
+        # مخفية حتى أول open()
+        self.withdraw()
+        self.run_db_task = run_db_task
+        self.on_created = on_created
+        self.on_save_contact = on_save_contact
+
+        self._next_codes: Dict[str, str] = {}
+        self._is_saving = False
+        self._suggest_job = None
+        self._suggest_entry = None
+        self._suggestions = []
+        self.last_customer_name = None
+        self.last_customer_phone = None
+
+        self.title("إضافة طلب صيانة جديد - ADR ELECTRONICS")
+        self.resizable(False, False)
+        x = (self.winfo_screenwidth() // 2) - (WIDTH // 2)
+        y = (self.winfo_screenheight() // 2) - (HEIGHT // 2)
+        self.geometry(f"{WIDTH}x{HEIGHT}+{x}+{y}")
+        try:
+            self.iconbitmap("icon.ico")
+        except Exception:
+            pass
+        self.protocol("WM_DELETE_WINDOW", self.hide)
+
+        self._build()
+        self.prefetch_codes()
+        # بناء فهرس العملاء قبل أول حرف يُكتب
+        self.run_db_task(lambda service: CustomerLookupService(service.db).warm(), key="customer_index")
+
+    # ------------------------------------------------------------------
+    # فتح / إخفاء
+    # ------------------------------------------------------------------
+    def open(self) -> None:
+        """إظهار النموذج فارغاً مع الكود التالي للنوع المختار"""
+        self.reset()
+        self.deiconify()
+        self.lift()
+        try:
+            self.grab_set()
+        except tk.TclError:
+            # النافذة لم تظهر بعد على الشاشة - المحاولة بعد عرضها
+            self.after(50, self.grab_set)
+        self.focus_force()
+        self.serial_entry.focus_set()
+        # قد تكون أكواد أُنشئت من web_app.py منذ آخر قراءة
+        self.prefetch_codes()
+
+    def hide(self) -> None:
+        self._hide_suggestions()
+        try:
+            self.grab_release()
+        except tk.TclError:
+            pass
+        self.withdraw()
+
+    def reset(self) -> None:
+        """مسح الحقول للطلب التالي (نوع الكود يبقى كما هو)"""
+        for entry in (self.serial_entry, self.customer_entry, self.phone_entry,
+                      self.device_type_entry, self.issue_entry, self.estimated_cost_entry):
+            entry.delete(0, tk.END)
+        self.device_details_entry.delete("1.0", tk.END)
+        self.device_info_label.configure(text="")
+        self._hide_suggestions()
+        self.phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
+        self.estimated_currency_var.set("USD")
+        self.conversion_display.configure(text="")
+        self._show_code()
+
+    # ------------------------------------------------------------------
+    # الأكواد
+    # ------------------------------------------------------------------
+    def prefetch_codes(self) -> None:
+        """قراءة الكود التالي لكل الأنواع في الخلفية"""
+        self.run_db_task(
+            lambda service: {prefix: service.generate_tracking_code(prefix) for prefix in CODE_PREFIXES},
+            on_success=self._set_codes,
+            on_error=lambda e: print(f"خطأ في تحديث الكود: {e}"),
+            key="intake_codes"
+        )
+
+    def _set_codes(self, codes: Dict[str, str]) -> None:
+        self._next_codes.update(codes)
+        self._show_code()
+
+    def _selected_prefix(self) -> str:
+        return _code_letter(self.code_type_var.get())
+
+    def _show_code(self, *args) -> None:
+        self.code_display.configure(text=self._next_codes.get(self._selected_prefix(), CODE_PLACEHOLDER))
+
+    def _advance_code(self, tracking_code: str) -> None:
+        """الكود التالي بعد الحجز مباشرة (بدون انتظار القاعدة)"""
+        parsed = parse_tracking_code(tracking_code)
+        if parsed:
+            prefix, number = parsed
+            self._next_codes[prefix] = f"{prefix}{number + 1}"
+        self._show_code()
+
+    # ------------------------------------------------------------------
+    # الحفظ
+    # ------------------------------------------------------------------
+    def _collect_values(self) -> Dict[str, Any]:
+        """قراءة الحقول مع القيم الافتراضية للحقول الفارغة"""
+        estimated_cost = self.estimated_cost_entry.get().strip()
+        currency = self.estimated_currency_var.get()
+        estimated_cost_value = 0.0
+        if estimated_cost:
+            try:
+                estimated_cost_value = float(estimated_cost)
+                # تحويل السعر إلى الدولار إذا كان بالليرة اللبنانية
+                if currency == "LBP":
+                    estimated_cost_value = estimated_cost_value / LBP_RATE
+            except ValueError:
+                estimated_cost_value = 0.0
+
+        displayed_code = self.code_display.cget("text")
+        device_details = self.device_details_entry.get("1.0", tk.END).strip()
+        return {
+            # بدون رقم تسلسلي: يُستخدم الكود المعروض
+            "serial": self.serial_entry.get().strip() or (displayed_code if displayed_code != CODE_PLACEHOLDER else ""),
+            "customer_name": self.customer_entry.get().strip() or "عميل غير محدد",
+            "phone": self.phone_entry.get().strip() or "غير محدد",
+            "device_type": self.device_type_entry.get().strip() or "غير محدد",
+            "device_details": device_details or None,
+            "issue": self.issue_entry.get().strip() or "لم يتم تحديد نوع العطل",
+            "estimated_cost": estimated_cost_value,
+            "estimated_cost_currency": currency,
+            "code_type": self._selected_prefix(),
+        }
+
+    def save(self) -> None:
+        if self._is_saving:
+            return
+        values = self._collect_values()
+        self._is_saving = True
+        self.save_btn.configure(state="disabled", text="⏳ جاري الحفظ...")
+
+        def work(service):
+            serial = values["serial"] or service.generate_tracking_code(values["code_type"])
+            result = service.create_maintenance_job(
+                customer_name=values["customer_name"],
+                phone=values["phone"],
+                device_type=values["device_type"],
+                device_model=None,
+                serial_number=serial,
+                issue_description=values["issue"],
+                estimated_cost=values["estimated_cost"],
+                estimated_cost_currency=values["estimated_cost_currency"],
+                notes=values["device_details"],
+                code_type=values["code_type"]
+            )
+            return result, serial
+
+        self.run_db_task(work, on_success=lambda result: self._on_saved(values, *result), on_error=self._on_save_error)
+
+    def _finish_saving(self) -> None:
+        self._is_saving = False
+        if self.winfo_exists():
+            self.save_btn.configure(state="normal", text="💾 حفظ الطلب")
+
+    def _on_saved(self, values: Dict[str, Any], result, serial: str) -> None:
+        self._finish_saving()
+        success, message, job = result
+        if not success:
+            messagebox.showerror("خطأ", f"فشل في حفظ البيانات: {message}", parent=self)
+            return
+
+        values["serial"] = serial
+        self.last_customer_name = values["customer_name"]
+        self.last_customer_phone = values["phone"]
+        self._advance_code(job['tracking_code'])
+        if self.on_created:
+            self.on_created(job, values)
+
+        messagebox.showinfo(
+            "نجاح",
+            f"تم إضافة طلب الصيانة بنجاح\nرقم التتبع: {job['tracking_code']}\nالكود الجديد: {self.code_display.cget('text')}",
+            parent=self
+        )
+        self.reset()
+        self.serial_entry.focus_set()
+        # تصحيح الكود المعروض إذا أُنشئت طلبات من مكان آخر
+        self.prefetch_codes()
+
+    def _on_save_error(self, error) -> None:
+        self._finish_saving()
+        messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {error}", parent=self)
+
+    def _save_contact(self) -> None:
+        """حفظ العميل في جهات اتصال الهاتف"""
+        if not self.on_save_contact:
+            return
+        if self.last_customer_name and self.last_customer_phone:
+            self.on_save_contact(self.last_customer_name, self.last_customer_phone)
+            return
+        # إذا لم يتم حفظ طلب بعد، استخدم البيانات من الحقول
+        name = self.customer_entry.get().strip()
+        phone = self.phone_entry.get().strip()
+        if name and phone:
+            self.on_save_contact(name, phone)
+        else:
+            messagebox.showwarning("تنبيه", "الرجاء إدخال اسم ورقم الهاتف أو حفظ الطلب أولاً", parent=self)
+
+    # ------------------------------------------------------------------
+    # الجهاز والعميل
+    # ------------------------------------------------------------------
+    def _lookup_device(self, event=None) -> None:
+        """البحث عن الكود الممسوح في حقل الرقم التسلسلي"""
+        code = self.serial_entry.get().strip()
+        if not code:
+            self.device_info_label.configure(text="")
+            return
+
+        # بحث حديث لنفس الكود: النتيجة من الذاكرة قبل انتقال التركيز
+        cached_result = DeviceLookupService.peek(code)
+        if cached_result is not None:
+            self._show_device(code, cached_result)
+            return
+
+        self.run_db_task(
+            lambda service: DeviceLookupService(service.db).lookup(code),
+            on_success=lambda result: self._show_device(code, result),
+            on_error=lambda e: print(f"خطأ في البحث عن الجهاز: {e}"),
+            key="intake_device"
+        )
+
+    def _show_device(self, code: str, result) -> None:
+        """تعبئة الحقول الفارغة من آخر طلب للجهاز"""
+        if self.serial_entry.get().strip() != code:
+            # تغير الكود قبل وصول النتيجة
+            return
+        success, message, device = result
+        if not success or not device:
+            self.device_info_label.configure(text="")
+            return
+
+        latest = device['latest']
+        for entry, field in ((self.customer_entry, 'customer_name'), (self.phone_entry, 'customer_phone'),
+                             (self.device_type_entry, 'device_type')):
+            if latest.get(field) and not entry.get().strip():
+                entry.insert(0, latest[field])
+        if device['total_jobs']:
+            last_code = device['jobs'][0]['tracking_code']
+            self.device_info_label.configure(text=f"🔁 جهاز معروف: {device['total_jobs']} طلب سابق (آخرها {last_code})")
+        else:
+            self.device_info_label.configure(text="🔁 جهاز مسجل في سجل الأجهزة")
+
+    def _lookup_customer(self, event=None) -> None:
+        """ملء رقم الهاتف تلقائياً من أفضل اقتراح لاسم العميل (في الخلفية)"""
+        # النقر على قائمة الاقتراحات يُفقد الحقل التركيز قبل تسجيل الاختيار
+        self.after(SUGGEST_DELAY_MS, self._hide_suggestions_unless_focused)
+        customer_name = self.customer_entry.get().strip()
+        if not customer_name or self.phone_entry.get().strip():
+            return
+
+        def on_success(result):
+            success, message, customers = result
+            if customers and not self.phone_entry.get().strip():
+                self._show_customer_phone(customers[0]['phone'])
+
+        self.run_db_task(
+            lambda service: CustomerLookupService(service.db).suggest(customer_name, limit=1),
+            on_success=on_success,
+            on_error=lambda e: print(f"خطأ في البحث عن العميل: {e}"),
+            key="intake_customer"
+        )
+
+    def _show_customer_phone(self, phone: Optional[str]) -> None:
+        if phone:
+            self.phone_entry.delete(0, tk.END)
+            self.phone_entry.insert("0", phone)
+            # تغيير لون حقل الهاتف للإشارة إلى أنه تم ملؤه تلقائياً
+            self.phone_entry.configure(fg_color="#e8f5e8", border_color="#4caf50")
+        else:
+            self.phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
+
+    # ------------------------------------------------------------------
+    # اقتراحات العملاء
+    # ------------------------------------------------------------------
+    def _schedule_suggestions(self, event) -> None:
+        """طلب الاقتراحات بعد توقف الكتابة (KeyRelease في الاسم أو الهاتف)"""
+        if event.keysym in _NAVIGATION_KEYS:
+            return
+        if self._suggest_job is not None:
+            self.after_cancel(self._suggest_job)
+        self._suggest_job = self.after(SUGGEST_DELAY_MS, lambda: self._request_suggestions(event.widget))
+
+    def _request_suggestions(self, widget) -> None:
+        self._suggest_job = None
+        entry = self.customer_entry if self._is_entry(widget, self.customer_entry) else self.phone_entry
+        query = entry.get().strip()
+        if not query:
+            self._hide_suggestions()
+            return
+        self.run_db_task(
+            lambda service: CustomerLookupService(service.db).suggest(query),
+            on_success=lambda result: self._show_suggestions(entry, query, result),
+            on_error=lambda e: print(f"خطأ في اقتراح العملاء: {e}"),
+            key="intake_suggest"
+        )
+
+    @staticmethod
+    def _is_entry(widget, entry) -> bool:
+        # الحدث يأتي من tk.Entry الداخلي لـ CTkEntry
+        return widget is entry or widget is getattr(entry, "_entry", None)
+
+    def _show_suggestions(self, entry, query: str, result) -> None:
+        if entry.get().strip() != query:
+            # تغير النص قبل وصول النتيجة
+            return
+        success, message, customers = result
+        if not success or not customers:
+            self._hide_suggestions()
+            return
+        self._suggestions = customers
+        self._suggest_entry = entry
+        self.suggestion_list.delete(0, tk.END)
+        for customer in customers:
+            self.suggestion_list.insert(tk.END, f"{customer['name']} - {customer['phone']}")
+        self.suggestion_list.configure(height=min(len(customers), SUGGESTION_ROWS))
+        self.suggestion_list.place(in_=entry, relx=0, rely=1, relwidth=1)
+        self.suggestion_list.lift()
+
+    def _hide_suggestions(self, event=None) -> None:
+        if self._suggest_job is not None:
+            self.after_cancel(self._suggest_job)
+            self._suggest_job = None
+        self._suggestions = []
+        self.suggestion_list.place_forget()
+
+    def _hide_suggestions_unless_focused(self) -> None:
+        if self.focus_get() is not self.suggestion_list:
+            self._hide_suggestions()
+
+    def _focus_suggestions(self, event=None):
+        """السهم للأسفل من الحقل ينقل التركيز إلى أول اقتراح"""
+        if not self._suggestions:
+            return None
+        self.suggestion_list.focus_set()
+        self.suggestion_list.selection_clear(0, tk.END)
+        self.suggestion_list.selection_set(0)
+        self.suggestion_list.activate(0)
+        return "break"
+
+    def _choose_suggestion(self, event=None):
+        selection = self.suggestion_list.curselection()
+        if not selection or not self._suggestions:
+            return "break"
+        customer = self._suggestions[selection[0]]
+        self.customer_entry.delete(0, tk.END)
+        self.customer_entry.insert(0, customer['name'])
+        self._show_customer_phone(customer['phone'])
+        self._hide_suggestions()
+        self.device_type_entry.focus_set()
+        return "break"
+
+    def _close_suggestions(self, event=None):
+        entry = self._suggest_entry or self.customer_entry
+        self._hide_suggestions()
+        entry.focus_set()
+        return "break"
+
+    def _update_price_conversion(self, *args) -> None:
+        """تحديث عرض التحويل للسعر التقديري"""
+        try:
+            value = self.estimated_cost_entry.get()
+            amount = float(value) if value else 0
+        except ValueError:
+            self.conversion_display.configure(text="")
+            return
+        if amount <= 0:
+            self.conversion_display.configure(text="")
+        elif self.estimated_currency_var.get() == "USD":
+            self.conversion_display.configure(text=f"المبلغ بالليرة: {amount * LBP_RATE:,.0f} ل.ل")
+        else:
+            self.conversion_display.configure(text=f"المبلغ بالدولار: ${amount / LBP_RATE:.2f}")
+
+    # ------------------------------------------------------------------
+    # بناء الواجهة (مرة واحدة)
+    # ------------------------------------------------------------------
+    def _field_section(self, parent, title: str, hint: str, required: bool = False, pady=(0, 1)):
+        """إطار حقل مع عنوان وملاحظة (مطلوب/اختياري)"""
+        section = ctk.CTkFrame(parent, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
+        section.pack(fill=tk.X, pady=pady, padx=20)
+
+        title_frame = ctk.CTkFrame(section, fg_color="transparent")
+        title_frame.pack(fill=tk.X, padx=15, pady=(15, 5))
+        ctk.CTkLabel(title_frame, text=title, font=("Arial", 14, "bold"), text_color="#424242").pack(side=tk.LEFT)
+        ctk.CTkLabel(
+            title_frame,
+            text=hint,
+            font=("Arial", 10),
+            text_color="#d32f2f" if required else "#666666"
+        ).pack(side=tk.RIGHT)
+        return section
+
+    def _entry(self, section, placeholder: str, height: int = 40, font_size: int = 13):
+        entry = ctk.CTkEntry(
+            section,
+            width=400,
+            height=height,
+            placeholder_text=placeholder,
+            font=("Arial", font_size),
+            corner_radius=8,
+            border_width=2
+        )
+        entry.pack(fill=tk.X, padx=15, pady=(0, 1))
+        return entry
+
+    def _build(self) -> None:
+        main_container = ctk.CTkFrame(self, fg_color="transparent")
+        main_container.pack(fill=tk.BOTH, expand=True, padx=25, pady=25)
+
+        # العنوان
+        title_frame = ctk.CTkFrame(main_container, fg_color="#1976d2", corner_radius=15)
+        title_frame.pack(fill=tk.X, pady=(0, 25))
+        title_content = ctk.CTkFrame(title_frame, fg_color="transparent")
+        title_content.pack(fill=tk.X, padx=25, pady=10)
+        ctk.CTkLabel(title_content, text="🔧 إضافة طلب صيانة جديد", font=("Arial", 22, "bold"), text_color="white").pack(side=tk.LEFT)
+        ctk.CTkLabel(title_content, text="ADR ELECTRONICS", font=("Arial", 12, "bold"), text_color="#E3F2FD").pack(side=tk.RIGHT)
+
+        # قسم الكود
+        code_section = ctk.CTkFrame(main_container, fg_color="#e8f5e8", corner_radius=12, border_width=3, border_color="#4caf50")
+        code_section.pack(fill=tk.X, pady=(0, 25))
+        code_title_frame = ctk.CTkFrame(code_section, fg_color="transparent")
+        code_title_frame.pack(fill=tk.X, padx=20, pady=(1, 1))
+        ctk.CTkLabel(code_title_frame, text="🏷️ الكود المرجعي للجهاز الجديد", font=("Arial", 16, "bold"), text_color="#2e7d32").pack(side=tk.LEFT)
+        ctk.CTkLabel(code_title_frame, text="يجب تسجيل هذا الكود على الجهاز", font=("Arial", 12), text_color="#4caf50").pack(side=tk.RIGHT)
+
+        code_type_frame = ctk.CTkFrame(code_section, fg_color="transparent")
+        code_type_frame.pack(fill=tk.X, padx=20, pady=(0, 1))
+        ctk.CTkLabel(code_type_frame, text="نوع الكود:", font=("Arial", 12, "bold"), text_color="#424242").pack(side=tk.LEFT, padx=(0, 10))
+
+        self.code_type_var = tk.StringVar(value="A")
+        self.code_type_combo = ctk.CTkComboBox(
+            code_type_frame,
+            values=[f"{prefix} - {label}" for prefix, label in CODE_TYPES],
+            variable=self.code_type_var,
+            width=200,
+            height=35,
+            font=("Arial", 12),
+            command=self._show_code
+        )
+        self.code_type_combo.pack(side=tk.LEFT)
+        self.code_type_var.trace_add("write", self._show_code)
+
+        code_display_frame = ctk.CTkFrame(code_section, fg_color="transparent")
+        code_display_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
+        self.code_display = ctk.CTkLabel(
+            code_display_frame,
+            text=CODE_PLACEHOLDER,
+            font=("Arial", 28, "bold"),
+            text_color="#1b5e20",
+            fg_color="#c8e6c9",
+            corner_radius=12,
+            width=300,
+            height=60
+        )
+        self.code_display.pack()
+
+        # الحقول
+        form_container = ctk.CTkScrollableFrame(main_container, fg_color="#fafafa", corner_radius=10)
+        form_container.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
+
+        section = self._field_section(form_container, "📱 الرقم التسلسلي", "(اختياري)", pady=(20, 15))
+        self.serial_entry = self._entry(section, "ادخل الرقم التسلسلي للجهاز")
+        self.device_info_label = ctk.CTkLabel(section, text="", font=("Arial", 11), text_color="#1976d2")
+        self.device_info_label.pack(anchor=tk.W, padx=15)
+
+        section = self._field_section(form_container, "👤 اسم العميل", "(مطلوب)", required=True)
+        self.customer_entry = self._entry(section, "ادخل اسم العميل الكامل")
+        self.customer_entry.bind('<FocusOut>', self._lookup_customer)
+
+        section = self._field_section(form_container, "📞 رقم الهاتف", "(مطلوب)", required=True)
+        self.phone_entry = self._entry(section, "أدخل رقم الهاتف")
+        self.phone_entry.bind('<FocusOut>', lambda e: self.after(SUGGEST_DELAY_MS, self._hide_suggestions_unless_focused))
+
+        # قائمة الاقتراحات تظهر تحت الحقل الذي يُكتب فيه
+        self.suggestion_list = tk.Listbox(self, height=SUGGESTION_ROWS, font=("Arial", 12), activestyle="none",
+                                          exportselection=False, justify=tk.RIGHT)
+        self.suggestion_list.bind('<Return>', self._choose_suggestion)
+        self.suggestion_list.bind('<KP_Enter>', self._choose_suggestion)
+        self.suggestion_list.bind('<ButtonRelease-1>', self._choose_suggestion)
+        self.suggestion_list.bind('<Escape>', self._close_suggestions)
+        for entry in (self.customer_entry, self.phone_entry):
+            entry.bind('<KeyRelease>', self._schedule_suggestions)
+            entry.bind('<Down>', self._focus_suggestions)
+            entry.bind('<Escape>', self._hide_suggestions)
+
+        section = self._field_section(form_container, "💻 نوع الجهاز", "(مطلوب)", required=True)
+        self.device_type_entry = self._entry(section, "مثال: هاتف، لابتوب، تابلت")
+
+        section = self._field_section(form_container, "📋 تفاصيل الجهاز", "(اختياري)")
+        self.device_details_entry = ctk.CTkTextbox(section, width=400, height=80, font=("Arial", 12), corner_radius=8, border_width=2)
+        self.device_details_entry.pack(fill=tk.X, padx=15, pady=(0, 15))
+
+        section = self._field_section(form_container, "🔧 وصف العطل", "(اختياري)")
+        self.issue_entry = self._entry(section, "وصف العطل أو المشكلة في الجهاز", height=25, font_size=12)
+
+        # السعر التقديري مع العملة
+        section = self._field_section(form_container, "💰 السعر التقديري", "(اختياري)")
+        price_content_frame = ctk.CTkFrame(section, fg_color="transparent")
+        price_content_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+
+        self.estimated_currency_var = tk.StringVar(value="USD")
+        currency_selection_frame = ctk.CTkFrame(price_content_frame, fg_color="transparent")
+        currency_selection_frame.pack(side=tk.LEFT, padx=(0, 15))
+        ctk.CTkLabel(currency_selection_frame, text="العملة:", font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
+        ctk.CTkRadioButton(currency_selection_frame, text="💵 دولار ($)", variable=self.estimated_currency_var, value="USD", font=("Arial", 10)).pack(anchor=tk.W)
+        ctk.CTkRadioButton(currency_selection_frame, text="💱 ليرة لبنانية (ل.ل)", variable=self.estimated_currency_var, value="LBP", font=("Arial", 10)).pack(anchor=tk.W)
+
+        price_input_frame = ctk.CTkFrame(price_content_frame, fg_color="transparent")
+        price_input_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ctk.CTkLabel(price_input_frame, text="المبلغ:", font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
+        self.estimated_cost_entry = ctk.CTkEntry(
+            price_input_frame,
+            width=200,
+            height=35,
+            placeholder_text="أدخل السعر التقديري",
+            font=("Arial", 12),
+            corner_radius=8,
+            border_width=2
+        )
+        self.estimated_cost_entry.pack(fill=tk.X, pady=(0, 5))
+        self.conversion_display = ctk.CTkLabel(price_input_frame, text="", font=("Arial", 10), text_color="#666666")
+        self.conversion_display.pack(anchor=tk.W)
+        self.estimated_cost_entry.bind('<KeyRelease>', self._update_price_conversion)
+        self.estimated_currency_var.trace_add("write", self._update_price_conversion)
+
+        # الأزرار
+        buttons_container = ctk.CTkFrame(main_container, fg_color="transparent")
+        buttons_container.pack(fill=tk.X, pady=(20, 0))
+
+        self.save_btn = ctk.CTkButton(
+            buttons_container,
+            text="💾 حفظ الطلب",
+            command=self.save,
+            fg_color="#28a745",
+            hover_color="#218838",
+            width=180,
+            height=50,
+            font=("Arial", 15, "bold"),
+            corner_radius=12,
+            border_width=2,
+            border_color="#1e7e34"
+        )
+        self.save_btn.pack(side=tk.LEFT, padx=(0, 10))
+
+        ctk.CTkButton(
+            buttons_container,
+            text="📱 حفظ في الهاتف",
+            command=self._save_contact,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            width=180,
+            height=50,
+            font=("Arial", 14, "bold"),
+            corner_radius=12,
+            border_width=2,
+            border_color="#0d47a1"
+        ).pack(side=tk.LEFT, padx=10)
+
+        ctk.CTkButton(
+            buttons_container,
+            text="❌ إغلاق",
+            command=self.hide,
+            fg_color="#dc3545",
+            hover_color="#c82333",
+            width=140,
+            height=50,
+            font=("Arial", 15, "bold"),
+            corner_radius=12,
+            border_width=2,
+            border_color="#bd2130"
+        ).pack(side=tk.LEFT, padx=(15, 0))
+
+        self._bind_enter_navigation()
+
+    def _bind_enter_navigation(self) -> None:
+        """تنقل Enter بين الحقول بالتسلسل، وEnter في حقل السعر أو زر الحفظ يحفظ"""
+        def save_on_enter(event=None):
+            self.save()
+            return "break"
+
+        def bind_enter(widget, next_widget=None, allow_shift_newline=False, before=None):
+            def handler(event):
+                if allow_shift_newline and (event.state & 0x0001):
+                    # السماح بإضافة سطر جديد داخل مربعات النص مع Shift+Enter
+                    return None
+                if before is not None:
+                    before()
+                if next_widget is None:
+                    return save_on_enter(event)
+                try:
+                    next_widget.focus_set()
+                except Exception:
+                    pass
+                return "break"
+            widget.bind('<Return>', handler)
+            widget.bind('<KP_Enter>', handler)
+
+        bind_enter(self.code_type_combo, self.serial_entry)
+        # الماسح يرسل Enter بعد الكود: البحث عن الجهاز ثم الانتقال لاسم العميل
+        bind_enter(self.serial_entry, self.customer_entry, before=self._lookup_device)
+        bind_enter(self.customer_entry, self.phone_entry)
+        bind_enter(self.phone_entry, self.device_type_entry)
+        bind_enter(self.device_type_entry, self.device_details_entry)
+        bind_enter(self.device_details_entry, self.issue_entry, allow_shift_newline=True)
+        bind_enter(self.issue_entry, self.estimated_cost_entry)
+        bind_enter(self.estimated_cost_entry)
+        self.save_btn.bind('<Return>', save_on_enter)
+        self.save_btn.bind('<KP_Enter>', save_on_enter)
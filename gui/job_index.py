@@ -0,0 +1,208 @@
+"""
+فهرس في الذاكرة لقائمة الطلبات المحملة (بحث وفلترة فورية بدون قاعدة البيانات)
+
+يُبنى من نفس صفوف search_jobs_page ويستخدم نفس توحيد النصوص في
+database.search_index، فتطابق نتائجه نتائج البحث في القاعدة:
+
+- trigram ← قائمة ids لكل الحقول النصية (بحث جزئي للاستعلامات من 3 أحرف فأكثر)
+- بادئة حرف/حرفين لكل كلمة ← ids (للكتابة الفورية قبل اكتمال 3 أحرف)
+- حالة ← ids (فلترة بطاقات الإحصائيات)
+
+المرشحون من الخرائط يُتحقق منهم بمقارنة النص الكامل (trigram قد يعطي نتائج
+زائدة)، والنتائج مرتبة مثل القائمة (received_at, id) تنازلياً.
+
+    index = JobIndex()
+    index.build(jobs)
+    index.search("احمد 70", status="received")
+"""
+
+import bisect
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from database.search_index import MIN_FTS_QUERY_LENGTH, compact_search_text, normalize_search_text
+
+# الحقول المفهرسة - نفس أعمدة jobs_fts
+TEXT_FIELDS = ("customer_name", "device_type", "device_model")
+COMPACT_FIELDS = ("tracking_code", "customer_phone", "serial_number")
+
+# فاصل الحقول في نص الصف (لا يظهر في نص بحث بعد strip فلا تتقاطع المطابقة بين حقلين)
+FIELD_SEPARATOR = "\n"
+
+# أطول بادئة تُفهرس (الاستعلامات الأطول تستخدم trigram)
+PREFIX_LENGTH = MIN_FTS_QUERY_LENGTH - 1
+
+
+def _status_value(status) -> str:
+    return status.value if hasattr(status, "value") else str(status or "")
+
+
+def _order_key(job: Dict[str, Any]) -> tuple:
+    return (job.get("received_at") or datetime.min, job.get("id") or 0)
+
+
+def _row_text(job: Dict[str, Any]) -> str:
+    """الحقول الموحّدة لصف واحد في نص واحد"""
+    return FIELD_SEPARATOR.join(
+        [normalize_search_text(job.get(field)) for field in TEXT_FIELDS] +
+        [compact_search_text(job.get(field)) for field in COMPACT_FIELDS]
+    )
+
+
+def _index_keys(text: str) -> Set[str]:
+    """trigrams النص وبادئات كلماته (حتى PREFIX_LENGTH حرف)"""
+    keys = {text[i:i + 3] for i in range(len(text) - 2)}
+    for word in text.split():
+        keys.update(word[:length] for length in range(1, min(PREFIX_LENGTH, len(word)) + 1))
+    return keys
+
+
+def _text_matches(text: str, query: str) -> bool:
+    if len(query) < MIN_FTS_QUERY_LENGTH:
+        # استعلام قصير: بداية كلمة فقط (مثل خريطة البادئات)
+        return text.startswith(query) or f" {query}" in text or f"{FIELD_SEPARATOR}{query}" in text
+    return query in text
+
+
+class JobIndex:
+    """فهرس بحث لصفوف الطلبات المحملة
+
+    complete=True يعني أن كل الطلبات موجودة في الفهرس - عندها فقط يمكن
+    الاعتماد عليه بدلاً من قاعدة البيانات.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.complete = False
+        self.built_at: Optional[float] = None
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._texts: Dict[int, str] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._statuses: Dict[str, Set[int]] = {}
+        self._order: List[tuple] = []  # (received_at, id) تصاعدياً
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, job_id) -> bool:
+        return job_id in self._rows
+
+    def build(self, jobs: Iterable[Dict[str, Any]], complete: bool = False, built_at: Optional[float] = None) -> None:
+        """إعادة بناء الفهرس من قائمة صفوف"""
+        self.clear()
+        for job in jobs:
+            self._add(job)
+        self._order.sort()
+        self.complete = complete
+        self.built_at = built_at
+
+    def add_rows(self, jobs: Iterable[Dict[str, Any]]) -> None:
+        """إضافة أو تحديث صفوف (صفحة جديدة أو طلبات متغيرة)"""
+        for job in jobs:
+            self.remove(job["id"])
+            self._add(job, keep_order=True)
+
+    def remove(self, job_id: int) -> None:
+        row = self._rows.pop(job_id, None)
+        if row is None:
+            return
+        for key in _index_keys(self._texts.pop(job_id)):
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.remove(job_id)
+                if not ids:
+                    del self._postings[key]
+        status_ids = self._statuses.get(_status_value(row.get("status")))
+        if status_ids is not None:
+            status_ids.discard(job_id)
+        position = bisect.bisect_left(self._order, _order_key(row))
+        if position < len(self._order) and self._order[position][1] == job_id:
+            del self._order[position]
+
+    def filter_status(self, status: Optional[str]) -> List[Dict[str, Any]]:
+        """كل الطلبات بالحالة المحددة (أو الكل) بترتيب القائمة"""
+        return self.search("", status=status)
+
+    def search(self, query: str, status: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """الطلبات المطابقة لـ query (جزئياً في أي حقل) وللحالة إن وُجدت"""
+        normalized = normalize_search_text(query)
+        compact = compact_search_text(query)
+        status_ids = self._statuses.get(_status_value(status), set()) if status else None
+
+        if normalized:
+            candidates = set(self._candidates(normalized))
+            if compact and compact != normalized:
+                candidates.update(self._candidates(compact))
+            if status_ids is not None:
+                candidates &= status_ids
+            # المرشحون من الخرائط يُتحقق منهم بالنص الكامل
+            texts = self._texts
+            candidates = {
+                job_id for job_id in candidates
+                if _text_matches(texts[job_id], normalized) or
+                (compact and compact != normalized and _text_matches(texts[job_id], compact))
+            }
+        else:
+            candidates = status_ids
+
+        return self._ordered(candidates, limit)
+
+    def matches(self, job: Dict[str, Any], query: str) -> bool:
+        """هل يطابق الصف نص البحث (للصفوف الجديدة القادمة من التحديث)"""
+        normalized = normalize_search_text(query)
+        if not normalized:
+            return True
+        compact = compact_search_text(query)
+        text = _row_text(job)
+        return _text_matches(text, normalized) or bool(compact) and _text_matches(text, compact)
+
+    def _candidates(self, query: str) -> List[int]:
+        """أقصر قائمة ids من trigrams الاستعلام (أو بادئته إذا كان قصيراً)"""
+        if len(query) < MIN_FTS_QUERY_LENGTH:
+            return self._postings.get(query, [])
+        shortest = None
+        for i in range(len(query) - 2):
+            ids = self._postings.get(query[i:i + 3])
+            if ids is None:
+                return []
+            if shortest is None or len(ids) < len(shortest):
+                shortest = ids
+        return shortest or []
+
+    def _ordered(self, job_ids: Optional[Set[int]], limit: Optional[int]) -> List[Dict[str, Any]]:
+        """الصفوف بترتيب القائمة (received_at, id) تنازلياً"""
+        rows = self._rows
+        if job_ids is None:
+            keys = reversed(self._order)
+        elif len(job_ids) * 8 < len(self._order):
+            # نتائج قليلة: ترتيبها مباشرة أسرع من المرور على كل القائمة
+            keys = sorted((_order_key(rows[job_id]) for job_id in job_ids), reverse=True)
+        else:
+            keys = (key for key in reversed(self._order) if key[1] in job_ids)
+
+        result = []
+        for key in keys:
+            result.append(rows[key[1]])
+            if limit and len(result) >= limit:
+                break
+        return result
+
+    def _add(self, job: Dict[str, Any], keep_order: bool = False) -> None:
+        job_id = job["id"]
+        text = _row_text(job)
+        self._rows[job_id] = job
+        self._texts[job_id] = text
+        postings = self._postings
+        for key in _index_keys(text):
+            ids = postings.get(key)
+            if ids is None:
+                postings[key] = [job_id]
+            else:
+                ids.append(job_id)
+        self._statuses.setdefault(_status_value(job.get("status")), set()).add(job_id)
+        if keep_order:
+            bisect.insort(self._order, _order_key(job))
+        else:
+            self._order.append(_order_key(job))
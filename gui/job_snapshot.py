@@ -0,0 +1,104 @@
+"""
+لقطة محلية لقائمة الطلبات (تشغيل سريع للواجهة)
+
+عند الإغلاق وبعد كل تحديث تُحفظ آخر صفوف معروضة مع علامة مائية:
+- change_version: آخر id في change_log كانت الصفوف متوافقة معه
+- synced_at: وقت آخر مزامنة (updated_at) للتحديث التزايدي
+
+عند التشغيل تُعرض اللقطة فوراً ثم تُطبق التغييرات بعد change_version فقط
+(ChangeWatcher) بدلاً من انتظار استعلام القائمة كاملة.
+
+الصيغة JSON مضغوط بـ zlib (وليس pickle) حتى لا يُنفذ أي كود عند قراءة الملف.
+"""
+
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database.models import MaintenanceStatus
+
+SNAPSHOT_VERSION = 1
+
+# أقصى عدد صفوف في اللقطة (الباقي يُجلب بالتمرير كالمعتاد)
+MAX_SNAPSHOT_ROWS = 1000
+
+DATETIME_FIELDS = ("received_at", "completed_at", "delivered_at")
+
+
+class JobSnapshot:
+    """صفوف القائمة مع العلامة المائية لقاعدة البيانات"""
+
+    def __init__(
+        self,
+        rows: List[Dict[str, Any]],
+        next_cursor: Optional[str],
+        change_version: int,
+        synced_at: Optional[datetime],
+        database_url: str
+    ):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.change_version = change_version
+        self.synced_at = synced_at
+        self.database_url = database_url
+
+
+def _encode_row(job: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(job)
+    for field in DATETIME_FIELDS:
+        if row.get(field) is not None:
+            row[field] = row[field].isoformat()
+    status = row.get("status")
+    if hasattr(status, "value"):
+        row["status"] = status.value
+    return row
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    if row.get("status"):
+        row["status"] = MaintenanceStatus(row["status"])
+    return row
+
+
+def save_job_snapshot(path: str, snapshot: JobSnapshot) -> None:
+    """كتابة اللقطة (ملف مؤقت ثم استبدال - لا تبقى لقطة نصف مكتوبة عند انقطاع الكهرباء)"""
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "database_url": snapshot.database_url,
+        "change_version": snapshot.change_version,
+        "synced_at": snapshot.synced_at.isoformat() if snapshot.synced_at else None,
+        "next_cursor": snapshot.next_cursor,
+        "rows": [_encode_row(job) for job in snapshot.rows],
+    }
+    data = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def load_job_snapshot(path: str, database_url: str) -> Optional[JobSnapshot]:
+    """قراءة اللقطة - None إذا لم توجد أو كانت لقاعدة بيانات أخرى أو تالفة"""
+    try:
+        with open(path, "rb") as f:
+            payload = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        if payload.get("version") != SNAPSHOT_VERSION or payload.get("database_url") != database_url:
+            return None
+        synced_at = payload.get("synced_at")
+        return JobSnapshot(
+            rows=[_decode_row(row) for row in payload["rows"]],
+            next_cursor=payload.get("next_cursor"),
+            change_version=int(payload["change_version"]),
+            synced_at=datetime.fromisoformat(synced_at) if synced_at else None,
+            database_url=database_url
+        )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError, zlib.error) as e:
+        print(f"⚠️ تعذر قراءة لقطة قائمة الطلبات: {e}")
+        return None
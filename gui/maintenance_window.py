@@ -8,20 +8,24 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import customtkinter as ctk
 from datetime import datetime, timedelta
-import qrcode
-from PIL import Image, ImageTk
 import io
-import threading
 import webbrowser
 import urllib.parse
 import json
 from typing import List, Dict, Any
 from services.maintenance_service import MaintenanceService
 from services.code_service import CodeService
-from database.connection import get_db
-from utils.barcode_generator import BarcodeGenerator
-from utils.notification_service import NotificationService
-from utils.vcard_generator import VCardGenerator
+from services.device_lookup_service import DeviceLookupService
+from database.connection import get_db, engine
+from database.change_log import ChangeWatcher
+from database.tracking_sequences import parse_tracking_code
+from database.pagination import decode_cursor, encode_cursor
+from database.search_index import MIN_FTS_QUERY_LENGTH
+from gui.virtual_table import VirtualTreeview
+from gui.task_runner import TaskRunner
+from gui.job_index import JobIndex
+from gui.job_snapshot import MAX_SNAPSHOT_ROWS, JobSnapshot, load_job_snapshot, save_job_snapshot
+from gui.intake_dialog import IntakeDialog
 from config import REPORTS_FOLDER, UPLOAD_FOLDER, TEMP_FOLDER, WHATSAPP_RECEIVED_MESSAGE, WHATSAPP_REPAIRED_MESSAGE, WHATSAPP_DELIVERED_MESSAGE
 import config
 from database.models import MaintenanceJob, Customer
@@ -43,15 +47,22 @@ class MaintenanceFrame(ctk.CTkFrame):
         
         self.code_service = CodeService(db_path)
         self.maintenance_service = MaintenanceService(self.db)
-        self.barcode_generator = BarcodeGenerator()
-        self.notification_service = NotificationService({})  # سيتم تحميل الإعدادات من ملف التكوين
-        self.vcard_generator = VCardGenerator()  # مولد جهات الاتصال
         
-        # خدمة التذكيرات الأسبوعية للديون
-        from services.debt_reminder_service import DebtReminderService
-        self.debt_reminder_service = DebtReminderService(self.maintenance_service)
-        # بدء خدمة التذكيرات في الخلفية
-        # self.debt_reminder_service.start()  # يمكن تفعيله عند الحاجة
+        # الاستعلامات البطيئة تعمل في الخلفية والنتائج تُعرض عبر after()
+        self.task_runner = TaskRunner(self)
+        
+        # الخدمات المساعدة (باركود، إشعارات، vCard، تذكيرات الديون) تُنشأ عند أول استخدام
+        # لأن استيرادها (PIL / qrcode / requests / jinja2) يبطئ فتح النافذة
+        self._barcode_generator = None
+        self._notification_service = None
+        self._vcard_generator = None
+        self._debt_reminder_service = None
+        
+        # التبويبات غير الظاهرة عند الفتح تُبنى عند أول عرض لها (on_main_tab_changed)
+        self._pending_tabs = {
+            "الديون": self.setup_debts_tab,
+            "التقارير": self.setup_reports_tab,
+        }
         
         # إعداد التحديث التلقائي (مفعّل افتراضياً - محسّن للأداء)
         self.auto_refresh_enabled = True
@@ -59,7 +70,6 @@ class MaintenanceFrame(ctk.CTkFrame):
         self.auto_refresh_job = None
         self.last_refresh_time = None
         self._last_load_time = None  # تتبع آخر وقت تحميل
-        self._is_loading = False  # منع التحميل المتزامن
         
         # متغير لتتبع حالة الفلترة
         self.current_filter_status = None
@@ -75,6 +85,40 @@ class MaintenanceFrame(ctk.CTkFrame):
         self._data_cache_key = None
         self._data_cache_ttl = 10  # 10 ثواني cache للبيانات
         
+        # الترحيل بالمؤشر لقائمة الطلبات (جلب الصفحات عند التمرير)
+        self._page_size = 200
+        self._next_cursor = None
+        self._is_loading_page = False
+        
+        # متابعة التغييرات من العمليات الأخرى (web_app.py) عبر change_log
+        self.change_watcher = ChangeWatcher(self.db.get_bind())
+        self.change_poll_interval = 2000  # 2 ثانية (استعلام MAX(id) فقط إذا لم يتغير شيء)
+        self.change_poll_job = None
+        
+        # التحديث التزايدي: آخر وقت مزامنة للقائمة (updated_at) مع هامش لتأخر الـ commit
+        self._last_sync_at = None
+        self._sync_overlap = timedelta(seconds=5)
+        
+        # فهرس في الذاكرة لكل الطلبات (بحث فوري وفلترة بطاقات الإحصائيات بدون قاعدة البيانات)
+        self._job_index = JobIndex()
+        self._index_max_rows = 20000  # أكثر من ذلك: البحث عبر FTS في القاعدة
+        self._index_page_size = 2000
+        self._index_max_age = 600  # 10 دقائق ثم إعادة البناء (التغييرات تُطبق عليه أولاً بأول)
+        self._index_backlog = []  # تغييرات وصلت أثناء بناء الفهرس في الخلفية
+        self._search_query = ""
+        self._search_debounce_ms = 150
+        self._search_job = None
+        
+        # لقطة القائمة على القرص: تُعرض فوراً عند التشغيل ثم تُطبق التغييرات بعدها فقط
+        self._snapshot_path = os.path.join(TEMP_FOLDER, "job_list_snapshot.bin")
+        # قاعدة البيانات التي يتصل بها المحرك فعلاً (DATABASE_URL / DB_*) - بدون كلمة المرور
+        self._database_url = engine.url.render_as_string(hide_password=True)
+        self._rows_change_version = 0  # آخر إصدار change_log تتوافق معه صفوف القائمة
+        self._pending_change_fetches = 0
+        
+        # نموذج إضافة طلب: يُبنى مخفياً بعد فتح النافذة ويُعاد استخدامه لكل عميل
+        self._intake_dialog = None
+        
         # إعدادات الأداء
         self.monthly_stats_enabled = getattr(config, "ENABLE_MONTHLY_STATS", True)
         
@@ -103,14 +147,49 @@ class MaintenanceFrame(ctk.CTkFrame):
         
         # بدء التحديث التلقائي
         self.start_auto_refresh()
+        self.change_poll_job = self.after(self.change_poll_interval, self.poll_changes)
         
         # تحديث الإحصائيات مرة واحدة عند التحميل (بعد إنشاء البطاقات)
         # سيتم استدعاؤها من setup_stats_tab بعد إنشاء stats_cards
     
+    @property
+    def barcode_generator(self):
+        if self._barcode_generator is None:
+            from utils.barcode_generator import BarcodeGenerator
+            self._barcode_generator = BarcodeGenerator()
+        return self._barcode_generator
+    
+    @property
+    def notification_service(self):
+        if self._notification_service is None:
+            from utils.notification_service import NotificationService
+            self._notification_service = NotificationService({})  # سيتم تحميل الإعدادات من ملف التكوين
+        return self._notification_service
+    
+    @property
+    def vcard_generator(self):
+        if self._vcard_generator is None:
+            from utils.vcard_generator import VCardGenerator
+            self._vcard_generator = VCardGenerator()  # مولد جهات الاتصال
+        return self._vcard_generator
+    
+    @property
+    def debt_reminder_service(self):
+        """خدمة التذكيرات الأسبوعية للديون (تبدأ يدوياً فقط)"""
+        if self._debt_reminder_service is None:
+            from services.debt_reminder_service import DebtReminderService
+            self._debt_reminder_service = DebtReminderService(self.maintenance_service)
+        return self._debt_reminder_service
+    
     def destroy(self):
         """تنظيف الموارد عند إغلاق الإطار"""
         # إيقاف التحديث التلقائي
         self.stop_auto_refresh()
+        if self.change_poll_job:
+            self.after_cancel(self.change_poll_job)
+            self.change_poll_job = None
+        self.task_runner.shutdown()
+        self._save_job_snapshot(in_background=False)
         # استدعاء destroy للكلاس الأب
         super().destroy()
     
@@ -249,7 +328,8 @@ class MaintenanceFrame(ctk.CTkFrame):
         def find_all_trees(widget, trees_list):
             """البحث عن جميع الجداول في النافذة"""
             try:
-                if isinstance(widget, ttk.Treeview):
+                # جدول الطلبات الافتراضي يعالج Enter بنفسه (VirtualTreeview)
+                if isinstance(widget, ttk.Treeview) and widget is not getattr(self, 'tree', None):
                     trees_list.append(widget)
                 for child in widget.winfo_children():
                     find_all_trees(child, trees_list)
@@ -330,6 +410,7 @@ class MaintenanceFrame(ctk.CTkFrame):
         search_entry.pack(side=tk.LEFT, padx=2)
         search_entry.bind('<Return>', lambda e: self.search_maintenance())
         search_entry.bind('<KeyPress-Return>', lambda e: self.search_maintenance())
+        search_entry.bind('<KeyRelease>', self._schedule_live_search)
         
         btn_search = ctk.CTkButton(search_frame, text="بحث", command=self.search_maintenance, 
                                     width=70, fg_color="#4CAF50", hover_color="#45a049")
@@ -409,23 +490,19 @@ class MaintenanceFrame(ctk.CTkFrame):
         # إنشاء قائمة الطلبات مباشرة (بدون تبويب)
         self.setup_main_treeview(content_frame)
         
-        # تكوين علامة التبويب الأولى (الإحصائيات)
+        # تكوين علامة التبويب الأولى (الإحصائيات) - الديون والتقارير تُبنى عند أول فتح
         self.setup_stats_tab()
         
-        # تكوين علامة التبويب الثانية (الديون)
-        self.setup_debts_tab()
-        
-        # تكوين علامة التبويب الثالثة (التقارير)
-        self.setup_reports_tab()
-        
         # تهيئة التحكم في التبويبات
         self.tabview.set(self.last_active_tab)
         self.tabview.configure(command=self.on_main_tab_changed)
         self.update_debts_locked_state()
         self.update_reports_locked_state()
         
-        # تحميل البيانات بعد إنشاء الواجهة
-        self.load_data()
+        # تحميل البيانات بعد إنشاء الواجهة (اللقطة المحلية فوراً إن وُجدت)
+        if not self._restore_job_snapshot():
+            self.load_data()
+        self.after(1000, self._get_intake_dialog)
 
     def on_main_tab_changed(self, event=None):
         """معالجة تغيير علامة التبويب الرئيسية"""
@@ -450,8 +527,7 @@ class MaintenanceFrame(ctk.CTkFrame):
                 finally:
                     self._tab_change_guard = False
                 return
-            # تم إلغاء قفل تبويب الديون، حدث البيانات
-            self.load_debts_data()
+            # تم إلغاء قفل تبويب الديون - بناء التبويب (prompt_debts_access) يحمّل البيانات
 
         if selected_tab == "التقارير" and not self.reports_access_granted:
             # إظهار حالة القفل الحالية
@@ -468,9 +544,22 @@ class MaintenanceFrame(ctk.CTkFrame):
                     self._tab_change_guard = False
                 return
 
+        self._build_pending_tab(selected_tab)
         self.last_active_tab = selected_tab
         self.update_debts_locked_state()
         self.update_reports_locked_state()
+    
+    def _build_pending_tab(self, tab_name) -> bool:
+        """بناء محتوى التبويب عند أول عرض له - True إذا تم البناء الآن"""
+        builder = self._pending_tabs.pop(tab_name, None)
+        if builder is None:
+            return False
+        import time
+        started = time.perf_counter()
+        builder()
+        self.setup_enter_navigation(self.tabview.tab(tab_name))
+        print(f"⏱️ بناء تبويب {tab_name}: {(time.perf_counter() - started) * 1000:.0f}ms")
+        return True
 
     def prompt_debts_access(self) -> bool:
         """طلب كلمة المرور لتبويب الديون"""
@@ -493,6 +582,7 @@ class MaintenanceFrame(ctk.CTkFrame):
             return False
 
         self.debts_access_granted = True
+        self._build_pending_tab("الديون")
         self.update_debts_locked_state()
         messagebox.showinfo("نجاح", "تم فتح تبويب الديون بنجاح.")
         return True
@@ -518,6 +608,7 @@ class MaintenanceFrame(ctk.CTkFrame):
             return False
 
         self.reports_access_granted = True
+        self._build_pending_tab("التقارير")
         self.update_reports_locked_state()
         messagebox.showinfo("نجاح", "تم فتح تبويب التقارير بنجاح.")
         return True
@@ -685,8 +776,8 @@ class MaintenanceFrame(ctk.CTkFrame):
         self.tree.column("delivered_date", width=90, anchor=tk.CENTER)
         
         # إضافة شريط التمرير
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        self.tree_scrollbar = scrollbar
         
         # تعبئة واجهة المستخدم
         self.tree.grid(row=0, column=0, sticky="nsew")
@@ -695,6 +786,19 @@ class MaintenanceFrame(ctk.CTkFrame):
         # ربط أحداث النقر
         self.tree.bind("<Double-1>", self.on_item_double_click)
         self.tree.bind("<Button-1>", self.on_item_click)
+        
+        # عرض افتراضي: كل النتائج في self.job_table.rows، والـ Treeview يحتوي
+        # فقط الصفوف الظاهرة (التمرير يعيد كتابة نفس العناصر)
+        self.job_table = VirtualTreeview(
+            self.tree,
+            scrollbar,
+            format_row=self._format_job_row,
+            on_near_end=lambda: self.after_idle(self._load_next_page)
+        )
+        
+        # الترتيب بالنقر على عنوان العمود
+        for column, sort_key in self._job_sort_keys().items():
+            self.tree.heading(column, command=lambda column=column, sort_key=sort_key: self.job_table.sort_by(column, sort_key))
     
     def setup_stats_tab(self):
         """إعداد علامة تبويب الإحصائيات"""
@@ -904,23 +1008,36 @@ class MaintenanceFrame(ctk.CTkFrame):
         self.load_debts_data()
     
     def load_debts_data(self):
-        """تحميل بيانات الديون"""
+        """تحميل بيانات الديون (الاستعلامات في الخلفية)"""
+        if not hasattr(self, 'maintenance_service'):
+            return
+        
+        def fetch(service):
+            return (
+                service.get_payment_summary(),
+                service.get_unpaid_jobs(),
+                service.search_jobs(status="delivered", limit=500)
+            )
+        
+        def on_error(error):
+            print(f"خطأ في تحميل بيانات الديون: {str(error)}")
+        
+        self.run_db_task(fetch, on_success=self._show_debts_data, on_error=on_error, key="debts")
+    
+    def _show_debts_data(self, results):
+        """عرض بيانات الديون بعد جلبها (خيط الواجهة)"""
+        (success, message, summary), (unpaid_success, _, debts), (paid_success, _, delivered_jobs) = results
         try:
-            if not hasattr(self, 'maintenance_service'):
-                return
-            
-            # جلب ملخص المدفوعات
-            success, message, summary = self.maintenance_service.get_payment_summary()
+            # ملخص المدفوعات
             if success:
                 self.total_debt_label.configure(text=f"{summary['total_unpaid']:.2f} $")
                 self.debtors_count_label.configure(text=self.format_number_english(summary['unpaid_count']))
                 self.total_paid_label.configure(text=f"{summary['total_paid']:.2f} $")
                 self.debt_summary_data.update(summary)
             
-            # جلب قائمة الديون غير المسددة
-            success, message, debts = self.maintenance_service.get_unpaid_jobs()
+            # قائمة الديون غير المسددة
             self.debts_data_unpaid = []
-            if success and debts:
+            if unpaid_success and debts:
                 for debt in debts:
                     amount_value = float(debt.get('final_cost', 0.0) or 0.0)
                     days_overdue = debt.get('days_overdue', 0)
@@ -935,9 +1052,8 @@ class MaintenanceFrame(ctk.CTkFrame):
                         "actions": "..."
                     })
 
-            # جلب قائمة الطلبات المدفوعة (للتصفية عند الحاجة)
+            # قائمة الطلبات المدفوعة (للتصفية عند الحاجة)
             self.debts_data_paid = []
-            paid_success, paid_message, delivered_jobs = self.maintenance_service.search_jobs(status="delivered", limit=500)
             if paid_success and delivered_jobs:
                 for job in delivered_jobs:
                     if job.get("payment_status") == "paid":
@@ -1860,38 +1976,56 @@ class MaintenanceFrame(ctk.CTkFrame):
             if not messagebox.askyesno("تأكيد", "هل تريد إرسال هذه الرسالة لجميع العملاء؟"):
                 return
             
-            # جلب جميع العملاء
-            db = next(get_db())
-            customers = db.query(Customer).all()
-            db.close()
+            self._load_customer_contacts(
+                lambda customers: self._send_whatsapp_messages(message, customers),
+                "فشل في إرسال الرسالة الجماعية: "
+            )
             
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل في إرسال الرسالة الجماعية: {str(e)}")
+    
+    def _load_customer_contacts(self, on_loaded, error_prefix):
+        """جلب (رقم، اسم، هاتف) لكل العملاء في الخلفية ثم on_loaded في خيط الواجهة"""
+        def fetch(service):
+            return [tuple(row) for row in service.db.query(Customer.id, Customer.name, Customer.phone)]
+        
+        def on_success(customers):
             if not customers:
                 messagebox.showwarning("تحذير", "لا يوجد عملاء في النظام")
                 return
+            on_loaded(customers)
+        
+        def on_error(error):
+            messagebox.showerror("خطأ", f"{error_prefix}{str(error)}")
+        
+        self.run_db_task(fetch, on_success=on_success, on_error=on_error, key="customer_contacts")
+    
+    def _send_whatsapp_messages(self, message, customers):
+        """فتح الواتساب لكل عميل (رقم، اسم، هاتف) بفاصل ثانيتين دون تجميد الواجهة"""
+        customers = list(customers)
+        sent_count = [0]
+        
+        def send_next(index=0):
+            if index >= len(customers):
+                messagebox.showinfo("نجح", f"تم فتح الواتساب لإرسال الرسالة لـ {sent_count[0]} عميل")
+                return
             
-            # إرسال الرسالة لكل عميل
-            sent_count = 0
-            for customer in customers:
-                try:
-                    phone = customer.phone.replace('+', '').replace(' ', '').replace('-', '')
-                    if not phone.startswith('961'):
-                        phone = '961' + phone.lstrip('0')
-                    
-                    whatsapp_url = f"https://wa.me/{phone}?text={urllib.parse.quote(message)}"
-                    webbrowser.open(whatsapp_url)
-                    sent_count += 1
-                    
-                    # تأخير قصير بين الرسائل
-                    import time
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    print(f"خطأ في إرسال رسالة للعميل {customer.name}: {e}")
-            
-            messagebox.showinfo("نجح", f"تم فتح الواتساب لإرسال الرسالة لـ {sent_count} عميل")
+            _, name, phone = customers[index]
+            try:
+                phone = phone.replace('+', '').replace(' ', '').replace('-', '')
+                if not phone.startswith('961'):
+                    phone = '961' + phone.lstrip('0')
+                
+                whatsapp_url = f"https://wa.me/{phone}?text={urllib.parse.quote(message)}"
+                webbrowser.open(whatsapp_url)
+                sent_count[0] += 1
+            except Exception as e:
+                print(f"خطأ في إرسال رسالة للعميل {name}: {e}")
             
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في إرسال الرسالة الجماعية: {str(e)}")
+            # تأخير قصير بين الرسائل
+            self.after(2000, send_next, index + 1)
+        
+        send_next()
     
     def send_specific_message(self):
         """إرسال رسالة لعملاء محددين"""
@@ -2141,17 +2275,15 @@ class MaintenanceFrame(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل في حذف القالب: {str(e)}")
     def show_customer_selection_dialog(self, message):
-        """عرض نافذة اختيار العملاء"""
+        """عرض نافذة اختيار العملاء (بعد جلبهم في الخلفية)"""
+        self._load_customer_contacts(
+            lambda customers: self._show_customer_selection_dialog(message, customers),
+            "فشل في عرض قائمة العملاء: "
+        )
+    
+    def _show_customer_selection_dialog(self, message, customers):
+        """نافذة اختيار العملاء من (رقم، اسم، هاتف)"""
         try:
-            # جلب جميع العملاء
-            db = next(get_db())
-            customers = db.query(Customer).all()
-            db.close()
-            
-            if not customers:
-                messagebox.showwarning("تحذير", "لا يوجد عملاء في النظام")
-                return
-            
             # إنشاء نافذة اختيار العملاء
             selection_dialog = ctk.CTkToplevel(self)
             selection_dialog.title("اختيار العملاء")
@@ -2175,13 +2307,16 @@ class MaintenanceFrame(ctk.CTkFrame):
             
             # قائمة العملاء مع مربعات الاختيار
             self.customer_vars = {}
+            self.customer_contacts = {}
             for customer in customers:
+                customer_id, name, phone = customer
                 var = tk.BooleanVar()
-                self.customer_vars[customer.id] = var
+                self.customer_vars[customer_id] = var
+                self.customer_contacts[customer_id] = customer
                 
                 ctk.CTkCheckBox(
                     customers_frame,
-                    text=f"{customer.name} - {customer.phone}",
+                    text=f"{name} - {phone}",
                     variable=var,
                     font=("Arial", 11)
                 ).pack(anchor=tk.W, padx=10, pady=2)
@@ -2240,32 +2375,10 @@ class MaintenanceFrame(ctk.CTkFrame):
             if not messagebox.askyesno("تأكيد", f"هل تريد إرسال الرسالة لـ {len(selected_customers)} عميل؟"):
                 return
             
-            # جلب بيانات العملاء المحددين
-            db = next(get_db())
-            customers = db.query(Customer).filter(Customer.id.in_(selected_customers)).all()
-            db.close()
-            
-            # إرسال الرسالة لكل عميل
-            sent_count = 0
-            for customer in customers:
-                try:
-                    phone = customer.phone.replace('+', '').replace(' ', '').replace('-', '')
-                    if not phone.startswith('961'):
-                        phone = '961' + phone.lstrip('0')
-                    
-                    whatsapp_url = f"https://wa.me/{phone}?text={urllib.parse.quote(message)}"
-                    webbrowser.open(whatsapp_url)
-                    sent_count += 1
-                    
-                    # تأخير قصير بين الرسائل
-                    import time
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    print(f"خطأ في إرسال رسالة للعميل {customer.name}: {e}")
-            
+            # بيانات العملاء المحملة مع النافذة - لا استعلام في خيط الواجهة
+            customers = [self.customer_contacts[customer_id] for customer_id in selected_customers]
             dialog.destroy()
-            messagebox.showinfo("نجح", f"تم فتح الواتساب لإرسال الرسالة لـ {sent_count} عميل")
+            self._send_whatsapp_messages(message, customers)
             
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل في إرسال الرسالة: {str(e)}")
@@ -2651,115 +2764,498 @@ class MaintenanceFrame(ctk.CTkFrame):
     def load_data(self, silent=False, use_threading=True):
         """تحميل بيانات الطلبات (محسّن للأداء)
         
+        الاستعلام يعمل في الخلفية عبر task_runner والجدول يُحدّث في خيط الواجهة.
+        طلب تحميل جديد يلغي السابق (مثلاً تغيير الفلتر أثناء التحميل).
+        
         Args:
             silent (bool): إذا كان True، لا تظهر رسائل الخطأ
-            use_threading (bool): استخدام threading لتحميل البيانات في الخلفية
+            use_threading (bool): False للتحميل المتزامن في خيط الواجهة
         """
-        # استخدام threading لتحميل البيانات في الخلفية (أسرع)
-        if use_threading and not silent:
-            def load_in_background():
-                try:
-                    self._load_data_sync(silent=True)
-                except Exception as e:
-                    print(f"خطأ في تحميل البيانات في الخلفية: {e}")
+        import time
+        current_time = time.time()
+        cache_key = getattr(self, 'current_filter_status', None)
+        
+        # التحقق من cache أولاً
+        cache_valid = (
+            self._data_cache is not None and
+            self._data_cache_time is not None and
+            self._data_cache_key == cache_key and
+            (current_time - self._data_cache_time) < self._data_cache_ttl
+        )
+        
+        if cache_valid:
+            tree_empty = not hasattr(self, 'job_table') or len(self.job_table) == 0
+            
+            if tree_empty and self._data_cache:
+                self._replace_tree_rows(self._visible_jobs(self._data_cache))
+            
+            if not silent:
+                self.update_stats(force_refresh=False)
             
-            thread = threading.Thread(target=load_in_background, daemon=True)
-            thread.start()
+            self._last_load_time = current_time
             return True
         
-        return self._load_data_sync(silent)
+        # جلب البيانات من الخدمة
+        if not hasattr(self, 'maintenance_service'):
+            if not silent:
+                messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
+            return False
+        
+        # صفحة قديمة قيد الجلب لا تُضاف للقائمة الجديدة
+        self.task_runner.cancel("next_page")
+        self._is_loading_page = False
+        
+        # جلب الصفحة الأولى فقط - باقي الصفحات تُجلب عند التمرير (_load_next_page)
+        sync_started = datetime.utcnow()
+        change_version = self.change_watcher.version
+        
+        def fetch(service):
+            return service.search_jobs_page(status=cache_key or None, limit=self._page_size)
+        
+        def on_loaded(result):
+            return self._on_jobs_loaded(result, cache_key, current_time, sync_started, silent, change_version)
+        
+        if not use_threading:
+            return on_loaded(fetch(self.maintenance_service))
+        self.run_db_task(fetch, on_success=on_loaded, key="job_list")
+        return True
+    
+    def _on_jobs_loaded(self, result, cache_key, load_time, sync_started, silent=False, change_version=None):
+        """عرض الصفحة الأولى من الطلبات بعد جلبها (خيط الواجهة)"""
+        success, message, jobs, next_cursor = result
+        if not success:
+            if not silent:
+                messagebox.showerror("خطأ", f"فشل في تحميل البيانات: {message}")
+            return False
+        
+        # تغيّر الفلتر أثناء الجلب - النتيجة لم تعد مطلوبة
+        if cache_key != getattr(self, 'current_filter_status', None):
+            return False
+        
+        # حفظ في cache (نسخة خاصة: الصفحات التالية تُضاف إليها)
+        self._data_cache = list(jobs)
+        self._data_cache_time = load_time
+        self._data_cache_key = cache_key
+        self._next_cursor = next_cursor
+        self._last_sync_at = sync_started
+        
+        if self._search_query and self._index_ready():
+            self._show_index_rows(cache_key)
+        else:
+            self._replace_tree_rows(self._visible_jobs(jobs))
+        
+        # تحديث وقت آخر تحميل
+        self._last_load_time = load_time
+        
+        if change_version is not None:
+            self._rows_change_version = change_version
+        if cache_key is None:
+            if not self._index_ready():
+                self._build_job_index(jobs, next_cursor)
+            self._save_job_snapshot()
+        
+        # تحديث الإحصائيات (استخدام cache لتسريع العملية)
+        if not silent:
+            self.update_stats(force_refresh=False)
+        return True
+    
+    def run_db_task(self, work, on_success=None, on_error=None, key=None):
+        """تشغيل work(service) في الخلفية بجلسة قاعدة بيانات مستقلة
+        
+        on_success(النتيجة) و on_error(الخطأ) تُستدعى في خيط الواجهة. مهمة جديدة
+        بنفس key تلغي السابقة.
+        """
+        return self.task_runner.submit_db(
+            lambda db: work(MaintenanceService(db)),
+            on_success=on_success,
+            on_error=on_error or self._on_task_error,
+            key=key
+        )
     
-    def _load_data_sync(self, silent=False):
-        """تحميل البيانات بشكل متزامن (داخلي - محسّن)"""
-        # منع التحميل المتزامن
-        if hasattr(self, '_is_loading') and self._is_loading:
+    def _on_task_error(self, error):
+        """معالجة افتراضية لأخطاء مهام الخلفية"""
+        print(f"❌ خطأ في مهمة الخلفية: {error}")
+        if hasattr(self, 'status_label'):
+            self.status_label.configure(text=f"خطأ: {error}")
+    
+    def _restore_job_snapshot(self):
+        """عرض لقطة القائمة المحفوظة فوراً ثم تطبيق التغييرات منذ حفظها في الخلفية"""
+        import time
+        started = time.perf_counter()
+        snapshot = load_job_snapshot(self._snapshot_path, self._database_url)
+        # إصدار أحدث من قاعدة البيانات = القاعدة استُبدلت (استعادة نسخة احتياطية)
+        if snapshot is None or not snapshot.rows or snapshot.change_version > self.change_watcher.version:
             return False
-        self._is_loading = True
         
+        self._data_cache = list(snapshot.rows)
+        self._data_cache_time = time.time()
+        self._data_cache_key = None
+        self._next_cursor = snapshot.next_cursor
+        self._last_sync_at = snapshot.synced_at
+        self._rows_change_version = snapshot.change_version
+        self._replace_tree_rows(snapshot.rows)
+        print(f"⚡ عرض {len(snapshot.rows)} طلب من اللقطة المحلية ({(time.perf_counter() - started) * 1000:.0f}ms)")
+        
+        # التغييرات بعد اللقطة فقط (أو إعادة تحميل كاملة إذا حُذف جزء من السجل)
+        self.change_watcher.version = snapshot.change_version
+        self.after_idle(self._reconcile_snapshot)
+        return True
+    
+    def _reconcile_snapshot(self):
+        """تطبيق التغييرات منذ حفظ اللقطة"""
         try:
-            # التحقق من cache أولاً
-            import time
-            current_time = time.time()
-            cache_key = getattr(self, 'current_filter_status', None)
-            
-            cache_valid = (
-                self._data_cache is not None and
-                self._data_cache_time is not None and
-                self._data_cache_key == cache_key and
-                (current_time - self._data_cache_time) < self._data_cache_ttl
-            )
-            
-            if cache_valid:
-                try:
-                    tree_empty = not hasattr(self, 'tree') or len(self.tree.get_children()) == 0
-                except Exception:
-                    tree_empty = True
-                
-                if tree_empty and self._data_cache:
-                    rows = [self._format_job_row(job) for job in self._data_cache]
-                    self._replace_tree_rows(rows)
-                
-                if not silent:
-                    self.update_stats(force_refresh=False)
-                
-                self._last_load_time = current_time
-                self._is_loading = False
-                return True
-            
-            # جلب البيانات من الخدمة
-            if not hasattr(self, 'maintenance_service'):
-                if not silent:
-                    messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
-                self._is_loading = False
-                return False
-            
-            current_status = getattr(self, 'current_filter_status', None)
-            if current_status:
-                success, message, jobs = self.maintenance_service.search_jobs(
-                    status=current_status,
-                    limit=10000  # عدد كبير لجلب جميع النتائج
-                )
+            changes = self.change_watcher.poll()
+            if changes:
+                self._apply_changes(changes)
             else:
-                success, message, jobs = self.maintenance_service.search_jobs(limit=10000)
-            
-            # حفظ في cache
-            if success:
-                self._data_cache = jobs
-                self._data_cache_time = current_time
-                self._data_cache_key = cache_key
+                self._mark_rows_synced()
+        except Exception as e:
+            print(f"خطأ في تحديث اللقطة: {e}")
+            self.invalidate_data_cache()
+            self.load_data(silent=True)
+            return
+        if not self._index_ready():
+            self._build_job_index(self._data_cache, self._next_cursor)
+    
+    def _save_job_snapshot(self, in_background=True):
+        """حفظ القائمة الحالية (غير المفلترة) لعرضها فوراً في التشغيل القادم"""
+        if self._data_cache_key is not None or not self._data_cache:
+            return
+        
+        # ترتيب القائمة الافتراضي (قد يكون الجدول مرتباً حسب عمود آخر)
+        rows = sorted(self._data_cache, key=self._job_order_key, reverse=True)
+        next_cursor = self._next_cursor
+        if len(rows) > MAX_SNAPSHOT_ROWS:
+            rows = rows[:MAX_SNAPSHOT_ROWS]
+            next_cursor = encode_cursor(rows[-1]['received_at'], rows[-1]['id'])
+        snapshot = JobSnapshot(rows, next_cursor, self._rows_change_version, self._last_sync_at, self._database_url)
+        
+        def write():
+            save_job_snapshot(self._snapshot_path, snapshot)
+        
+        if not in_background:
+            try:
+                write()
+            except OSError as e:
+                print(f"⚠️ تعذر حفظ لقطة قائمة الطلبات: {e}")
+            return
+        self.task_runner.submit(
+            write,
+            on_error=lambda e: print(f"⚠️ تعذر حفظ لقطة قائمة الطلبات: {e}"),
+            key="snapshot"
+        )
+    
+    def _index_ready(self):
+        """هل يمكن الاعتماد على فهرس الذاكرة بدلاً من قاعدة البيانات"""
+        import time
+        index = self._job_index
+        return (
+            index.complete and
+            index.built_at is not None and
+            (time.time() - index.built_at) < self._index_max_age
+        )
+    
+    def _build_job_index(self, jobs=None, next_cursor=None):
+        """بناء فهرس الذاكرة: مباشرة إذا كانت كل الطلبات محملة، وإلا في الخلفية"""
+        import time
+        if jobs is not None and not next_cursor:
+            self._job_index.build(jobs, complete=True, built_at=time.time())
+            return
+        if self.task_runner.is_running("job_index"):
+            return
+        
+        started = time.time()
+        max_rows, page_size = self._index_max_rows, self._index_page_size
+        
+        def build(service):
+            from sqlalchemy import func
+            if service.db.query(func.count(MaintenanceJob.id)).scalar() > max_rows:
+                return None  # كبير جداً للذاكرة - البحث يبقى عبر القاعدة
             
-            if success:
-                rows = [self._format_job_row(job) for job in jobs]
-                self._replace_tree_rows(rows)
-                
-                # تحديث وقت آخر تحميل
-                self._last_load_time = current_time
-                
-                # تحديث الإحصائيات (استخدام cache لتسريع العملية)
-                if not silent:
-                    self.update_stats(force_refresh=False)
-                
-                self._is_loading = False
-                return True
+            rows, cursor = [], None
+            while True:
+                success, message, page, cursor = service.search_jobs_page(limit=page_size, cursor=cursor)
+                if not success:
+                    raise RuntimeError(message)
+                rows.extend(page)
+                if not cursor:
+                    break
+            index = JobIndex()
+            index.build(rows, complete=True, built_at=started)
+            return index
+        
+        def on_built(index):
+            backlog, self._index_backlog = self._index_backlog, []
+            if index is None:
+                return
+            for changed_jobs, removed_ids in backlog:
+                self._update_job_index(changed_jobs, removed_ids, index=index)
+            self._job_index = index
+            print(f"✅ فهرس البحث جاهز ({self.format_number_english(len(index))} طلب)")
+        
+        self._index_backlog = []
+        self.run_db_task(build, on_success=on_built, key="job_index")
+    
+    def _update_job_index(self, jobs=(), removed_ids=(), index=None):
+        """تطبيق الطلبات المتغيرة/المحذوفة على فهرس الذاكرة"""
+        if index is None:
+            index = self._job_index
+            if self.task_runner.is_running("job_index"):
+                # الفهرس الجديد قيد البناء من بيانات قد تسبق هذا التغيير
+                self._index_backlog.append((jobs, removed_ids))
+        index.add_rows(jobs)
+        for job_id in removed_ids:
+            index.remove(job_id)
+    
+    def _visible_jobs(self, jobs):
+        """الطلبات المطابقة لنص البحث الفوري الحالي (إن وُجد)"""
+        if not self._search_query:
+            return jobs
+        return [job for job in jobs if self._job_index.matches(job, self._search_query)]
+    
+    def _show_index_rows(self, status):
+        """عرض الطلبات من فهرس الذاكرة (الحالة + نص البحث) بدلاً من الاستعلام"""
+        import time
+        self.task_runner.cancel("job_list")
+        self.task_runner.cancel("next_page")
+        self._is_loading_page = False
+        
+        all_rows = self._job_index.filter_status(status)
+        self._data_cache = all_rows
+        self._data_cache_time = time.time()
+        self._data_cache_key = status
+        self._next_cursor = None  # كل الطلبات معروضة - لا صفحات إضافية
+        
+        rows = self._job_index.search(self._search_query, status=status) if self._search_query else all_rows
+        self._replace_tree_rows(rows)
+        return rows
+    
+    def _schedule_live_search(self, event=None):
+        """بحث فوري أثناء الكتابة (بعد توقف قصير عن الكتابة)"""
+        if event is not None and event.keysym in ("Return", "KP_Enter"):
+            return
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(self._search_debounce_ms, self._live_search)
+    
+    def _live_search(self):
+        """تصفية الجدول حسب نص البحث من فهرس الذاكرة
+        
+        إذا لم يكن الفهرس جاهزاً (قاعدة كبيرة أو قيد البناء) يبقى البحث عبر Enter.
+        """
+        self._search_job = None
+        query = self.search_var.get().strip()
+        if query == self._search_query:
+            return
+        if not self._index_ready():
+            if not query:
+                self._search_query = ""
+                self.invalidate_data_cache()
+                self.load_data(silent=True)
             else:
-                if not silent:
-                    messagebox.showerror("خطأ", f"فشل في تحميل البيانات: {message}")
-                self._is_loading = False
-                return False
-                
-        except Exception as e:
-            if not silent:
-                messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            self._is_loading = False
-            return False
+                self._build_job_index()
+            return
+        
+        self._search_query = query
+        self._show_index_rows(getattr(self, 'current_filter_status', None))
     
     def invalidate_data_cache(self):
         """تفريغ بيانات الـ cache لإجبار التحديث القادم على جلب البيانات من القاعدة"""
         self._data_cache = None
         self._data_cache_time = None
         self._data_cache_key = None
+        self._next_cursor = None
+    
+    def poll_changes(self):
+        """فحص دوري لسجل التغييرات وتحديث الصفوف المتأثرة فقط"""
+        try:
+            changes = self.change_watcher.poll()
+            if changes:
+                self._apply_changes(changes)
+        except Exception as e:
+            print(f"خطأ في فحص التغييرات: {e}")
+        finally:
+            self.change_poll_job = self.after(self.change_poll_interval, self.poll_changes)
+    
+    def _apply_changes(self, changes):
+        """تطبيق ChangeSet على الجدول: حذف/تعديل/إضافة الصفوف المتغيرة بدلاً من إعادة التحميل"""
+        if not hasattr(self, 'job_table'):
+            return
+        
+        # تغيير إعدادات فقط (مثل قالب الواتساب من web_app.py) - لا صفوف متأثرة
+        if not (changes.full_reload or changes.customers or changes.jobs or changes.deleted_jobs):
+            return
+        
+        # تعديل اسم/هاتف عميل يؤثر على صفوف غير معروفة، والتغييرات الكثيرة أسرع بإعادة التحميل
+        if changes.full_reload or changes.customers or len(changes.jobs) > self._page_size:
+            self._job_index.clear()
+            self.invalidate_data_cache()
+            self.load_data(silent=True)
+            self.update_stats(force_refresh=True)
+            return
+        
+        if not changes.jobs:
+            self._patch_job_rows((), changes.deleted_jobs)
+            self._mark_rows_synced()
+            self.update_stats(force_refresh=True)
+            return
+        
+        job_ids = list(changes.jobs)
+        
+        def reload(error):
+            # الصفوف لم تعد متوافقة مع change_log - إعادة تحميل بدلاً من تجاهل التغيير
+            print(f"خطأ في جلب الطلبات المتغيرة: {error}")
+            self.invalidate_data_cache()
+            self.load_data(silent=True)
+        
+        def on_fetched(result):
+            self._pending_change_fetches -= 1
+            success, message, jobs, _ = result
+            if not success:
+                reload(message)
+                return
+            fetched = {job['id']: job for job in jobs}
+            # طلب لم يعد موجوداً (حُذف بعد التسجيل) يُزال أيضاً
+            removed = set(changes.deleted_jobs) | (changes.jobs - set(fetched))
+            self._patch_job_rows(fetched.values(), removed)
+            self._mark_rows_synced()
+            self.update_stats(force_refresh=True)
+        
+        def on_error(error):
+            self._pending_change_fetches -= 1
+            reload(error)
+        
+        # بدون key: كل ChangeSet يُطبّق حتى لو وصل التالي قبل انتهاء جلبه
+        self._pending_change_fetches += 1
+        self.run_db_task(
+            lambda service: service.search_jobs_page(job_ids=job_ids, limit=len(job_ids)),
+            on_success=on_fetched,
+            on_error=on_error
+        )
+    
+    def _mark_rows_synced(self):
+        """الصفوف أصبحت متوافقة مع آخر إصدار change_log (لا جلب تغييرات أو تحميل معلق)"""
+        if not self._pending_change_fetches and not self.task_runner.is_running("job_list"):
+            self._rows_change_version = self.change_watcher.version
+    
+    def _patch_job_rows(self, jobs, removed_ids=()):
+        """تعديل/إضافة/حذف صفوف محددة في الجدول حسب id الطلب (بدون إعادة التحميل)
+        
+        الطلب الجديد يُضاف فقط إذا كان ضمن الصفحات المحملة (أحدث من آخر صف محمل)،
+        وإلا سيظهر عند التمرير. الطلب الذي لم يعد يطابق الفلتر الحالي يُزال.
+        """
+        table = self.job_table
+        jobs = list(jobs)
+        removed = set(removed_ids)
+        self._update_job_index(jobs, list(removed))
+        
+        # آخر صف محمل (received_at, id) - لا يوجد حد إذا كانت كل الصفحات محملة
+        boundary = None
+        if self._next_cursor:
+            try:
+                boundary = decode_cursor(self._next_cursor)
+            except ValueError:
+                boundary = None
+        
+        with table.batch():
+            for job in jobs:
+                if not self._job_matches_current_filter(job.get('status')) or not self._visible_jobs([job]):
+                    removed.add(job['id'])
+                elif table.update_row(job):
+                    continue
+                elif boundary is None or self._job_order_key(job) > boundary:
+                    table.insert_row(job, self._job_insert_position(job))
+            table.remove_keys(removed)
+        
+        if self._data_cache is None:
+            pass
+        elif not self._search_query:
+            self._data_cache = list(table.rows)
+        elif self._index_ready():
+            # الجدول يعرض نتائج البحث فقط - القائمة الكاملة من الفهرس
+            self._data_cache = self._job_index.filter_status(self._data_cache_key)
+        else:
+            self.invalidate_data_cache()
+        self._update_tree_count()
+    
+    @staticmethod
+    def _job_order_key(job):
+        """مفتاح الترتيب الافتراضي للقائمة (received_at, id) تنازلياً"""
+        return (job.get('received_at') or datetime.min, job.get('id') or 0)
+    
+    def _job_insert_position(self, job):
+        """موضع الطلب في الترتيب الافتراضي للقائمة"""
+        key = self._job_order_key(job)
+        for position, row in enumerate(self.job_table.rows):
+            if self._job_order_key(row) < key:
+                return position
+        return len(self.job_table.rows)
+    
+    def incremental_refresh(self):
+        """تحديث الصفوف التي تغيرت منذ آخر مزامنة فقط (updated_at)
+        
+        يحافظ على التحديد وموضع التمرير لأن باقي الصفوف لا تُلمس. يعود إلى
+        التحميل الكامل إذا لم تتم مزامنة بعد أو كانت التغييرات كثيرة.
+        """
+        if self._last_sync_at is None or not hasattr(self, 'job_table'):
+            return self.load_data(silent=True)
+        
+        started = datetime.utcnow()
+        since = self._last_sync_at - self._sync_overlap
+        
+        def on_loaded(result):
+            success, message, jobs = result
+            if not success:
+                print(f"خطأ في التحديث التزايدي: {message}")
+                return
+            if jobs is None:
+                self._job_index.clear()
+                self.invalidate_data_cache()
+                self.load_data(silent=True)
+                return
+            if jobs:
+                self._patch_job_rows(jobs)
+            self._last_sync_at = started
+            self._save_job_snapshot()
+        
+        self.run_db_task(
+            lambda service: service.get_jobs_changed_since(since, limit=self._page_size),
+            on_success=on_loaded,
+            key="job_refresh"
+        )
+        return True
+    
+    def _load_next_page(self):
+        """جلب الصفحة التالية من الطلبات وإضافتها لنهاية القائمة"""
+        if not self._next_cursor or self._is_loading_page:
+            return
+        self._is_loading_page = True
+        cursor = self._next_cursor
+        status = getattr(self, 'current_filter_status', None) or None
+        
+        def on_loaded(result):
+            self._is_loading_page = False
+            success, message, jobs, next_cursor = result
+            # تم تحديث القائمة أثناء الجلب - تجاهل الصفحة القديمة
+            if not success or cursor != self._next_cursor:
+                return
+            
+            self._next_cursor = next_cursor
+            if self._data_cache is not None:
+                self._data_cache.extend(jobs)
+            self.job_table.append_rows(self._visible_jobs(jobs))
+            self._update_tree_count()
+        
+        def on_error(error):
+            self._is_loading_page = False
+            print(f"خطأ في جلب الصفحة التالية: {error}")
+        
+        self.run_db_task(
+            lambda service: service.search_jobs_page(status=status, limit=self._page_size, cursor=cursor),
+            on_success=on_loaded,
+            on_error=on_error,
+            key="next_page"
+        )
     
     def _normalize_status_value(self, status):
         """إرجاع الحالة كنص بسيط"""
@@ -2810,33 +3306,43 @@ class MaintenanceFrame(ctk.CTkFrame):
             delivered_str
         )
     
-    def _replace_tree_rows(self, rows):
-        """استبدال كل صفوف الجدول بالبيانات المعطاة"""
-        if not hasattr(self, 'tree'):
+    def _replace_tree_rows(self, jobs):
+        """استبدال كل صفوف الجدول بالطلبات المعطاة (تُنسّق الصفوف الظاهرة فقط)"""
+        if not hasattr(self, 'job_table'):
             return
         
-        items = self.tree.get_children()
-        if items:
-            self.tree.delete(*items)
-        
-        self.tree.config(displaycolumns='#all')
-        for values in rows:
-            self.tree.insert("", tk.END, values=values)
-        self.tree.update_idletasks()
-        self.tree.heading("select", text="☐")
-        self._update_tree_count(len(rows))
+        self.job_table.set_rows(jobs)
+        self._update_tree_count(len(jobs))
+    
+    def _job_sort_keys(self):
+        """دوال الترتيب لكل عمود في جدول الطلبات"""
+        def tracking_key(job):
+            parsed = parse_tracking_code(job.get('tracking_code'))
+            return parsed if parsed else (job.get('tracking_code') or '', 0)
+        
+        return {
+            "id": lambda job: job.get('id'),
+            "tracking_code": tracking_key,
+            "customer_name": lambda job: job.get('customer_name'),
+            "customer_phone": lambda job: job.get('customer_phone'),
+            "device_type": lambda job: job.get('device_type'),
+            "serial_number": lambda job: job.get('serial_number'),
+            "status": lambda job: self._normalize_status_value(job.get('status')),
+            "price": lambda job: job.get('final_cost') or job.get('estimated_cost'),
+            "payment": lambda job: (job.get('payment_status') or '', job.get('payment_method') or ''),
+            "received_date": lambda job: job.get('received_at'),
+            "delivered_date": lambda job: job.get('delivered_at'),
+        }
     
     def _append_tree_row(self, job, prepend=False):
         """إضافة صف جديد إلى الجدول"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
         
-        values = self._format_job_row(job)
         if prepend:
-            self.tree.insert("", 0, values=values)
+            self.job_table.prepend_row(job)
         else:
-            self.tree.insert("", tk.END, values=values)
-        self.tree.update_idletasks()
+            self.job_table.append_rows([job])
         self._update_tree_count()
     
     def _update_tree_count(self, count=None):
@@ -2845,10 +3351,7 @@ class MaintenanceFrame(ctk.CTkFrame):
             return
         
         if count is None:
-            if hasattr(self, 'tree'):
-                count = len(self.tree.get_children())
-            else:
-                count = 0
+            count = len(self.job_table) if hasattr(self, 'job_table') else 0
         
         current_status = getattr(self, 'current_filter_status', None)
         if current_status:
@@ -2891,106 +3394,104 @@ class MaintenanceFrame(ctk.CTkFrame):
             print(f"⚠️ فشل في التحديث السريع لقائمة الطلبات: {exc}")
     
     def update_stats(self, force_refresh=False):
-        """تحديث إحصائيات الطلبات مع cache"""
-        try:
-            # التحقق من وجود stats_cards
-            if not hasattr(self, 'stats_cards'):
-                print("⚠️ تحذير: stats_cards غير موجود - سيتم تجاوز التحديث")
-                return False
-            
-            if not self.stats_cards:
-                print("⚠️ تحذير: stats_cards فارغ - سيتم تجاوز التحديث")
-                return False
-            
-            # جلب إحصائيات الطلبات
-            if not hasattr(self, 'maintenance_service'):
-                print("⚠️ تحذير: maintenance_service غير موجود - سيتم تجاوز التحديث")
-                return False
-            
-            print("🔄 بدء تحديث الإحصائيات...")
-            
-            # استخدام cache إذا كان متاحاً وغير منتهي الصلاحية
-            import time
-            current_time = time.time()
-            if (not force_refresh and 
-                hasattr(self, '_stats_cache') and 
-                self._stats_cache is not None and 
-                hasattr(self, '_stats_cache_time') and 
-                self._stats_cache_time is not None and
-                (current_time - self._stats_cache_time) < self._cache_ttl):
-                stats = self._stats_cache
-                success = True
-                message = "تم جلب الإحصائيات من cache"
-            else:
-                print("🔄 جلب الإحصائيات من قاعدة البيانات...")
-                success, message, stats = self.maintenance_service.get_dashboard_stats()
-                print(f"📊 نتيجة جلب الإحصائيات: success={success}, message={message}")
-                if success:
-                    print(f"📊 البيانات المستلمة: {stats}")
-                    # حفظ في cache
-                    self._stats_cache = stats
-                    self._stats_cache_time = current_time
-                else:
-                    print(f"❌ فشل في جلب الإحصائيات: {message}")
-            
+        """تحديث إحصائيات الطلبات مع cache (الاستعلام في الخلفية والعرض في خيط الواجهة)"""
+        # التحقق من وجود stats_cards
+        if not hasattr(self, 'stats_cards'):
+            print("⚠️ تحذير: stats_cards غير موجود - سيتم تجاوز التحديث")
+            return False
+        
+        if not self.stats_cards:
+            print("⚠️ تحذير: stats_cards فارغ - سيتم تجاوز التحديث")
+            return False
+        
+        # جلب إحصائيات الطلبات
+        if not hasattr(self, 'maintenance_service'):
+            print("⚠️ تحذير: maintenance_service غير موجود - سيتم تجاوز التحديث")
+            return False
+        
+        print("🔄 بدء تحديث الإحصائيات...")
+        
+        # استخدام cache إذا كان متاحاً وغير منتهي الصلاحية
+        import time
+        current_time = time.time()
+        if (not force_refresh and 
+            self._stats_cache is not None and 
+            self._stats_cache_time is not None and
+            (current_time - self._stats_cache_time) < self._cache_ttl):
+            return self._render_stats(self._stats_cache)
+        
+        def on_loaded(result):
+            success, message, stats = result
+            print(f"📊 نتيجة جلب الإحصائيات: success={success}, message={message}")
             if success:
-                # التحقق من صحة البيانات
-                total_jobs = stats.get('total_jobs', 0)
-                in_progress = stats.get('in_progress', 0)
-                ready_for_delivery = stats.get('ready_for_delivery', 0)
-                delivered = stats.get('delivered', 0)
-                
-                # التحقق من أن الأرقام منطقية
-                calculated_total = in_progress + ready_for_delivery + delivered
-                if calculated_total != total_jobs:
-                    print(f"⚠️ تحذير: مجموع الإحصائيات ({calculated_total}) لا يطابق إجمالي الطلبات ({total_jobs})")
-                    print(f"   التفاصيل: قيد المعالجة={in_progress}, جاهزة={ready_for_delivery}, مسلمة={delivered}")
-                
-                # تحديث البطاقات الإحصائية
-                print(f"🔄 تحديث البطاقات الإحصائية...")
-                print(f"   - إجمالي الطلبات: {total_jobs}")
-                print(f"   - قيد المعالجة: {in_progress}")
-                print(f"   - جاهزة للتسليم: {ready_for_delivery}")
-                print(f"   - تم التسليم: {delivered}")
-                
-                if 'total_jobs' in stats:
-                    formatted_total = self.format_number_english(total_jobs)
-                    print(f"🔄 تحديث بطاقة 'إجمالي الطلبات' بالقيمة: {formatted_total}")
-                    self.update_stat_card("إجمالي الطلبات", formatted_total)
-                if 'in_progress' in stats:
-                    formatted_in_progress = self.format_number_english(in_progress)
-                    print(f"🔄 تحديث بطاقة 'قيد المعالجة' بالقيمة: {formatted_in_progress}")
-                    self.update_stat_card("قيد المعالجة", formatted_in_progress)
-                if 'ready_for_delivery' in stats:
-                    formatted_ready = self.format_number_english(ready_for_delivery)
-                    print(f"🔄 تحديث بطاقة 'جاهزة للتسليم' بالقيمة: {formatted_ready}")
-                    self.update_stat_card("جاهزة للتسليم", formatted_ready)
-                if 'delivered' in stats:
-                    formatted_delivered = self.format_number_english(delivered)
-                    print(f"🔄 تحديث بطاقة 'تم التسليم' بالقيمة: {formatted_delivered}")
-                    
-                    # إضافة تاريخ آخر تسليم إذا كان متوفراً
-                    delivery_date_info = None
-                    if 'last_delivery_date' in stats and stats['last_delivery_date']:
-                        try:
-                            if isinstance(stats['last_delivery_date'], datetime):
-                                delivery_date_info = f"آخر تسليم: {stats['last_delivery_date'].strftime('%Y-%m-%d')}"
-                            else:
-                                delivery_date_info = f"آخر تسليم: {str(stats['last_delivery_date'])[:10]}"
-                        except Exception as e:
-                            print(f"⚠️ خطأ في تنسيق تاريخ التسليم: {e}")
-                    
-                    self.update_stat_card("تم التسليم", formatted_delivered, delivery_date_info)
-                
-                print(f"✅ تم تحديث الإحصائيات بنجاح: إجمالي={total_jobs}, قيد المعالجة={in_progress}, جاهزة={ready_for_delivery}, مسلمة={delivered}")
-                return True
+                # حفظ في cache
+                self._stats_cache = stats
+                self._stats_cache_time = current_time
+                self._render_stats(stats)
             else:
                 print(f"❌ فشل في جلب الإحصائيات: {message}")
                 if hasattr(self, 'status_label'):
                     self.status_label.configure(text=f"خطأ في تحميل الإحصائيات: {message}")
-                return False
+        
+        # طلب جديد يلغي أي طلب إحصائيات سابق لم يكتمل
+        print("🔄 جلب الإحصائيات من قاعدة البيانات...")
+        self.run_db_task(lambda service: service.get_dashboard_stats(), on_success=on_loaded, key="stats")
+        return True
+    
+    def _render_stats(self, stats):
+        """عرض الإحصائيات في البطاقات (خيط الواجهة)"""
+        try:
+            # التحقق من صحة البيانات
+            total_jobs = stats.get('total_jobs', 0)
+            in_progress = stats.get('in_progress', 0)
+            ready_for_delivery = stats.get('ready_for_delivery', 0)
+            delivered = stats.get('delivered', 0)
+            
+            # التحقق من أن الأرقام منطقية
+            calculated_total = in_progress + ready_for_delivery + delivered
+            if calculated_total != total_jobs:
+                print(f"⚠️ تحذير: مجموع الإحصائيات ({calculated_total}) لا يطابق إجمالي الطلبات ({total_jobs})")
+                print(f"   التفاصيل: قيد المعالجة={in_progress}, جاهزة={ready_for_delivery}, مسلمة={delivered}")
+            
+            # تحديث البطاقات الإحصائية
+            print(f"🔄 تحديث البطاقات الإحصائية...")
+            print(f"   - إجمالي الطلبات: {total_jobs}")
+            print(f"   - قيد المعالجة: {in_progress}")
+            print(f"   - جاهزة للتسليم: {ready_for_delivery}")
+            print(f"   - تم التسليم: {delivered}")
+            
+            if 'total_jobs' in stats:
+                formatted_total = self.format_number_english(total_jobs)
+                print(f"🔄 تحديث بطاقة 'إجمالي الطلبات' بالقيمة: {formatted_total}")
+                self.update_stat_card("إجمالي الطلبات", formatted_total)
+            if 'in_progress' in stats:
+                formatted_in_progress = self.format_number_english(in_progress)
+                print(f"🔄 تحديث بطاقة 'قيد المعالجة' بالقيمة: {formatted_in_progress}")
+                self.update_stat_card("قيد المعالجة", formatted_in_progress)
+            if 'ready_for_delivery' in stats:
+                formatted_ready = self.format_number_english(ready_for_delivery)
+                print(f"🔄 تحديث بطاقة 'جاهزة للتسليم' بالقيمة: {formatted_ready}")
+                self.update_stat_card("جاهزة للتسليم", formatted_ready)
+            if 'delivered' in stats:
+                formatted_delivered = self.format_number_english(delivered)
+                print(f"🔄 تحديث بطاقة 'تم التسليم' بالقيمة: {formatted_delivered}")
                 
-        except Exception as e:
+                # إضافة تاريخ آخر تسليم إذا كان متوفراً
+                delivery_date_info = None
+                if 'last_delivery_date' in stats and stats['last_delivery_date']:
+                    try:
+                        if isinstance(stats['last_delivery_date'], datetime):
+                            delivery_date_info = f"آخر تسليم: {stats['last_delivery_date'].strftime('%Y-%m-%d')}"
+                        else:
+                            delivery_date_info = f"آخر تسليم: {str(stats['last_delivery_date'])[:10]}"
+                    except Exception as e:
+                        print(f"⚠️ خطأ في تنسيق تاريخ التسليم: {e}")
+                
+                self.update_stat_card("تم التسليم", formatted_delivered, delivery_date_info)
+            
+            print(f"✅ تم تحديث الإحصائيات بنجاح: إجمالي={total_jobs}, قيد المعالجة={in_progress}, جاهزة={ready_for_delivery}, مسلمة={delivered}")
+            return True
+        except Exception as e:
             print(f"❌ خطأ في تحديث الإحصائيات: {e}")
             import traceback
             traceback.print_exc()
@@ -3073,97 +3574,33 @@ class MaintenanceFrame(ctk.CTkFrame):
     
     def _search_device(self, code, customer_entry=None, device_type_entry=None, model_entry=None, serial_entry=None, barcode_entry=None):
         """البحث عن جهاز باستخدام الباركود أو الرقم التسلسلي"""
-        if not code:
-            return
-            
-        # البحث في قاعدة البيانات
-        if not hasattr(self, 'code_service'):
+        device_history = self._search_device_history(code)
+        if not device_history:
             return None
-        device = self.code_service.find_device_by_code(code)
-        
-        if device:
-            # تعبئة الحقول ببيانات الجهاز إذا تم توفيرها
-            if customer_entry:
-                customer_entry.delete(0, tk.END)
-                customer_entry.insert("0", device.get('customer_name', ''))
-            
-            if device_type_entry:
-                device_type_entry.delete(0, tk.END)
-                device_type_entry.insert("0", device.get('device_type', ''))
-                
-            if model_entry:
-                model_entry.delete(0, tk.END)
-                model_entry.insert("0", device.get('device_model', ''))
-                
-            if serial_entry:
-                serial_entry.delete(0, tk.END)
-                serial_entry.insert("0", device.get('device_serial', ''))
-            
-            # عرض رسالة للتنبيه بأنه تم العثور على الجهاز
-            messagebox.showinfo(
-                "تم العثور على الجهاز",
-                f"تم العثور على جهاز مسجل مسبقاً\n"
-                f"النوع: {device.get('device_type', 'غير محدد')}\n"
-                f"الموديل: {device.get('device_model', 'غير محدد')}"
-            )
-            return device
-        
-        return None
+        device = device_history['latest']
+        
+        # تعبئة الحقول ببيانات الجهاز إذا تم توفيرها
+        for entry, field in ((customer_entry, 'customer_name'), (device_type_entry, 'device_type'),
+                             (model_entry, 'device_model'), (serial_entry, 'serial_number')):
+            if entry:
+                entry.delete(0, tk.END)
+                entry.insert("0", device.get(field) or '')
+        
+        # عرض رسالة للتنبيه بأنه تم العثور على الجهاز
+        messagebox.showinfo(
+            "تم العثور على الجهاز",
+            f"تم العثور على جهاز مسجل مسبقاً\n"
+            f"النوع: {device.get('device_type') or 'غير محدد'}\n"
+            f"الموديل: {device.get('device_model') or 'غير محدد'}"
+        )
+        return device
 
     def _search_device_history(self, code):
-        """البحث عن تاريخ الجهاز بالباركود أو الرقم التسلسلي"""
-        try:
-            if not hasattr(self, 'maintenance_service'):
-                return None
-            
-            db = next(get_db())
-            from database.models import MaintenanceJob, Customer, Customer, StatusHistory
-            
-            # البحث عن جميع طلبات الصيانة لهذا الجهاز
-            jobs = db.query(MaintenanceJob).filter(
-                (MaintenanceJob.serial_number == code) | 
-                (MaintenanceJob.tracking_code == code)
-            ).order_by(MaintenanceJob.received_at.desc()).all()
-            
-            if not jobs:
-                db.close()
-                return None
-            
-            # تجميع تاريخ الجهاز
-            device_history = {
-                'serial_number': code,
-                'total_jobs': len(jobs),
-                'jobs': []
-            }
-            
-            for job in jobs:
-                # الحصول على تاريخ الحالات
-                status_history = db.query(StatusHistory).filter_by(maintenance_job_id=job.id).order_by(StatusHistory.created_at).all()
-                
-                job_info = {
-                    'id': job.id,
-                    'tracking_code': job.tracking_code,
-                    'customer_name': job.customer.name,
-                    'device_type': job.device_type,
-                    'received_at': job.received_at,
-                    'completed_at': job.completed_at,
-                    'current_status': job.status,
-                    'status_history': [
-                        {
-                            'status': status.status,
-                            'created_at': status.created_at,
-                            'notes': status.notes
-                        } for status in status_history
-                    ]
-                }
-                device_history['jobs'].append(job_info)
-            
-            db.close()
-            return device_history
-            
-        except Exception as e:
-            print(f"خطأ في البحث عن تاريخ الجهاز: {str(e)}")
-            return None
+        """البحث عن تاريخ الجهاز بالباركود أو الرقم التسلسلي (سجل الأجهزة + الطلبات + الحالات)"""
+        success, message, device_history = DeviceLookupService(self.db).lookup(code)
+        if not success:
+            print(f"خطأ في البحث عن تاريخ الجهاز: {message}")
+        return device_history
     
     def show_device_history_dialog(self, device_history, customer_entry, device_type_entry, serial_entry, barcode_entry):
         """عرض نافذة تاريخ الجهاز"""
@@ -3273,1277 +3710,90 @@ class MaintenanceFrame(ctk.CTkFrame):
                     
                     ctk.CTkLabel(
                         info_frame, 
-                        text=status_text, 
-                        font=("Arial", 10),
-                        text_color="#666666"
-                    ).pack(anchor=tk.W, pady=(0, 1), padx=20)
-        
-        # أزرار
-        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
-        button_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
-        
-        def use_this_device():
-            # استخدام بيانات آخر طلب
-            if device_history['jobs']:
-                last_job = device_history['jobs'][0]  # أحدث طلب
-                
-                # تعبئة الحقول
-                customer_entry.delete(0, tk.END)
-                customer_entry.insert("0", last_job['customer_name'])
-                
-                device_type_entry.delete(0, tk.END)
-                device_type_entry.insert("0", last_job['device_type'])
-                
-                serial_entry.delete(0, tk.END)
-                serial_entry.insert("0", device_history['serial_number'])
-                
-                barcode_entry.delete(0, tk.END)
-                barcode_entry.insert("0", device_history['serial_number'])
-            
-            dialog.destroy()
-        
-        ctk.CTkButton(
-            button_frame, 
-            text="استخدام هذا الجهاز", 
-            command=use_this_device,
-            fg_color="#4CAF50",
-            hover_color="#45a049",
-            width=200,
-            height=40,
-            font=("Arial", 12, "bold")
-        ).pack(side=tk.LEFT, padx=(0, 10))
-        
-        ctk.CTkButton(
-            button_frame, 
-            text="إغلاق", 
-            command=dialog.destroy,
-            fg_color="#f44336",
-            hover_color="#da190b",
-            width=150,
-            height=40,
-            font=("Arial", 12, "bold")
-        ).pack(side=tk.LEFT, padx=(10, 0))
-    def add_maintenance_old(self):
-        """إضافة طلب صيانة جديد - قديم"""
-        # إنشاء نافذة الإضافة
-        dialog = ctk.CTkToplevel(self)
-        dialog.title("إضافة طلب صيانة جديد - ADR ELECTRONICS")
-        dialog.geometry("500x800")  # نافذة أطول وأضيق
-        dialog.grab_set()  # جعل النافذة مركزة
-        
-        # إعداد التنقل بالـ Enter
-        self.setup_enter_navigation(dialog)
-        
-        # توليد كود جديد فوراً عند فتح النافذة من قاعدة البيانات
-        if hasattr(self, 'maintenance_service'):
-            current_code = self.maintenance_service.generate_tracking_code()
-        else:
-            current_code = "A1"
-        
-        # متغير لحفظ الكود المولد
-        generated_code = tk.StringVar()
-        generated_code.set(current_code)  # استخدام الكود المولد
-        
-        # محتوى النافذة الرئيسي
-        main_container = ctk.CTkFrame(dialog, fg_color="transparent")
-        main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-        
-        # عنوان النافذة
-        title_frame = ctk.CTkFrame(main_container, fg_color="#1976d2", corner_radius=10)
-        title_frame.pack(fill=tk.X, pady=(0, 20))
-        
-        ctk.CTkLabel(
-            title_frame, 
-            text="إضافة طلب صيانة جديد", 
-            font=("Arial", 18, "bold"), 
-            text_color="white"
-        ).pack(pady=3)
-        
-        # عرض الكود المرجعي مع تحديث تلقائي
-        code_section = ctk.CTkFrame(main_container, fg_color="#e8f5e8", corner_radius=8, border_width=2, border_color="#4caf50")
-        code_section.pack(fill=tk.X, pady=(0, 20))
-        
-        ctk.CTkLabel(
-            code_section, 
-            text="🏷️ الكود المرجعي للجهاز الجديد", 
-            font=("Arial", 14, "bold"), 
-            text_color="#2e7d32"
-        ).pack(anchor=tk.W, pady=(5, 3), padx=15)
-        
-        ctk.CTkLabel(
-            code_section, 
-            text="يجب تسجيل هذا الكود على الجهاز:", 
-            font=("Arial", 11), 
-            text_color="#4caf50"
-        ).pack(anchor=tk.W, pady=(0, 1), padx=15)
-        
-        code_display = ctk.CTkLabel(
-            code_section,
-            textvariable=generated_code,
-            font=("Arial", 20, "bold"),
-            text_color="#1b5e20",
-            fg_color="#c8e6c9",
-            corner_radius=8,
-            width=200,
-            height=40
-        )
-        code_display.pack(pady=(0, 1))
-        
-        # تحديث الكود في النافذة فوراً
-        generated_code.set(current_code)
-        code_display.configure(text=current_code)
-        
-        # إطار النموذج الرئيسي
-        form_container = ctk.CTkScrollableFrame(main_container, fg_color="#fafafa", corner_radius=10)
-        form_container.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
-        
-        # حقل الباركود
-        barcode_section = ctk.CTkFrame(form_container, fg_color="transparent")
-        barcode_section.pack(fill=tk.X, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            barcode_section, 
-            text="باركود/رقم تسلسلي", 
-            font=("Arial", 12, "bold"),
-            text_color="#424242"
-        ).pack(anchor=tk.W, pady=(0, 1))
-        
-        barcode_entry = ctk.CTkEntry(
-            barcode_section, 
-            width=400, 
-            height=35,
-            placeholder_text="ادخل الباركود أو اتركه فارغاً ليتم توليد الكود الحالي",
-            font=("Arial", 12)
-        )
-        barcode_entry.pack(fill=tk.X, pady=(0, 1))
-        
-        # دالة لتوليد الكود الحالي إذا كان حقل الباركود فارغاً
-        def on_barcode_leave(event):
-            if not barcode_entry.get().strip():
-                barcode_entry.delete(0, tk.END)
-                barcode_entry.insert("0", generated_code.get())
-        
-        # حقل الباركود يبقى فارغاً عند فتح النافذة
-        
-        barcode_entry.bind('<FocusOut>', on_barcode_leave)
-        
-        # قسم معلومات العميل
-        customer_section = ctk.CTkFrame(form_container, fg_color="#e3f2fd", corner_radius=8)
-        customer_section.pack(fill=tk.X, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            customer_section, 
-            text="معلومات العميل", 
-            font=("Arial", 14, "bold"),
-            text_color="#1976d2"
-        ).pack(anchor=tk.W, pady=(1, 1), padx=15)
-        
-        # حقل اسم العميل
-        name_frame = ctk.CTkFrame(customer_section, fg_color="transparent")
-        name_frame.pack(fill=tk.X, pady=(0, 1), padx=15)
-        
-        ctk.CTkLabel(
-            name_frame, 
-            text="اسم العميل *", 
-            font=("Arial", 12, "bold"), 
-            text_color="#d32f2f"
-        ).pack(anchor=tk.W, pady=(0, 1))
-        
-        customer_entry = ctk.CTkEntry(
-            name_frame, 
-            width=400, 
-            height=35,
-            placeholder_text="أدخل اسم العميل",
-            font=("Arial", 12)
-        )
-        customer_entry.pack(fill=tk.X, pady=(0, 1))
-        customer_entry.bind('<Return>', lambda e: phone_entry.focus())
-        customer_entry.bind('<KeyPress-Return>', lambda e: phone_entry.focus())
-        
-        # حقل رقم الهاتف مع إشارة بصرية
-        phone_frame = ctk.CTkFrame(customer_section, fg_color="transparent")
-        phone_frame.pack(fill=tk.X, pady=(0, 1), padx=15)
-        
-        # إطار العنوان مع إشارة الحالة
-        phone_title_frame = ctk.CTkFrame(phone_frame, fg_color="transparent")
-        phone_title_frame.pack(fill=tk.X, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            phone_title_frame, 
-            text="رقم الهاتف *", 
-            font=("Arial", 12, "bold"), 
-            text_color="#d32f2f"
-        ).pack(side=tk.LEFT)
-        
-        # إشارة بصرية للحالة (ستظهر عند العثور على العميل)
-        status_label = ctk.CTkLabel(
-            phone_title_frame, 
-            text="", 
-            font=("Arial", 10, "bold"),
-            text_color="#4caf50"
-        )
-        status_label.pack(side=tk.RIGHT)
-        
-        phone_entry = ctk.CTkEntry(
-            phone_frame, 
-            width=400, 
-            height=35,
-            placeholder_text="أدخل رقم الهاتف",
-            font=("Arial", 12)
-        )
-        phone_entry.pack(fill=tk.X, pady=(0, 1))
-        phone_entry.bind('<Return>', lambda e: device_type_entry.focus())
-        phone_entry.bind('<KeyPress-Return>', lambda e: device_type_entry.focus())
-        
-        # دالة للبحث عن العميل وملء رقم الهاتف تلقائياً (بدون نافذة منبثقة)
-        def search_customer_by_name(event=None):
-            customer_name = customer_entry.get().strip()
-            if customer_name and hasattr(self, 'maintenance_service'):
-                try:
-                    # البحث عن العميل في قاعدة البيانات (بحث دقيق بالاسم الكامل)
-                    db = next(get_db())
-                    from database.models import Customer
-                    customer = db.query(Customer).filter(Customer.name.ilike(f"%{customer_name}%")).first()
-                    db.close()
-                    
-                    if customer:
-                        # ملء رقم الهاتف تلقائياً بدون رسالة
-                        phone_entry.delete(0, tk.END)
-                        phone_entry.insert("0", customer.phone)
-                        
-                        # تغيير لون حقل الهاتف للإشارة إلى أنه تم ملؤه تلقائياً
-                        phone_entry.configure(fg_color="#e8f5e8", border_color="#4caf50")
-                        
-                        # وضع الكود في حقل الباركود عند العثور على العميل
-                        barcode_entry.delete(0, tk.END)
-                        barcode_entry.insert("0", generated_code.get())
-                        
-                        # إظهار إشارة بصرية
-                        status_label.configure(text="✓ تم العثور على العميل")
-                        status_label.configure(text_color="#4caf50")
-                    else:
-                        # إعادة تعيين لون حقل الهاتف
-                        phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
-                        phone_entry.configure(placeholder_text="أدخل رقم الهاتف")
-                        
-                        # إخفاء الإشارة البصرية
-                        status_label.configure(text="")
-                except Exception as e:
-                    print(f"خطأ في البحث عن العميل: {str(e)}")
-        
-        # ربط البحث عند ترك حقل اسم العميل (FocusOut) بدلاً من KeyRelease
-        customer_entry.bind('<FocusOut>', search_customer_by_name)
-        customer_entry.bind('<Return>', lambda e: phone_entry.focus())
-        phone_entry.bind('<Return>', lambda e: device_type_entry.focus())
-        
-        # قسم معلومات الجهاز
-        device_section = ctk.CTkFrame(form_container, fg_color="#fff3e0", corner_radius=8)
-        device_section.pack(fill=tk.X, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            device_section, 
-            text="معلومات الجهاز", 
-            font=("Arial", 14, "bold"),
-            text_color="#f57c00"
-        ).pack(anchor=tk.W, pady=(1, 1), padx=15)
-        
-        # حقل نوع الجهاز
-        device_type_frame = ctk.CTkFrame(device_section, fg_color="transparent")
-        device_type_frame.pack(fill=tk.X, pady=(0, 1), padx=15)
-        
-        ctk.CTkLabel(
-            device_type_frame, 
-            text="نوع الجهاز *", 
-            font=("Arial", 12, "bold"), 
-            text_color="#d32f2f"
-        ).pack(anchor=tk.W, pady=(0, 1))
-        
-        device_type_entry = ctk.CTkEntry(
-            device_type_frame, 
-            width=400, 
-            height=35,
-            placeholder_text="مثال: هاتف محمول، حاسوب محمول، تابلت",
-            font=("Arial", 12)
-        )
-        device_type_entry.pack(fill=tk.X, pady=(0, 1))
-        device_type_entry.bind('<Return>', lambda e: issue_text.focus())
-        device_type_entry.bind('<KeyPress-Return>', lambda e: issue_text.focus())
-        
-        # حقل وصف العطل
-        issue_section = ctk.CTkFrame(form_container, fg_color="#f3e5f5", corner_radius=8)
-        issue_section.pack(fill=tk.X, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            issue_section, 
-            text="وصف العطل", 
-            font=("Arial", 14, "bold"),
-            text_color="#7b1fa2"
-        ).pack(anchor=tk.W, pady=(5, 3), padx=15)
-        
-        issue_text = ctk.CTkTextbox(
-            issue_section, 
-            height=30,
-            font=("Arial", 12)
-        )
-        issue_text.pack(fill=tk.X, pady=(0, 1), padx=15)
-        def save_on_issue_enter(event):
-            """حفظ الطلب عند الضغط على Enter داخل خانة وصف العطل."""
-            try:
-                if event.state & 0x0001:  # Shift لتعديل السطر
-                    return
-            except Exception:
-                pass
-            save()
-            return "break"
-        
-        issue_text.bind('<Return>', save_on_issue_enter)
-        issue_text.bind('<KeyPress-Return>', save_on_issue_enter)
-        
-        # إضافة نص توضيحي
-        issue_text.insert("1.0", "وصف العطل أو المشكلة في الجهاز")
-        issue_text.configure(text_color="gray")
-        
-        # دالة لمسح النص التوضيحي
-        def clear_placeholder(event):
-            if issue_text.get("1.0", tk.END).strip() == "وصف العطل أو المشكلة في الجهاز":
-                issue_text.delete("1.0", tk.END)
-                issue_text.configure(text_color="black")
-        
-        issue_text.bind("<FocusIn>", clear_placeholder)
-        
-        # أزرار الحفظ والإلغاء - تصميم احترافي
-        button_section = ctk.CTkFrame(main_container, fg_color="transparent")
-        button_section.pack(fill=tk.X, pady=(0, 1))
-        
-        # إطار الأزرار
-        buttons_container = ctk.CTkFrame(button_section, fg_color="transparent")
-        buttons_container.pack(fill=tk.X, pady=2)
-        
-        def save():
-            # جمع البيانات من جميع الحقول
-            customer_name = customer_entry.get().strip()
-            phone = phone_entry.get().strip()
-            device_type = device_type_entry.get().strip()
-            barcode = barcode_entry.get().strip()
-            issue = issue_text.get("1.0", tk.END).strip()
-            
-            # التحقق من البيانات المطلوبة
-            required_fields = []
-            if not customer_name:
-                required_fields.append("اسم العميل")
-            if not phone:
-                required_fields.append("رقم الهاتف")
-            if not device_type:
-                required_fields.append("نوع الجهاز")
-                
-            if required_fields:
-                messagebox.showwarning("حقول مطلوبة", f"الرجاء إدخال الحقول التالية:\n{', '.join(required_fields)}")
-                return
-            
-            try:
-                # استخدام الباركود إذا كان موجوداً، وإلا استخدم الكود المرجعي
-                final_serial = barcode if barcode else generated_code.get()
-                
-                # إذا لم يكن هناك باركود، استخدم الكود المولد كباركود
-                if not barcode:
-                    barcode_entry.delete(0, tk.END)
-                    barcode_entry.insert(0, final_serial)
-                
-                # حفظ البيانات
-                if not hasattr(self, 'maintenance_service'):
-                    messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
-                    return
-                    
-                # استخراج نوع الكود من القائمة المنسدلة
-                selected_type = code_type_var.get()
-                code_letter = selected_type.split(" - ")[0] if " - " in selected_type else selected_type
-                
-                
-                success, message, job = self.maintenance_service.create_maintenance_job(
-                    customer_name=customer_name,
-                    phone=phone,
-                    device_type=device_type,
-                    device_model=None,
-                    serial_number=final_serial,
-                    issue_description=issue if issue and issue != "وصف العطل أو المشكلة في الجهاز" else "لم يتم تحديد وصف العطل",
-                    code_type=code_letter
-                )
-                
-                if success:
-                    # حفظ بيانات الجهاز في سجل الأكواد لميزات البحث المستقبلية
-                    if hasattr(self, 'code_service'):
-                        try:
-                            device_data = {
-                                'serial_number': final_serial,
-                                'barcode': final_serial,
-                                'device_type': device_type,
-                                'device_model': None,
-                                'customer_name': customer_name
-                            }
-                            self.code_service.save_device_code(device_data)
-                        except Exception as save_error:
-                            print(f"⚠️ تحذير: تعذر حفظ بيانات الجهاز في سجل الأكواد: {save_error}")
-                    
-                    # تحديث الكود المرجعي للطلب التالي
-                    if hasattr(self, 'code_service'):
-                        new_code = self.code_service.generate_unique_code()
-                        generated_code.set(new_code)
-                        code_display.configure(text=new_code)
-                        
-                        # مسح الحقول للطلب التالي
-                        customer_entry.delete(0, tk.END)
-                        phone_entry.delete(0, tk.END)
-                        device_type_entry.delete(0, tk.END)
-                        barcode_entry.delete(0, tk.END)
-                        issue_text.delete("1.0", tk.END)
-                        issue_text.insert("1.0", "وصف العطل أو المشكلة في الجهاز")
-                        issue_text.configure(text_color="gray")
-                        
-                        # إعادة تعيين لون حقل الهاتف
-                        phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
-                        phone_entry.configure(placeholder_text="أدخل رقم الهاتف")
-                        status_label.configure(text="")
-                    
-                    # حفظ بيانات العميل الأخير
-                    self.last_customer_name = customer_name
-                    self.last_customer_phone = phone
-                    
-                    messagebox.showinfo("نجاح", f"تم إضافة طلب الصيانة بنجاح\nرقم التتبع: {job['tracking_code']}\nالكود الجديد: {generated_code.get()}")
-                    self.load_data()  # تحديث الجدول
-                    
-                    # لا نغلق النافذة، نتركها مفتوحة للطلب التالي
-                else:
-                    messagebox.showerror("خطأ", f"فشل في حفظ البيانات: {message}")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
-        
-        # زر الحفظ مع تنسيق محسن
-        def trigger_save_from_button(event=None):
-            save()
-            return "break"
-        
-        save_btn = ctk.CTkButton(
-            buttons_container, 
-            text="💾 حفظ الطلب", 
-            command=save,
-            fg_color="#28a745",  # لون أخضر
-            hover_color="#218838",
-            width=180,
-            height=45,
-            font=("Arial", 13, "bold"),
-            corner_radius=10
-        )
-        save_btn.pack(side=tk.LEFT, padx=(0, 5))
-        
-        # زر حفظ في الهاتف
-        def save_to_phone():
-            """حفظ العميل الأخير في جهات اتصال الهاتف"""
-            if hasattr(self, 'last_customer_name') and hasattr(self, 'last_customer_phone'):
-                self.show_contact_save_options(self.last_customer_name, self.last_customer_phone)
-            else:
-                # إذا لم يتم حفظ طلب بعد، استخدم البيانات من الحقول
-                name = customer_entry.get().strip()
-                phone_val = phone_entry.get().strip()
-                if name and phone_val:
-                    self.show_contact_save_options(name, phone_val)
-                else:
-                    messagebox.showwarning("تنبيه", "الرجاء حفظ الطلب أولاً أو إدخال اسم ورقم الهاتف")
-        
-        phone_btn = ctk.CTkButton(
-            buttons_container, 
-            text="📱 حفظ في الهاتف", 
-            command=save_to_phone,
-            fg_color="#2196F3",  # لون أزرق
-            hover_color="#1976D2",
-            width=150,
-            height=45,
-            font=("Arial", 12, "bold"),
-            corner_radius=10
-        )
-        phone_btn.pack(side=tk.LEFT, padx=5)
-        
-        # زر إغلاق
-        close_btn = ctk.CTkButton(
-            buttons_container, 
-            text="❌ إغلاق", 
-            command=dialog.destroy,
-            fg_color="#dc3545",  # لون أحمر
-            hover_color="#c82333",
-            width=120,
-            height=45,
-            font=("Arial", 13, "bold"),
-            corner_radius=10
-        )
-        close_btn.pack(side=tk.LEFT, padx=(10, 0))
-        
-        # ربط Enter مباشر للحفظ السريع
-        def on_barcode_enter(event):
-            print("تم الضغط على Enter في حقل الباركود")
-            try:
-                customer_entry.focus_set()
-                customer_entry.update()
-            except Exception as e:
-                print(f"خطأ في التركيز على حقل اسم العميل: {e}")
-            return "break"
-        
-        def on_customer_enter_quick(event):
-            try:
-                phone_entry.focus_set()
-                phone_entry.update()
-            except Exception as e:
-                print(f"خطأ في التركيز على حقل رقم الهاتف: {e}")
-            return "break"
-        
-        def on_phone_enter_quick(event):
-            print("تم الضغط على Enter في حقل رقم الهاتف (الحفظ السريع)")
-            try:
-                device_type_entry.focus_set()
-                device_type_entry.update()
-                print("تم التركيز على حقل نوع الجهاز (الحفظ السريع)")
-            except Exception as e:
-                print(f"خطأ في التركيز على حقل نوع الجهاز: {e}")
-            return "break"
-        
-        def on_device_enter_quick(event):
-            print("تم الضغط على Enter في حقل نوع الجهاز (الحفظ السريع)")
-            try:
-                issue_text.focus_set()
-                issue_text.update()
-                print("تم التركيز على حقل وصف العطل (الحفظ السريع)")
-            except Exception as e:
-                print(f"خطأ في التركيز على حقل وصف العطل: {e}")
-            return "break"
-        
-        def on_issue_enter_quick(event):
-            print("تم الضغط على Enter في حقل وصف العطل (الحفظ السريع)")
-            try:
-                save()
-                print("تم حفظ الطلب (الحفظ السريع)")
-            except Exception as e:
-                print(f"خطأ في حفظ الطلب: {e}")
-            return "break"
-        
-        # ربط Enter مباشر
-        barcode_entry.bind('<Return>', on_barcode_enter)
-        customer_entry.bind('<Return>', on_customer_enter_quick)
-        phone_entry.bind('<Return>', on_phone_enter_quick)
-        device_type_entry.bind('<Return>', on_device_enter_quick)
-        issue_text.bind('<Return>', on_issue_enter_quick)
-        
-        print("✅ تم ربط Enter مباشر للحفظ السريع")
-    def add_maintenance(self):
-        """إضافة طلب صيانة جديد - محسن واحترافي"""
-        # إنشاء نافذة الإضافة
-        dialog = ctk.CTkToplevel(self)
-        dialog.title("إضافة طلب صيانة جديد - ADR ELECTRONICS")
-        dialog.geometry("550x750")  # نافذة محسنة
-        dialog.grab_set()  # جعل النافذة مركزة
-        dialog.resizable(False, False)  # منع تغيير الحجم
-        
-        
-        # مركز النافذة على الشاشة
-        dialog.update_idletasks()
-        x = (dialog.winfo_screenwidth() // 2) - (550 // 2)
-        y = (dialog.winfo_screenheight() // 2) - (750 // 2)
-        dialog.geometry(f"550x750+{x}+{y}")
-        
-        # إضافة أيقونة النافذة
-        try:
-            dialog.iconbitmap("icon.ico")
-        except:
-            pass
-        
-        # إجبار التركيز على النافذة
-        dialog.focus_force()
-        
-        # متغير نوع الكود
-        code_type_var = tk.StringVar(value="A")
-        
-        # توليد كود جديد فوراً عند فتح النافذة من قاعدة البيانات
-        if hasattr(self, 'maintenance_service'):
-            current_code = self.maintenance_service.generate_tracking_code(code_type_var.get())
-        else:
-            current_code = "A1"
-        
-        # محتوى النافذة الرئيسي
-        main_container = ctk.CTkFrame(dialog, fg_color="transparent")
-        main_container.pack(fill=tk.BOTH, expand=True, padx=25, pady=25)
-        
-        # عنوان النافذة المحسن
-        title_frame = ctk.CTkFrame(main_container, fg_color="#1976d2", corner_radius=15)
-        title_frame.pack(fill=tk.X, pady=(0, 25))
-        
-        # عنوان رئيسي مع أيقونة
-        title_content = ctk.CTkFrame(title_frame, fg_color="transparent")
-        title_content.pack(fill=tk.X, padx=25, pady=10)
-        
-        ctk.CTkLabel(
-            title_content, 
-            text="🔧 إضافة طلب صيانة جديد", 
-            font=("Arial", 22, "bold"), 
-            text_color="white"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            title_content, 
-            text="ADR ELECTRONICS", 
-            font=("Arial", 12, "bold"), 
-            text_color="#E3F2FD"
-        ).pack(side=tk.RIGHT)
-        
-        # قسم الكود الجديد المحسن
-        code_section = ctk.CTkFrame(main_container, fg_color="#e8f5e8", corner_radius=12, border_width=3, border_color="#4caf50")
-        code_section.pack(fill=tk.X, pady=(0, 25))
-        
-        # عنوان القسم
-        code_title_frame = ctk.CTkFrame(code_section, fg_color="transparent")
-        code_title_frame.pack(fill=tk.X, padx=20, pady=(1, 1))
-        
-        ctk.CTkLabel(
-            code_title_frame, 
-            text="🏷️ الكود المرجعي للجهاز الجديد", 
-            font=("Arial", 16, "bold"), 
-            text_color="#2e7d32"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            code_title_frame, 
-            text="يجب تسجيل هذا الكود على الجهاز", 
-            font=("Arial", 12), 
-            text_color="#4caf50"
-        ).pack(side=tk.RIGHT)
-        
-        # قائمة اختيار نوع الكود
-        code_type_frame = ctk.CTkFrame(code_section, fg_color="transparent")
-        code_type_frame.pack(fill=tk.X, padx=20, pady=(0, 1))
-        
-        ctk.CTkLabel(
-            code_type_frame,
-            text="نوع الكود:",
-            font=("Arial", 12, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT, padx=(0, 10))
-        
-        # دالة تحديث الكود عند تغيير النوع
-        def update_code_on_type_change(*args):
-            """تحديث الكود عند تغيير نوع الكود"""
-            try:
-                selected_type = code_type_var.get()
-                # استخراج الحرف من النص (مثل "A - انفرترات" -> "A")
-                code_letter = selected_type.split(" - ")[0] if " - " in selected_type else selected_type
-                
-                # توليد كود جديد من نفس النوع
-                if hasattr(self, 'maintenance_service'):
-                    new_code = self.maintenance_service.generate_tracking_code(code_letter)
-                else:
-                    new_code = f"{code_letter}1"
-                
-                # تحديث عرض الكود
-                code_display.configure(text=new_code)
-                
-            except Exception as e:
-                print(f"خطأ في تحديث الكود: {e}")
-        
-        code_type_combo = ctk.CTkComboBox(
-            code_type_frame,
-            values=["A - انفرترات", "B - عده صناعيه", "C - مشكل", "D - شاشات"],
-            variable=code_type_var,
-            width=200,
-            height=35,
-            font=("Arial", 12),
-            command=update_code_on_type_change
-        )
-        code_type_combo.pack(side=tk.LEFT)
-        
-        # ربط حدث التغيير أيضاً
-        code_type_var.trace("w", update_code_on_type_change)
-        
-        # عرض الكود
-        code_display_frame = ctk.CTkFrame(code_section, fg_color="transparent")
-        code_display_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
-        
-        code_display = ctk.CTkLabel(
-            code_display_frame,
-            text=current_code,
-            font=("Arial", 28, "bold"),
-            text_color="#1b5e20",
-            fg_color="#c8e6c9",
-            corner_radius=12,
-            width=300,
-            height=60
-        )
-        code_display.pack()
-        
-        # إطار النموذج الرئيسي مع إمكانية التمرير
-        form_container = ctk.CTkScrollableFrame(main_container, fg_color="#fafafa", corner_radius=10)
-        form_container.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
-        
-        # حقل الرقم التسلسلي المحسن
-        serial_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        serial_section.pack(fill=tk.X, pady=(20, 15), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        serial_title = ctk.CTkFrame(serial_section, fg_color="transparent")
-        serial_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            serial_title, 
-            text="📱 الرقم التسلسلي", 
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            serial_title, 
-            text="(اختياري)", 
-            font=("Arial", 10),
-            text_color="#666666"
-        ).pack(side=tk.RIGHT)
-        
-        serial_entry = ctk.CTkEntry(
-            serial_section, 
-            width=400, 
-            height=40,
-            placeholder_text="ادخل الرقم التسلسلي للجهاز",
-            font=("Arial", 13),
-            corner_radius=8,
-            border_width=2
-        )
-        serial_entry.pack(fill=tk.X, padx=15, pady=(0, 1))
-        
-        
-        # تم إزالة التأثيرات البصرية المعقدة لتحسين الأداء
-        
-        # حقل اسم العميل المحسن
-        customer_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        customer_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        customer_title = ctk.CTkFrame(customer_section, fg_color="transparent")
-        customer_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            customer_title,
-            text="👤 اسم العميل",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            customer_title,
-            text="(مطلوب)",
-            font=("Arial", 10),
-            text_color="#d32f2f"
-        ).pack(side=tk.RIGHT)
-        
-        customer_entry = ctk.CTkEntry(
-            customer_section, 
-            width=400, 
-            height=40,
-            placeholder_text="ادخل اسم العميل الكامل",
-            font=("Arial", 13),
-            corner_radius=8,
-            border_width=2
-        )
-        customer_entry.pack(fill=tk.X, padx=15, pady=(0, 1))
-        
-        # دالة البحث عن العميل
-        def search_customer_by_name(event=None):
-            customer_name = customer_entry.get().strip()
-            if customer_name and hasattr(self, 'maintenance_service'):
-                try:
-                    # البحث عن العميل في قاعدة البيانات
-                    db = next(get_db())
-                    from database.models import Customer
-                    customer = db.query(Customer).filter(Customer.name.ilike(f"%{customer_name}%")).first()
-                    db.close()
-                    
-                    if customer:
-                        # ملء رقم الهاتف تلقائياً
-                        phone_entry.delete(0, tk.END)
-                        phone_entry.insert("0", customer.phone)
-                        
-                        # تغيير لون حقل الهاتف للإشارة إلى أنه تم ملؤه تلقائياً
-                        phone_entry.configure(fg_color="#e8f5e8", border_color="#4caf50")
-                        
-                        # الانتقال إلى حقل نوع الجهاز
-                        device_type_entry.focus()
-                    else:
-                        # إعادة تعيين لون حقل الهاتف
-                        phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
-                        phone_entry.configure(placeholder_text="أدخل رقم الهاتف")
-                except Exception as e:
-                    print(f"خطأ في البحث عن العميل: {e}")
-                    phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))
-        
-        # تم إزالة دالة التمرير التلقائي المعقدة لتحسين الأداء
-        # ربط البحث بالانتقال من حقل اسم العميل
-        customer_entry.bind('<FocusOut>', search_customer_by_name)
-        
-        # حقل رقم الهاتف المحسن
-        phone_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        phone_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        phone_title = ctk.CTkFrame(phone_section, fg_color="transparent")
-        phone_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            phone_title,
-            text="📞 رقم الهاتف",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            phone_title,
-            text="(مطلوب)",
-            font=("Arial", 10),
-            text_color="#d32f2f"
-        ).pack(side=tk.RIGHT)
-        
-        phone_entry = ctk.CTkEntry(
-            phone_section, 
-            width=400, 
-            height=40,
-            placeholder_text="أدخل رقم الهاتف",
-            font=("Arial", 13),
-            corner_radius=8,
-            border_width=2
-        )
-        phone_entry.pack(fill=tk.X, padx=15, pady=(0, 1))
-        
-        # تم تبسيط التنقل لتحسين الأداء
-        
-        # حقل نوع الجهاز المحسن
-        device_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        device_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        device_title = ctk.CTkFrame(device_section, fg_color="transparent")
-        device_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            device_title,
-            text="💻 نوع الجهاز",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            device_title,
-            text="(مطلوب)",
-            font=("Arial", 10),
-            text_color="#d32f2f"
-        ).pack(side=tk.RIGHT)
-        
-        device_type_entry = ctk.CTkEntry(
-            device_section, 
-            width=400, 
-            height=40,
-            placeholder_text="مثال: هاتف، لابتوب، تابلت",
-            font=("Arial", 13),
-            corner_radius=8,
-            border_width=2
-        )
-        device_type_entry.pack(fill=tk.X, padx=15, pady=(0, 1))
-        
-        # تم تبسيط التنقل لتحسين الأداء
-        
-        # حقل تفاصيل الجهاز المحسن
-        device_details_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        device_details_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        device_details_title = ctk.CTkFrame(device_details_section, fg_color="transparent")
-        device_details_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            device_details_title,
-            text="📋 تفاصيل الجهاز",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            device_details_title,
-            text="(اختياري)",
-            font=("Arial", 10),
-            text_color="#666666"
-        ).pack(side=tk.RIGHT)
-        
-        device_details_entry = ctk.CTkTextbox(
-            device_details_section, 
-            width=400, 
-            height=80,
-            font=("Arial", 12),
-            corner_radius=8,
-            border_width=2
-        )
-        device_details_entry.pack(fill=tk.X, padx=15, pady=(0, 15))
-        
-        # تم تبسيط التنقل لتحسين الأداء
-        # حقل نوع العطل المحسن
-        issue_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        issue_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        issue_title = ctk.CTkFrame(issue_section, fg_color="transparent")
-        issue_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            issue_title,
-            text="🔧 وصف العطل",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            issue_title,
-            text="(اختياري)",
-            font=("Arial", 10),
-            text_color="#666666"
-        ).pack(side=tk.RIGHT)
-        
-        issue_entry = ctk.CTkEntry(
-            issue_section, 
-            width=400, 
-            height=25,
-            placeholder_text="وصف العطل أو المشكلة في الجهاز",
-            font=("Arial", 12),
-            corner_radius=6,
-            border_width=1
-        )
-        issue_entry.pack(fill=tk.X, padx=15, pady=(0, 1))
-        
-        # تم تبسيط التنقل لتحسين الأداء
-        # حقل السعر التقديري المحسن
-        price_section = ctk.CTkFrame(form_container, fg_color="#ffffff", corner_radius=10, border_width=1, border_color="#e0e0e0")
-        price_section.pack(fill=tk.X, pady=(0, 1), padx=20)
-        
-        # عنوان الحقل مع أيقونة
-        price_title = ctk.CTkFrame(price_section, fg_color="transparent")
-        price_title.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        ctk.CTkLabel(
-            price_title,
-            text="💰 السعر التقديري",
-            font=("Arial", 14, "bold"),
-            text_color="#424242"
-        ).pack(side=tk.LEFT)
-        
-        ctk.CTkLabel(
-            price_title,
-            text="(اختياري)",
-            font=("Arial", 10),
-            text_color="#666666"
-        ).pack(side=tk.RIGHT)
-        
-        # إطار العملة والسعر
-        price_content_frame = ctk.CTkFrame(price_section, fg_color="transparent")
-        price_content_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
-        
-        # اختيار العملة
-        estimated_currency_var = tk.StringVar(value="USD")
-        currency_selection_frame = ctk.CTkFrame(price_content_frame, fg_color="transparent")
-        currency_selection_frame.pack(side=tk.LEFT, padx=(0, 15))
-        
-        ctk.CTkLabel(currency_selection_frame, text="العملة:", font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
-        
-        usd_radio = ctk.CTkRadioButton(currency_selection_frame, text="💵 دولار ($)", variable=estimated_currency_var, value="USD", font=("Arial", 10))
-        usd_radio.pack(anchor=tk.W)
-        
-        lbp_radio = ctk.CTkRadioButton(currency_selection_frame, text="💱 ليرة لبنانية (ل.ل)", variable=estimated_currency_var, value="LBP", font=("Arial", 10))
-        lbp_radio.pack(anchor=tk.W)
-        
-        # حقل السعر
-        price_input_frame = ctk.CTkFrame(price_content_frame, fg_color="transparent")
-        price_input_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        
-        ctk.CTkLabel(price_input_frame, text="المبلغ:", font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
-        estimated_cost_entry = ctk.CTkEntry(
-            price_input_frame, 
-            width=200, 
-            height=35,
-            placeholder_text="أدخل السعر التقديري",
-            font=("Arial", 12),
-            corner_radius=8,
-            border_width=2
-        )
-        estimated_cost_entry.pack(fill=tk.X, pady=(0, 5))
+                        text=status_text, 
+                        font=("Arial", 10),
+                        text_color="#666666"
+                    ).pack(anchor=tk.W, pady=(0, 1), padx=20)
         
-        # عرض التحويل
-        conversion_display = ctk.CTkLabel(price_input_frame, text="", font=("Arial", 10), text_color="#666666")
-        conversion_display.pack(anchor=tk.W)
+        # أزرار
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.pack(fill=tk.X, padx=20, pady=(0, 20))
         
-        def update_price_conversion():
-            """تحديث عرض التحويل للسعر التقديري"""
-            try:
-                amount = float(estimated_cost_entry.get()) if estimated_cost_entry.get() else 0
-                currency = estimated_currency_var.get()
+        def use_this_device():
+            # استخدام بيانات آخر طلب
+            if device_history['jobs']:
+                last_job = device_history['jobs'][0]  # أحدث طلب
                 
-                if amount > 0:
-                    if currency == "USD":
-                        lbp_amount = amount * 90000  # سعر الصرف
-                        conversion_display.configure(text=f"المبلغ بالليرة: {lbp_amount:,.0f} ل.ل")
-                    else:
-                        usd_amount = amount / 90000  # سعر الصرف
-                        conversion_display.configure(text=f"المبلغ بالدولار: ${usd_amount:.2f}")
-                else:
-                    conversion_display.configure(text="")
-            except ValueError:
-                conversion_display.configure(text="")
-        
-        # ربط التحديثات
-        estimated_cost_entry.bind('<KeyRelease>', lambda e: update_price_conversion())
-        estimated_currency_var.trace('w', lambda *args: update_price_conversion())
-        
-        # تم تبسيط التنقل لتحسين الأداء
-        
-        # أزرار التحكم
-        buttons_container = ctk.CTkFrame(main_container, fg_color="transparent")
-        buttons_container.pack(fill=tk.X, pady=(20, 0))
-        
-        def save():
-            serial = serial_entry.get().strip()
-            customer_name = customer_entry.get().strip()
-            phone = phone_entry.get().strip()
-            device_type = device_type_entry.get().strip()
-            device_details = device_details_entry.get("1.0", tk.END).strip()
-            issue = issue_entry.get().strip()
-            estimated_cost = estimated_cost_entry.get().strip()
-            estimated_cost_currency = estimated_currency_var.get()
-            
-            # استخدام الكود المعروض إذا لم يتم إدخال رقم تسلسلي
-            if not serial:
-                serial = code_display.cget("text")
-                # تحديث حقل الرقم التسلسلي بالكود المولد
-                serial_entry.delete(0, tk.END)
-                serial_entry.insert(0, serial)
-            
-            # السماح بالحفظ حتى لو لم تكتمل جميع المعلومات
-            # استخدام قيم افتراضية للحقول الفارغة
-            empty_fields = []
-            if not customer_name:
-                customer_name = "عميل غير محدد"
-                empty_fields.append("اسم العميل")
-            if not phone:
-                phone = "غير محدد"
-                empty_fields.append("رقم الهاتف")
-            if not device_type:
-                device_type = "غير محدد"
-                empty_fields.append("نوع الجهاز")
-            if not issue:
-                issue = "لم يتم تحديد نوع العطل"
-                empty_fields.append("نوع العطل")
-            
-            # معالجة السعر التقديري
-            estimated_cost_value = 0.0
-            if estimated_cost:
-                try:
-                    estimated_cost_value = float(estimated_cost)
-                    # تحويل السعر إلى الدولار إذا كان بالليرة اللبنانية
-                    if estimated_cost_currency == "LBP":
-                        estimated_cost_value = estimated_cost_value / 90000  # تحويل إلى دولار
-                except ValueError:
-                    estimated_cost_value = 0.0
-            
-            # حفظ مباشر بدون رسائل تحذير
-            
-            try:
-                if not hasattr(self, 'maintenance_service'):
-                    messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
-                    return
-                    
-                # استخراج نوع الكود من القائمة المنسدلة
-                selected_type = code_type_var.get()
-                code_letter = selected_type.split(" - ")[0] if " - " in selected_type else selected_type
+                # تعبئة الحقول
+                customer_entry.delete(0, tk.END)
+                customer_entry.insert("0", last_job['customer_name'])
                 
+                device_type_entry.delete(0, tk.END)
+                device_type_entry.insert("0", last_job['device_type'])
                 
-                success, message, job = self.maintenance_service.create_maintenance_job(                                                                        
-                    customer_name=customer_name,
-                    phone=phone,
-                    device_type=device_type,
-                    device_model=None,
-                    serial_number=serial,
-                    issue_description=issue,
-                    estimated_cost=estimated_cost_value,
-                    estimated_cost_currency=estimated_cost_currency,
-                    notes=device_details if device_details else None,
-                    code_type=code_letter
-                )
+                serial_entry.delete(0, tk.END)
+                serial_entry.insert("0", device_history['serial_number'])
                 
-                if success:
-                    # تحديث الجدول سريعاً بدون إعادة تحميل ثقيلة
-                    self.invalidate_data_cache()
-                    self._insert_new_job_fast(
-                        job_data=job,
-                        customer_name=customer_name,
-                        phone=phone,
-                        device_type=device_type,
-                        serial=serial,
-                        estimated_cost_value=estimated_cost_value
-                    )
-                    self.update_stats(force_refresh=True)
-                    
-                    # حفظ بيانات العميل الأخير لاستخدامها في حفظ جهة الاتصال
-                    self.last_customer_name = customer_name
-                    self.last_customer_phone = phone
-                    
-                    # تحديث الكود للطلب التالي بنفس النوع
-                    if hasattr(self, 'maintenance_service'):
-                        selected_type = code_type_var.get()
-                        code_letter = selected_type.split(" - ")[0] if " - " in selected_type else selected_type
-                        new_code = self.maintenance_service.generate_tracking_code(code_letter)
-                        code_display.configure(text=new_code)
-                    
-                    messagebox.showinfo("نجاح", f"تم إضافة طلب الصيانة بنجاح\nرقم التتبع: {job['tracking_code']}\nالكود الجديد: {new_code if hasattr(self, 'maintenance_service') else current_code}")
-                    # مسح الحقول للطلب التالي
-                    serial_entry.delete(0, tk.END)
-                    customer_entry.delete(0, tk.END)
-                    phone_entry.delete(0, tk.END)
-                    phone_entry.configure(fg_color=("gray95", "gray10"), border_color=("gray60", "gray30"))                                                     
-                    device_type_entry.delete(0, tk.END)
-                    device_details_entry.delete("1.0", tk.END)
-                    issue_entry.delete(0, tk.END)
-                    estimated_cost_entry.delete(0, tk.END)
-                    estimated_currency_var.set("USD")  # إعادة تعيين العملة للدولار                                                                             
-                    conversion_display.configure(text="")  # مسح عرض التحويل
-                    
-                    # التركيز على حقل الرقم التسلسلي
-                    serial_entry.focus()
-                else:
-                    messagebox.showerror("خطأ", f"فشل في حفظ البيانات: {message}")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
-        
-        # دالة لحفظ البيانات عند الضغط على Enter
-        def trigger_save_from_button(event=None):
-            """تنفيذ الحفظ عند الضغط على Enter"""
-            save()
-            return "break"
-        
-        # --- تنقل Enter بين الحقول ---
-        def focus_widget(widget):
-            try:
-                widget.focus_set()
-                if isinstance(widget, ctk.CTkTextbox):
-                    widget.focus()
-            except Exception:
-                pass
-        
-        def bind_enter(widget, next_widget=None, *, allow_shift_newline=False, on_enter_callback=None):
-            """ربط مفتاح Enter للانتقال بين الحقول بالتسلسل."""
-            def handler(event):
-                if allow_shift_newline and isinstance(widget, ctk.CTkTextbox) and (event.state & 0x0001):
-                    # السماح بإضافة سطر جديد داخل مربعات النص مع Shift+Enter
-                    return
-                if on_enter_callback:
-                    # إذا كان هناك callback مخصص (مثل الحفظ)، قم بتشغيله
-                    return on_enter_callback(event)
-                if next_widget:
-                    focus_widget(next_widget)
-                return "break"
-            widget.bind('<Return>', handler)
-            widget.bind('<KP_Enter>', handler)
-        
-        # ربط Enter للتنقل بين الحقول
-        # ربط Enter على قائمة نوع الكود للانتقال إلى حقل الرقم التسلسلي
-        def on_code_type_enter(event):
-            serial_entry.focus_set()
-            return "break"
-        code_type_combo.bind('<Return>', on_code_type_enter)
-        code_type_combo.bind('<KP_Enter>', on_code_type_enter)
-        
-        bind_enter(serial_entry, customer_entry)
-        bind_enter(customer_entry, phone_entry)
-        bind_enter(phone_entry, device_type_entry)
-        bind_enter(device_type_entry, device_details_entry)
-        bind_enter(device_details_entry, issue_entry, allow_shift_newline=True)
-        bind_enter(issue_entry, estimated_cost_entry)
-        # عند الضغط على Enter في آخر حقل (السعر)، يتم الحفظ مباشرة
-        bind_enter(estimated_cost_entry, on_enter_callback=trigger_save_from_button)
-        
-        # زر الحفظ المحسن
-        save_btn = ctk.CTkButton(
-            buttons_container, 
-            text="💾 حفظ الطلب", 
-            command=save,
-            fg_color="#28a745",
-            hover_color="#218838",
-            width=180,
-            height=50,
-            font=("Arial", 15, "bold"),
-            corner_radius=12,
-            border_width=2,
-            border_color="#1e7e34"
-        )
-        save_btn.pack(side=tk.LEFT, padx=(0, 10))
-        # ربط Enter على زر الحفظ لحفظ البيانات
-        save_btn.bind('<Return>', trigger_save_from_button)
-        save_btn.bind('<KP_Enter>', trigger_save_from_button)
-        
-        # بدء الإدخال من حقل الرقم التسلسلي
-        try:
-            serial_entry.focus_set()
-            serial_entry.icursor(tk.END)
-        except Exception:
-            pass
-        
-        # زر حفظ في الهاتف
-        def save_to_phone_2():
-            """حفظ العميل في جهات اتصال الهاتف"""
-            if hasattr(self, 'last_customer_name') and hasattr(self, 'last_customer_phone'):
-                self.show_contact_save_options(self.last_customer_name, self.last_customer_phone)
-            else:
-                # إذا لم يتم حفظ طلب بعد، استخدم البيانات من الحقول
-                name = customer_entry.get().strip()
-                phone_val = phone_entry.get().strip()
-                if name and phone_val:
-                    self.show_contact_save_options(name, phone_val)
-                else:
-                    messagebox.showwarning("تنبيه", "الرجاء إدخال اسم ورقم الهاتف أو حفظ الطلب أولاً")
+                barcode_entry.delete(0, tk.END)
+                barcode_entry.insert("0", device_history['serial_number'])
+            
+            dialog.destroy()
         
-        phone_btn = ctk.CTkButton(
-            buttons_container, 
-            text="📱 حفظ في الهاتف", 
-            command=save_to_phone_2,
-            fg_color="#2196F3",
-            hover_color="#1976D2",
-            width=180,
-            height=50,
-            font=("Arial", 14, "bold"),
-            corner_radius=12,
-            border_width=2,
-            border_color="#0d47a1"
-        )
-        phone_btn.pack(side=tk.LEFT, padx=10)
+        ctk.CTkButton(
+            button_frame, 
+            text="استخدام هذا الجهاز", 
+            command=use_this_device,
+            fg_color="#4CAF50",
+            hover_color="#45a049",
+            width=200,
+            height=40,
+            font=("Arial", 12, "bold")
+        ).pack(side=tk.LEFT, padx=(0, 10))
         
-        # زر إغلاق محسن
-        close_btn = ctk.CTkButton(
-            buttons_container, 
-            text="❌ إغلاق", 
+        ctk.CTkButton(
+            button_frame, 
+            text="إغلاق", 
             command=dialog.destroy,
-            fg_color="#dc3545",
-            hover_color="#c82333",
-            width=140,
-            height=50,
-            font=("Arial", 15, "bold"),
-            corner_radius=12,
-            border_width=2,
-            border_color="#bd2130"
+            fg_color="#f44336",
+            hover_color="#da190b",
+            width=150,
+            height=40,
+            font=("Arial", 12, "bold")
+        ).pack(side=tk.LEFT, padx=(10, 0))
+    def add_maintenance(self):
+        """إضافة طلب صيانة جديد (النموذج مبني مسبقاً ويُعاد استخدامه)"""
+        self._get_intake_dialog().open()
+    
+    def _get_intake_dialog(self):
+        """نموذج الإضافة - يُبنى مرة واحدة ويُخفى بين الاستخدامات"""
+        if self._intake_dialog is None or not self._intake_dialog.winfo_exists():
+            import time
+            started = time.perf_counter()
+            self._intake_dialog = IntakeDialog(
+                self,
+                self.run_db_task,
+                on_created=self._on_intake_job_created,
+                on_save_contact=self.show_contact_save_options
+            )
+            print(f"⚡ تم تجهيز نموذج الإضافة ({(time.perf_counter() - started) * 1000:.0f}ms)")
+        return self._intake_dialog
+    
+    def _on_intake_job_created(self, job, values):
+        """تحديث القائمة سريعاً بعد حفظ طلب من نموذج الإضافة"""
+        self.invalidate_data_cache()
+        self._insert_new_job_fast(
+            job_data=job,
+            customer_name=values["customer_name"],
+            phone=values["phone"],
+            device_type=values["device_type"],
+            serial=values["serial"],
+            estimated_cost_value=values["estimated_cost"]
         )
-        close_btn.pack(side=tk.LEFT, padx=(15, 0))
+        self.update_stats(force_refresh=True)
         
-        # تم إزالة setup_enter_navigation لتحسين الأداء - نستخدم ربط Enter المخصص بدلاً منه
-        
-        # التركيز على أول حقل
-        try:
-            serial_entry.focus_set()
-        except:
-            pass
+        # حفظ بيانات العميل الأخير لاستخدامها في حفظ جهة الاتصال
+        self.last_customer_name = values["customer_name"]
+        self.last_customer_phone = values["phone"]
     
     def edit_maintenance(self):
         """تعديل طلب صيانة محدد"""
@@ -5872,15 +5122,13 @@ class MaintenanceFrame(ctk.CTkFrame):
             self.load_data()
             return
         
-        try:
-            # البحث عن الطلبات المطابقة
-            if not hasattr(self, 'maintenance_service'):
-                messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
-                return
-            success, message, jobs = self.maintenance_service.search_jobs(
-                query=search_term
-            )
-            
+        # البحث عن الطلبات المطابقة
+        if not hasattr(self, 'maintenance_service'):
+            messagebox.showerror("خطأ", "خدمة الصيانة غير متاحة")
+            return
+        
+        def on_results(result):
+            success, message, jobs = result
             if success:
                 if len(jobs) == 0:
                     messagebox.showinfo("لا توجد نتائج", f"لم يتم العثور على نتائج للبحث: {search_term}")
@@ -5891,9 +5139,22 @@ class MaintenanceFrame(ctk.CTkFrame):
                 
             else:
                 messagebox.showerror("خطأ", f"فشل في البحث: {message}")
-                
-        except Exception as e:
-            messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
+        
+        def on_error(error):
+            messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(error)}")
+        
+        # فهرس الذاكرة يجيب فوراً (الاستعلامات القصيرة تبقى في القاعدة لأن الفهرس يطابق بدايات الكلمات فقط)
+        if self._index_ready() and len(search_term) >= MIN_FTS_QUERY_LENGTH:
+            on_results((True, "", self._job_index.search(search_term)))
+            return
+        
+        # بحث جديد يلغي البحث السابق الذي لم ينتهِ بعد
+        self.run_db_task(
+            lambda service: service.search_jobs(query=search_term),
+            on_success=on_results,
+            on_error=on_error,
+            key="search"
+        )
     
     def show_search_results_window(self, jobs, search_term):
         """عرض نتائج البحث في نافذة منفصلة"""
@@ -6137,15 +5398,11 @@ class MaintenanceFrame(ctk.CTkFrame):
         if not hasattr(self, 'tree'):
             return
         
-        # البحث عن الطلب في الجدول
-        found = False
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if len(values) > 1 and str(values[1]) == str(job_id):
-                # حفظ المحدد مؤقتاً
-                self.tree.selection_set(item)
-                found = True
-                break
+        # البحث عن الطلب في الجدول (التمرير إليه إذا لم يكن ظاهراً)
+        item = self.job_table.scroll_to(int(job_id)) if str(job_id).isdigit() else None
+        found = item is not None
+        if found:
+            self.tree.selection_set(item)
         
         if not found:
             # إذا لم يُعثر عليه في الجدول، دعنا نجد الطلب في قاعدة البيانات ونفتح نافذة التعديل مباشرة
@@ -6166,13 +5423,22 @@ class MaintenanceFrame(ctk.CTkFrame):
         """مسح حقل البحث وإعادة تحميل جميع البيانات"""
         if hasattr(self, 'search_var'):
             self.search_var.set("")
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        had_query, self._search_query = bool(self._search_query), ""
+        if had_query and not self._index_ready():
+            self.invalidate_data_cache()
         # إلغاء الفلترة
         self.current_filter_status = None
         self._filter_mode_active = False  # تتبع حالة وضع الفلترة
         # إلغاء وضع الفلترة
         self._filter_mode_active = False
-        # إعادة تحميل البيانات
-        self.load_data()
+        # إعادة تحميل البيانات (من فهرس الذاكرة إن أمكن)
+        if self._index_ready():
+            self._show_index_rows(None)
+        else:
+            self.load_data()
         # إعادة تشغيل التحديث التلقائي إذا كان مفعّل
         if self.auto_refresh_enabled and self.auto_refresh_job is None:
             self.start_auto_refresh()
@@ -6184,8 +5450,12 @@ class MaintenanceFrame(ctk.CTkFrame):
         # استعادة التحديث التلقائي إذا كان مفعّلاً
         if self.auto_refresh_enabled and self.auto_refresh_job is None:
             self.start_auto_refresh()
-        # إعادة تحميل البيانات
-        self.load_data()
+        # إعادة تحميل البيانات (من فهرس الذاكرة إن أمكن)
+        if self._index_ready():
+            self._show_index_rows(None)
+            self.update_stats(force_refresh=False)
+        else:
+            self.load_data()
     
     def filter_by_status_from_stats(self, status):
         """فلترة الطلبات حسب الحالة عند النقر على بطاقة الإحصائيات"""
@@ -6218,100 +5488,50 @@ class MaintenanceFrame(ctk.CTkFrame):
         if not hasattr(self, 'tree'):
             return
         
-        # مسح العرض الحالي
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # جلب البيانات من الخدمة
         if not hasattr(self, 'maintenance_service'):
             return
         
-        try:
-            # جلب البيانات مع الفلترة مباشرة من قاعدة البيانات
-            # إزالة الـ limit للحصول على جميع النتائج عند الفلترة
-            if status:
-                # عند الفلترة حسب الحالة، نريد جلب جميع النتائج
-                success, message, jobs = self.maintenance_service.search_jobs(
-                    status=status,
-                    limit=10000  # عدد كبير جداً لجلب جميع النتائج
-                )
-            else:
-                # عند عدم وجود فلترة، جلب جميع النتائج
-                success, message, jobs = self.maintenance_service.search_jobs(limit=10000)
-            
-            if not success:
-                messagebox.showerror("خطأ", f"فشل في جلب البيانات: {message}")
-                return
-                
-            if not jobs or len(jobs) == 0:
-                message_status = self.translate_status_to_arabic(status) if status else "المحددة"
-                messagebox.showinfo("لا توجد نتائج", f"لا توجد طلبات بالحالة: {message_status}")
-                if hasattr(self, 'status_count'):
-                    self.status_count.configure(text=f"{self.format_number_english(0)} عنصر")
+        # كل الطلبات في فهرس الذاكرة - لا حاجة لاستعلام
+        if self._index_ready():
+            self._report_status_filter(status, self._show_index_rows(status))
+            return
+        
+        # جلب الصفحة الأولى مع الفلترة مباشرة من قاعدة البيانات
+        # باقي الصفحات تُجلب عند التمرير (_load_next_page)
+        import time
+        self.task_runner.cancel("next_page")
+        self._is_loading_page = False
+        sync_started = datetime.utcnow()
+        
+        def on_loaded(result):
+            if not self._on_jobs_loaded(result, status, time.time(), sync_started, silent=True):
+                if not result[0]:
+                    messagebox.showerror("خطأ", f"فشل في جلب البيانات: {result[1]}")
                 return
-            
-            filtered_jobs = jobs
-            
-            # إضافة البيانات المفلترة إلى الجدول
-            for job in filtered_jobs:
-                if hasattr(self, 'tree'):
-                    # ترجمة الحالة إلى العربية
-                    arabic_status = self.translate_status_to_arabic(job['status'])
-                    
-                    # تحديد حالة الدفع
-                    payment_status = job.get('payment_status', 'unpaid')
-                    payment_method = job.get('payment_method', '')
-                    
-                    if payment_status == 'paid':
-                        if payment_method == 'cash':
-                            payment_display = "💵 كاش"
-                        elif payment_method == 'wish_money':
-                            payment_display = "💳 Wish"
-                        else:
-                            payment_display = "✅ مدفوع"
-                    else:
-                        payment_display = "📝 دين"
-                    
-                    # تحديد السعر
-                    price_display = f"{job.get('final_cost', 0):.2f} $" if job.get('final_cost') else "غير محدد"
-                    
-                    # معالجة الرقم التسلسلي
-                    serial_number = job.get('serial_number', 'غير محدد')
-                    if serial_number is None:
-                        serial_number = 'غير محدد'
-                    
-                    # معالجة تاريخ التسليم
-                    delivered_date = ''
-                    if job.get('delivered_at'):
-                        delivered_date = job['delivered_at'].strftime('%Y-%m-%d') if hasattr(job['delivered_at'], 'strftime') else str(job['delivered_at'])[:10]
-                    
-                    self.tree.insert("", tk.END, values=(
-                        "☐",  # مربع التحديد (غير محدد)
-                        job['id'],
-                        job['tracking_code'],
-                        job['customer_name'],
-                        job['customer_phone'],
-                        job['device_type'],
-                        serial_number,
-                        arabic_status,
-                        price_display,
-                        payment_display,
-                        job['received_at'].strftime('%Y-%m-%d') if job['received_at'] else '',
-                        delivered_date
-                    ))
-            
-            # تحديث العداد
+            self._report_status_filter(status, result[2])
+        
+        def on_error(error):
+            messagebox.showerror("خطأ", f"حدث خطأ أثناء الفلترة: {str(error)}")
+        
+        self.run_db_task(
+            lambda service: service.search_jobs_page(status=status or None, limit=self._page_size),
+            on_success=on_loaded,
+            on_error=on_error,
+            key="job_list"
+        )
+    
+    def _report_status_filter(self, status, jobs):
+        """رسالة عند عدم وجود نتائج للفلتر"""
+        if not jobs:
+            message_status = self.translate_status_to_arabic(status) if status else "المحددة"
+            messagebox.showinfo("لا توجد نتائج", f"لا توجد طلبات بالحالة: {message_status}")
             if hasattr(self, 'status_count'):
-                status_label = "جميع الطلبات" if not status else self.translate_status_to_arabic(status)
-                self.status_count.configure(text=f"{self.format_number_english(len(filtered_jobs))} عنصر ({status_label})")
-            
-            # تسجيل عدد العناصر المجلوبة
-            print(f"✅ تم جلب {len(filtered_jobs)} عنصر من الحالة '{status}' (الفلتر: {status})")
+                self.status_count.configure(text=f"{self.format_number_english(0)} عنصر")
+            return
         
-        except Exception as e:
-            messagebox.showerror("خطأ", f"حدث خطأ أثناء الفلترة: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        # تسجيل عدد العناصر المجلوبة
+        print(f"✅ تم جلب {len(jobs)} عنصر من الحالة '{status}' (الفلتر: {status})")
     
     def start_auto_refresh(self):
         """بدء التحديث التلقائي"""
@@ -6351,41 +5571,8 @@ class MaintenanceFrame(ctk.CTkFrame):
                 return
             
             try:
-                # حفظ الموضع الحالي للتمرير والعناصر المحددة
-                if hasattr(self, 'tree'):
-                    current_yview = self.tree.yview()
-                    selected_items = self.tree.selection()
-                    selected_ids = []
-                    for item in selected_items:
-                        try:
-                            # الحصول على job_id من العمود الثاني (index 1)
-                            job_id = self.tree.item(item)['values'][1]
-                            selected_ids.append(job_id)
-                        except:
-                            pass
-                else:
-                    current_yview = None
-                    selected_ids = []
-                
-                # تحديث البيانات بصمت (بدون رسائل)
-                self.load_data(silent=True)
-                
-                # استعادة التحديد
-                if hasattr(self, 'tree') and selected_ids:
-                    for item in self.tree.get_children():
-                        try:
-                            values = self.tree.item(item)['values']
-                            if len(values) > 1 and values[1] in selected_ids:
-                                self.tree.selection_add(item)
-                        except:
-                            pass
-                
-                # استعادة موضع التمرير
-                if hasattr(self, 'tree') and current_yview:
-                    try:
-                        self.tree.yview_moveto(current_yview[0])
-                    except:
-                        pass
+                # تحديث الصفوف المتغيرة فقط - التحديد وموضع التمرير لا يتأثران
+                self.incremental_refresh()
                 
                 # تحديث وقت آخر تحديث
                 self.last_refresh_time = datetime.now()
@@ -6422,16 +5609,8 @@ class MaintenanceFrame(ctk.CTkFrame):
         
         # إذا كان النقر على عمود التحديد (العمود الأول)
         if column == "#1":  # عمود التحديد
-            values = list(self.tree.item(item, 'values'))
-            if values and len(values) > 0:
-                if values[0] == "☐":  # إذا كان غير محدد
-                    values[0] = "☑"  # تحديد
-                else:  # إذا كان محدد
-                    values[0] = "☐"  # إلغاء التحديد
-                self.tree.item(item, values=values)
-                
-                # تحديث حالة مربع التحديد الرئيسي في رأس العمود
-                self.update_header_checkbox()
+            # يحدّث أيضاً مربع التحديد الرئيسي في رأس العمود
+            self.job_table.toggle_checked(item)
     
     def on_item_double_click(self, event):
         """معالجة حدث النقر المزدوج على عنصر في الجدول"""
@@ -6559,8 +5738,9 @@ class MaintenanceFrame(ctk.CTkFrame):
                     
                     if success:
                         # تحديث السعر في الجدول (يعرض بالدولار دائماً)
-                        values[8] = f"{price_float:.2f} $"
-                        self.tree.item(item, values=values)
+                        job_row = self.job_table.get(int(job_id))
+                        if job_row is not None:
+                            self.job_table.update_row(dict(job_row, final_cost=price_float))
                         messagebox.showinfo("نجح", f"تم تحديث السعر بنجاح!\nالسعر النهائي: ${price_float:.2f}")
                         dialog.destroy()
                     else:
@@ -6587,95 +5767,38 @@ class MaintenanceFrame(ctk.CTkFrame):
     
     def select_all_items(self):
         """تحديد جميع العناصر في الجدول"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
-        
-        for item in self.tree.get_children():
-            values = list(self.tree.item(item, 'values'))
-            if values and values[0] == "☐":  # إذا كان غير محدد
-                values[0] = "☑"  # تحديد
-                self.tree.item(item, values=values)
+        self.job_table.set_all_checked(True)
     
     def deselect_all_items(self):
         """إلغاء تحديد جميع العناصر في الجدول"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
-        
-        for item in self.tree.get_children():
-            values = list(self.tree.item(item, 'values'))
-            if values and values[0] == "☑":  # إذا كان محدد
-                values[0] = "☐"  # إلغاء التحديد
-                self.tree.item(item, values=values)
+        self.job_table.set_all_checked(False)
     
     def toggle_select_all(self):
         """تبديل تحديد/إلغاء تحديد جميع العناصر"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
         
-        # التحقق من الحالة الحالية: هل كل العناصر محددة؟
-        all_selected = True
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values and values[0] == "☐":  # وجدنا عنصر غير محدد
-                all_selected = False
-                break
-        
         # إذا كانت كلها محددة، ألغِ التحديد. وإلا حدد الكل
-        if all_selected:
-            # إلغاء تحديد الكل
-            for item in self.tree.get_children():
-                values = list(self.tree.item(item, 'values'))
-                if values:
-                    values[0] = "☐"
-                    self.tree.item(item, values=values)
-            # تحديث رأس العمود
-            self.tree.heading("select", text="☐")
-            self.all_selected = False
-        else:
-            # تحديد الكل
-            for item in self.tree.get_children():
-                values = list(self.tree.item(item, 'values'))
-                if values:
-                    values[0] = "☑"
-                    self.tree.item(item, values=values)
-            # تحديث رأس العمود
-            self.tree.heading("select", text="☑")
-            self.all_selected = True
+        self.all_selected = not self.job_table.all_checked()
+        self.job_table.set_all_checked(self.all_selected)
     
     def update_header_checkbox(self):
         """تحديث حالة مربع التحديد في رأس العمود"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
-        
-        # التحقق من حالة جميع العناصر
-        all_selected = True
-        any_selected = False
-        
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values:
-                if values[0] == "☑":
-                    any_selected = True
-                else:
-                    all_selected = False
-        
-        # تحديث رأس العمود بناءً على الحالة
-        if all_selected and any_selected:
-            self.tree.heading("select", text="☑")  # كل العناصر محددة
-        else:
-            self.tree.heading("select", text="☐")  # بعض أو لا شيء محدد
+        self.tree.heading("select", text="☑" if self.job_table.all_checked() else "☐")
     
     def smart_delete(self):
         """حذف ذكي: يحذف العناصر المحددة إذا وُجدت، وإلا يحذف الصف الحالي"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
         
-        # البحث عن العناصر المحددة
-        selected_items = []
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values and values[0] == "☑":  # إذا كان محدد
-                selected_items.append((item, values[1]))  # (TreeView item, ID العنصر)
+        # البحث عن العناصر المحددة (بما فيها غير الظاهرة حالياً)
+        selected_items = self.job_table.checked_keys()
         
         # إذا وُجدت عناصر محددة، احذفها
         if selected_items:
@@ -6683,36 +5806,18 @@ class MaintenanceFrame(ctk.CTkFrame):
             if not messagebox.askyesno("تأكيد الحذف", f"هل أنت متأكد من حذف {len(selected_items)} عنصر؟"):
                 return
             
-            try:
-                deleted_count = 0
-                for tree_item, item_id in selected_items:
-                    if hasattr(self, 'maintenance_service'):
-                        success, message = self.maintenance_service.delete_job(item_id)
-                        if success:
-                            deleted_count += 1
-                
-                if deleted_count > 0:
-                    messagebox.showinfo("نجاح", f"✅ تم حذف {deleted_count} عنصر بنجاح")
-                    self.load_data()  # تحديث الجدول
-                else:
-                    messagebox.showerror("خطأ", "❌ فشل في حذف العناصر")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"❌ حدث خطأ غير متوقع: {str(e)}")
+            self._delete_jobs(selected_items, success_prefix="✅ ", error_prefix="❌ ")
         else:
             # إذا لم توجد عناصر محددة، احذف الصف الحالي (السلوك القديم)
             self.delete_maintenance()
     
     def delete_selected_items(self):
         """حذف العناصر المحددة"""
-        if not hasattr(self, 'tree'):
+        if not hasattr(self, 'job_table'):
             return
         
-        selected_items = []
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values and values[0] == "☑":  # إذا كان محدد
-                selected_items.append(values[1])  # ID العنصر
+        # ID العناصر المحددة (بما فيها غير الظاهرة حالياً)
+        selected_items = self.job_table.checked_keys()
         
         if not selected_items:
             messagebox.showwarning("تحذير", "الرجاء تحديد عنصر واحد على الأقل للحذف")
@@ -6722,47 +5827,61 @@ class MaintenanceFrame(ctk.CTkFrame):
         if not messagebox.askyesno("تأكيد الحذف", f"هل أنت متأكد من حذف {len(selected_items)} عنصر؟"):
             return
         
-        try:
-            deleted_count = 0
-            for item_id in selected_items:
-                if hasattr(self, 'maintenance_service'):
-                    success, message = self.maintenance_service.delete_job(item_id)
-                    if success:
-                        deleted_count += 1
-            
-            if deleted_count > 0:
-                messagebox.showinfo("نجاح", f"تم حذف {deleted_count} عنصر بنجاح")
+        self._delete_jobs(selected_items)
+    
+    def _delete_jobs(self, job_ids, success_prefix="", error_prefix=""):
+        """حذف مجموعة طلبات في الخلفية ثم تحديث الجدول"""
+        if not hasattr(self, 'maintenance_service'):
+            return
+        job_ids = list(job_ids)
+        
+        def delete_all(service):
+            # معاملة واحدة لكل المحدد بدلاً من commit لكل طلب
+            return service.bulk_delete_jobs(job_ids)
+        
+        def on_done(result):
+            success, message, deleted_count = result
+            if not success:
+                messagebox.showerror("خطأ", f"{error_prefix}{message}")
+            elif deleted_count > 0:
+                messagebox.showinfo("نجاح", f"{success_prefix}تم حذف {deleted_count} عنصر بنجاح")
                 self.load_data()  # تحديث الجدول
             else:
-                messagebox.showerror("خطأ", "فشل في حذف العناصر")
-                
-        except Exception as e:
-            messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
+                messagebox.showerror("خطأ", f"{error_prefix}فشل في حذف العناصر")
+        
+        def on_error(error):
+            messagebox.showerror("خطأ", f"{error_prefix}حدث خطأ غير متوقع: {str(error)}")
+        
+        self.run_db_task(delete_all, on_success=on_done, on_error=on_error)
     
     def generate_orders_report(self):
-        """إنشاء تقرير بالطلبات"""
+        """إنشاء تقرير بالطلبات (جلب الطلبات في الخلفية)"""
         if hasattr(self, 'report_text'):
             self.report_text.delete("1.0", tk.END)
         self.report_text.insert(tk.END, "تقرير طلبات الصيانة\n")
         self.report_text.insert(tk.END, "=" * 50 + "\n\n")
         
-        # جلب بيانات الطلبات
-        success, message, jobs = self.maintenance_service.search_jobs()
+        def on_loaded(result):
+            success, message, jobs = result
+            if success:
+                for job in jobs:
+                    if hasattr(self, 'report_text'):
+                        self.report_text.insert(tk.END, f"رقم الطلب: {job['tracking_code']}\n")
+                    self.report_text.insert(tk.END, f"العميل: {job['customer_name']}\n")
+                    self.report_text.insert(tk.END, f"الجهاز: {job['device_type']} - {job.get('device_model', '')}\n")
+                    self.report_text.insert(tk.END, f"الحالة: {job['status']}\n")
+                    self.report_text.insert(tk.END, f"تاريخ الاستلام: {job['received_at'].strftime('%Y-%m-%d') if job['received_at'] else ''}\n")
+                    self.report_text.insert(tk.END, "-" * 50 + "\n\n")
+                
+                if hasattr(self, 'status_label'):
+                    self.status_label.configure(text=f"تم إنشاء التقرير - {self.format_number_english(len(jobs))} طلب")
+            else:
+                messagebox.showerror("خطأ", f"فشل في إنشاء التقرير: {message}")
         
-        if success:
-            for job in jobs:
-                if hasattr(self, 'report_text'):
-                    self.report_text.insert(tk.END, f"رقم الطلب: {job['tracking_code']}\n")
-                self.report_text.insert(tk.END, f"العميل: {job['customer_name']}\n")
-                self.report_text.insert(tk.END, f"الجهاز: {job['device_type']} - {job.get('device_model', '')}\n")
-                self.report_text.insert(tk.END, f"الحالة: {job['status']}\n")
-                self.report_text.insert(tk.END, f"تاريخ الاستلام: {job['received_at'].strftime('%Y-%m-%d') if job['received_at'] else ''}\n")
-                self.report_text.insert(tk.END, "-" * 50 + "\n\n")
-            
-            if hasattr(self, 'status_label'):
-                self.status_label.configure(text=f"تم إنشاء التقرير - {self.format_number_english(len(jobs))} طلب")
-        else:
-            messagebox.showerror("خطأ", f"فشل في إنشاء التقرير: {message}")
+        def on_error(error):
+            messagebox.showerror("خطأ", f"فشل في إنشاء التقرير: {str(error)}")
+        
+        self.run_db_task(lambda service: service.search_jobs(), on_success=on_loaded, on_error=on_error, key="orders_report")
     
     def generate_payments_report(self):
         """إنشاء تقرير بالمدفوعات (قديم - محفوظ للتوافق)"""
@@ -6846,25 +5965,36 @@ class MaintenanceFrame(ctk.CTkFrame):
                         messagebox.showwarning("تحذير", "الرجاء إدخال تاريخ البداية والنهاية")
                     return
             
-            # جلب بيانات التقرير
-            success, message, report_data = self.maintenance_service.get_report_data(
-                report_type=report_type,
-                code_type=code_type_filter,
-                status=status_filter,
-                start_date=start_date,
-                end_date=end_date
-            )
+            # جلب بيانات التقرير في الخلفية - تغيير فلتر جديد يلغي الطلب السابق
+            def fetch(service):
+                return service.get_report_data(
+                    report_type=report_type,
+                    code_type=code_type_filter,
+                    status=status_filter,
+                    start_date=start_date,
+                    end_date=end_date
+                )
             
-            if not success:
-                if not silent:
-                    messagebox.showerror("خطأ", f"فشل في جلب بيانات التقرير: {message}")
-                return
+            def on_loaded(result):
+                success, message, report_data = result
+                if not success:
+                    if not silent:
+                        messagebox.showerror("خطأ", f"فشل في جلب بيانات التقرير: {message}")
+                    return
+                
+                # حفظ بيانات التقرير
+                self.current_report_data = report_data
+                
+                # عرض التقرير
+                self.display_report(report_data)
             
-            # حفظ بيانات التقرير
-            self.current_report_data = report_data
+            def on_error(error):
+                if silent:
+                    print(f"خطأ في التحديث التلقائي: {error}")
+                else:
+                    messagebox.showerror("خطأ", f"حدث خطأ أثناء إنشاء التقرير: {str(error)}")
             
-            # عرض التقرير
-            self.display_report(report_data)
+            self.run_db_task(fetch, on_success=on_loaded, on_error=on_error, key="report")
             
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء إنشاء التقرير: {str(e)}")
@@ -7672,10 +6802,26 @@ class MaintenanceFrame(ctk.CTkFrame):
         if not hasattr(self, 'maintenance_service') or not getattr(self, 'cost_jobs_tree', None):
             return
 
-        success, message, jobs = self.maintenance_service.search_jobs(limit=150)
+        def fetch(service):
+            success, message, jobs = service.search_jobs(limit=150)
+            profits = {}
+            if success:
+                for job in jobs:
+                    profit_success, _, profit_summary = service.calculate_job_profit(job["id"])
+                    if profit_success:
+                        profits[job["id"]] = profit_summary.get('net_profit', 0.0)
+            return success, message, jobs, profits
+
+        self.run_db_task(fetch, on_success=self._show_cost_manager_jobs, key="cost_jobs")
+
+    def _show_cost_manager_jobs(self, result):
+        """عرض قائمة الطلبات في نافذة التكاليف بعد جلبها (خيط الواجهة)"""
+        success, message, jobs, profits = result
         if not success:
             messagebox.showerror("خطأ", f"فشل في جلب الطلبات: {message}")
             return
+        if not getattr(self, 'cost_jobs_tree', None):
+            return
 
         self.cost_jobs_tree.delete(*self.cost_jobs_tree.get_children())
         self.cost_jobs_map = {}
@@ -7688,9 +6834,8 @@ class MaintenanceFrame(ctk.CTkFrame):
             price = job.get("final_cost") or job.get("estimated_cost") or 0.0
             net_profit_text = "--"
 
-            profit_success, _, profit_summary = self.maintenance_service.calculate_job_profit(job_id)
-            if profit_success:
-                net_profit_text = f"{profit_summary.get('net_profit', 0.0):.2f}"
+            if job_id in profits:
+                net_profit_text = f"{profits[job_id]:.2f}"
 
             item_id = str(job_id)
             self.cost_jobs_tree.insert(
@@ -7725,12 +6870,23 @@ class MaintenanceFrame(ctk.CTkFrame):
         if not hasattr(self, 'maintenance_service'):
             return
 
-        details_success, message, details = self.maintenance_service.get_job_details(job_id)
+        def fetch(service):
+            return service.get_job_details(job_id), service.calculate_job_profit(job_id)
+
+        self.run_db_task(
+            fetch,
+            on_success=lambda results: self._show_cost_manager_details(job_id, *results),
+            key="cost_details"
+        )
+
+    def _show_cost_manager_details(self, job_id, details_result, profit_result):
+        """عرض تفاصيل الطلب والمصاريف بعد جلبها (خيط الواجهة)"""
+        details_success, message, details = details_result
         if not details_success:
             messagebox.showerror("خطأ", f"فشل في جلب تفاصيل الطلب: {message}")
             return
 
-        profit_success, message, summary = self.maintenance_service.calculate_job_profit(job_id)
+        profit_success, message, summary = profit_result
         if not profit_success:
             messagebox.showerror("خطأ", f"فشل في حساب الربحية: {message}")
             return
@@ -8187,7 +7343,15 @@ class MaintenanceFrame(ctk.CTkFrame):
             messagebox.showerror("خطأ", "يرجى إدخال تواريخ صحيحة بالصيغة YYYY-MM-DD.")
             return
 
-        success, message, summary = self.maintenance_service.get_profit_summary(start_dt, end_dt)
+        self.run_db_task(
+            lambda service: service.get_profit_summary(start_dt, end_dt),
+            on_success=self._show_profit_report,
+            key="profit_report"
+        )
+
+    def _show_profit_report(self, result):
+        """عرض تقرير الأرباح بعد جلبه (خيط الواجهة)"""
+        success, message, summary = result
         if not success:
             messagebox.showerror("خطأ", f"فشل في إنشاء التقرير: {message}")
             return
@@ -0,0 +1,181 @@
+"""
+تشغيل مهام قاعدة البيانات في الخلفية لواجهة customtkinter
+
+Tkinter غير آمن للاستخدام من خيوط أخرى، وجلسة SQLAlchemy غير آمنة للمشاركة
+بين الخيوط. لذلك:
+
+- المهمة تعمل في مجموعة خيوط محدودة (ThreadPoolExecutor) بجلسة قاعدة بيانات
+  خاصة بها (submit_db) ولا تلمس أي عنصر واجهة.
+- النتيجة تُنقل إلى خيط الواجهة عبر طابور يُفرَّغ بـ after()، وهناك فقط
+  تُستدعى on_success / on_error.
+- المهام ذات نفس المفتاح (key) تُلغي بعضها: بحث جديد يلغي البحث السابق، ونتيجة
+  المهمة الملغاة لا تصل للواجهة حتى لو كانت قد بدأت التنفيذ.
+
+    runner = TaskRunner(self)
+    runner.submit_db(
+        lambda db: MaintenanceService(db).search_jobs(query=text),
+        on_success=self.show_results,
+        key="search",
+    )
+"""
+
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+DEFAULT_WORKERS = 3
+
+# الفاصل بين فحوص طابور النتائج أثناء وجود مهام قيد التنفيذ
+POLL_INTERVAL_MS = 30
+
+
+class TaskHandle:
+    """مرجع لمهمة مُرسلة (للإلغاء أو فحص الحالة)"""
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """إلغاء المهمة: لا تبدأ إذا كانت في الانتظار، ولا تُسلَّم نتيجتها إذا كانت تعمل"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+
+class TaskRunner:
+    """مجموعة خيوط للمهام البطيئة مع تسليم النتائج في خيط الواجهة
+
+    كل الدوال العامة تُستدعى من خيط الواجهة فقط.
+    """
+
+    def __init__(self, widget, max_workers: int = DEFAULT_WORKERS):
+        self.widget = widget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-task")
+        self._results: "queue.Queue" = queue.Queue()
+        self._latest: Dict[str, TaskHandle] = {}
+        self._active: Set[TaskHandle] = set()
+        self._poll_job = None
+        self._closed = False
+
+    def submit(
+        self,
+        work: Callable[[], Any],
+        on_success: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        key: Optional[str] = None
+    ) -> TaskHandle:
+        """تشغيل work() في الخلفية ثم on_success(النتيجة) أو on_error(الخطأ) في خيط الواجهة"""
+        handle = TaskHandle(key)
+        if self._closed:
+            handle.cancel()
+            return handle
+
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = handle
+
+        def run():
+            if handle.cancelled:
+                return
+            try:
+                result = (True, work())
+            except Exception as e:
+                result = (False, e)
+            self._results.put((handle, result, on_success, on_error))
+
+        handle.future = self._executor.submit(run)
+        self._active.add(handle)
+        self._schedule_poll()
+        return handle
+
+    def submit_db(
+        self,
+        work: Callable[[Any], Any],
+        on_success: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        key: Optional[str] = None
+    ) -> TaskHandle:
+        """مثل submit لكن work(db) تستلم جلسة قاعدة بيانات جديدة تُغلق بعد انتهائها"""
+        from database.connection import SessionLocal
+
+        def run_with_session():
+            db = SessionLocal()
+            try:
+                return work(db)
+            finally:
+                db.close()
+
+        return self.submit(run_with_session, on_success=on_success, on_error=on_error, key=key)
+
+    def cancel(self, key: str) -> None:
+        """إلغاء آخر مهمة بهذا المفتاح"""
+        handle = self._latest.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    def is_running(self, key: str) -> bool:
+        handle = self._latest.get(key)
+        return handle is not None and not handle.cancelled
+
+    def shutdown(self) -> None:
+        """إلغاء كل المهام وإيقاف الخيوط (عند إغلاق النافذة)"""
+        self._closed = True
+        for handle in list(self._active):
+            handle.cancel()
+        self._active.clear()
+        self._latest.clear()
+        if self._poll_job is not None:
+            try:
+                self.widget.after_cancel(self._poll_job)
+            except Exception:
+                pass
+            self._poll_job = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self) -> None:
+        if self._poll_job is None and not self._closed:
+            self._poll_job = self.widget.after(POLL_INTERVAL_MS, self._drain)
+
+    def _drain(self) -> None:
+        """تسليم النتائج الجاهزة (خيط الواجهة)"""
+        self._poll_job = None
+        while True:
+            try:
+                handle, (ok, value), on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self._active.discard(handle)
+            if handle.key is not None and self._latest.get(handle.key) is handle:
+                del self._latest[handle.key]
+            if handle.cancelled or self._closed:
+                continue
+
+            try:
+                if ok:
+                    if on_success:
+                        on_success(value)
+                elif on_error:
+                    on_error(value)
+                else:
+                    print(f"⚠️ فشلت مهمة في الخلفية: {value}")
+            except Exception:
+                traceback.print_exc()
+
+        # مهام أُلغيت قبل أن تبدأ لا تُرسل نتيجة
+        self._active = {handle for handle in self._active if not handle.done()}
+        if self._active or not self._results.empty():
+            self._schedule_poll()
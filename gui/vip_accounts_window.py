@@ -10,6 +10,7 @@ from typing import Optional, List, Dict
 from database.connection import get_db
 from database.models import VIPCustomer, Customer, MaintenanceJob, AccountTransaction, WhatsAppSchedule
 from services.maintenance_service import MaintenanceService
+from gui.task_runner import TaskRunner
 
 
 class VIPAccountsWindow(ctk.CTkToplevel):
@@ -112,6 +113,7 @@ class VIPAccountsWindow(ctk.CTkToplevel):
         super().__init__(parent)
         self.parent = parent
         self.maintenance_service = MaintenanceService(next(get_db()))
+        self.task_runner = TaskRunner(self)
         
         self.title("إدارة حسابات العملاء المميزين")
         self.geometry("1200x800")
@@ -123,6 +125,11 @@ class VIPAccountsWindow(ctk.CTkToplevel):
         # إعداد التنقل بالـ Enter
         self.setup_enter_navigation(self)
     
+    def destroy(self):
+        """إيقاف مهام الخلفية قبل إغلاق النافذة"""
+        self.task_runner.shutdown()
+        super().destroy()
+    
     def setup_ui(self):
         """إعداد واجهة المستخدم"""
         # شريط الأدوات
@@ -570,21 +577,26 @@ class VIPAccountsWindow(ctk.CTkToplevel):
     
     def load_vip_customers(self):
         """تحميل قائمة العملاء المميزين"""
-        try:
-            db = next(get_db())
-            vip_customers = db.query(VIPCustomer).join(Customer).all()
-            
-            # مسح القائمة
-            for item in self.customers_tree.get_children():
-                self.customers_tree.delete(item)
-            
-            # إضافة العملاء
-            for vip in vip_customers:
-                self.customers_tree.insert("", tk.END, values=(vip.customer.name,), tags=(vip.id,))
-            
-            db.close()
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في تحميل العملاء المميزين: {str(e)}")
+        def fetch(db):
+            rows = db.query(VIPCustomer.id, Customer.name).join(Customer).all()
+            return [(vip_id, name) for vip_id, name in rows]
+        
+        self.task_runner.submit_db(
+            fetch,
+            on_success=self._show_vip_customers,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في تحميل العملاء المميزين: {str(e)}"),
+            key="customers"
+        )
+    
+    def _show_vip_customers(self, vip_customers):
+        """عرض قائمة العملاء المميزين [(vip_id, name)]"""
+        # مسح القائمة
+        for item in self.customers_tree.get_children():
+            self.customers_tree.delete(item)
+        
+        # إضافة العملاء
+        for vip_id, name in vip_customers:
+            self.customers_tree.insert("", tk.END, values=(name,), tags=(vip_id,))
     
     def on_customer_select(self, event):
         """عند اختيار عميل"""
@@ -606,25 +618,29 @@ class VIPAccountsWindow(ctk.CTkToplevel):
     
     def load_customer_details(self, vip_id: int):
         """تحميل تفاصيل العميل"""
-        try:
-            print(f"📋 جارٍ تحميل تفاصيل العميل المميز ID: {vip_id}")
-            db = next(get_db())
-            vip = db.query(VIPCustomer).filter(VIPCustomer.id == vip_id).first()
-            
-            if not vip:
+        print(f"📋 جارٍ تحميل تفاصيل العميل المميز ID: {vip_id}")
+        
+        def fetch(db):
+            row = db.query(VIPCustomer.customer_id, Customer.name, Customer.phone)\
+                    .outerjoin(Customer, VIPCustomer.customer_id == Customer.id)\
+                    .filter(VIPCustomer.id == vip_id).first()
+            return tuple(row) if row else None
+        
+        def on_loaded(row):
+            if not row:
                 print(f"❌ لم يتم العثور على عميل مميز برقم: {vip_id}")
                 messagebox.showwarning("تحذير", f"لم يتم العثور على عميل مميز برقم: {vip_id}")
-                db.close()
                 return
             
-            print(f"✅ تم العثور على عميل مميز: {vip.customer.name if vip.customer else 'غير معروف'}")
+            customer_id, name, phone = row
+            print(f"✅ تم العثور على عميل مميز: {name or 'غير معروف'}")
             
             # تحميل معلومات العميل - مبسطة
-            self.name_label.configure(text=vip.customer.name if vip.customer else "غير معروف")
-            self.phone_label.configure(text=vip.customer.phone if vip.customer else "-")
+            self.name_label.configure(text=name or "غير معروف")
+            self.phone_label.configure(text=phone or "-")
             
             # تحميل الطلبات
-            self.load_customer_orders(vip.customer_id)
+            self.load_customer_orders(customer_id)
             
             # تحميل جداول واتساب
             self.load_whatsapp_schedules(vip_id)
@@ -633,10 +649,13 @@ class VIPAccountsWindow(ctk.CTkToplevel):
             self.update_statement(vip_id)
             
             self.current_vip_id = vip_id
-            db.close()
-            
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في تحميل التفاصيل: {str(e)}")
+        
+        self.task_runner.submit_db(
+            fetch,
+            on_success=on_loaded,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في تحميل التفاصيل: {str(e)}"),
+            key="details"
+        )
     
     def translate_status_to_arabic(self, status):
         """ترجمة حالة الجهاز إلى العربية"""
@@ -655,23 +674,17 @@ class VIPAccountsWindow(ctk.CTkToplevel):
     
     def load_customer_orders(self, customer_id: int):
         """تحميل طلبات العميل"""
-        try:
-            # مسح الجدول
-            for item in self.orders_tree.get_children():
-                self.orders_tree.delete(item)
-            
-            db = next(get_db())
+        def fetch(db):
             # استخدام استعلام محسّن مع حساب الإجمالي في قاعدة البيانات
-            from sqlalchemy import func, case
-            from sqlalchemy.orm import joinedload
+            from sqlalchemy import func
             
             # جلب الطلبات مع حساب الإجمالي في استعلام واحد
-            jobs_query = db.query(
+            jobs = db.query(
                 MaintenanceJob,
                 func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0).label('cost')
             ).filter(
                 MaintenanceJob.customer_id == customer_id
-            ).order_by(MaintenanceJob.received_at.desc())
+            ).order_by(MaintenanceJob.received_at.desc()).all()
             
             # حساب الإجمالي في قاعدة البيانات (أسرع)
             total_cost_result = db.query(
@@ -680,64 +693,76 @@ class VIPAccountsWindow(ctk.CTkToplevel):
                 MaintenanceJob.customer_id == customer_id
             ).scalar() or 0
             
-            jobs = jobs_query.all()
-            
-            # إدراج البيانات في الجدول
-            for job_result in jobs:
-                job = job_result[0] if isinstance(job_result, tuple) else job_result
-                cost = job_result[1] if isinstance(job_result, tuple) else (job.final_cost or job.estimated_cost or 0)
-                
-                # ترجمة الحالة إلى العربية
-                job_status = job.status.value if hasattr(job.status, 'value') else str(job.status)
-                arabic_status = self.translate_status_to_arabic(job_status)
-                
-                # تحديد حالة الدفع
-                if job.payment_status == "paid":
-                    if job.payment_method == "cash":
-                        payment_status = "كاش ✅"
-                    elif job.payment_method == "wish_money":
-                        payment_status = "ويش موني ✅"
-                    else:
-                        payment_status = "مدفوع ✅"
+            # الكائنات تُستخدم في خيط الواجهة بعد إغلاق الجلسة - قيم بسيطة فقط
+            rows = [
+                (job.tracking_code, job.device_type, job.status, cost,
+                 job.payment_status, job.payment_method, job.received_at)
+                for job, cost in jobs
+            ]
+            return rows, total_cost_result
+        
+        def on_error(error):
+            print(f"خطأ في تحميل الطلبات: {error}")
+        
+        self.task_runner.submit_db(fetch, on_success=self._show_customer_orders, on_error=on_error, key="orders")
+    
+    def _show_customer_orders(self, result):
+        """عرض طلبات العميل بعد جلبها (خيط الواجهة)"""
+        rows, total_cost_result = result
+        
+        # مسح الجدول
+        for item in self.orders_tree.get_children():
+            self.orders_tree.delete(item)
+        
+        # إدراج البيانات في الجدول
+        for tracking_code, device_type, status, cost, job_payment_status, payment_method, received_at in rows:
+            # ترجمة الحالة إلى العربية
+            job_status = status.value if hasattr(status, 'value') else str(status)
+            arabic_status = self.translate_status_to_arabic(job_status)
+            
+            # تحديد حالة الدفع
+            if job_payment_status == "paid":
+                if payment_method == "cash":
+                    payment_status = "كاش ✅"
+                elif payment_method == "wish_money":
+                    payment_status = "ويش موني ✅"
                 else:
-                    payment_status = "دين ❌"
-                
-                self.orders_tree.insert("", tk.END, values=(
-                    job.tracking_code,
-                    job.device_type,
-                    arabic_status,
-                    f"{self.format_number_english(cost):.2f} $",
-                    payment_status,
-                    job.received_at.strftime("%Y-%m-%d") if job.received_at else ""
-                ))
-            
-            # تحديث مجموع الكلفة
-            if hasattr(self, 'total_cost_label'):
-                self.total_cost_label.configure(text=f"إجمالي الكلفة: {self.format_number_english(total_cost_result):.2f} $")
-            
-            db.close()
-        except Exception as e:
-            print(f"خطأ في تحميل الطلبات: {e}")
-            import traceback
-            print(traceback.format_exc())
+                    payment_status = "مدفوع ✅"
+            else:
+                payment_status = "دين ❌"
+            
+            self.orders_tree.insert("", tk.END, values=(
+                tracking_code,
+                device_type,
+                arabic_status,
+                f"{self.format_number_english(cost):.2f} $",
+                payment_status,
+                received_at.strftime("%Y-%m-%d") if received_at else ""
+            ))
+        
+        # تحديث مجموع الكلفة
+        if hasattr(self, 'total_cost_label'):
+            self.total_cost_label.configure(text=f"إجمالي الكلفة: {self.format_number_english(total_cost_result):.2f} $")
     
     def load_whatsapp_schedules(self, vip_id: int):
         """تحميل جداول واتساب"""
-        try:
-            self.schedules_listbox.delete(0, tk.END)
-            
-            db = next(get_db())
-            schedules = db.query(WhatsAppSchedule).filter(
+        def fetch(db):
+            return db.query(
+                WhatsAppSchedule.message_type, WhatsAppSchedule.send_time, WhatsAppSchedule.is_active
+            ).filter(
                 WhatsAppSchedule.vip_customer_id == vip_id
             ).all()
-            
-            for schedule in schedules:
-                status = "نشط" if schedule.is_active else "معطل"
-                self.schedules_listbox.insert(tk.END, f"{schedule.message_type} - {schedule.send_time} ({status})")
-            
-            db.close()
-        except Exception as e:
-            print(f"خطأ في تحميل الجداول: {e}")
+        
+        def on_loaded(schedules):
+            self.schedules_listbox.delete(0, tk.END)
+            for message_type, send_time, is_active in schedules:
+                status = "نشط" if is_active else "معطل"
+                self.schedules_listbox.insert(tk.END, f"{message_type} - {send_time} ({status})")
+        
+        def on_error(error):
+            print(f"خطأ في تحميل الجداول: {error}")
+        
+        self.task_runner.submit_db(fetch, on_success=on_loaded, on_error=on_error, key="schedules")
     
     def format_number_english(self, number):
         """تحويل رقم إلى سلسلة نصية بالأرقام الإنجليزية (0-9) دائماً"""
@@ -755,22 +780,18 @@ class VIPAccountsWindow(ctk.CTkToplevel):
     
     def update_statement(self, vip_id: int):
         """تحديث كشف الحساب"""
-        try:
-            db = next(get_db())
-            vip = db.query(VIPCustomer).filter(VIPCustomer.id == vip_id).first()
+        def fetch(db):
+            from sqlalchemy import func, case
+            from sqlalchemy.orm import joinedload
             
+            # العلاقات المطلوبة للعرض تُحمّل مسبقاً لأن الجلسة تُغلق قبل استخدامها
+            vip = db.query(VIPCustomer)\
+                    .options(joinedload(VIPCustomer.customer))\
+                    .filter(VIPCustomer.id == vip_id).first()
             if not vip:
-                db.close()
-                return
-            
-            # تحديث حد الائتمان
-            if hasattr(self, 'balance_labels') and 'credit_limit' in self.balance_labels:
-                credit_limit_formatted = self.format_number_english(f"{float(vip.credit_limit):.2f}")
-                self.balance_labels['credit_limit'].configure(text=f"{credit_limit_formatted} $")
+                return None
             
             # جلب جميع المعاملات مع eager loading للطلبات
-            from sqlalchemy.orm import joinedload
-            
             transactions = db.query(AccountTransaction)\
                            .options(joinedload(AccountTransaction.maintenance_job))\
                            .filter(AccountTransaction.vip_customer_id == vip_id)\
@@ -778,14 +799,28 @@ class VIPAccountsWindow(ctk.CTkToplevel):
                            .all()
             
             # حساب الإجماليات في قاعدة البيانات (أسرع)
-            from sqlalchemy import func, case
             totals = db.query(
                 func.sum(case((AccountTransaction.transaction_type == "debt", AccountTransaction.amount), else_=0)).label('total_debt'),
                 func.sum(case((AccountTransaction.transaction_type == "payment", AccountTransaction.amount), else_=0)).label('total_payment')
             ).filter(AccountTransaction.vip_customer_id == vip_id).first()
             
-            total_debt = totals.total_debt or 0
-            total_payment = totals.total_payment or 0
+            return vip, transactions, totals.total_debt or 0, totals.total_payment or 0
+        
+        def on_error(error):
+            print(f"خطأ في تحديث كشف الحساب: {error}")
+        
+        self.task_runner.submit_db(fetch, on_success=self._show_statement, on_error=on_error, key="statement")
+    
+    def _show_statement(self, result):
+        """عرض كشف الحساب بعد جلبه (خيط الواجهة)"""
+        if result is None:
+            return
+        vip, transactions, total_debt, total_payment = result
+        try:
+            # تحديث حد الائتمان
+            if hasattr(self, 'balance_labels') and 'credit_limit' in self.balance_labels:
+                credit_limit_formatted = self.format_number_english(f"{float(vip.credit_limit):.2f}")
+                self.balance_labels['credit_limit'].configure(text=f"{credit_limit_formatted} $")
             
             # مسح الجداول
             if hasattr(self, 'payments_tree'):
@@ -888,8 +923,6 @@ class VIPAccountsWindow(ctk.CTkToplevel):
             statement = self.generate_statement_text(vip, transactions, total_debt, total_payment, balance)
             self.statement_text.delete("1.0", tk.END)
             self.statement_text.insert("1.0", statement)
-            
-            db.close()
         except Exception as e:
             print(f"خطأ في تحديث كشف الحساب: {e}")
             import traceback
@@ -897,75 +930,70 @@ class VIPAccountsWindow(ctk.CTkToplevel):
     
     def generate_statement_text(self, vip, transactions, total_debt, total_payment, balance):
         """إنشاء نص كشف الحساب للطباعة"""
-        db = next(get_db())
-        
-        try:
-            statement = "=" * 70 + "\n"
-            statement += f"كشف حساب - {vip.customer.name}\n"
-            statement += "=" * 70 + "\n\n"
-            statement += f"الاسم: {vip.customer.name}\n"
-            statement += f"الهاتف: {vip.customer.phone}\n"
-            if vip.customer.email:
-                statement += f"البريد: {vip.customer.email}\n"
-            statement += f"تاريخ الطباعة: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-            statement += "=" * 70 + "\n\n"
-            
-            # الديون
-            statement += "الديون:\n"
+        statement = "=" * 70 + "\n"
+        statement += f"كشف حساب - {vip.customer.name}\n"
+        statement += "=" * 70 + "\n\n"
+        statement += f"الاسم: {vip.customer.name}\n"
+        statement += f"الهاتف: {vip.customer.phone}\n"
+        if vip.customer.email:
+            statement += f"البريد: {vip.customer.email}\n"
+        statement += f"تاريخ الطباعة: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
+        statement += "=" * 70 + "\n\n"
+        
+        # الديون
+        statement += "الديون:\n"
+        statement += "-" * 70 + "\n"
+        debts = [t for t in transactions if t.transaction_type == "debt"]
+        if debts:
+            statement += f"{'التاريخ':<12} | {'رقم التتبع':<15} | {'نوع الجهاز':<20} | {'المبلغ':>10}\n"
             statement += "-" * 70 + "\n"
-            debts = [t for t in transactions if t.transaction_type == "debt"]
-            if debts:
-                statement += f"{'التاريخ':<12} | {'رقم التتبع':<15} | {'نوع الجهاز':<20} | {'المبلغ':>10}\n"
-                statement += "-" * 70 + "\n"
-                for trans in debts:
-                    date_str = trans.created_at.strftime("%Y-%m-%d") if trans.created_at else ""
-                    tracking_code = "-"
-                    device_type = "-"
-                    
-                    if trans.maintenance_job_id:
-                        job = db.query(MaintenanceJob).filter(MaintenanceJob.id == trans.maintenance_job_id).first()
-                        if job:
-                            tracking_code = job.tracking_code
-                            device_type = job.device_type[:20]  # تقصير النص
-                    
-                    desc = (trans.description or "دين")[:20]
-                    statement += f"{date_str:<12} | {tracking_code:<15} | {device_type:<20} | {trans.amount:>10.2f} $\n"
-                    if desc and desc != "دين":
-                        statement += f"{'':12} | {'':15} | {desc:<20} | {'':>10}\n"
-            else:
-                statement += "لا توجد ديون\n"
-            
-            statement += "\n"
-            
-            # الدفعات
-            statement += "الدفعات:\n"
+            for trans in debts:
+                date_str = trans.created_at.strftime("%Y-%m-%d") if trans.created_at else ""
+                tracking_code = "-"
+                device_type = "-"
+                
+                if trans.maintenance_job_id:
+                    job = trans.maintenance_job  # محمّل مسبقاً مع المعاملات
+                    if job:
+                        tracking_code = job.tracking_code
+                        device_type = job.device_type[:20]  # تقصير النص
+                
+                desc = (trans.description or "دين")[:20]
+                statement += f"{date_str:<12} | {tracking_code:<15} | {device_type:<20} | {trans.amount:>10.2f} $\n"
+                if desc and desc != "دين":
+                    statement += f"{'':12} | {'':15} | {desc:<20} | {'':>10}\n"
+        else:
+            statement += "لا توجد ديون\n"
+        
+        statement += "\n"
+        
+        # الدفعات
+        statement += "الدفعات:\n"
+        statement += "-" * 70 + "\n"
+        payments = [t for t in transactions if t.transaction_type == "payment"]
+        if payments:
+            statement += f"{'التاريخ':<12} | {'المبلغ':>10} | {'طريقة الدفع':<15} | {'الوصف':<25}\n"
             statement += "-" * 70 + "\n"
-            payments = [t for t in transactions if t.transaction_type == "payment"]
-            if payments:
-                statement += f"{'التاريخ':<12} | {'المبلغ':>10} | {'طريقة الدفع':<15} | {'الوصف':<25}\n"
-                statement += "-" * 70 + "\n"
-                for trans in payments:
-                    date_str = trans.created_at.strftime("%Y-%m-%d") if trans.created_at else ""
-                    method = "كاش" if trans.payment_method == "cash" else "ويش موني" if trans.payment_method == "wish_money" else "أخرى"
-                    desc = (trans.description or "دفعة")[:25]
-                    statement += f"{date_str:<12} | {trans.amount:>10.2f} $ | {method:<15} | {desc:<25}\n"
-            else:
-                statement += "لا توجد دفعات\n"
-            
-            statement += "\n" + "=" * 70 + "\n"
-            statement += f"إجمالي الديون: {total_debt:.2f} $\n"
-            statement += f"إجمالي المدفوعات: {total_payment:.2f} $\n"
-            statement += f"الرصيد الحالي: {balance:.2f} $\n"
-            statement += f"حد الائتمان: {vip.credit_limit:.2f} $\n"
-            if balance > 0:
-                statement += f"\n⚠️ المبلغ المستحق: {balance:.2f} $\n"
-            statement += "=" * 70 + "\n"
-            statement += f"\nADR ELECTRONICS\n"
-            statement += f"شكراً لثقتكم بنا 🙏\n"
-            
-            return statement
-        finally:
-            db.close()
+            for trans in payments:
+                date_str = trans.created_at.strftime("%Y-%m-%d") if trans.created_at else ""
+                method = "كاش" if trans.payment_method == "cash" else "ويش موني" if trans.payment_method == "wish_money" else "أخرى"
+                desc = (trans.description or "دفعة")[:25]
+                statement += f"{date_str:<12} | {trans.amount:>10.2f} $ | {method:<15} | {desc:<25}\n"
+        else:
+            statement += "لا توجد دفعات\n"
+        
+        statement += "\n" + "=" * 70 + "\n"
+        statement += f"إجمالي الديون: {total_debt:.2f} $\n"
+        statement += f"إجمالي المدفوعات: {total_payment:.2f} $\n"
+        statement += f"الرصيد الحالي: {balance:.2f} $\n"
+        statement += f"حد الائتمان: {vip.credit_limit:.2f} $\n"
+        if balance > 0:
+            statement += f"\n⚠️ المبلغ المستحق: {balance:.2f} $\n"
+        statement += "=" * 70 + "\n"
+        statement += f"\nADR ELECTRONICS\n"
+        statement += f"شكراً لثقتكم بنا 🙏\n"
+        
+        return statement
     
     def add_vip_customer(self):
         """إضافة عميل مميز جديد"""
@@ -1683,21 +1711,17 @@ class VIPAccountsWindow(ctk.CTkToplevel):
             self.load_vip_customers()
             return
         
-        try:
-            db = next(get_db())
-            vip_customers = db.query(VIPCustomer).join(Customer).filter(
+        def fetch(db):
+            rows = db.query(VIPCustomer.id, Customer.name).join(Customer).filter(
                 Customer.name.ilike(f"%{search_term}%")
             ).all()
-            
-            # مسح القائمة
-            for item in self.customers_tree.get_children():
-                self.customers_tree.delete(item)
-            
-            # إضافة النتائج
-            for vip in vip_customers:
-                self.customers_tree.insert("", tk.END, values=(vip.customer.name,), tags=(vip.id,))
-            
-            db.close()
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في البحث: {str(e)}")
+            return [(vip_id, name) for vip_id, name in rows]
+        
+        # نفس مفتاح load_vip_customers: آخر بحث فقط يُعرض
+        self.task_runner.submit_db(
+            fetch,
+            on_success=self._show_vip_customers,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في البحث: {str(e)}"),
+            key="customers"
+        )
 
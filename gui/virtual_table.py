@@ -0,0 +1,363 @@
+"""
+جدول افتراضي (virtual scrolling) فوق ttk.Treeview
+
+بدلاً من إنشاء عنصر Treeview لكل طلب (10,000 عنصر = تجميد الواجهة عدة ثوانٍ)
+نحتفظ بكل النتائج في قائمة عادية، ونُنشئ فقط عدداً ثابتاً من العناصر يساوي
+الصفوف الظاهرة + هامش صغير. عند التمرير تُعاد كتابة قيم نفس العناصر من الموضع
+الجديد في القائمة، لذلك زمن التحميل والتمرير لا يعتمد على عدد الطلبات.
+
+التحديد (selection) ومربعات الاختيار (☐/☑) محفوظة حسب id الطلب وليس حسب
+عنصر الـ Treeview، فتبقى صحيحة بعد التمرير والترتيب وإعادة التحميل.
+"""
+
+import tkinter as tk
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+CHECKED = "☑"
+UNCHECKED = "☐"
+
+# عدد الصفوف لكل حركة من عجلة الفأرة
+WHEEL_STEP = 3
+
+# Shift / Control في event.state
+_EXTEND_MASK = 0x0001 | 0x0004
+
+
+def _sort_value(value: Any):
+    """مفتاح ترتيب آمن مع القيم الفارغة (None في النهاية)"""
+    if value is None or value == "":
+        return (1, 0)
+    if isinstance(value, str):
+        return (0, value.lower())
+    return (0, value)
+
+
+class VirtualTreeview:
+    """إدارة Treeview بعرض نافذي للصفوف الظاهرة فقط
+
+    Args:
+        tree: الـ Treeview (أول عمود = مربع الاختيار)
+        scrollbar: شريط التمرير العمودي (يُدار من هنا وليس من الـ Treeview)
+        format_row: دالة تحويل صف البيانات إلى قيم الأعمدة
+        key_of: دالة إرجاع المعرّف الفريد للصف
+        margin: عدد الصفوف الإضافية المُنشأة أسفل المنطقة الظاهرة
+        on_near_end: تُستدعى عند الاقتراب من نهاية الصفوف المحملة (لجلب الصفحة التالية)
+    """
+
+    def __init__(
+        self,
+        tree,
+        scrollbar,
+        format_row: Callable[[Dict[str, Any]], tuple],
+        key_of: Callable[[Dict[str, Any]], Any] = lambda row: row.get("id"),
+        margin: int = 5,
+        on_near_end: Optional[Callable[[], None]] = None
+    ):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.key_of = key_of
+        self.margin = margin
+        self.on_near_end = on_near_end
+
+        self.rows: List[Dict[str, Any]] = []
+        self.checked: Set[Any] = set()
+        self.selected: Set[Any] = set()
+        self.offset = 0
+
+        self._items: List[str] = []  # عناصر Treeview المُعاد استخدامها
+        self._visible = max(1, int(tree.cget("height") or 20))
+        self._index: Optional[Dict[Any, int]] = None
+        self._sort_column: Optional[str] = None
+        self._sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self._sort_reverse = False
+        self._headings = {column: tree.heading(column, "text") for column in tree["columns"]}
+        self._rendering = False
+        self._batch_depth = 0
+        self._extend_selection = False
+
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self._on_resize, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", self._on_wheel)
+        tree.bind("<Button-5>", self._on_wheel)
+        tree.bind("<ButtonPress-1>", self._on_press, add="+")
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        for key, delta in (("<Up>", -1), ("<Down>", 1), ("<Return>", 1), ("<KP_Enter>", 1),
+                           ("<Prior>", "-page"), ("<Next>", "page"), ("<Home>", "home"), ("<End>", "end")):
+            tree.bind(key, lambda event, delta=delta: self._on_key(delta))
+
+    # ------------------------------------------------------------------
+    # البيانات
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @contextmanager
+    def batch(self):
+        """تأجيل إعادة الرسم حتى نهاية عدة تعديلات متتالية"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.render()
+
+    def set_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """استبدال كل الصفوف (يحتفظ بالتحديد ومربعات الاختيار للصفوف الباقية)"""
+        self.rows = list(rows)
+        self._apply_sort()
+        keys = set(self._keys())
+        self.checked &= keys
+        self.selected &= keys
+        self.offset = 0
+        self.render()
+
+    def append_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """إضافة صفوف لنهاية القائمة (الصفحة التالية)"""
+        self.rows.extend(rows)
+        self._apply_sort()
+        self.render()
+
+    def prepend_row(self, row: Dict[str, Any]) -> None:
+        """إضافة صف في بداية القائمة (طلب جديد)"""
+        self.insert_row(row, 0)
+
+    def insert_row(self, row: Dict[str, Any], position: int) -> None:
+        """إضافة صف في موضع محدد (يُعاد ترتيبه إذا كان هناك ترتيب حسب عمود)"""
+        self.rows.insert(position, row)
+        self._apply_sort()
+        self.render()
+
+    def update_row(self, row: Dict[str, Any]) -> bool:
+        """استبدال صف موجود بنفس المعرّف"""
+        position = self.index_of(self.key_of(row))
+        if position is None:
+            return False
+        self.rows[position] = row
+        if self._sort_key:
+            self._apply_sort()
+        self.render()
+        return True
+
+    def remove_keys(self, keys: Iterable[Any]) -> int:
+        """حذف صفوف حسب المعرّف"""
+        keys = set(keys)
+        if not keys:
+            return 0
+        before = len(self.rows)
+        self.rows = [row for row in self.rows if self.key_of(row) not in keys]
+        self.checked -= keys
+        self.selected -= keys
+        self._index = None
+        self.render()
+        return before - len(self.rows)
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        """صف البيانات حسب المعرّف"""
+        position = self.index_of(key)
+        return self.rows[position] if position is not None else None
+
+    def index_of(self, key: Any) -> Optional[int]:
+        if self._index is None:
+            self._index = {self.key_of(row): position for position, row in enumerate(self.rows)}
+        return self._index.get(key)
+
+    def key_of_item(self, item: str) -> Any:
+        """معرّف الصف المعروض في عنصر Treeview"""
+        try:
+            position = self.offset + self._items.index(item)
+        except ValueError:
+            return None
+        return self.key_of(self.rows[position]) if position < len(self.rows) else None
+
+    def _keys(self) -> List[Any]:
+        return [self.key_of(row) for row in self.rows]
+
+    # ------------------------------------------------------------------
+    # مربعات الاختيار
+    # ------------------------------------------------------------------
+
+    def toggle_checked(self, item: str) -> None:
+        key = self.key_of_item(item)
+        if key is None:
+            return
+        if key in self.checked:
+            self.checked.discard(key)
+        else:
+            self.checked.add(key)
+        self.render()
+
+    def set_all_checked(self, checked: bool) -> None:
+        self.checked = set(self._keys()) if checked else set()
+        self.render()
+
+    def all_checked(self) -> bool:
+        return bool(self.rows) and len(self.checked) == len(self.rows)
+
+    def checked_keys(self) -> List[Any]:
+        """المعرّفات المختارة بترتيب العرض"""
+        return [key for key in self._keys() if key in self.checked]
+
+    def selected_keys(self) -> List[Any]:
+        """المعرّفات المحددة (بما فيها غير الظاهرة حالياً) بترتيب العرض"""
+        return [key for key in self._keys() if key in self.selected]
+
+    # ------------------------------------------------------------------
+    # الترتيب
+    # ------------------------------------------------------------------
+
+    def sort_by(self, column: str, key: Callable[[Dict[str, Any]], Any]) -> None:
+        """ترتيب حسب عمود (النقر مرة ثانية يعكس الاتجاه)"""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_reverse = False
+        self._sort_column = column
+        self._sort_key = key
+        for name, text in self._headings.items():
+            if name == column:
+                text = f"{text} {'▼' if self._sort_reverse else '▲'}"
+            if name != "select":
+                self.tree.heading(name, text=text)
+        self._apply_sort()
+        self.offset = 0
+        self.render()
+
+    def _apply_sort(self) -> None:
+        self._index = None
+        if self._sort_key:
+            sort_key = self._sort_key
+            self.rows.sort(key=lambda row: _sort_value(sort_key(row)), reverse=self._sort_reverse)
+
+    # ------------------------------------------------------------------
+    # العرض والتمرير
+    # ------------------------------------------------------------------
+
+    def render(self) -> None:
+        """إعادة كتابة العناصر الظاهرة من self.offset"""
+        if self._batch_depth:
+            return
+        total = len(self.rows)
+        self.offset = max(0, min(self.offset, total - self._visible))
+        count = min(self._visible + self.margin, total - self.offset)
+
+        self._rendering = True
+        try:
+            while len(self._items) < count:
+                self._items.append(self.tree.insert("", tk.END, values=()))
+            if len(self._items) > count:
+                self.tree.delete(*self._items[count:])
+                del self._items[count:]
+
+            visible_selection = []
+            for position, item in enumerate(self._items):
+                row = self.rows[self.offset + position]
+                key = self.key_of(row)
+                values = list(self.format_row(row))
+                values[0] = CHECKED if key in self.checked else UNCHECKED
+                self.tree.item(item, values=values)
+                if key in self.selected:
+                    visible_selection.append(item)
+            self.tree.selection_set(visible_selection)
+            self.tree.yview_moveto(0)
+            self.tree.heading("select", text=CHECKED if self.all_checked() else UNCHECKED)
+        finally:
+            self._rendering = False
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(total, self.offset + self._visible) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+        if self.on_near_end and total and self.offset + self._visible >= total * 0.9:
+            self.on_near_end()
+
+    def scroll_to(self, key: Any) -> Optional[str]:
+        """تمرير حتى يظهر الصف وإرجاع عنصر الـ Treeview الخاص به"""
+        position = self.index_of(key)
+        if position is None:
+            return None
+        if not self.offset <= position < self.offset + self._visible:
+            self.offset = max(0, position - self._visible // 2)
+            self.render()
+        return self._items[position - self.offset]
+
+    def yview(self, *args) -> None:
+        """أمر شريط التمرير (moveto / scroll)"""
+        total = len(self.rows)
+        if not args or not total:
+            return
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self._visible if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.offset -= WHEEL_STEP
+        else:
+            self.offset += WHEEL_STEP
+        self.render()
+        return "break"
+
+    def _on_key(self, delta):
+        total = len(self.rows)
+        if not total:
+            return "break"
+        focus = self.tree.focus()
+        current = self.offset + self._items.index(focus) if focus in self._items else self.offset
+        if delta == "home":
+            target = 0
+        elif delta == "end":
+            target = total - 1
+        elif delta in ("page", "-page"):
+            target = current + (self._visible if delta == "page" else -self._visible)
+        else:
+            target = current + delta
+        target = max(0, min(total - 1, target))
+
+        if target < self.offset:
+            self.offset = target
+        elif target >= self.offset + self._visible:
+            self.offset = target - self._visible + 1
+        self.selected = {self.key_of(self.rows[target])}
+        self.render()
+        item = self._items[target - self.offset]
+        self.tree.focus(item)
+        return "break"
+
+    def _on_resize(self, event=None) -> None:
+        """حساب عدد الصفوف الظاهرة من ارتفاع الـ Treeview"""
+        if not self._items:
+            self.render()
+            if not self._items:
+                return
+        bbox = self.tree.bbox(self._items[0])
+        if not bbox:
+            return
+        _, top, _, row_height = bbox
+        visible = max(1, (self.tree.winfo_height() - top) // max(1, row_height))
+        if visible != self._visible:
+            self._visible = visible
+            self.render()
+
+    def _on_press(self, event) -> None:
+        self._extend_selection = bool(event.state & _EXTEND_MASK)
+
+    def _on_select(self, event=None) -> None:
+        """مزامنة التحديد من الـ Treeview إلى المعرّفات"""
+        if self._rendering:
+            return
+        visible_keys = {self.key_of_item(item) for item in self._items}
+        chosen = {self.key_of_item(item) for item in self.tree.selection()}
+        if self._extend_selection:
+            self.selected = (self.selected - visible_keys) | chosen
+        else:
+            self.selected = chosen
+        self.selected.discard(None)
@@ -2,6 +2,10 @@
 شاشة إضافة طلب جديد
 """
 
+import threading
+
+from kivy.clock import Clock, mainthread
+from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDRaisedButton
@@ -10,15 +14,32 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.scrollview import MDScrollView
 from services.api_service import APIService
 
+# انتظار توقف الكتابة قبل طلب اقتراحات العملاء (ثانية)
+SUGGEST_DELAY = 0.3
+
 
 class AddJobScreen(MDScreen):
     """شاشة إضافة طلب جديد"""
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.api_service = APIService()
+        self.api_service = None
+        self._suggest_event = None
+        self._suggest_request = 0
+        self._suggest_menu = None
+        self._filling_suggestion = False
         self.build_ui()
     
+    def get_api_service(self):
+        """الحصول على API Service مع الرابط الصحيح"""
+        from kivymd.app import MDApp
+        app = MDApp.get_running_app()
+        if app and not self.api_service:
+            self.api_service = APIService(base_url=app.api_base_url)
+        elif not self.api_service:
+            self.api_service = APIService()
+        return self.api_service
+    
     def build_ui(self):
         """بناء واجهة المستخدم"""
         scroll = MDScrollView()
@@ -48,6 +69,7 @@ class AddJobScreen(MDScreen):
             size_hint_y=None,
             height=50
         )
+        self.customer_name_field.bind(text=self.on_customer_name_text)
         layout.add_widget(self.customer_name_field)
         
         # رقم الهاتف
@@ -136,6 +158,64 @@ class AddJobScreen(MDScreen):
         scroll.add_widget(layout)
         self.add_widget(scroll)
     
+    def on_customer_name_text(self, instance, text):
+        """طلب الاقتراحات بعد توقف الكتابة"""
+        if self._filling_suggestion:
+            return
+        if self._suggest_event:
+            self._suggest_event.cancel()
+        self._suggest_event = Clock.schedule_once(lambda dt: self.request_suggestions(text.strip()), SUGGEST_DELAY)
+    
+    def request_suggestions(self, query):
+        """جلب الاقتراحات في خيط منفصل حتى لا تتجمد الواجهة"""
+        self._suggest_request += 1
+        request_id = self._suggest_request
+        if not query:
+            self.dismiss_suggestions()
+            return
+        
+        api_service = self.get_api_service()
+        
+        def worker():
+            success, customers = api_service.suggest_customers(query)
+            self.show_suggestions(request_id, customers if success else [])
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    @mainthread
+    def show_suggestions(self, request_id, customers):
+        """عرض الاقتراحات تحت حقل الاسم"""
+        # رد قديم وصل بعد طلب أحدث
+        if request_id != self._suggest_request:
+            return
+        self.dismiss_suggestions()
+        if not customers:
+            return
+        
+        items = [
+            {
+                "viewclass": "OneLineListItem",
+                "text": f"{customer['name']} - {customer['phone']}",
+                "on_release": lambda customer=customer: self.choose_suggestion(customer),
+            }
+            for customer in customers
+        ]
+        self._suggest_menu = MDDropdownMenu(caller=self.customer_name_field, items=items, width_mult=5)
+        self._suggest_menu.open()
+    
+    def choose_suggestion(self, customer):
+        """ملء الاسم والهاتف من الاقتراح المختار"""
+        self._filling_suggestion = True
+        self.customer_name_field.text = customer['name']
+        self._filling_suggestion = False
+        self.phone_field.text = customer['phone'] or ""
+        self.dismiss_suggestions()
+    
+    def dismiss_suggestions(self):
+        if self._suggest_menu:
+            self._suggest_menu.dismiss()
+            self._suggest_menu = None
+    
     def save_job(self, instance):
         """حفظ الطلب"""
         # التحقق من الحقول المطلوبة
@@ -167,7 +247,11 @@ class AddJobScreen(MDScreen):
     
     def clear_fields(self):
         """مسح الحقول"""
+        self._suggest_request += 1
+        self.dismiss_suggestions()
+        self._filling_suggestion = True
         self.customer_name_field.text = ""
+        self._filling_suggestion = False
         self.phone_field.text = ""
         self.device_type_field.text = ""
         self.device_model_field.text = ""
@@ -10,6 +10,7 @@ from kivymd.uix.card import MDCard
 from kivymd.uix.scrollview import MDScrollView
 from kivymd.uix.textfield import MDTextField
 from services.api_service import APIService
+from services.event_listener import JobEventListener
 
 
 class JobsScreen(MDScreen):
@@ -19,6 +20,10 @@ class JobsScreen(MDScreen):
         super().__init__(**kwargs)
         self.api_service = None
         self.jobs = []
+        self.job_cards = {}  # رقم الطلب ← البطاقة (لتعديلها بدون إعادة بناء القائمة)
+        self.search_query = ''
+        self.loaded = False
+        self.event_listener = None
         self.build_ui()
     
     def get_api_service(self):
@@ -85,16 +90,22 @@ class JobsScreen(MDScreen):
     
     def on_enter(self):
         """عند دخول الشاشة"""
-        self.load_jobs()
+        # القائمة تبقى محدثة بأحداث الخادم - تُجلب مرة واحدة فقط
+        if not self.loaded:
+            self.load_jobs()
+        if self.event_listener is None:
+            self.event_listener = JobEventListener(self.get_api_service(), self.on_job_event)
+        self.event_listener.start()
     
     def load_jobs(self):
         """تحميل الطلبات"""
         # جلب الطلبات من API
         api_service = self.get_api_service()
-        success, jobs = api_service.get_jobs()
+        success, jobs = api_service.get_jobs(search=self.search_query or None)
         
         if success:
             self.jobs = jobs
+            self.loaded = True
             self.display_jobs()
         else:
             # عرض رسالة خطأ
@@ -103,11 +114,56 @@ class JobsScreen(MDScreen):
     def display_jobs(self):
         """عرض الطلبات"""
         self.jobs_layout.clear_widgets()
+        self.job_cards = {}
         
         for job in self.jobs:
             card = self.create_job_card(job)
+            self.job_cards[job.get('id')] = card
             self.jobs_layout.add_widget(card)
     
+    def on_job_event(self, event_type, data):
+        """تعديل القائمة بحدث من الخادم (خيط الواجهة) بدلاً من إعادة جلبها"""
+        if event_type == 'ready':
+            # اتصال جديد (ليس استئنافاً): ما تغير قبله لن يصل كأحداث
+            if not data.get('resumed') and self.loaded:
+                self.load_jobs()
+            return
+        if event_type == 'reload':
+            self.load_jobs()
+            return
+        
+        job_id = data.get('id')
+        index = next((i for i, job in enumerate(self.jobs) if job.get('id') == job_id), None)
+        if event_type == 'job-deleted':
+            if index is not None:
+                self.jobs.pop(index)
+                self.jobs_layout.remove_widget(self.job_cards.pop(job_id))
+        elif event_type in ('job-created', 'job-updated'):
+            job = data['job']
+            if index is not None:
+                self.jobs[index] = job
+                self.replace_card(job)
+            elif event_type == 'job-created' and not self.search_query:
+                # الأحدث أولاً (أول عنصر في children يظهر في الأسفل)
+                self.jobs.insert(0, job)
+                self.job_cards[job_id] = self.create_job_card(job)
+                self.jobs_layout.add_widget(self.job_cards[job_id], index=len(self.jobs_layout.children))
+        elif index is not None:
+            # status-changed / payment-changed: الحقول المتغيرة فقط
+            self.jobs[index].update(data)
+            self.replace_card(self.jobs[index])
+    
+    def replace_card(self, job):
+        """إعادة بناء بطاقة طلب واحد في مكانها"""
+        old_card = self.job_cards.get(job.get('id'))
+        if old_card is None:
+            return
+        position = self.jobs_layout.children.index(old_card)
+        self.jobs_layout.remove_widget(old_card)
+        card = self.create_job_card(job)
+        self.job_cards[job.get('id')] = card
+        self.jobs_layout.add_widget(card, index=position)
+    
     def create_job_card(self, job):
         """إنشاء بطاقة طلب"""
         card = MDCard(
@@ -149,13 +205,9 @@ class JobsScreen(MDScreen):
     
     def search_jobs(self, instance):
         """بحث في الطلبات"""
-        query = self.search_field.text
+        self.search_query = self.search_field.text
         # تنفيذ البحث
-        api_service = self.get_api_service()
-        success, jobs = api_service.get_jobs(search=query if query else None)
-        if success:
-            self.jobs = jobs
-            self.display_jobs()
+        self.load_jobs()
     
     def add_job(self, instance):
         """إضافة طلب جديد"""
@@ -2,12 +2,16 @@
 خدمة API للاتصال بـ Flask API - محسّنة للأداء والموثوقية
 """
 
+import json
 import requests
-from typing import Optional, Tuple, Dict, Any, List
+from typing import Optional, Tuple, Dict, Any, List, Iterator
 import time
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+# الخادم يرسل تعليقاً كل 15 ثانية على الأقل - صمت أطول = اتصال مقطوع
+EVENTS_READ_TIMEOUT = 60
+
 
 class APIService:
     """خدمة API محسّنة مع Retry و Timeout"""
@@ -17,6 +21,8 @@ class APIService:
         self.session = requests.Session()
         self.token = None
         self.timeout = 30  # 30 ثانية timeout
+        # آخر رد لكل رابط مع ETag: الخادم يرد 304 بدون بيانات إذا لم يتغير شيء
+        self._etag_cache: Dict[str, Tuple[str, Any]] = {}
         
         # إضافة retry strategy للتعامل مع مشاكل الشبكة
         retry_strategy = Retry(
@@ -29,6 +35,23 @@ class APIService:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
     
+    def _get_json(self, url: str) -> Tuple[int, Any]:
+        """GET مع If-None-Match - عند 304 يعيد آخر JSON محفوظ لنفس الرابط (200)"""
+        cached = self._etag_cache.get(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304 and cached:
+            return 200, cached[1]
+        if response.status_code != 200:
+            return response.status_code, None
+        
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            self._etag_cache[url] = (etag, data)
+        return 200, data
+    
     def login(self, password: str) -> Tuple[bool, Optional[str], Optional[Dict]]:
         """تسجيل الدخول (يستخدم كلمة مرور بسيطة)"""
         try:
@@ -63,10 +86,9 @@ class APIService:
                 if params:
                     url += "?" + "&".join(params)
                 
-                response = self.session.get(url, timeout=self.timeout)
+                status_code, data = self._get_json(url)
                 
-                if response.status_code == 200:
-                    data = response.json()
+                if status_code == 200:
                     return True, data.get('jobs', [])
                 else:
                     if attempt < max_retries - 1:
@@ -89,10 +111,10 @@ class APIService:
     def get_job(self, job_id: int) -> Tuple[bool, Optional[Dict]]:
         """جلب تفاصيل طلب"""
         try:
-            response = self.session.get(f"{self.base_url}/jobs/{job_id}")
+            status_code, data = self._get_json(f"{self.base_url}/jobs/{job_id}")
             
-            if response.status_code == 200:
-                return True, response.json()
+            if status_code == 200:
+                return True, data
             else:
                 return False, None
         except Exception as e:
@@ -258,26 +280,77 @@ class APIService:
     def get_stats(self) -> Tuple[bool, Optional[Dict]]:
         """جلب الإحصائيات"""
         try:
-            response = self.session.get(f"{self.base_url}/stats")
+            status_code, data = self._get_json(f"{self.base_url}/stats")
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
                 if data.get('success'):
                     return True, data.get('stats')
             return False, None
         except Exception as e:
             return False, None
     
-    def get_debts(self) -> Tuple[bool, List[Dict]]:
-        """جلب قائمة الديون"""
+    def suggest_customers(self, query: str, limit: int = 10) -> Tuple[bool, List[Dict]]:
+        """اقتراحات العملاء أثناء الكتابة: [{id, name, phone, job_count}]"""
         try:
-            response = self.session.get(f"{self.base_url}/debts")
+            # مهلة قصيرة: اقتراح متأخر لا فائدة منه
+            response = self.session.get(
+                f"{self.base_url}/customers/suggest",
+                params={'q': query, 'limit': limit},
+                timeout=5
+            )
             
             if response.status_code == 200:
                 data = response.json()
+                if data.get('success'):
+                    return True, data.get('customers', [])
+            return False, []
+        except Exception as e:
+            return False, []
+    
+    def get_debts(self) -> Tuple[bool, List[Dict]]:
+        """جلب قائمة الديون"""
+        try:
+            status_code, data = self._get_json(f"{self.base_url}/debts")
+            
+            if status_code == 200:
                 if data.get('success'):
                     return True, data.get('debts', [])
             return False, []
         except Exception as e:
             return False, []
-
+    
+    def iter_events(self, last_event_id: Optional[int] = None) -> Iterator[Tuple[Optional[int], str, Dict]]:
+        """أحداث تغييرات الطلبات من /api/events: (id، النوع، البيانات) حتى ينتهي الاتصال
+        
+        last_event_id يستأنف بعد آخر حدث وصل. الأخطاء (انقطاع، مهلة) تصل كاستثناء
+        requests، وينتهي المولد عند إغلاق الخادم للاتصال - الاستدعاء من جديد يكمل.
+        """
+        headers = {'Accept': 'text/event-stream'}
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = str(last_event_id)
+        
+        with self.session.get(f"{self.base_url}/events", headers=headers, stream=True,
+                              timeout=(self.timeout, EVENTS_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            
+            event_id, event_type, data = None, 'message', []
+            # chunk_size=None: كل حدث يُقرأ فور وصوله
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line:
+                    if line.startswith(':'):
+                        continue
+                    field, _, value = line.partition(':')
+                    value = value[1:] if value.startswith(' ') else value
+                    if field == 'id':
+                        event_id = int(value)
+                    elif field == 'event':
+                        event_type = value
+                    elif field == 'data':
+                        data.append(value)
+                    continue
+                
+                # سطر فارغ = نهاية الحدث
+                if data:
+                    yield event_id, event_type, json.loads('\n'.join(data))
+                event_type, data = 'message', []
@@ -0,0 +1,57 @@
+"""
+استقبال تغييرات الطلبات من الخادم (/api/events) في الخلفية
+
+الخيط يبقى متصلاً ويعيد الاتصال عند الانقطاع من آخر حدث وصل (Last-Event-ID)،
+فلا يضيع تغيير ولا يُعاد جلب القائمة. on_event(النوع، البيانات) يُستدعى في خيط
+الواجهة (Clock)، فيمكنه تعديل الـ widgets مباشرة.
+"""
+
+import threading
+from typing import Callable, Dict, Optional
+
+import requests
+from kivy.clock import Clock
+
+from services.api_service import APIService
+
+# انتظار قبل إعادة الاتصال (الخادم متوقف، أو رفض لكثرة الاتصالات)
+RECONNECT_DELAY = 3
+
+
+class JobEventListener:
+    """خيط واحد لأحداث الطلبات"""
+
+    def __init__(self, api_service: APIService, on_event: Callable[[str, Dict], None]):
+        self.api_service = api_service
+        self.on_event = on_event
+        self.last_event_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """الخيط ينتهي عند الحدث أو التعليق التالي من الخادم (15 ثانية على الأكثر)"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                for event_id, event_type, data in self.api_service.iter_events(self.last_event_id):
+                    if self._stop.is_set():
+                        return
+                    if event_id is not None:
+                        self.last_event_id = event_id
+                    Clock.schedule_once(lambda dt, t=event_type, d=data: self.on_event(t, d))
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️ انقطع اتصال التحديث المباشر: {e}")
+            self._stop.wait(RECONNECT_DELAY)
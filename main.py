@@ -2,6 +2,11 @@
 نظام إدارة الصيانة - ADR Maintenance System
 """
 
+import time
+
+# بداية قياس زمن التشغيل (قبل الاستيرادات الثقيلة)
+_STARTED_AT = time.perf_counter()
+
 import sys
 import os
 import customtkinter as ctk
@@ -13,15 +18,23 @@ from database.models import User, UserRole
 from utils.auth import hash_password
 from utils.logger import logger
 
+_IMPORTED_AT = time.perf_counter()
+
+
 class MaintenanceApp:
     def __init__(self):
+        # أزمنة مراحل التشغيل (ms) - تُسجل عند أول عرض للنافذة
+        self.startup_timings = {"import": (_IMPORTED_AT - _STARTED_AT) * 1000}
+        
         # تهيئة قاعدة البيانات أولاً (للموثوقية)
         logger.info("🔄 جاري تهيئة قاعدة البيانات...")
+        started = time.perf_counter()
         init_db()
         
         # إنشاء مستخدم افتراضي إذا لم يكن موجوداً
         self.create_default_user()
         self.current_user = self.get_default_user()
+        self.startup_timings["database"] = (time.perf_counter() - started) * 1000
         
         # تهيئة الواجهة
         self.setup_ui()
@@ -89,9 +102,24 @@ class MaintenanceApp:
         
         self.root.protocol("WM_DELETE_WINDOW", self.root.destroy)
 
+        started = time.perf_counter()
         self.open_main_window()
+        self.startup_timings["window"] = (time.perf_counter() - started) * 1000
+        
+        # after_idle ينفذ بعد أول رسم للنافذة
+        self.root.after_idle(self.report_startup_time)
         self.root.mainloop()
 
+    def report_startup_time(self):
+        """تسجيل زمن التشغيل حتى أول عرض للنافذة الرئيسية"""
+        self.startup_timings["first_paint"] = (time.perf_counter() - _STARTED_AT) * 1000
+        timings = self.startup_timings
+        logger.info(
+            f"⏱️ زمن التشغيل: أول عرض {timings['first_paint']:.0f}ms "
+            f"(استيراد {timings['import']:.0f}ms، قاعدة البيانات {timings['database']:.0f}ms، "
+            f"الواجهة {timings['window']:.0f}ms)"
+        )
+
     def open_main_window(self):
         """فتح الواجهة الرئيسية بعد تسجيل الدخول"""
         for widget in self.root.winfo_children():
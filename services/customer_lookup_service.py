@@ -0,0 +1,373 @@
+"""
+اقتراحات العملاء أثناء الكتابة (type-ahead) لنماذج الاستلام
+
+فهرس بادئات في الذاكرة (مشترك لكل الخيوط في العملية) لكل العملاء:
+
+- مفاتيح مرتبة: الاسم الكامل الموحّد، كل كلمة من الاسم، والهاتف الموحّد.
+  البحث عن بادئة = bisect على القائمة المرتبة.
+- البادئات القصيرة (حتى TOP_PREFIX_LENGTH حرف) لها قائمة جاهزة بأفضل
+  العملاء، لأن نطاقها قد يضم عشرات الآلاف ("7" أو "م").
+- الترتيب: تطابق تام ← بداية الاسم ← بداية كلمة، ثم عدد الطلبات (الأكثر تردداً).
+- يُحدَّث تزايدياً عند تغير وسوم jobs/customers في app_cache (عميل جديد يأتي
+  دائماً مع طلب جديد) ويُعاد بناؤه بالكامل كل INDEX_MAX_AGE ثانية.
+
+    success, message, customers = CustomerLookupService(db).suggest("احم")
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database.customer_search import normalize_phone
+from database.models import Customer, MaintenanceJob
+from database.search_index import compact_search_text, normalize_search_text
+from services.maintenance_service import CACHE_TAG_CUSTOMERS, CACHE_TAG_JOBS
+from utils.performance_cache import app_cache
+from utils.logger import service_logger as logger
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 20
+
+# البادئات حتى هذا الطول لها قائمة جاهزة بأفضل TOP_K عميل
+TOP_PREFIX_LENGTH = 3
+TOP_K = MAX_SUGGESTIONS
+
+# أقصى عدد مرشحين يُرتبون لبادئة أطول (النطاق عادة أصغر بكثير)
+MAX_SCAN = 5000
+
+# إعادة بناء كاملة دورياً (حذف عملاء/طلبات لا يظهر في التحديث التزايدي)
+INDEX_MAX_AGE = 600
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# بادئات أنواع المفاتيح
+NAME_KEY = "n:"
+TOKEN_KEY = "t:"
+PHONE_KEY = "p:"
+
+# ترتيب نوع المطابقة
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_TOKEN = 2
+
+_KEY_END = "\uffff"
+
+
+def _name_key(name: Optional[str]) -> str:
+    return " ".join(normalize_search_text(name).split())
+
+
+def _customer_keys(name_key: str, phone_key: str) -> List[str]:
+    keys = []
+    if name_key:
+        keys.append(NAME_KEY + name_key)
+        # الكلمة الأولى مغطاة ببداية الاسم الكامل
+        keys.extend(TOKEN_KEY + token for token in set(name_key.split()[1:]))
+    if phone_key:
+        keys.append(PHONE_KEY + phone_key)
+    return keys
+
+
+class CustomerIndex:
+    """فهرس بادئات العملاء - كل الدوال آمنة للاستدعاء من أكثر من خيط"""
+
+    def __init__(self, max_age: int = INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            # id → (الاسم، الهاتف، الاسم الموحّد، الهاتف الموحّد، عدد الطلبات، كلمات الاسم)
+            self._customers: Dict[int, tuple] = {}
+            self._keys: List[str] = []
+            self._ids: List[int] = []
+            self._top: Dict[str, List[int]] = {}
+            self.built_at: Optional[float] = None
+            self.synced_at: Optional[datetime] = None
+            self._generations: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    # ------------------------------------------------------------------
+    # المزامنة مع قاعدة البيانات
+    # ------------------------------------------------------------------
+    def ensure_fresh(self, db: Session) -> None:
+        """بناء الفهرس أو تحديثه إذا تغيرت الطلبات/العملاء منذ آخر مزامنة"""
+        generations = app_cache.tag_generations((CACHE_TAG_JOBS, CACHE_TAG_CUSTOMERS))
+        with self._lock:
+            if self.built_at is None or time.monotonic() - self.built_at > self.max_age:
+                self.build(db)
+            elif generations != self._generations:
+                self.sync(db)
+            # الوسوم قبل الاستعلام: كتابة أثناءه تؤدي لمزامنة أخرى
+            self._generations = generations
+
+    def build(self, db: Session) -> None:
+        """إعادة بناء الفهرس من كل العملاء"""
+        started = time.perf_counter()
+        synced_at = datetime.utcnow()
+        job_counts = dict(db.execute(
+            select(MaintenanceJob.customer_id, func.count(MaintenanceJob.id))
+            .group_by(MaintenanceJob.customer_id)
+        ).all())
+        rows = db.execute(select(Customer.id, Customer.name, Customer.phone)).all()
+
+        customers = {}
+        entries = []
+        for customer_id, name, phone in rows:
+            name_key = _name_key(name)
+            phone_key = normalize_phone(phone)
+            customers[customer_id] = (name or "", phone or "", name_key, phone_key,
+                                      job_counts.get(customer_id, 0), tuple(name_key.split()))
+            entries.extend((key, customer_id) for key in _customer_keys(name_key, phone_key))
+        entries.sort()
+
+        with self._lock:
+            self._customers = customers
+            self._keys = [key for key, _ in entries]
+            self._ids = [customer_id for _, customer_id in entries]
+            self._build_top_lists()
+            self.built_at = time.monotonic()
+            self.synced_at = synced_at
+        logger.info(f"⚡ فهرس العملاء: {len(customers)} عميل ({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def sync(self, db: Session) -> None:
+        """تحديث العملاء المعدّلين ومن لهم طلبات جديدة منذ آخر مزامنة"""
+        synced_at = datetime.utcnow()
+        since = self.synced_at - SYNC_OVERLAP
+        changed = db.execute(
+            select(Customer.id, Customer.name, Customer.phone).where(Customer.updated_at >= since)
+        ).all()
+        recent_customers = select(MaintenanceJob.customer_id).where(MaintenanceJob.created_at >= since)
+        job_counts = dict(db.execute(
+            select(MaintenanceJob.customer_id, func.count(MaintenanceJob.id))
+            .where(MaintenanceJob.customer_id.in_(recent_customers))
+            .group_by(MaintenanceJob.customer_id)
+        ).all())
+
+        with self._lock:
+            for customer_id, name, phone in changed:
+                current = self._customers.get(customer_id)
+                job_count = job_counts.pop(customer_id, current[4] if current else 0)
+                self._put(customer_id, name or "", phone or "", job_count)
+            for customer_id, job_count in job_counts.items():
+                current = self._customers.get(customer_id)
+                if current is not None and current[4] != job_count:
+                    self._put(customer_id, current[0], current[1], job_count)
+            self.synced_at = synced_at
+
+    def _put(self, customer_id: int, name: str, phone: str, job_count: int) -> None:
+        """إضافة عميل أو تحديثه (الاسم/الهاتف/عدد الطلبات)"""
+        self._remove(customer_id)
+        name_key = _name_key(name)
+        phone_key = normalize_phone(phone)
+        self._customers[customer_id] = (name, phone, name_key, phone_key, job_count, tuple(name_key.split()))
+        for key in _customer_keys(name_key, phone_key):
+            position = bisect.bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._ids.insert(position, customer_id)
+            self._add_to_top(key, customer_id)
+
+    def _remove(self, customer_id: int) -> None:
+        current = self._customers.pop(customer_id, None)
+        if current is None:
+            return
+        for key in _customer_keys(current[2], current[3]):
+            position = bisect.bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._ids[position] == customer_id:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+            # القائمة قد تنقص عن TOP_K حتى إعادة البناء التالية - يكملها البحث في النطاق
+            for prefix in self._short_prefixes(key):
+                top = self._top.get(prefix)
+                if top and customer_id in top:
+                    top.remove(customer_id)
+
+    # ------------------------------------------------------------------
+    # قوائم البادئات القصيرة
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _short_prefixes(key: str) -> Iterable[str]:
+        kind, value = key[:2], key[2:]
+        return (kind + value[:length] for length in range(1, min(TOP_PREFIX_LENGTH, len(value)) + 1))
+
+    def _popularity(self, customer_id: int) -> Tuple[int, str]:
+        customer = self._customers[customer_id]
+        return (-customer[4], customer[2])
+
+    def _build_top_lists(self) -> None:
+        candidates: Dict[str, List[int]] = {}
+        for key, customer_id in zip(self._keys, self._ids):
+            for prefix in self._short_prefixes(key):
+                candidates.setdefault(prefix, []).append(customer_id)
+        self._top = {
+            prefix: heapq.nsmallest(TOP_K, set(ids), key=self._popularity)
+            for prefix, ids in candidates.items()
+        }
+
+    def _add_to_top(self, key: str, customer_id: int) -> None:
+        score = self._popularity(customer_id)
+        for prefix in self._short_prefixes(key):
+            top = self._top.setdefault(prefix, [])
+            if customer_id in top:
+                top.remove(customer_id)
+            if len(top) >= TOP_K and score >= self._popularity(top[-1]):
+                continue
+            bisect.insort(top, customer_id, key=self._popularity)
+            del top[TOP_K:]
+
+    # ------------------------------------------------------------------
+    # البحث
+    # ------------------------------------------------------------------
+    def _exact_ids(self, key: str) -> List[int]:
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key, start)
+        return self._ids[start:end]
+
+    def _range(self, key_prefix: str) -> Tuple[int, int]:
+        """نطاق المفاتيح التي تبدأ بـ key_prefix (حتى MAX_SCAN مفتاح)"""
+        start = bisect.bisect_left(self._keys, key_prefix)
+        end = bisect.bisect_left(self._keys, key_prefix + _KEY_END, start, min(len(self._keys), start + MAX_SCAN))
+        return start, end
+
+    def _prefix_ids(self, key_prefix: str) -> List[int]:
+        """العملاء الذين يبدأ أحد مفاتيحهم بـ key_prefix (الأفضل فقط للبادئات القصيرة)"""
+        if len(key_prefix) - 2 <= TOP_PREFIX_LENGTH:
+            top = self._top.get(key_prefix)
+            if top is not None and len(top) >= TOP_K:
+                return top
+        start, end = self._range(key_prefix)
+        return self._ids[start:end]
+
+    def _range_size(self, key_prefix: str) -> int:
+        start, end = self._range(key_prefix)
+        return end - start
+
+    def search(self, query: str, limit: int = DEFAULT_SUGGESTIONS) -> List[Dict[str, Any]]:
+        """أفضل العملاء لنص مكتوب (بداية الاسم أو أي كلمة فيه أو الهاتف)"""
+        limit = max(1, min(limit or DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS))
+        compact = compact_search_text(query)
+        with self._lock:
+            if compact and compact.isdigit():
+                ranked = self._search_phone(normalize_phone(compact, partial=True))
+            else:
+                ranked = self._search_name(_name_key(query), limit)
+            best = heapq.nsmallest(limit, ranked.items(), key=lambda item: (item[1],) + self._popularity(item[0]))
+            return [self._suggestion(customer_id) for customer_id, _ in best]
+
+    def _search_phone(self, phone_key: str) -> Dict[int, int]:
+        if not phone_key:
+            return {}
+        ranked = dict.fromkeys(self._prefix_ids(PHONE_KEY + phone_key), RANK_PREFIX)
+        ranked.update(dict.fromkeys(self._exact_ids(PHONE_KEY + phone_key), RANK_EXACT))
+        return ranked
+
+    def _search_name(self, name_key: str, limit: int) -> Dict[int, int]:
+        words = name_key.split()
+        if not words:
+            return {}
+        # التطابق التام يُبحث عنه منفصلاً لأن قائمة البادئة القصيرة فيها الأكثر طلبات فقط
+        ranked = dict.fromkeys(self._prefix_ids(NAME_KEY + name_key), RANK_PREFIX)
+        ranked.update(dict.fromkeys(self._exact_ids(NAME_KEY + name_key), RANK_EXACT))
+        if len(ranked) >= limit:
+            # مطابقة بداية كلمة لا تتقدم أبداً على بداية الاسم
+            return ranked
+
+        if len(words) == 1:
+            for customer_id in self._prefix_ids(TOKEN_KEY + name_key):
+                ranked.setdefault(customer_id, RANK_TOKEN)
+            return ranked
+
+        # عدة كلمات: المرشحون من الكلمة الأقل نتائج، وكل الكلمات يجب أن تكون بدايات كلمات في الاسم
+        word = min(words, key=lambda w: self._range_size(TOKEN_KEY + w) + self._range_size(NAME_KEY + w))
+        customers = self._customers
+        # النطاق الكامل وليس قائمة الأفضل: المرشح الأشهر قد لا يطابق بقية الكلمات
+        for key_kind in (TOKEN_KEY, NAME_KEY):
+            start, end = self._range(key_kind + word)
+            for customer_id in self._ids[start:end]:
+                if customer_id in ranked:
+                    continue
+                tokens = customers[customer_id][5]
+                if all(any(token.startswith(w) for token in tokens) for w in words):
+                    ranked[customer_id] = RANK_TOKEN
+        return ranked
+
+    def _suggestion(self, customer_id: int) -> Dict[str, Any]:
+        name, phone, _, _, job_count, _ = self._customers[customer_id]
+        return {'id': customer_id, 'name': name, 'phone': phone, 'job_count': job_count}
+
+
+# فهرس واحد لكل عملية (الواجهة أو web_app.py)
+customer_index = CustomerIndex()
+
+
+class CustomerLookupService:
+    """البحث عن العملاء لنماذج الإضافة (الواجهة، /api، تطبيق Kivy)"""
+
+    def __init__(self, db: Session, index: CustomerIndex = customer_index):
+        self.db = db
+        self.index = index
+
+    def suggest(self, query: str, limit: int = DEFAULT_SUGGESTIONS) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        """اقتراحات مرتبة: [{id, name, phone, job_count}]"""
+        if not (query or "").strip():
+            return True, "", []
+        try:
+            self.index.ensure_fresh(self.db)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            return False, f"حدث خطأ أثناء البحث عن العملاء: {str(e)}", []
+        return True, "", self.index.search(query, limit)
+
+    def find_by_phone(self, phone: str) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        """العملاء بنفس الهاتف الموحّد (فهرس phone_normalized)"""
+        phone_key = normalize_phone(phone)
+        if not phone_key:
+            return True, "", []
+        try:
+            rows = self.db.execute(
+                select(Customer.id, Customer.name, Customer.phone)
+                .where(Customer.phone_normalized == phone_key)
+                .order_by(Customer.id)
+            ).all()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            return False, f"حدث خطأ أثناء البحث عن العميل: {str(e)}", []
+        return True, "", [{'id': row.id, 'name': row.name, 'phone': row.phone} for row in rows]
+
+    def warm(self) -> None:
+        """بناء الفهرس مسبقاً (في الخلفية) حتى لا يدفع أول اقتراح ثمن البناء"""
+        try:
+            self.index.ensure_fresh(self.db)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.warning(f"⚠️ تعذر بناء فهرس العملاء: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+    from database.connection import SessionLocal
+
+    db = SessionLocal()
+    try:
+        service = CustomerLookupService(db)
+        service.warm()
+        for query in sys.argv[1:] or ["ا", "احم", "70"]:
+            started = time.perf_counter()
+            success, message, customers = service.suggest(query)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            names = "، ".join(customer['name'] for customer in customers[:5])
+            print(f"{query}: {len(customers)} اقتراح ({elapsed_ms:.2f}ms) {names}")
+    finally:
+        db.close()
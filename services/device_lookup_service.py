@@ -0,0 +1,188 @@
+"""
+خدمة البحث عن جهاز بكود ممسوح (باركود / رقم تسلسلي / رقم تتبع) عند الاستلام
+
+ماسح الباركود (keyboard wedge) يكتب الكود ثم Enter خلال أجزاء من الثانية،
+لذلك يجب أن تصل النتيجة قبل أن ينتقل التركيز للحقل التالي:
+
+- سجل الأجهزة (device_codes) وطلبات الصيانة يُبحث فيهما بمطابقة تامة على
+  أعمدة مفهرسة؛ شرط serial_number = code OR tracking_code = code يُستبدل بـ
+  UNION لاستعلامين كل منهما على فهرسه.
+- سجل الحالات لكل طلبات الجهاز في استعلام واحد (بدلاً من استعلام لكل طلب).
+- النتيجة (حتى "غير موجود") تُخزن في app_cache وتُبطل مع أي كتابة على
+  الطلبات أو العملاء، و peek() يقرأها بدون قاعدة البيانات في خيط الواجهة.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, union
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload
+
+from database.models import DeviceCode, MaintenanceJob, StatusHistory
+from services.maintenance_service import CACHE_TAG_CUSTOMERS, CACHE_TAG_JOBS
+from utils.performance_cache import app_cache
+from utils.logger import service_logger as logger
+
+# سجل الأجهزة لا يرسل إشعار كتابة (يكتب فيه CodeService مباشرة) - المدة تحد من قدم النتيجة
+LOOKUP_CACHE_TTL = 300
+
+# أقصى عدد طلبات تُعرض في تاريخ الجهاز (الأحدث أولاً)
+MAX_HISTORY_JOBS = 50
+
+_CACHE_TAGS = (CACHE_TAG_JOBS, CACHE_TAG_CUSTOMERS)
+
+
+def normalize_device_code(code: Optional[str]) -> str:
+    """إزالة المسافات وأحرف التحكم التي يضيفها بعض الماسحات"""
+    return "".join(ch for ch in str(code or "") if ch.isprintable()).strip()
+
+
+def _cache_key(code: str) -> str:
+    return f"device_lookup:{code}"
+
+
+class DeviceLookupService:
+    """البحث عن جهاز وتاريخه بكود واحد"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def peek(code: str) -> Optional[Tuple[bool, str, Optional[Dict[str, Any]]]]:
+        """النتيجة المخزنة فقط (بدون قاعدة بيانات) - None إذا لم تُبحث مؤخراً"""
+        code = normalize_device_code(code)
+        if not code:
+            return None
+        return app_cache.get(_cache_key(code))
+
+    def lookup(self, code: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """البحث عن جهاز بالباركود أو الرقم التسلسلي أو رقم التتبع
+
+        النتيجة: (نجاح، رسالة، بيانات الجهاز أو None إذا لم يُعرف)
+        بيانات الجهاز: device (من سجل الأجهزة)، latest (آخر طلب: العميل والجهاز)،
+        serial_number, total_jobs, jobs (مع status_history لكل طلب).
+        """
+        code = normalize_device_code(code)
+        if not code:
+            return False, "الكود فارغ", None
+
+        cache_key = _cache_key(code)
+        cached_result = app_cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+        # الوسوم قبل الاستعلام: كتابة أثناءه تُبطل النتيجة فوراً
+        generations = app_cache.tag_generations(_CACHE_TAGS)
+        try:
+            device = self._find_registered_device(code)
+            jobs = self._find_jobs(code)
+        except SQLAlchemyError as e:
+            logger.warning(f"⚠️ تعذر البحث عن الجهاز {code}: {e}")
+            return False, f"حدث خطأ أثناء البحث عن الجهاز: {str(e)}", None
+
+        if device is None and not jobs:
+            result = (True, "جهاز غير مسجل", None)
+        else:
+            result = (True, "تم العثور على الجهاز", self._device_info(code, device, jobs))
+        app_cache.set(cache_key, result, ttl=LOOKUP_CACHE_TTL, tags=generations)
+        return result
+
+    def _find_registered_device(self, code: str) -> Optional[Dict[str, Any]]:
+        """سجل الأجهزة: device_serial و barcode فريدان (فهرس لكل منهما)"""
+        row = self.db.query(
+            DeviceCode.device_serial,
+            DeviceCode.barcode,
+            DeviceCode.device_type,
+            DeviceCode.device_model,
+            DeviceCode.customer_name
+        ).filter(
+            or_(DeviceCode.device_serial == code, DeviceCode.barcode == code)
+        ).order_by(DeviceCode.last_used_at.desc()).first()
+        return dict(row._mapping) if row else None
+
+    def _find_jobs(self, code: str) -> List[MaintenanceJob]:
+        """طلبات الجهاز مع العميل، الأحدث أولاً"""
+        # UNION لاستعلامين مفهرسين بدلاً من OR على عمودين
+        job_ids = union(
+            select(MaintenanceJob.id).where(MaintenanceJob.serial_number == code),
+            select(MaintenanceJob.id).where(MaintenanceJob.tracking_code == code.replace(" ", "").upper())
+        )
+        return self.db.query(MaintenanceJob)\
+                      .options(joinedload(MaintenanceJob.customer))\
+                      .filter(MaintenanceJob.id.in_(job_ids))\
+                      .order_by(MaintenanceJob.received_at.desc(), MaintenanceJob.id.desc())\
+                      .limit(MAX_HISTORY_JOBS)\
+                      .all()
+
+    def _status_history(self, job_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """سجل الحالات لكل الطلبات في استعلام واحد (idx_status_history_job_created)"""
+        history: Dict[int, List[Dict[str, Any]]] = {job_id: [] for job_id in job_ids}
+        if not job_ids:
+            return history
+        rows = self.db.query(
+            StatusHistory.maintenance_job_id,
+            StatusHistory.status,
+            StatusHistory.created_at,
+            StatusHistory.notes
+        ).filter(
+            StatusHistory.maintenance_job_id.in_(job_ids)
+        ).order_by(StatusHistory.maintenance_job_id, StatusHistory.created_at).all()
+        for job_id, status, created_at, notes in rows:
+            history[job_id].append({'status': status, 'created_at': created_at, 'notes': notes})
+        return history
+
+    def _device_info(self, code: str, device: Optional[Dict[str, Any]], jobs: List[MaintenanceJob]) -> Dict[str, Any]:
+        history = self._status_history([job.id for job in jobs])
+        job_infos = [
+            {
+                'id': job.id,
+                'tracking_code': job.tracking_code,
+                'customer_name': job.customer.name if job.customer else None,
+                'customer_phone': job.customer.phone if job.customer else None,
+                'device_type': job.device_type,
+                'device_model': job.device_model,
+                'serial_number': job.serial_number,
+                'received_at': job.received_at,
+                'completed_at': job.completed_at,
+                'current_status': job.status,
+                'status_history': history[job.id],
+            }
+            for job in jobs
+        ]
+
+        # بيانات التعبئة: آخر طلب أولاً ثم سجل الأجهزة
+        latest = dict(job_infos[0]) if job_infos else {}
+        if device:
+            for field, device_field in (('customer_name', 'customer_name'), ('device_type', 'device_type'),
+                                        ('device_model', 'device_model'), ('serial_number', 'device_serial')):
+                if not latest.get(field):
+                    latest[field] = device.get(device_field)
+
+        return {
+            'serial_number': code,
+            'device': device,
+            'latest': latest,
+            'total_jobs': len(job_infos),
+            'jobs': job_infos,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from database.connection import SessionLocal
+
+    db = SessionLocal()
+    try:
+        service = DeviceLookupService(db)
+        for scanned in sys.argv[1:] or ["A1"]:
+            started = time.perf_counter()
+            success, message, info = service.lookup(scanned)
+            cold_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            service.lookup(scanned)
+            warm_ms = (time.perf_counter() - started) * 1000
+            total = info['total_jobs'] if info else 0
+            print(f"{scanned}: {message} ({total} طلب) - أول بحث {cold_ms:.1f}ms، من الذاكرة {warm_ms:.2f}ms")
+    finally:
+        db.close()
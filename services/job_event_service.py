@@ -0,0 +1,191 @@
+"""
+أحداث تغييرات الطلبات للعملاء المتصلين (Server-Sent Events على /api/events)
+
+المصدر هو change_log: كل كتابة في MaintenanceService تسجل صفاً فيه داخل نفس
+المعاملة، فالأحداث تصل من كل العمليات (واجهة سطح المكتب وعمليات web_server.py)،
+ورقم الصف هو id الحدث: العميل الذي ينقطع يعيد الاتصال بـ Last-Event-ID ويستلم
+ما فاته فقط.
+
+- عدة صفوف لنفس الطلب في دفعة واحدة = حدث واحد بآخر رقم (بالبيانات الحالية)
+- البيانات بأقل حجم: الحالة لـ status-changed، حقول الدفع لـ payment-changed،
+  الصف كاملاً (بصيغة /api/jobs) لطلب جديد أو معدّل فقط، والرقم فقط للمحذوف
+- فجوة أكبر من MAX_EVENTS_PER_BATCH، أو سجلات حُذفت بالتنظيف = حدث reload
+  واحد (العميل يعيد تحميل القائمة)
+- الدفعة تُبنى مرة واحدة لكل العملاء المتصلين في نفس الموضع (app_cache)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database.change_log import (
+    ENTITY_JOBS, ENTITY_PAYMENTS, ACTION_INSERT, ACTION_DELETE, ACTION_STATUS, MAX_CHANGES_PER_POLL,
+    latest_version, commits_in_id_order, committed_changes
+)
+from database.models import ChangeLog
+from services.maintenance_service import MaintenanceService
+from utils.performance_cache import app_cache
+
+EVENT_READY = "ready"
+EVENT_RELOAD = "reload"
+EVENT_JOB_CREATED = "job-created"
+EVENT_JOB_UPDATED = "job-updated"
+EVENT_STATUS_CHANGED = "status-changed"
+EVENT_PAYMENT_CHANGED = "payment-changed"
+EVENT_JOB_DELETED = "job-deleted"
+
+# الإنشاء والحذف يحلان محل أي تغيير سابق للطلب في نفس الدفعة
+_REPLACING_EVENTS = (EVENT_JOB_CREATED, EVENT_JOB_DELETED)
+
+MAX_EVENTS_PER_BATCH = MAX_CHANGES_PER_POLL
+
+# الدفعة محددة بـ (من، إلى) فلا تحتاج إبطالاً - المدة لتنظيف الذاكرة فقط
+EVENTS_CACHE_TTL = 30
+
+PAYMENT_FIELDS = ("payment_status", "payment_method", "final_cost", "total_paid", "remaining")
+
+
+class JobEvent:
+    """حدث واحد: id (رقم change_log)، النوع، البيانات"""
+
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, event_id: int, event_type: str, data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"JobEvent({self.id}, {self.type!r}, {self.data!r})"
+
+
+def _event_type(entity: str, action: str) -> Optional[str]:
+    """نوع الحدث لصف change_log - None للعملاء والإعدادات"""
+    if entity == ENTITY_PAYMENTS:
+        return EVENT_PAYMENT_CHANGED
+    if entity != ENTITY_JOBS:
+        return None
+    if action == ACTION_INSERT:
+        return EVENT_JOB_CREATED
+    if action == ACTION_DELETE:
+        return EVENT_JOB_DELETED
+    if action == ACTION_STATUS:
+        return EVENT_STATUS_CHANGED
+    return EVENT_JOB_UPDATED
+
+
+class JobEventService:
+    """قراءة أحداث الطلبات من change_log"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def latest_event_id(self) -> int:
+        """رقم آخر حدث (بداية اتصال بدون Last-Event-ID)"""
+        return latest_version(self.db)
+
+    def events_since(self, since: int) -> Tuple[bool, str, List[JobEvent], int]:
+        """الأحداث بعد since مرتبة حسب id
+
+        Returns:
+            (نجاح، رسالة، الأحداث، آخر رقم تمت قراءته - since للاستدعاء التالي)
+        """
+        try:
+            table = ChangeLog.__table__
+            oldest, latest = self.db.execute(select(func.min(table.c.id), func.max(table.c.id))).one()
+            latest = latest or 0
+            if latest == since:
+                return True, "لا توجد تغييرات", [], since
+
+            ordered = commits_in_id_order(self.db.get_bind())
+            cache_key = f"job_events:{since}:{latest}"
+            if ordered:
+                cached_result = app_cache.get(cache_key)
+                if cached_result is not None:
+                    return cached_result
+
+            rows = []
+            # since أكبر من آخر رقم = قاعدة بيانات أخرى (استعادة نسخة احتياطية)
+            full_reload = since > latest or (oldest or 0) > since + 1
+            if not full_reload:
+                rows = self.db.execute(
+                    table.select()
+                    .with_only_columns(table.c.id, table.c.entity, table.c.entity_id, table.c.action,
+                                       table.c.changed_at)
+                    .where(table.c.id > since, table.c.id <= latest)
+                    .order_by(table.c.id)
+                    .limit(MAX_EVENTS_PER_BATCH + 1)
+                ).all()
+                full_reload = len(rows) > MAX_EVENTS_PER_BATCH
+            if not full_reload and not ordered:
+                # الأحداث حتى أول رقم ناقص فقط - الدفعة تُحفظ حسب ما قُرئ فعلاً
+                rows, latest = committed_changes(rows, since, latest, ordered)
+                if latest == since:
+                    return True, "لا توجد تغييرات", [], since
+                cache_key = f"job_events:{since}:{latest}"
+                cached_result = app_cache.get(cache_key)
+                if cached_result is not None:
+                    return cached_result
+        except SQLAlchemyError as e:
+            return False, f"حدث خطأ أثناء قراءة التغييرات: {str(e)}", [], since
+
+        if full_reload:
+            events = [JobEvent(latest, EVENT_RELOAD, {})]
+        else:
+            success, message, events = self._build_events(rows)
+            if not success:
+                return False, message, [], since
+
+        result = (True, f"{len(events)} حدث", events, latest)
+        app_cache.set(cache_key, result, ttl=EVENTS_CACHE_TTL)
+        return result
+
+    def _build_events(self, rows) -> Tuple[bool, str, List[JobEvent]]:
+        # لكل طلب: نوع الحدث ← آخر رقم
+        pending: Dict[int, Dict[str, int]] = {}
+        for row in rows:
+            event_type = _event_type(row.entity, row.action)
+            if event_type is None:
+                continue
+            job_events = pending.setdefault(row.entity_id, {})
+            if event_type in _REPLACING_EVENTS:
+                job_events.clear()
+                job_events[event_type] = row.id
+            elif EVENT_JOB_CREATED in job_events or EVENT_JOB_DELETED in job_events:
+                # حدث الإنشاء يحمل البيانات الحالية، والمحذوف لا بيانات له
+                job_events[next(iter(job_events))] = row.id
+            else:
+                job_events[event_type] = row.id
+
+        # صفوف الطلبات بصيغة /api/jobs في استعلام واحد
+        job_ids = [job_id for job_id, job_events in pending.items() if EVENT_JOB_DELETED not in job_events]
+        job_rows: Dict[int, Dict[str, Any]] = {}
+        if job_ids:
+            success, message, jobs, _ = MaintenanceService(self.db).search_jobs_page(job_ids=job_ids, limit=len(job_ids))
+            if not success:
+                return False, message, []
+            job_rows = {job["id"]: job for job in jobs}
+
+        events = []
+        for job_id, job_events in pending.items():
+            job = job_rows.get(job_id)
+            for event_type, event_id in job_events.items():
+                if event_type == EVENT_JOB_DELETED:
+                    events.append(JobEvent(event_id, event_type, {"id": job_id}))
+                elif job is None:
+                    # حُذف بعد هذه الدفعة - حدث الحذف يصل في الدفعة التالية
+                    continue
+                elif event_type == EVENT_STATUS_CHANGED:
+                    events.append(JobEvent(event_id, event_type, {
+                        "id": job_id, "tracking_code": job["tracking_code"], "status": job["status"]
+                    }))
+                elif event_type == EVENT_PAYMENT_CHANGED:
+                    data = {"id": job_id}
+                    data.update((field, job[field]) for field in PAYMENT_FIELDS)
+                    events.append(JobEvent(event_id, event_type, data))
+                else:
+                    events.append(JobEvent(event_id, event_type, {"id": job_id, "job": job}))
+        events.sort(key=lambda event: event.id)
+        return True, f"{len(events)} حدث", events
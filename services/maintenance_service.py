@@ -2,32 +2,83 @@
 خدمات إدارة الصيانة
 """
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict, Any, List
 from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, and_, or_, exists, text
+from sqlalchemy import func, and_, or_, exists, text, select, literal_column, union
 import random
 import string
 import re
 import config
 from config import WHATSAPP_RECEIVED_MESSAGE, WHATSAPP_REPAIRED_MESSAGE, WHATSAPP_DELIVERED_MESSAGE
 
+from database.connection import SessionLocal
 from database.models import (
     MaintenanceJob, Customer, User, MaintenanceStatus,
-    StatusHistory, UsedPart, Part, Payment, PaymentStatus, SystemSettings, JobExpense
+    StatusHistory, UsedPart, Part, Payment, PaymentStatus, SystemSettings, JobExpense,
+    JobDailyStat, AccountTransaction
 )
+from database.tracking_sequences import (
+    normalize_prefix, peek_next_number, allocate_next_number, bump_to_at_least
+)
+from database.daily_stats import (
+    BASIS_RECEIVED, BASIS_DELIVERED, PERIOD_PREVIOUS, job_snapshot, load_snapshots,
+    apply_job_change, apply_changes, stats_query, report_breakdown
+)
+from database.pagination import encode_cursor, decode_cursor, keyset_after
+from database.change_log import (
+    ENTITY_JOBS, ENTITY_PAYMENTS, ENTITY_CUSTOMERS, ENTITY_SETTINGS, ACTION_INSERT, ACTION_DELETE, ACTION_STATUS,
+    record_change
+)
+from database.search_index import (
+    FTS_TABLE, is_fts_available, build_match_query, normalize_search_text, pg_normalized
+)
+from database.customer_search import normalize_phone
 
 # استيراد نظام Cache المتقدم
 from utils.performance_cache import app_cache, cached
 from utils.logger import service_logger as logger
 
+# وسوم الـ cache: كل كتابة تستدعي app_cache.bump() للوسوم التي تغيّرت بياناتها،
+# وكل قراءة مخزنة تُوسم بالبيانات التي تعتمد عليها
+CACHE_TAG_JOBS = "jobs"
+CACHE_TAG_PAYMENTS = "payments"
+CACHE_TAG_CUSTOMERS = "customers"
+
+# العمليات الجماعية المتاحة (bulk_apply / POST /api/jobs/bulk)
+BULK_DELETE = "delete"
+BULK_STATUS = "status"
+BULK_PAYMENT = "payment"
+BULK_ACTIONS = (BULK_DELETE, BULK_STATUS, BULK_PAYMENT)
+
+PAYMENT_STATUSES = ("paid", "unpaid")
+PAYMENT_METHODS = ("cash", "wish_money")
+
+JOBS_NOT_FOUND = "طلبات الصيانة غير موجودة"
+
+
+def _unique_job_ids(job_ids) -> List[int]:
+    """ترتيب الإدخال بدون تكرار (مربعات التحديد قد تُرسل نفس الطلب مرتين)"""
+    return list(dict.fromkeys(int(job_id) for job_id in job_ids))
+
+
 class MaintenanceService:
     """خدمات إدارة الصيانة"""
     
     def __init__(self, db: Session):
         self.db = db
     
+    @contextmanager
+    def detached_copy(self):
+        """نسخة من الخدمة بجلسة مستقلة (لتحديث الـ cache في الخلفية بعد إغلاق جلسة المستدعي)"""
+        db = SessionLocal(bind=self.db.get_bind())
+        try:
+            yield type(self)(db)
+        finally:
+            db.close()
+    
     def convert_currency(self, amount: float, from_currency: str, to_currency: str) -> float:
         """تحويل العملة بين الدولار والليرة اللبنانية"""
         if from_currency == to_currency:
@@ -53,77 +104,28 @@ class MaintenanceService:
         return f"{amount:,.2f} {symbol}"
     
     def generate_tracking_code(self, code_type: str = "A") -> str:
-        """إنشاء رمز تتبع فريد حسب النوع المحدد - محسّن للأداء بشكل خارق
+        """الكود التالي المتوقع لنوع معين - للعرض فقط بدون حجز الرقم
         
-        ملاحظة: لا نستخدم Cache هنا لأن كل كود يجب أن يكون فريداً
-        لكن الاستعلام محسّن جداً ليكون سريعاً بدون cache
+        الرقم يُقرأ من جدول tracking_code_sequences (بحث على المفتاح الأساسي)
+        بدلاً من مسح جميع أكواد التتبع. الحجز الفعلي يتم في create_maintenance_job.
         """
-        # تحويل نوع الكود إلى أحرف كبيرة وإزالة المسافات للاتساق
-        code_type = code_type.upper().strip()
+        code_type = normalize_prefix(code_type)
         
         try:
-            # استخدام استعلام SQL محسّن جداً - استخراج أكبر رقم مباشرة من قاعدة البيانات
-            # هذا أسرع بكثير من جلب 100 كود ومعالجتها في Python
-            sql_query = text("""
-                SELECT MAX(CAST(
-                    SUBSTR(
-                        REPLACE(UPPER(TRIM(tracking_code)), ' ', ''),
-                        LENGTH(:code_type) + 1
-                    ) AS INTEGER
-                )) as max_num
-                FROM maintenance_jobs 
-                WHERE UPPER(REPLACE(TRIM(tracking_code), ' ', '')) LIKE :pattern
-                AND SUBSTR(REPLACE(UPPER(TRIM(tracking_code)), ' ', ''), 1, LENGTH(:code_type)) = :code_type
-                AND SUBSTR(REPLACE(UPPER(TRIM(tracking_code)), ' ', ''), LENGTH(:code_type) + 1) GLOB '[0-9]*'
-            """)
-            
-            result = self.db.execute(sql_query, {
-                "pattern": f"{code_type}%",
-                "code_type": code_type
-            })
-            row = result.fetchone()
-            max_number = row[0] if row and row[0] is not None else 0
-            
-            # إرجاع الكود التالي
-            new_number = max_number + 1
-            return f"{code_type}{new_number}"
-            
-        except Exception as e:
-            # في حالة حدوث أي خطأ، جرب الطريقة البديلة المحسّنة
-            try:
-                # طريقة بديلة محسّنة: استخدام ORM مع limit أصغر
-                recent_codes = self.db.query(MaintenanceJob.tracking_code)\
-                                     .filter(MaintenanceJob.tracking_code.ilike(f'{code_type}%'))\
-                                     .order_by(MaintenanceJob.id.desc())\
-                                     .limit(50)\
-                                     .all()
-                
-                if not recent_codes:
-                    return f"{code_type}1"
-                
-                max_number = 0
-                import re
-                
-                for code_tuple in recent_codes:
-                    code = code_tuple[0] if isinstance(code_tuple, tuple) else code_tuple
-                    if code:
-                        code_clean = str(code).replace(" ", "").upper().strip()
-                        if code_clean.startswith(code_type):
-                            try:
-                                code_without_prefix = code_clean[len(code_type):].strip()
-                                if code_without_prefix:
-                                    match = re.search(r'^\d+', code_without_prefix)
-                                    if match:
-                                        number = int(match.group())
-                                        if number > max_number:
-                                            max_number = number
-                            except:
-                                continue
-                
-                return f"{code_type}{max_number + 1}"
-            except:
-                # في حالة فشل جميع المحاولات، ابدأ من 1
-                return f"{code_type}1"
+            return f"{code_type}{peek_next_number(self.db, code_type)}"
+        except SQLAlchemyError as e:
+            logger.warning(f"⚠️ تعذر قراءة تسلسل الأكواد للنوع {code_type}: {e}")
+            return f"{code_type}1"
+    
+    def _allocate_tracking_code(self, code_type: str) -> str:
+        """حجز كود تتبع جديد بشكل ذري داخل المعاملة الحالية"""
+        code_type = normalize_prefix(code_type)
+        
+        # تخطي أي رقم مستخدم مسبقاً (أكواد أُدخلت قبل إنشاء التسلسل)
+        while True:
+            tracking_code = f"{code_type}{allocate_next_number(self.db, code_type)}"
+            if not self.db.query(exists().where(MaintenanceJob.tracking_code == tracking_code)).scalar():
+                return tracking_code
     
     def create_maintenance_job(
         self,
@@ -143,25 +145,23 @@ class MaintenanceService:
     ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """إنشاء طلب صيانة جديد"""
         try:
-            # البحث عن العميل أو إنشاؤه (محسّن مع فهرس على name و phone)
-            customer = self.db.query(Customer).filter(
-                Customer.name == customer_name,
-                Customer.phone == phone
-            ).first()
+            # البحث عن العميل أو إنشاؤه: نفس الهاتف الموحّد (فهرس) ونفس الاسم بعد التوحيد
+            customer = self._find_customer(customer_name, phone)
             
             if not customer:
                 # إنشاء عميل جديد
                 customer = Customer(
                     name=customer_name,
                     phone=phone,
+                    phone_normalized=normalize_phone(phone),
                     email=email,
                     address=address
                 )
                 self.db.add(customer)
                 self.db.flush()  # للحصول على ID العميل
             
-            # إنشاء رمز التتبع
-            tracking_code = self.generate_tracking_code(code_type)
+            # حجز رمز التتبع (القفل يبقى حتى commit لضمان عدم التكرار)
+            tracking_code = self._allocate_tracking_code(code_type)
             
             # تحويل التكلفة إلى الدولار إذا كانت بالليرة اللبنانية
             if estimated_cost_currency == "LBP" and estimated_cost > 0:
@@ -188,6 +188,9 @@ class MaintenanceService:
             
             self.db.add(job)
             
+            # تحديث التجميع اليومي في نفس المعاملة
+            apply_job_change(self.db, None, job_snapshot(job))
+            
             # تسجيل تغيير الحالة
             status_history = StatusHistory(
                 maintenance_job=job,
@@ -196,7 +199,12 @@ class MaintenanceService:
             )
             self.db.add(status_history)
             
+            # إشعار العمليات الأخرى (يحتاج id الطلب)
+            self.db.flush()
+            record_change(self.db, ENTITY_JOBS, [job.id], ACTION_INSERT)
+            
             self.db.commit()
+            app_cache.bump(CACHE_TAG_JOBS)
             
             # إرجاع بيانات الطلب
             job_data = {
@@ -216,6 +224,26 @@ class MaintenanceService:
             self.db.rollback()
             return False, f"حدث خطأ أثناء إنشاء طلب الصيانة: {str(e)}", None
     
+    def _find_customer(self, customer_name: str, phone: str) -> Optional[Customer]:
+        """العميل الموجود بنفس الهاتف والاسم ("70-123 456"/"أحمد" == "70123456"/"احمد")"""
+        phone_key = normalize_phone(phone)
+        if not phone_key:
+            # هاتف غير رقمي (مثل "غير محدد") - مطابقة حرفية كما كُتب
+            return self.db.query(Customer).filter(
+                Customer.name == customer_name,
+                Customer.phone == phone
+            ).first()
+        
+        name_key = normalize_search_text(customer_name)
+        candidates = self.db.query(Customer)\
+                            .filter(Customer.phone_normalized == phone_key)\
+                            .order_by(Customer.id)\
+                            .all()
+        for candidate in candidates:
+            if normalize_search_text(candidate.name) == name_key:
+                return candidate
+        return None
+    
     def update_customer(
         self,
         customer_id: int,
@@ -234,12 +262,15 @@ class MaintenanceService:
             self.db.query(Customer).filter(Customer.id == customer_id).update({
                 "name": name,
                 "phone": phone,
+                "phone_normalized": normalize_phone(phone),
                 "email": email,
                 "address": address,
                 "updated_at": datetime.utcnow()
             }, synchronize_session=False)
+            record_change(self.db, ENTITY_CUSTOMERS, [customer_id])
             
             self.db.commit()
+            app_cache.bump(CACHE_TAG_CUSTOMERS)
             return True, "تم تحديث بيانات العميل بنجاح"
             
         except SQLAlchemyError as e:
@@ -260,8 +291,9 @@ class MaintenanceService:
     ) -> Tuple[bool, str]:
         """تحديث بيانات طلب الصيانة - محسّن"""
         try:
-            # استخدام exists() للتحقق من وجود الطلب (أسرع)
-            if not self.db.query(exists().where(MaintenanceJob.id == job_id)).scalar():
+            # جلب الحقول المؤثرة في التجميع اليومي فقط (يتحقق أيضاً من وجود الطلب)
+            before = load_snapshots(self.db, [job_id]).get(job_id)
+            if not before:
                 return False, "طلب الصيانة غير موجود"
             
             if tracking_code:
@@ -299,13 +331,17 @@ class MaintenanceService:
                 update_dict, synchronize_session=False
             )
             
+            # الكود اليدوي قد يتجاوز آخر رقم محجوز - رفع التسلسل لتجنب التكرار لاحقاً
+            if tracking_code:
+                bump_to_at_least(self.db, tracking_code)
+            
+            apply_job_change(self.db, before, dict(before, **update_dict))
+            record_change(self.db, ENTITY_JOBS, [job_id])
+            
             self.db.commit()
             
             # مسح Cache بعد التحديث
-            app_cache.invalidate_pattern("search_jobs")
-            app_cache.invalidate_pattern("get_jobs")
-            app_cache.invalidate_pattern("get_dashboard_stats")
-            app_cache.invalidate_pattern("get_report_data")
+            app_cache.bump(CACHE_TAG_JOBS)
             
             return True, "تم تحديث بيانات طلب الصيانة بنجاح"
             
@@ -344,53 +380,21 @@ class MaintenanceService:
         return self.generate_tracking_code(code_type)
     
     def get_available_tracking_codes(self, code_type: str) -> List[str]:
-        """الحصول على قائمة بالأكواد المتاحة لنوع معين - محسّن"""
+        """الحصول على قائمة بالأكواد المتاحة لنوع معين - من جدول التسلسل"""
+        code_type = normalize_prefix(code_type)
         try:
-            # استخدام scalar بدلاً من first() لتحسين الأداء
-            last_code = self.db.query(MaintenanceJob.tracking_code)\
-                              .filter(MaintenanceJob.tracking_code.like(f'{code_type}%'))\
-                              .order_by(MaintenanceJob.id.desc())\
-                              .limit(1)\
-                              .scalar()
-            
-            if not last_code:
-                return [f"{code_type}1"]
-            
-            # استخراج الرقم من آخر كود
-            if last_code.startswith(code_type):
-                try:
-                    number = int(last_code[1:])
-                    # إرجاع الأكواد المتاحة (الآخر + 5 أكواد إضافية)
-                    return [f"{code_type}{i}" for i in range(number + 1, number + 6)]
-                except ValueError:
-                    return [f"{code_type}1"]
-            else:
-                return [f"{code_type}1"]
-                
+            number = peek_next_number(self.db, code_type)
+            # إرجاع الأكواد المتاحة (التالي + 4 أكواد إضافية)
+            return [f"{code_type}{i}" for i in range(number, number + 5)]
         except SQLAlchemyError:
             return [f"{code_type}1"]
     
     def delete_job(self, job_id: int) -> Tuple[bool, str]:
         """حذف طلب صيانة - محسّن"""
-        try:
-            # استخدام exists() للتحقق من وجود الطلب (أسرع من first())
-            if not self.db.query(exists().where(MaintenanceJob.id == job_id)).scalar():
-                return False, "طلب الصيانة غير موجود"
-            
-            # حذف السجلات المرتبطة دفعة واحدة (أسرع)
-            self.db.query(StatusHistory).filter_by(maintenance_job_id=job_id).delete(synchronize_session=False)
-            self.db.query(UsedPart).filter_by(maintenance_job_id=job_id).delete(synchronize_session=False)
-            self.db.query(Payment).filter_by(maintenance_job_id=job_id).delete(synchronize_session=False)
-            
-            # حذف طلب الصيانة
-            self.db.query(MaintenanceJob).filter(MaintenanceJob.id == job_id).delete(synchronize_session=False)
-            self.db.commit()
-            
-            return True, "تم حذف طلب الصيانة بنجاح"
-            
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            return False, f"حدث خطأ أثناء حذف طلب الصيانة: {str(e)}"
+        success, message, deleted_count = self.bulk_delete_jobs([job_id])
+        if message == JOBS_NOT_FOUND:
+            return False, "طلب الصيانة غير موجود"
+        return success, "تم حذف طلب الصيانة بنجاح" if success else message
     
     def update_job_status(
         self,
@@ -410,6 +414,7 @@ class MaintenanceService:
             if new_status not in valid_statuses:
                 return False, f"حالة غير صالحة. الحالات المتاحة: {', '.join(valid_statuses)}"
             
+            before = job_snapshot(job)
             old_status = job.status
             job.status = new_status
             
@@ -420,6 +425,8 @@ class MaintenanceService:
             elif new_status == "delivered":
                 job.delivered_at = now
             
+            apply_job_change(self.db, before, job_snapshot(job))
+            
             # تسجيل تغيير الحالة
             status_history = StatusHistory(
                 maintenance_job_id=job_id,
@@ -428,15 +435,12 @@ class MaintenanceService:
                 changed_by_id=user_id
             )
             self.db.add(status_history)
+            record_change(self.db, ENTITY_JOBS, [job_id], ACTION_STATUS)
             
             self.db.commit()
             
             # مسح Cache بعد التحديث
-            app_cache.invalidate_pattern("search_jobs")
-            app_cache.invalidate_pattern("get_jobs")
-            app_cache.invalidate_pattern("get_dashboard_stats")
-            app_cache.invalidate_pattern("get_unpaid_jobs")
-            app_cache.invalidate_pattern("get_report_data")
+            app_cache.bump(CACHE_TAG_JOBS)
             
             return True, f"تم تحديث حالة الطلب من '{old_status}' إلى '{new_status}'"
             
@@ -444,15 +448,57 @@ class MaintenanceService:
             self.db.rollback()
             return False, f"حدث خطأ أثناء تحديث حالة الطلب: {str(e)}"
     
-    def batch_update_job_status(
+    # ------------------------------------------------------------------
+    # العمليات الجماعية: معاملة واحدة لكل العملية + إبطال cache واحد
+    # ------------------------------------------------------------------
+    def bulk_delete_jobs(self, job_ids: List[int]) -> Tuple[bool, str, int]:
+        """حذف عدة طلبات مع سجلاتها المرتبطة في معاملة واحدة"""
+        try:
+            job_ids = _unique_job_ids(job_ids)
+            if not job_ids:
+                return False, "لم يتم تحديد أي طلبات", 0
+            
+            # الطلبات الموجودة فعلاً مع الحقول المؤثرة في التجميع اليومي (استعلام واحد)
+            before_snapshots = load_snapshots(self.db, job_ids)
+            existing_ids = list(before_snapshots.keys())
+            if not existing_ids:
+                return False, JOBS_NOT_FOUND, 0
+            
+            # السجلات المرتبطة: عبارة DELETE واحدة لكل جدول
+            for child in (StatusHistory, UsedPart, Payment, JobExpense):
+                self.db.query(child)\
+                    .filter(child.maintenance_job_id.in_(existing_ids))\
+                    .delete(synchronize_session=False)
+            # حركات حساب العميل تبقى في كشف الحساب بدون ربط بالطلب
+            self.db.query(AccountTransaction)\
+                .filter(AccountTransaction.maintenance_job_id.in_(existing_ids))\
+                .update({"maintenance_job_id": None}, synchronize_session=False)
+            
+            self.db.query(MaintenanceJob)\
+                .filter(MaintenanceJob.id.in_(existing_ids))\
+                .delete(synchronize_session=False)
+            apply_changes(self.db, [(before, None) for before in before_snapshots.values()])
+            record_change(self.db, ENTITY_JOBS, existing_ids, ACTION_DELETE)
+            
+            self.db.commit()
+            app_cache.bump(CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS)
+            
+            return True, f"تم حذف {len(existing_ids)} طلب بنجاح", len(existing_ids)
+            
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            return False, f"حدث خطأ أثناء حذف الطلبات: {str(e)}", 0
+    
+    def bulk_update_job_status(
         self,
         job_ids: List[int],
         new_status: str,
         notes: Optional[str] = None,
         user_id: Optional[int] = None
     ) -> Tuple[bool, str, int]:
-        """تحديث حالة عدة طلبات دفعة واحدة - محسّن للأداء"""
+        """تحديث حالة عدة طلبات دفعة واحدة مع سجل الحالة لكل طلب"""
         try:
+            job_ids = _unique_job_ids(job_ids)
             if not job_ids:
                 return False, "لم يتم تحديد أي طلبات", 0
             
@@ -461,40 +507,117 @@ class MaintenanceService:
             if new_status not in valid_statuses:
                 return False, f"حالة غير صالحة. الحالات المتاحة: {', '.join(valid_statuses)}", 0
             
-            # تحديث جميع الطلبات في استعلام واحد (أسرع بكثير)
+            # نفس أوقات الحالة في update_job_status
             now = datetime.utcnow()
             update_dict = {"status": new_status}
-            
             if new_status == "completed":
                 update_dict["completed_at"] = now
             elif new_status == "delivered":
                 update_dict["delivered_at"] = now
             
-            # تحديث الطلبات دفعة واحدة
-            updated_count = self.db.query(MaintenanceJob)\
-                .filter(MaintenanceJob.id.in_(job_ids))\
+            # حالة الطلبات قبل التحديث (استعلام واحد) - الطلبات غير الموجودة تُتجاهل
+            before_snapshots = load_snapshots(self.db, job_ids)
+            existing_ids = list(before_snapshots.keys())
+            if not existing_ids:
+                return False, JOBS_NOT_FOUND, 0
+            
+            self.db.query(MaintenanceJob)\
+                .filter(MaintenanceJob.id.in_(existing_ids))\
                 .update(update_dict, synchronize_session=False)
             
-            # إضافة سجلات تغيير الحالة
-            status_histories = [
-                StatusHistory(
-                    maintenance_job_id=job_id,
-                    status=new_status,
-                    notes=notes,
-                    changed_by_id=user_id
-                )
-                for job_id in job_ids
-            ]
-            self.db.bulk_save_objects(status_histories)
+            # سجل الحالة: INSERT واحد بعدة صفوف (executemany)
+            self.db.execute(StatusHistory.__table__.insert(), [
+                {
+                    "maintenance_job_id": job_id,
+                    "status": new_status,
+                    "notes": notes,
+                    "changed_by_id": user_id,
+                    "created_at": now,
+                }
+                for job_id in existing_ids
+            ])
+            
+            apply_changes(self.db, [
+                (before, dict(before, **update_dict))
+                for before in before_snapshots.values()
+            ])
+            record_change(self.db, ENTITY_JOBS, existing_ids, ACTION_STATUS)
             
             self.db.commit()
+            app_cache.bump(CACHE_TAG_JOBS)
             
-            return True, f"تم تحديث {updated_count} طلب بنجاح", updated_count
+            return True, f"تم تحديث {len(existing_ids)} طلب بنجاح", len(existing_ids)
             
         except SQLAlchemyError as e:
             self.db.rollback()
             return False, f"حدث خطأ أثناء تحديث الطلبات: {str(e)}", 0
     
+    # الاسم القديم
+    batch_update_job_status = bulk_update_job_status
+    
+    def bulk_update_payment_status(
+        self,
+        job_ids: List[int],
+        payment_status: str,
+        payment_method: Optional[str] = None
+    ) -> Tuple[bool, str, int]:
+        """تحديث حالة الدفع لعدة طلبات في معاملة واحدة"""
+        try:
+            job_ids = _unique_job_ids(job_ids)
+            if not job_ids:
+                return False, "لم يتم تحديد أي طلبات", 0
+            
+            error, payment_method = self._validate_payment(payment_status, payment_method)
+            if error:
+                return False, error, 0
+            
+            before_snapshots = load_snapshots(self.db, job_ids)
+            existing_ids = list(before_snapshots.keys())
+            if not existing_ids:
+                return False, JOBS_NOT_FOUND, 0
+            
+            now = datetime.utcnow()
+            update_dict = {
+                "payment_status": payment_status,
+                "payment_method": payment_method if payment_status == "paid" else None,
+                "payment_date": now if payment_status == "paid" else None,
+            }
+            self.db.query(MaintenanceJob)\
+                .filter(MaintenanceJob.id.in_(existing_ids))\
+                .update(update_dict, synchronize_session=False)
+            
+            apply_changes(self.db, [
+                (before, dict(before, payment_status=payment_status, payment_method=update_dict["payment_method"]))
+                for before in before_snapshots.values()
+            ])
+            record_change(self.db, ENTITY_PAYMENTS, existing_ids)
+            
+            self.db.commit()
+            app_cache.bump(CACHE_TAG_PAYMENTS)
+            
+            return True, f"تم تحديث حالة الدفع لـ {len(existing_ids)} طلب بنجاح", len(existing_ids)
+            
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            return False, f"حدث خطأ أثناء تحديث حالة الدفع: {str(e)}", 0
+    
+    def bulk_apply(self, action: str, job_ids: List[int], **options) -> Tuple[bool, str, int]:
+        """تنفيذ عملية جماعية بالاسم (delete / status / payment)
+        
+        options: new_status, notes, user_id للحالة - payment_status, payment_method للدفع
+        """
+        if action == BULK_DELETE:
+            return self.bulk_delete_jobs(job_ids)
+        if action == BULK_STATUS:
+            return self.bulk_update_job_status(
+                job_ids, options.get("new_status"), options.get("notes"), options.get("user_id")
+            )
+        if action == BULK_PAYMENT:
+            return self.bulk_update_payment_status(
+                job_ids, options.get("payment_status"), options.get("payment_method")
+            )
+        return False, f"عملية غير معروفة. العمليات المتاحة: {', '.join(BULK_ACTIONS)}", 0
+    
     def add_part_to_job(
         self,
         job_id: int,
@@ -569,15 +692,14 @@ class MaintenanceService:
             )
             
             self.db.add(payment)
+            record_change(self.db, ENTITY_PAYMENTS, [job_id])
             self.db.commit()
             
             # تحديث حالة الطلب إذا تم الدفع بالكامل
             self._update_job_payment_status(job_id)
             
             # مسح Cache بعد التحديث
-            app_cache.invalidate_pattern("get_unpaid_jobs")
-            app_cache.invalidate_pattern("get_dashboard_stats")
-            app_cache.invalidate_pattern("get_report_data")
+            app_cache.bump(CACHE_TAG_PAYMENTS)
             
             return True, "تم تسجيل الدفعة بنجاح"
             
@@ -600,6 +722,7 @@ class MaintenanceService:
         
         # حساب إجمالي التكلفة (النهائية إذا كانت موجودة، وإلا التقديرية)
         total_cost = job.final_cost or job.estimated_cost or 0
+        before = job_snapshot(job)
         
         # تحديث حالة الدفع
         if total_paid >= total_cost and total_cost > 0:
@@ -609,6 +732,8 @@ class MaintenanceService:
         else:
             job.payment_status = "pending"
         
+        apply_job_change(self.db, before, job_snapshot(job))
+        record_change(self.db, ENTITY_PAYMENTS, [job_id])
         self.db.commit()
     
     def get_job_by_tracking_code(self, tracking_code: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
@@ -767,16 +892,63 @@ class MaintenanceService:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        job_ids: Optional[List[int]] = None
     ) -> Tuple[bool, str, List[Dict[str, Any]]]:
         """بحث في طلبات الصيانة (محسّن للأداء مع Cache)"""
+        success, message, jobs, _ = self.search_jobs_page(
+            query=query,
+            status=status,
+            customer_id=customer_id,
+            technician_id=technician_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            job_ids=job_ids
+        )
+        return success, message, jobs
+    
+    def search_jobs_page(
+        self,
+        query: Optional[str] = None,
+        status: Optional[str] = None,
+        customer_id: Optional[int] = None,
+        technician_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        job_ids: Optional[List[int]] = None
+    ) -> Tuple[bool, str, List[Dict[str, Any]], Optional[str]]:
+        """بحث في طلبات الصيانة مع ترحيل بالمؤشر
+        
+        الترتيب تنازلي حسب (received_at, id). لجلب الصفحة التالية مرّر next_cursor
+        المُعاد كـ cursor (زمن ثابت لأي صفحة، بعكس offset). job_ids يقصر النتائج
+        على طلبات محددة (لتحديث صفوف تغيرت فقط).
+        
+        Returns:
+            (نجاح، رسالة، الطلبات، next_cursor أو None إذا كانت الصفحة الأخيرة)
+        """
         # بناء مفتاح cache من المعاملات
-        cache_key = f"search_jobs:{query}:{status}:{customer_id}:{technician_id}:{start_date}:{end_date}:{limit}:{offset}"
+        cache_key = f"search_jobs:{query}:{status}:{customer_id}:{technician_id}:{start_date}:{end_date}:{limit}:{offset}:{cursor}:{sorted(job_ids) if job_ids is not None else None}"
         
         # محاولة الحصول من cache
         cached_result = app_cache.get(cache_key)
         if cached_result is not None:
-            return cached_result
+            success, message, rows, next_cursor = cached_result
+            return success, message, list(rows), next_cursor
+        
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            return False, str(e), [], None
+        
+        # أجيال الوسوم قبل الاستعلام (كتابة أثناء البحث لا تُبقي نتيجة قديمة)
+        generations = app_cache.tag_generations((CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS, CACHE_TAG_CUSTOMERS))
         
         try:
             # بناء الاستعلام مع eager loading لتقليل استعلامات N+1 (محسّن للأداء بشكل خارق)
@@ -792,14 +964,7 @@ class MaintenanceService:
             
             # تطبيق عوامل التصفية
             if query:
-                search = f"%{query}%"
-                q = q.filter(
-                    (MaintenanceJob.tracking_code.ilike(search)) |
-                    (Customer.name.ilike(search)) |
-                    (MaintenanceJob.device_type.ilike(search)) |
-                    (MaintenanceJob.device_model.ilike(search)) |
-                    (MaintenanceJob.serial_number.ilike(search))
-                )
+                q = self._apply_text_search(q, query)
             
             if status:
                 # تحويل string إلى MaintenanceStatus enum
@@ -817,6 +982,9 @@ class MaintenanceService:
                 
             if customer_id:
                 q = q.filter(MaintenanceJob.customer_id == customer_id)
+            
+            if job_ids is not None:
+                q = q.filter(MaintenanceJob.id.in_(list(job_ids)))
                 
             if technician_id:
                 q = q.filter(MaintenanceJob.technician_id == technician_id)
@@ -830,14 +998,24 @@ class MaintenanceService:
                 end_date = end_date + timedelta(days=1)
                 q = q.filter(MaintenanceJob.received_at < end_date)
             
-            # تنفيذ الاستعلام مع الترحيل - محسّن للأداء
-            # استخدام index على received_at للترتيب السريع
-            jobs = q.order_by(MaintenanceJob.received_at.desc())\
-                   .offset(offset)\
-                   .limit(limit)\
-                   .all()
+            # تنفيذ الاستعلام - استخدام index على received_at للترتيب السريع
+            q = q.order_by(MaintenanceJob.received_at.desc(), MaintenanceJob.id.desc())
+            
+            # الترحيل بالمؤشر: البدء مباشرة بعد آخر صف في الصفحة السابقة
+            if after:
+                q = q.filter(keyset_after(MaintenanceJob.received_at, MaintenanceJob.id, after))
+            elif offset:
+                q = q.offset(offset)
+            
+            # جلب صف إضافي لمعرفة هل توجد صفحة تالية
+            jobs = q.limit(limit + 1).all()
             
-            # تحسين: استخدام yield_per للبيانات الكبيرة (لكن limit=10000 كافٍ هنا)
+            next_cursor = None
+            if len(jobs) > limit:
+                jobs = jobs[:limit]
+                last_job = jobs[-1]
+                if last_job.received_at:
+                    next_cursor = encode_cursor(last_job.received_at, last_job.id)
             
             # تجميع النتائج (البيانات محملة مسبقاً، لا حاجة لاستعلامات إضافية)
             result = []
@@ -875,40 +1053,87 @@ class MaintenanceService:
                     "technician_name": job.technician.full_name if job.technician else None
                 })
             
-            result_tuple = (True, "تم العثور على النتائج", result)
-            
             # حفظ في cache (TTL محسّن - زيادة من 10 إلى 20 ثانية)
-            app_cache.set(cache_key, result_tuple, ttl=20)
+            # الصفوف كـ tuple والمستدعي يأخذ نسخة: تعديل قائمته لا يغيّر النتيجة المحفوظة
+            app_cache.set(cache_key, (True, "تم العثور على النتائج", tuple(result), next_cursor), ttl=20, tags=generations)
             
-            return result_tuple
+            return True, "تم العثور على النتائج", result, next_cursor
             
         except SQLAlchemyError as e:
-            return False, f"حدث خطأ أثناء البحث: {str(e)}", []
+            return False, f"حدث خطأ أثناء البحث: {str(e)}", [], None
+    
+    def get_jobs_changed_since(
+        self,
+        since: datetime,
+        limit: int = 500
+    ) -> Tuple[bool, str, Optional[List[Dict[str, Any]]]]:
+        """الطلبات التي تغيرت (هي أو بيانات عميلها) بعد since - للتحديث التزايدي
+        
+        استعلامان على فهرسي updated_at (الطلبات والعملاء) بدلاً من إعادة جلب
+        القائمة كاملة. الطلبات المحذوفة لا تظهر هنا (تصل عبر change_log).
+        
+        Returns:
+            (نجاح، رسالة، الطلبات بنفس صيغة search_jobs_page، أو None إذا تجاوز
+            عددها limit - الأسرع حينها إعادة التحميل الكاملة)
+        """
+        try:
+            changed = union(
+                select(MaintenanceJob.id).where(MaintenanceJob.updated_at > since),
+                select(MaintenanceJob.id)
+                .join(Customer, MaintenanceJob.customer_id == Customer.id)
+                .where(Customer.updated_at > since),
+            ).limit(limit + 1)
+            job_ids = self.db.execute(changed).scalars().all()
+        except SQLAlchemyError as e:
+            return False, f"حدث خطأ أثناء جلب التغييرات: {str(e)}", []
+        
+        if len(job_ids) > limit:
+            return True, "عدد التغييرات كبير", None
+        if not job_ids:
+            return True, "لا توجد تغييرات", []
+        
+        success, message, jobs, _ = self.search_jobs_page(job_ids=job_ids, limit=len(job_ids))
+        return success, message, jobs
+    
+    def _apply_text_search(self, q, query: str):
+        """تطبيق البحث النصي - FTS5 على SQLite، و pg_trgm على PostgreSQL، و ILIKE كبديل"""
+        bind = self.db.get_bind()
+        
+        # SQLite: البحث في جدول FTS5 (فهرس trigram بدلاً من مسح الجدول كاملاً)
+        if is_fts_available(bind):
+            match_query = build_match_query(query)
+            if match_query:
+                fts_ids = select(literal_column("rowid"))\
+                    .select_from(text(FTS_TABLE))\
+                    .where(text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=match_query))
+                return q.filter(MaintenanceJob.id.in_(fts_ids))
+        
+        search = f"%{query}%"
+        if bind.dialect.name == "postgresql":
+            # الاسم الموحّد يطابق فهرس GIN على translate(lower(name))
+            name_filter = pg_normalized(Customer.name).ilike(f"%{normalize_search_text(query)}%")
+        else:
+            name_filter = Customer.name.ilike(search)
+        
+        return q.filter(
+            (MaintenanceJob.tracking_code.ilike(search)) |
+            name_filter |
+            (MaintenanceJob.device_type.ilike(search)) |
+            (MaintenanceJob.device_model.ilike(search)) |
+            (MaintenanceJob.serial_number.ilike(search))
+        )
     
-    @cached(ttl=30)  # Cache لمدة 30 ثانية
+    # Cache لمدة 30 ثانية، ثم دقيقة إضافية تُعرض فيها القيمة السابقة أثناء تحديثها في الخلفية
+    @cached(ttl=30, tags=(CACHE_TAG_JOBS, CACHE_TAG_CUSTOMERS), stale_ttl=60)
     def get_dashboard_stats(self) -> Tuple[bool, str, Dict[str, Any]]:
         """الحصول على إحصائيات لوحة التحكم - محسّن للأداء مع Cache"""
         try:
             # استخدام استعلام واحد مع GROUP BY للحصول على جميع الإحصائيات دفعة واحدة
             from sqlalchemy import case
             
-            # استعلام واحد للحصول على إحصائيات الحالات
-            status_counts = self.db.query(
-                MaintenanceJob.status,
-                func.count(MaintenanceJob.id).label('count')
-            ).group_by(MaintenanceJob.status).all()
-            
-            # تحويل النتائج إلى قاموس - استخدام .value للحصول على القيمة الفعلية من Enum
-            status_dict = {}
-            for status, count in status_counts:
-                # إذا كان status هو Enum، استخدم .value، وإلا استخدم str()
-                if hasattr(status, 'value'):
-                    status_key = status.value
-                elif hasattr(status, 'name'):
-                    status_key = status.name.lower()
-                else:
-                    status_key = str(status)
-                status_dict[status_key] = count
+            # إحصائيات الحالات من جدول التجميع اليومي (بدلاً من GROUP BY على كل الطلبات)
+            status_rows = stats_query(self.db, BASIS_RECEIVED, JobDailyStat.status).all()
+            status_dict = {row.status: int(row.job_count) for row in status_rows if row.job_count}
             
             # استخراج القيم
             received_count = status_dict.get('received', 0)
@@ -920,14 +1145,10 @@ class MaintenanceService:
             total_jobs = sum(status_dict.values())
             in_progress = received_count + not_repaired_count
             
-            # إجمالي الإيرادات باستخدام استعلام منفصل محسّن
-            total_revenue = self.db.query(
-                func.sum(MaintenanceJob.final_cost)
-            ).filter(
-                MaintenanceJob.status == MaintenanceStatus.DELIVERED,
-                MaintenanceJob.final_cost.isnot(None),
-                MaintenanceJob.final_cost > 0
-            ).scalar() or 0
+            # إجمالي الإيرادات (final_cost > 0 للطلبات المسلّمة) من جدول التجميع
+            total_revenue = stats_query(
+                self.db, BASIS_RECEIVED, status=MaintenanceStatus.DELIVERED.value
+            ).one().final_revenue or 0
             
             # الحصول على تاريخ آخر تسليم
             last_delivery_date = self.db.query(
@@ -998,22 +1219,12 @@ class MaintenanceService:
             if not job:
                 return False, "طلب الصيانة غير موجود"
             
-            # التحقق من صحة حالة الدفع
-            valid_statuses = ["paid", "unpaid"]
-            if payment_status not in valid_statuses:
-                return False, f"حالة دفع غير صالحة. الحالات المتاحة: {', '.join(valid_statuses)}"
-            
-            # التحقق من طريقة الدفع إذا كانت الحالة مدفوع
-            if payment_status == "paid":
-                if not payment_method:
-                    # إذا لم يتم تحديد طريقة دفع، الكاش هو الافتراضي
-                    payment_method = "cash"
-                
-                valid_methods = ["cash", "wish_money"]
-                if payment_method not in valid_methods:
-                    return False, f"طريقة دفع غير صالحة. الطرق المتاحة: {', '.join(valid_methods)}"
+            error, payment_method = self._validate_payment(payment_status, payment_method)
+            if error:
+                return False, error
             
             # تحديث حالة الدفع
+            before = job_snapshot(job)
             job.payment_status = payment_status
             
             if payment_status == "paid":
@@ -1023,7 +1234,10 @@ class MaintenanceService:
                 job.payment_method = None
                 job.payment_date = None
             
+            apply_job_change(self.db, before, job_snapshot(job))
+            record_change(self.db, ENTITY_PAYMENTS, [job_id])
             self.db.commit()
+            app_cache.bump(CACHE_TAG_PAYMENTS)
             
             return True, "تم تحديث حالة الدفع بنجاح"
             
@@ -1031,7 +1245,22 @@ class MaintenanceService:
             self.db.rollback()
             return False, f"حدث خطأ أثناء تحديث حالة الدفع: {str(e)}"
     
-    @cached(ttl=60)  # Cache لمدة دقيقة لأن الديون لا تتغير كثيراً
+    @staticmethod
+    def _validate_payment(payment_status: str, payment_method: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """التحقق من حالة وطريقة الدفع - (رسالة الخطأ أو None، طريقة الدفع بعد الافتراضي)"""
+        if payment_status not in PAYMENT_STATUSES:
+            return f"حالة دفع غير صالحة. الحالات المتاحة: {', '.join(PAYMENT_STATUSES)}", payment_method
+        
+        # التحقق من طريقة الدفع إذا كانت الحالة مدفوع
+        if payment_status == "paid":
+            if not payment_method:
+                # إذا لم يتم تحديد طريقة دفع، الكاش هو الافتراضي
+                payment_method = "cash"
+            if payment_method not in PAYMENT_METHODS:
+                return f"طريقة دفع غير صالحة. الطرق المتاحة: {', '.join(PAYMENT_METHODS)}", payment_method
+        return None, payment_method
+    
+    @cached(ttl=60, tags=(CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS, CACHE_TAG_CUSTOMERS))  # Cache لمدة دقيقة لأن الديون لا تتغير كثيراً
     def get_unpaid_jobs(self) -> Tuple[bool, str, List[Dict[str, Any]]]:
         """الحصول على قائمة الطلبات غير المدفوعة (الديون) - محسّن للأداء"""
         try:
@@ -1063,7 +1292,7 @@ class MaintenanceService:
         except SQLAlchemyError as e:
             return False, f"حدث خطأ أثناء جلب قائمة الديون: {str(e)}", []
     
-    @cached(ttl=60)  # Cache لمدة دقيقة
+    @cached(ttl=60, tags=(CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS, CACHE_TAG_CUSTOMERS))  # Cache لمدة دقيقة
     def get_pending_old_jobs(self, days_threshold: int = 30, status: Optional[str] = None) -> Tuple[bool, str, List[Dict[str, Any]]]:
         """الحصول على قائمة الأجهزة القديمة المعلقة (لم تُصلح أو لم تُسلم بعد)
         
@@ -1170,7 +1399,7 @@ class MaintenanceService:
         except SQLAlchemyError as e:
             return False, f"حدث خطأ أثناء جلب قائمة الأجهزة المعلقة: {str(e)}", []
     
-    @cached(ttl=30)  # Cache لمدة 30 ثانية
+    @cached(ttl=30, tags=(CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS))  # Cache لمدة 30 ثانية
     def get_payment_summary(self) -> Tuple[bool, str, Dict[str, Any]]:
         """الحصول على ملخص المدفوعات - محسّن باستخدام استعلام واحد مع Cache"""
         try:
@@ -1281,7 +1510,10 @@ class MaintenanceService:
                     description=description
                 )
                 self.db.add(setting)
+                self.db.flush()
             
+            # إصدار بيانات جديد: ETag الإعدادات في web_app.py يتغير
+            record_change(self.db, ENTITY_SETTINGS, [setting.id])
             self.db.commit()
             return True, "تم حفظ الإعداد بنجاح"
             
@@ -1516,7 +1748,7 @@ class MaintenanceService:
             logger.error(f"خطأ في إنشاء رسالة الواتساب المخصصة: {e}", exc_info=True)
             return ""
     
-    @cached(ttl=120)  # Cache لمدة دقيقتين للتقارير لأنها لا تتغير كثيراً
+    @cached(ttl=120, tags=(CACHE_TAG_JOBS, CACHE_TAG_PAYMENTS, CACHE_TAG_CUSTOMERS))  # Cache لمدة دقيقتين للتقارير لأنها لا تتغير كثيراً
     def get_report_data(
         self,
         report_type: str,  # 'daily', 'weekly', 'monthly', 'yearly', 'custom'
@@ -1556,181 +1788,155 @@ class MaintenanceService:
             else:
                 return False, f"نوع التقرير غير صحيح: {report_type}", {}
             
-            # بناء الاستعلام مع eager loading للعميل فقط (ما نحتاجه)
-            query = self.db.query(MaintenanceJob).options(joinedload(MaintenanceJob.customer))
-            
-            # تصفية حسب نوع الكود
+            # شروط تصفية الطلبات (للتفاصيل وأفضل عميل)
+            conditions = []
             if code_type:
-                query = query.filter(MaintenanceJob.tracking_code.like(f'{code_type}%'))
-            
-            # تصفية حسب الحالة
+                conditions.append(MaintenanceJob.tracking_code.like(f'{code_type}%'))
             if status == 'delivered':
-                query = query.filter(MaintenanceJob.status == MaintenanceStatus.DELIVERED)
                 # إذا كانت الحالة "delivered"، استخدم delivered_at للتصفية
-                if start_date:
-                    query = query.filter(MaintenanceJob.delivered_at >= start_date)
-                if end_date:
-                    query = query.filter(MaintenanceJob.delivered_at < end_date)
+                conditions += [
+                    MaintenanceJob.status == MaintenanceStatus.DELIVERED,
+                    MaintenanceJob.delivered_at >= start_date,
+                    MaintenanceJob.delivered_at < end_date
+                ]
             else:
                 # إذا كانت جميع الحالات، استخدم received_at للتصفية
-                if start_date:
-                    query = query.filter(MaintenanceJob.received_at >= start_date)
-                if end_date:
-                    query = query.filter(MaintenanceJob.received_at < end_date)
-            
-            # استخدام استعلامات SQL محسّنة لحساب الإحصائيات بدلاً من معالجة Python
-            # بناء شروط الفلترة للاستخدام في الاستعلامات الفرعية
-            # ملاحظة: لا يمكن استخدام query.whereclause مباشرة في if - يجب استخدام is not None
-            base_filter = query.whereclause if hasattr(query, 'whereclause') and query.whereclause is not None else None
-            
-            # حساب الإحصائيات الأساسية باستخدام SQL aggregate functions
-            total_jobs = query.count()
-            
-            # حساب إجمالي الإيرادات باستخدام SQL
-            revenue_query = self.db.query(func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)))
-            if base_filter is not None:
-                revenue_query = revenue_query.filter(base_filter)
-            total_revenue_result = revenue_query.scalar() or 0.0
-            
-            # حساب الإحصائيات للحالات
-            if status == 'delivered':
-                delivered_count = total_jobs
-                delivered_revenue = total_revenue_result
-            else:
-                delivered_query = self.db.query(MaintenanceJob).filter(MaintenanceJob.status == MaintenanceStatus.DELIVERED)
-                if base_filter is not None:
-                    delivered_query = delivered_query.filter(base_filter)
-                delivered_count = delivered_query.count()
-                delivered_revenue_query = self.db.query(func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)))\
-                                                  .filter(MaintenanceJob.status == MaintenanceStatus.DELIVERED)
-                if base_filter is not None:
-                    delivered_revenue_query = delivered_revenue_query.filter(base_filter)
-                delivered_revenue = float(delivered_revenue_query.scalar() or 0.0)
-            
-            # حساب متوسط السعر
-            avg_price = total_revenue_result / total_jobs if total_jobs > 0 else 0
-            
-            # جلب البيانات للتفاصيل (مع حدود للتقرير الكبير - محسّن)
-            # استخدام eager loading للتقليل من استعلامات N+1
-            jobs = query.options(
-                joinedload(MaintenanceJob.customer),
-                selectinload(MaintenanceJob.payments)
-            ).order_by(MaintenanceJob.received_at.desc()).limit(10000).all()
-            
-            # أفضل عميل (حسب عدد الأجهزة والإيرادات) - محسّن
-            customer_query = self.db.query(
-                MaintenanceJob.customer_id,
-                Customer.name,
-                func.count(MaintenanceJob.id).label('count'),
-                func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)).label('revenue')
-            ).join(Customer)
-            if base_filter is not None:
-                customer_query = customer_query.filter(base_filter)
-            customer_stats = customer_query.group_by(MaintenanceJob.customer_id, Customer.name)\
-                                           .order_by(func.count(MaintenanceJob.id).desc())\
-                                           .first()
-            
-            best_customer_by_count = {'name': customer_stats.name, 'count': customer_stats.count} if customer_stats else None
-            
-            customer_revenue_query = self.db.query(
-                MaintenanceJob.customer_id,
-                Customer.name,
-                func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)).label('revenue')
-            ).join(Customer)
-            if base_filter is not None:
-                customer_revenue_query = customer_revenue_query.filter(base_filter)
-            customer_stats_revenue = customer_revenue_query.group_by(MaintenanceJob.customer_id, Customer.name)\
-                                                          .order_by(func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)).desc())\
-                                                          .first()
-            
-            best_customer_by_revenue = {'name': customer_stats_revenue.name, 'revenue': float(customer_stats_revenue.revenue)} if customer_stats_revenue else None
-            
-            # إحصائيات حسب نوع الجهاز - محسّن باستخدام SQL
-            device_query = self.db.query(
-                MaintenanceJob.device_type,
-                func.count(MaintenanceJob.id).label('count'),
-                func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)).label('revenue')
-            )
-            if base_filter is not None:
-                device_query = device_query.filter(base_filter)
-            device_stats = device_query.group_by(MaintenanceJob.device_type).all()
-            
-            device_type_stats = {stat.device_type or 'غير محدد': {'count': stat.count, 'revenue': float(stat.revenue or 0)} for stat in device_stats}
-            
-            # إحصائيات حسب طريقة الدفع - محسّن باستخدام SQL
-            payment_query = self.db.query(
-                MaintenanceJob.payment_status,
-                MaintenanceJob.payment_method,
-                func.sum(func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)).label('total')
-            )
-            if base_filter is not None:
-                payment_query = payment_query.filter(base_filter)
-            payment_stats_query = payment_query.group_by(MaintenanceJob.payment_status, MaintenanceJob.payment_method).all()
+                conditions += [
+                    MaintenanceJob.received_at >= start_date,
+                    MaintenanceJob.received_at < end_date
+                ]
             
+            # الفترة السابقة للمقارنة
+            prev_start = prev_end = None
+            if report_type == 'daily':
+                prev_start, prev_end = start_date - timedelta(days=1), start_date
+            elif report_type == 'weekly':
+                prev_start, prev_end = start_date - timedelta(days=7), start_date
+            elif report_type == 'monthly':
+                if start_date.month == 1:
+                    prev_start = datetime(start_date.year - 1, 12, 1)
+                else:
+                    prev_start = datetime(start_date.year, start_date.month - 1, 1)
+                prev_end = start_date
+            elif report_type == 'yearly':
+                prev_start, prev_end = datetime(start_date.year - 1, 1, 1), start_date
+            
+            # 1) كل الإجماليات (الفترة الحالية والسابقة) بعبارة واحدة على جدول التجميع اليومي
+            # - أساس delivered_at للتقارير المسلّمة، و received_at لجميع الحالات
+            breakdown = report_breakdown(
+                self.db,
+                BASIS_DELIVERED if status == 'delivered' else BASIS_RECEIVED,
+                start_date,
+                end_date,
+                code_type=code_type,
+                status=MaintenanceStatus.DELIVERED.value if status == 'delivered' else None,
+                previous_range=(prev_start, prev_end) if prev_start else None
+            ).all()
+            
+            total_jobs = 0
+            total_revenue = 0.0
+            delivered_count = 0
+            delivered_revenue = 0.0
+            prev_total = 0
+            prev_revenue = 0.0
+            device_type_stats = {}
             payment_stats = {'cash': 0, 'wish_money': 0, 'unpaid': 0}
-            for stat in payment_stats_query:
-                if stat.payment_status == 'paid':
-                    if stat.payment_method == 'cash':
-                        payment_stats['cash'] += float(stat.total or 0)
-                    elif stat.payment_method == 'wish_money':
-                        payment_stats['wish_money'] += float(stat.total or 0)
+            for row in breakdown:
+                count = int(row.job_count or 0)
+                revenue = float(row.revenue or 0)
+                if row.period == PERIOD_PREVIOUS:
+                    prev_total += count
+                    prev_revenue += revenue
+                    continue
+                
+                total_jobs += count
+                total_revenue += revenue
+                if row.status == MaintenanceStatus.DELIVERED.value:
+                    delivered_count += count
+                    delivered_revenue += revenue
+                
+                # إحصائيات حسب نوع الجهاز
+                device_entry = device_type_stats.setdefault(row.device_type or 'غير محدد', {'count': 0, 'revenue': 0.0})
+                device_entry['count'] += count
+                device_entry['revenue'] += revenue
+                
+                # إحصائيات حسب طريقة الدفع
+                if row.payment_status == 'paid':
+                    if row.payment_method in ('cash', 'wish_money'):
+                        payment_stats[row.payment_method] += revenue
                 else:
-                    payment_stats['unpaid'] += float(stat.total or 0)
-            
-            total_revenue = float(total_revenue_result)
+                    payment_stats['unpaid'] += revenue
             
-            # ملاحظة: best_customer_by_count و best_customer_by_revenue تم تعريفهما بالفعل أعلاه
-            # (في السطور 1143 و 1156) باستخدام استعلامات SQL محسّنة
+            # حساب متوسط السعر
+            avg_price = total_revenue / total_jobs if total_jobs > 0 else 0
             
-            # تحضير بيانات الطلبات للجدول
-            jobs_data = []
-            for job in jobs:
-                jobs_data.append({
-                    'id': job.id,
-                    'tracking_code': job.tracking_code,
-                    'customer_name': job.customer.name,
-                    'customer_phone': job.customer.phone,
-                    'device_type': job.device_type,
-                    'status': job.status.value if hasattr(job.status, 'value') else str(job.status),
-                    'final_cost': job.final_cost or job.estimated_cost or 0,
-                    'payment_status': job.payment_status,
-                    'payment_method': job.payment_method,
-                    'received_at': job.received_at,
-                    'delivered_at': job.delivered_at
-                })
+            # 2) أفضل عميل حسب العدد وحسب الإيرادات بعبارة واحدة (CTE + دوال النوافذ)
+            job_revenue = func.coalesce(MaintenanceJob.final_cost, MaintenanceJob.estimated_cost, 0)
+            per_customer = select(
+                MaintenanceJob.customer_id.label('customer_id'),
+                func.count(MaintenanceJob.id).label('count'),
+                func.sum(job_revenue).label('revenue')
+            ).where(*conditions).group_by(MaintenanceJob.customer_id).cte('per_customer')
+            ranked = select(
+                per_customer,
+                func.row_number().over(order_by=per_customer.c.count.desc()).label('count_rank'),
+                func.row_number().over(order_by=per_customer.c.revenue.desc()).label('revenue_rank')
+            ).cte('ranked')
+            best_customers = self.db.execute(
+                select(Customer.name, ranked.c.count, ranked.c.revenue, ranked.c.count_rank, ranked.c.revenue_rank)
+                .join(Customer, Customer.id == ranked.c.customer_id)
+                .where(or_(ranked.c.count_rank == 1, ranked.c.revenue_rank == 1))
+            ).all()
+            
+            best_customer_by_count = None
+            best_customer_by_revenue = None
+            for customer in best_customers:
+                if customer.count_rank == 1:
+                    best_customer_by_count = {'name': customer.name, 'count': customer.count}
+                if customer.revenue_rank == 1:
+                    best_customer_by_revenue = {'name': customer.name, 'revenue': float(customer.revenue or 0)}
+            
+            # 3) بيانات الطلبات للجدول كأعمدة فقط (بدون تحميل كائنات ORM والدفعات)
+            job_rows = self.db.execute(
+                select(
+                    MaintenanceJob.id,
+                    MaintenanceJob.tracking_code,
+                    Customer.name,
+                    Customer.phone,
+                    MaintenanceJob.device_type,
+                    MaintenanceJob.status,
+                    MaintenanceJob.final_cost,
+                    MaintenanceJob.estimated_cost,
+                    MaintenanceJob.payment_status,
+                    MaintenanceJob.payment_method,
+                    MaintenanceJob.received_at,
+                    MaintenanceJob.delivered_at
+                )
+                .join(Customer, Customer.id == MaintenanceJob.customer_id)
+                .where(*conditions)
+                .order_by(MaintenanceJob.received_at.desc())
+                .limit(10000)
+            ).all()
+            
+            jobs_data = [{
+                'id': job_id,
+                'tracking_code': tracking_code,
+                'customer_name': customer_name,
+                'customer_phone': customer_phone,
+                'device_type': device_type,
+                'status': job_status.value if hasattr(job_status, 'value') else str(job_status),
+                'final_cost': final_cost or estimated_cost or 0,
+                'payment_status': payment_status,
+                'payment_method': payment_method,
+                'received_at': received_at,
+                'delivered_at': delivered_at
+            } for (
+                job_id, tracking_code, customer_name, customer_phone, device_type, job_status,
+                final_cost, estimated_cost, payment_status, payment_method, received_at, delivered_at
+            ) in job_rows]
             
-            # إحصائيات الفترة السابقة للمقارنة
             previous_period_stats = None
-            if report_type in ['daily', 'weekly', 'monthly', 'yearly']:
-                if report_type == 'daily':
-                    prev_start = start_date - timedelta(days=1)
-                    prev_end = start_date
-                elif report_type == 'weekly':
-                    prev_start = start_date - timedelta(days=7)
-                    prev_end = start_date
-                elif report_type == 'monthly':
-                    if start_date.month == 1:
-                        prev_start = datetime(start_date.year - 1, 12, 1)
-                    else:
-                        prev_start = datetime(start_date.year, start_date.month - 1, 1)
-                    prev_end = start_date
-                elif report_type == 'yearly':
-                    prev_start = datetime(start_date.year - 1, 1, 1)
-                    prev_end = start_date
-                
-                prev_query = self.db.query(MaintenanceJob)
-                if code_type:
-                    prev_query = prev_query.filter(MaintenanceJob.tracking_code.like(f'{code_type}%'))
-                if status == 'delivered':
-                    prev_query = prev_query.filter(MaintenanceJob.status == MaintenanceStatus.DELIVERED)
-                prev_query = prev_query.filter(
-                    MaintenanceJob.received_at >= prev_start,
-                    MaintenanceJob.received_at < prev_end
-                )
-                prev_jobs = prev_query.all()
-                prev_total = len(prev_jobs)
-                prev_revenue = sum(job.final_cost or job.estimated_cost or 0 for job in prev_jobs if job.final_cost or job.estimated_cost)
-                
+            if prev_start:
                 previous_period_stats = {
                     'total_jobs': prev_total,
                     'total_revenue': prev_revenue,
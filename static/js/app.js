@@ -5,6 +5,9 @@ const API_URL = window.location.origin + '/api';
 let cameraStream = null;
 let capturedPhoto = null;
 
+// الطلبات المعروضة في قسم الطلبات (تُعدّل بأحداث الخادم بدون إعادة جلب القائمة)
+let jobsList = { jobs: [], search: '', status: '', loaded: false };
+
 // عرض القسم
 function showSection(sectionName) {
     try {
@@ -50,7 +53,10 @@ function showSection(sectionName) {
                 // الحفاظ على الفلتر الحالي عند فتح قسم الطلبات
                 const currentStatus = document.getElementById('status-filter')?.value || '';
                 const currentSearch = document.getElementById('search-input')?.value || '';
-                loadJobs(currentSearch, currentStatus);
+                // القائمة المعروضة محدثة بالأحداث - لا داعي لجلبها من جديد
+                if (!jobsListIsLive(currentSearch, currentStatus)) {
+                    loadJobs(currentSearch, currentStatus);
+                }
             } else {
                 console.error('❌ دالة loadJobs غير موجودة');
             }
@@ -119,9 +125,9 @@ function hideLoading() {
 }
 
 // تحميل لوحة التحكم
-async function loadDashboard() {
+async function loadDashboard(silent = false) {
     try {
-        showLoading();
+        if (!silent) showLoading();
         
         // تحميل الإحصائيات
         const statsResponse = await fetch(`${API_URL}/stats`);
@@ -143,7 +149,7 @@ async function loadDashboard() {
     } catch (error) {
         hideLoading();
         console.error('خطأ في تحميل لوحة التحكم:', error);
-        alert('فشل في تحميل البيانات');
+        if (!silent) alert('فشل في تحميل البيانات');
     }
 }
 
@@ -172,9 +178,9 @@ function displayRecentJobs(jobs) {
 }
 
 // تحميل جميع الطلبات
-async function loadJobs(search = '', status = '') {
+async function loadJobs(search = '', status = '', silent = false) {
     try {
-        showLoading();
+        if (!silent) showLoading();
         
         let url = `${API_URL}/jobs?`;
         if (search) url += `search=${encodeURIComponent(search)}&`;
@@ -184,6 +190,7 @@ async function loadJobs(search = '', status = '') {
         const data = await response.json();
         
         if (data.success) {
+            jobsList = { jobs: data.jobs, search, status, loaded: true };
             displayJobs(data.jobs);
         }
         
@@ -191,7 +198,7 @@ async function loadJobs(search = '', status = '') {
     } catch (error) {
         hideLoading();
         console.error('خطأ في تحميل الطلبات:', error);
-        alert('فشل في تحميل الطلبات');
+        if (!silent) alert('فشل في تحميل الطلبات');
     }
 }
 
@@ -204,8 +211,12 @@ function displayJobs(jobs) {
         return;
     }
     
-    container.innerHTML = jobs.map(job => `
-        <div class="job-card" onclick="viewJob(${job.id})">
+    container.innerHTML = jobs.map(jobCardHtml).join('');
+}
+
+function jobCardHtml(job) {
+    return `
+        <div class="job-card" data-job-id="${job.id}" onclick="viewJob(${job.id})">
             <div class="job-header">
                 <span class="job-code">${job.tracking_code}</span>
                 <span class="job-status status-${job.status}">${translateStatus(job.status)}</span>
@@ -217,7 +228,147 @@ function displayJobs(jobs) {
                 ${job.estimated_cost ? `<br><strong>التكلفة المتوقعة:</strong> ${job.estimated_cost} ل.ل` : ''}
             </div>
         </div>
-    `).join('');
+    `;
+}
+
+// التحديث المباشر: أحداث الخادم (/api/events) تعدّل القائمة المعروضة بدلاً من إعادة جلبها
+const JOB_EVENTS_RETRY_MS = 5000;
+const JOBS_PAGE_SIZE = 100;  // الحد الافتراضي لـ /api/jobs
+let jobEvents = null;
+let lastJobEventId = null;
+let jobsReloadTimeout;
+let dashboardRefreshTimeout;
+
+function connectJobEvents() {
+    if (!window.EventSource || jobEvents) return;
+    
+    // المتصفح يرسل Last-Event-ID عند إعادة الاتصال بنفسه؛ بعد انقطاع نهائي نكمل من آخر حدث وصل
+    const url = lastJobEventId === null ? `${API_URL}/events` : `${API_URL}/events?last_event_id=${lastJobEventId}`;
+    jobEvents = new EventSource(url);
+    
+    const handlers = {
+        // اتصال جديد (ليس استئنافاً): ما تغير قبله لن يصل كأحداث
+        'ready': data => { if (!data.resumed) refreshAfterGap(); },
+        'reload': () => refreshAfterGap(),
+        'job-created': data => upsertJob(data.job, true),
+        'job-updated': data => upsertJob(data.job, false),
+        'status-changed': data => patchJob(data),
+        'payment-changed': data => patchJob(data),
+        'job-deleted': data => removeJobCard(data.id)
+    };
+    Object.entries(handlers).forEach(([type, handler]) => {
+        jobEvents.addEventListener(type, event => {
+            lastJobEventId = event.lastEventId;
+            handler(JSON.parse(event.data));
+            if (type !== 'ready') scheduleDashboardRefresh();
+        });
+    });
+    
+    jobEvents.onerror = () => {
+        // رد غير 200 (مثل 503 لكثرة الاتصالات): المتصفح لا يعيد الاتصال بنفسه
+        if (jobEvents.readyState === EventSource.CLOSED) {
+            jobEvents = null;
+            setTimeout(connectJobEvents, JOB_EVENTS_RETRY_MS);
+        }
+    };
+}
+
+function jobsListIsLive(search, status) {
+    return jobsList.loaded && jobsList.search === search && jobsList.status === status
+        && jobEvents !== null && jobEvents.readyState === EventSource.OPEN;
+}
+
+function jobMatchesFilter(job) {
+    return !jobsList.status || job.status === jobsList.status;
+}
+
+function refreshAfterGap() {
+    if (jobsList.loaded) scheduleJobsReload();
+    scheduleDashboardRefresh();
+}
+
+function scheduleJobsReload() {
+    clearTimeout(jobsReloadTimeout);
+    jobsReloadTimeout = setTimeout(() => loadJobs(jobsList.search, jobsList.status, true), 300);
+}
+
+function scheduleDashboardRefresh() {
+    // الإحصائيات مجمّعة: عدة أحداث متتالية = طلب واحد (وقسم لوحة التحكم يحمّلها عند فتحه)
+    if (!document.getElementById('dashboard').classList.contains('active')) return;
+    clearTimeout(dashboardRefreshTimeout);
+    dashboardRefreshTimeout = setTimeout(() => loadDashboard(true), 1000);
+}
+
+function upsertJob(job, isNew) {
+    if (!jobsList.loaded) return;
+    const index = jobsList.jobs.findIndex(j => j.id === job.id);
+    if (jobsList.search) {
+        // مطابقة البحث على الخادم فقط: تعديل الموجود، وإعادة البحث لطلب جديد
+        if (index >= 0) replaceJobCard(index, job);
+        else if (isNew) scheduleJobsReload();
+        return;
+    }
+    if (!jobMatchesFilter(job)) {
+        removeJobCard(job.id);
+    } else if (index >= 0) {
+        replaceJobCard(index, job);
+    } else {
+        insertJobCard(job);
+    }
+}
+
+function patchJob(data) {
+    if (!jobsList.loaded) return;
+    const index = jobsList.jobs.findIndex(j => j.id === data.id);
+    if (index < 0) {
+        // أصبح يطابق فلتر الحالة: الحدث لا يحمل الصف كاملاً
+        if (data.status && data.status === jobsList.status) scheduleJobsReload();
+        return;
+    }
+    const job = { ...jobsList.jobs[index], ...data };
+    if (jobMatchesFilter(job)) {
+        replaceJobCard(index, job);
+    } else {
+        removeJobCard(job.id);
+    }
+}
+
+function replaceJobCard(index, job) {
+    jobsList.jobs[index] = job;
+    const card = document.querySelector(`#jobs-list [data-job-id="${job.id}"]`);
+    if (card) card.outerHTML = jobCardHtml(job);
+}
+
+function insertJobCard(job) {
+    // نفس ترتيب الخادم: الأحدث استلاماً أولاً ثم الأكبر رقماً
+    // (Date.parse وليس مقارنة النص: مزود JSON الافتراضي يرسل التاريخ بصيغة HTTP)
+    const receivedAt = j => Date.parse(j.received_at) || 0;
+    const position = jobsList.jobs.findIndex(j =>
+        receivedAt(j) < receivedAt(job) || (receivedAt(j) === receivedAt(job) && j.id < job.id));
+    if (position < 0 && jobsList.jobs.length >= JOBS_PAGE_SIZE) return;  // بعد الصفحة المعروضة
+    
+    const before = position >= 0 ? document.querySelector(`#jobs-list [data-job-id="${jobsList.jobs[position].id}"]`) : null;
+    if (position >= 0) {
+        jobsList.jobs.splice(position, 0, job);
+    } else {
+        jobsList.jobs.push(job);
+    }
+    if (jobsList.jobs.length === 1) {
+        displayJobs(jobsList.jobs);
+    } else if (before) {
+        before.insertAdjacentHTML('beforebegin', jobCardHtml(job));
+    } else {
+        document.getElementById('jobs-list').insertAdjacentHTML('beforeend', jobCardHtml(job));
+    }
+}
+
+function removeJobCard(jobId) {
+    const index = jobsList.jobs.findIndex(j => j.id === jobId);
+    if (index < 0) return;
+    jobsList.jobs.splice(index, 1);
+    const card = document.querySelector(`#jobs-list [data-job-id="${jobId}"]`);
+    if (card) card.remove();
+    if (jobsList.jobs.length === 0) displayJobs([]);
 }
 
 // عرض تفاصيل طلب
@@ -489,6 +640,55 @@ document.getElementById('search-input').addEventListener('input', (e) => {
     }, 500);
 });
 
+// اقتراحات العملاء أثناء كتابة الاسم
+let customerSuggestTimeout;
+let customerSuggestRequest = 0;
+let customerSuggestions = [];
+document.getElementById('customer-name').addEventListener('input', (e) => {
+    const name = e.target.value;
+    clearTimeout(customerSuggestTimeout);
+
+    // اختيار اقتراح من القائمة يملأ رقم الهاتف
+    const chosen = customerSuggestions.find(customer => customer.name === name);
+    if (chosen) {
+        const phoneInput = document.getElementById('phone');
+        if (!phoneInput.value) {
+            phoneInput.value = chosen.phone;
+        }
+        return;
+    }
+
+    customerSuggestTimeout = setTimeout(() => loadCustomerSuggestions(name.trim()), 200);
+});
+
+async function loadCustomerSuggestions(query) {
+    const datalist = document.getElementById('customer-suggestions');
+    const requestId = ++customerSuggestRequest;
+    if (!query) {
+        customerSuggestions = [];
+        datalist.innerHTML = '';
+        return;
+    }
+
+    try {
+        const response = await fetch(`${API_URL}/customers/suggest?q=${encodeURIComponent(query)}&limit=10`);
+        const data = await response.json();
+        // تجاهل رد قديم وصل بعد رد أحدث
+        if (requestId !== customerSuggestRequest || !data.success) return;
+
+        customerSuggestions = data.customers;
+        datalist.innerHTML = '';
+        customerSuggestions.forEach(customer => {
+            const option = document.createElement('option');
+            option.value = customer.name;
+            option.label = customer.phone;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        console.error('خطأ في اقتراحات العملاء:', error);
+    }
+}
+
 document.getElementById('status-filter').addEventListener('change', (e) => {
     const search = document.getElementById('search-input').value;
     const status = e.target.value;
@@ -797,6 +997,9 @@ window.addEventListener('load', () => {
         console.error('❌ دالة loadDashboard غير موجودة!');
     }
     
+    // التحديث المباشر للطلبات والإحصائيات
+    connectJobEvents();
+    
     // تسجيل Service Worker للـ PWA
     if ('serviceWorker' in navigator) {
         navigator.serviceWorker.register('/static/sw.js')
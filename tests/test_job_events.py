@@ -0,0 +1,132 @@
+"""
+أماكن اتصالات /api/events (EVENTS_MAX_STREAMS) تُحرر عند انتهاء كل اتصال
+(خادم التطوير، و EventStreamApp في web_server.py عند انقطاع العميل)
+
+    python -m pytest tests/test_job_events.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# قاعدة بيانات ومفتاح جلسات مؤقتان قبل استيراد config
+_TEMP_DIR = tempfile.mkdtemp(prefix="adr_events_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEMP_DIR, 'events.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+import config  # noqa: E402
+import web_app  # noqa: E402
+import web_server  # noqa: E402
+
+MAX_STREAMS = 2
+
+
+class EventStreamSlotsTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(config, "EVENTS_MAX_DURATION", 0),
+            mock.patch.object(config, "EVENTS_POLL_INTERVAL", 0),
+            mock.patch.object(web_app, "event_streams", threading.BoundedSemaphore(MAX_STREAMS)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def open_stream(self, close: bool):
+        """طلب /api/events والمرور على الرد كاملاً - close=False مثل WSGIMiddleware في uvicorn"""
+        statuses = []
+        environ = EnvironBuilder(path="/api/events", environ_base={"REMOTE_ADDR": "127.0.0.1"}).get_environ()
+        body = web_app.app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        chunks = [chunk for chunk in body]
+        if close:
+            body.close()
+        return statuses[0], b"".join(chunks)
+
+    def test_streams_beyond_limit_without_close(self):
+        results = [self.open_stream(close=False) for _ in range(MAX_STREAMS * 2)]
+        self.assertEqual([status for status, _ in results], ["200 OK"] * (MAX_STREAMS * 2))
+        self.assertIn(b"event: ready", results[-1][1])
+
+    def test_streams_beyond_limit_with_close(self):
+        # المولد يحرر المكان ثم call_on_close - مرة واحدة فقط (BoundedSemaphore يرفض الزيادة)
+        statuses = [self.open_stream(close=True)[0] for _ in range(MAX_STREAMS * 2)]
+        self.assertEqual(statuses, ["200 OK"] * (MAX_STREAMS * 2))
+
+    def test_closed_before_iteration(self):
+        environ = EnvironBuilder(path="/api/events", environ_base={"REMOTE_ADDR": "127.0.0.1"}).get_environ()
+        for _ in range(MAX_STREAMS * 2):
+            web_app.app(environ, lambda status, headers, exc_info=None: None).close()
+        self.assertEqual(self.open_stream(close=False)[0], "200 OK")
+
+    def test_limit_applies_to_open_streams(self):
+        environ = EnvironBuilder(path="/api/events", environ_base={"REMOTE_ADDR": "127.0.0.1"}).get_environ()
+        open_bodies = [web_app.app(environ, lambda status, headers, exc_info=None: None) for _ in range(MAX_STREAMS)]
+        self.assertEqual(self.open_stream(close=False)[0], "503 SERVICE UNAVAILABLE")
+        for body in open_bodies:
+            body.close()
+        self.assertEqual(self.open_stream(close=False)[0], "200 OK")
+
+
+@unittest.skipUnless(web_server.UVICORN_AVAILABLE, "uvicorn غير مثبت")
+class AsyncEventStreamTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(config, "EVENTS_MAX_DURATION", 300),
+            mock.patch.object(config, "EVENTS_POLL_INTERVAL", 0.01),
+            mock.patch.object(web_app, "event_streams", threading.BoundedSemaphore(MAX_STREAMS)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.asgi_app = web_server.EventStreamApp(web_app.app, wsgi_app=None)
+
+    async def open_stream(self, disconnect: asyncio.Event):
+        """اتصال ASGI بـ /api/events حتى disconnect - (الحالة، الجسم)"""
+        scope = {
+            "type": "http", "method": "GET", "path": "/api/events", "query_string": b"",
+            "http_version": "1.1", "headers": [], "client": ("127.0.0.1", 50000),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await self.asgi_app(scope, receive, send)
+        return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+    def test_disconnect_releases_slot(self):
+        async def scenario():
+            disconnect = asyncio.Event()
+            streams = [asyncio.ensure_future(self.open_stream(disconnect)) for _ in range(MAX_STREAMS)]
+            await asyncio.sleep(0.2)
+            self.assertEqual((await self.open_stream(disconnect))[0], 503)
+
+            # العملاء يغلقون الاتصال: المولد ينتهي قبل EVENTS_MAX_DURATION بكثير
+            disconnect.set()
+            results = await asyncio.wait_for(asyncio.gather(*streams), timeout=5)
+            self.assertEqual([status for status, _ in results], [200] * MAX_STREAMS)
+            self.assertIn(b"event: ready", results[0][1])
+
+            # الأماكن تحررت
+            for _ in range(MAX_STREAMS):
+                self.assertTrue(web_app.event_streams.acquire(blocking=False))
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
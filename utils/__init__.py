@@ -2,7 +2,20 @@
 أدوات مساعدة
 """
 
-from .barcode_generator import BarcodeGenerator
-from .notification_service import NotificationService
-
 __all__ = ['BarcodeGenerator', 'NotificationService']
+
+# الاستيراد عند أول استخدام: أي "from utils.x import ..." يحمّل هذا الملف أولاً،
+# ولا نريد أن يدفع utils.logger ثمن استيراد PIL / requests / jinja2
+_LAZY_IMPORTS = {
+    'BarcodeGenerator': '.barcode_generator',
+    'NotificationService': '.notification_service',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,91 @@
+"""
+ضغط ردود الويب (brotli / gzip) فوق حد أدنى للحجم
+
+قائمة طلبات أو تقرير شهري قد يكون عدة ميغابايت من JSON، والضغط يقلله
+عادة 5-10 مرات (مهم للتطبيق على بيانات الهاتف). الردود الصغيرة لا تُضغط لأن
+تكلفة الضغط أكبر من الفائدة.
+
+- brotli إذا كان مثبتاً وطلبه المتصفح، وإلا gzip.
+- ETag القوي يختلف لكل ترميز (لاحقة -br / -gzip)؛ conditional_get في
+  web_app.py يقبل أي لاحقة عند مقارنة If-None-Match.
+- الردود المتدفقة (SSE) والملفات (send_file) لا تُضغط.
+
+    install_compression(app)
+"""
+
+import gzip
+from typing import List
+
+import config
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+}
+
+# ضغط سريع للردود الديناميكية (وليس أعلى نسبة)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def etag_variants(etag: str) -> List[str]:
+    """ETag الرد بكل ترميز ممكن (للمقارنة مع If-None-Match)"""
+    return [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]
+
+
+def choose_encoding(accept_encodings) -> str:
+    """"br" أو "gzip" أو "" حسب Accept-Encoding"""
+    if BROTLI_AVAILABLE and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return ""
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def install_compression(app, min_size: int = None) -> None:
+    """ضغط الردود بعد كل طلب (after_request)"""
+    from flask import request
+
+    min_size = config.COMPRESS_MIN_SIZE if min_size is None else min_size
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if not encoding:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        return response
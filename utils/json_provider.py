@@ -0,0 +1,89 @@
+"""
+مزود JSON سريع لتطبيق الويب (orjson)
+
+jsonify الافتراضي في Flask يمر على كل قيمة في Python ويحوّل datetime عبر
+دالة default، ومع ensure_ascii تصبح كل حرف عربي \\uXXXX (6 بايت بدلاً من 2).
+orjson يسلسل datetime و Enum و dict/list بلغة C مباشرة إلى UTF-8.
+
+- التواريخ بصيغة ISO 8601 مع +00:00 (القاعدة تحفظ UTC بدون منطقة زمنية،
+  و new Date() في المتصفح يقرأها صحيحة).
+- إذا لم يكن orjson مثبتاً (أو JSON_PROVIDER=default) يبقى مزود Flask.
+
+    install_json_provider(app)
+"""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+import config
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """نفس واجهة مزود Flask مع التسلسل عبر orjson"""
+
+    def _options(self, indent: bool = False) -> int:
+        # مفاتيح غير نصية (أرقام) مثل json.dumps
+        options = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options("indent" in kwargs)).decode("utf-8")
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # bytes مباشرة بدون تحويل إلى str ثم ترميزه من جديد
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def install_json_provider(app) -> str:
+    """اختيار مزود JSON حسب config.JSON_PROVIDER - يعيد اسم المزود المستخدم"""
+    if config.JSON_PROVIDER == "orjson" and ORJSON_AVAILABLE:
+        app.json = OrjsonProvider(app)
+        return "orjson"
+    return "default"
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from utils.compression import BROTLI_AVAILABLE
+    from web_app import app
+
+    RUNS = 20
+    paths = sys.argv[1:] or ["/api/jobs?limit=500", "/api/reports?report_type=monthly"]
+    providers = [("default", DefaultJSONProvider(app))]
+    if ORJSON_AVAILABLE:
+        providers.append(("orjson", OrjsonProvider(app)))
+    encodings = ["identity", "gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+
+    client = app.test_client()
+    for path in paths:
+        print(f"\n📊 {path}")
+        for name, provider in providers:
+            app.json = provider
+            # أول طلب يملأ الـ cache: القياس بعده للتسلسل والإرسال فقط
+            client.get(path, headers={"Accept-Encoding": "identity"})
+            started = time.perf_counter()
+            for _ in range(RUNS):
+                client.get(path, headers={"Accept-Encoding": "identity"})
+            elapsed_ms = (time.perf_counter() - started) * 1000 / RUNS
+            sizes = []
+            for encoding in encodings:
+                response = client.get(path, headers={"Accept-Encoding": encoding})
+                sizes.append(f"{encoding} {len(response.data) / 1024:.0f}KB")
+            print(f"   {name:8} {elapsed_ms:7.1f}ms/طلب   " + "، ".join(sizes))
@@ -2,26 +2,89 @@
 نظام Cache ذكي متقدم للأداء الخارق
 """
 
+import heapq
+import sys
 import time
 import threading
-from typing import Any, Callable, Optional, Dict
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Dict, Iterable, List, Tuple, Union
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from enum import Enum
 import hashlib
+import inspect
 import json
 
+from sqlalchemy.orm import Session
+
+import config
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """تقدير تقريبي لحجم قيمة في الذاكرة بالبايت (مع محتويات القوائم والقواميس)"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    return size
+
+
+class _Flight:
+    """حساب جارٍ لمفتاح واحد - المستدعون الآخرون ينتظرون event"""
+    
+    __slots__ = ('event', 'value', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
 class SmartCache:
-    """نظام Cache ذكي مع TTL و invalidation تلقائي"""
+    """نظام Cache ذكي مع TTL و invalidation تلقائي
+    
+    - حد أقصى لعدد الإدخالات وحجم تقريبي بالبايت، مع إخراج الأقدم استخداماً (LRU)
+    - أوقات انتهاء الصلاحية في heap، وكل عملية set تحذف ما انتهى من رأس الـ heap
+      بدون المرور على جميع الإدخالات
+    - وسوم (tags) بعدّاد جيل لكل وسم: الكتابة تستدعي bump("jobs") بتكلفة O(1)،
+      وأي إدخال حُفظ بجيل أقدم لهذا الوسم يُعتبر منتهياً عند قراءته
+    - get_or_compute: حساب واحد فقط لكل مفتاح في نفس اللحظة (single-flight)، مع
+      إمكانية إرجاع القيمة القديمة أثناء تحديثها في الخلفية (stale-while-revalidate)
+    """
     
-    def __init__(self, default_ttl: int = 60):
+    def __init__(self, default_ttl: int = 60, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
         """
         default_ttl: الوقت الافتراضي للـ cache بالثواني
+        max_entries: الحد الأقصى لعدد الإدخالات
+        max_bytes: الحد الأقصى التقريبي للحجم بالبايت
         """
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, str]] = []
         self._lock = threading.RLock()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._sequence = 0
         self._hits = 0
         self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._generations: Dict[str, int] = {}
+        self._method_stats: Dict[str, List[int]] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._coalesced = 0
+        self._stale_hits = 0
     
     def get(self, key: str, default: Any = None) -> Any:
         """الحصول على قيمة من الـ cache"""
@@ -29,45 +92,238 @@ class SmartCache:
             if key in self._cache:
                 entry = self._cache[key]
                 # التحقق من انتهاء الصلاحية
-                if time.time() < entry['expires_at']:
+                if not self._tags_current(entry['tags']):
+                    # تم إبطال أحد وسوم الإدخال بعد حفظه
+                    self._remove(key)
+                    self._invalidations += 1
+                elif time.time() < entry['expires_at']:
+                    self._cache.move_to_end(key)
                     self._hits += 1
                     return entry['value']
-                else:
-                    # حذف الإدخال المنتهي
-                    del self._cache[key]
+                elif time.time() >= entry['stale_until']:
+                    # حذف الإدخال المنتهي (الإدخال في فترة stale يبقى لـ get_or_compute)
+                    self._remove(key)
+                    self._expirations += 1
             
             self._misses += 1
             return default
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """حفظ قيمة في الـ cache"""
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        tags: Optional[Union[Iterable[str], Dict[str, int]]] = None,
+        stale_ttl: int = 0
+    ) -> None:
+        """حفظ قيمة في الـ cache
+        
+        tags: وسوم الإدخال، أو نتيجة tag_generations() أُخذت قبل حساب القيمة
+              (حتى لا تُحفظ قيمة قديمة إذا حدثت كتابة أثناء الحساب)
+        stale_ttl: مدة إضافية بعد انتهاء الصلاحية يمكن خلالها إرجاع القيمة
+                   القديمة من get_or_compute أثناء تحديثها
+        """
+        size = estimate_size(value)
         with self._lock:
+            if tags is not None and not isinstance(tags, dict):
+                tags = self.tag_generations(tags)
             ttl = ttl or self.default_ttl
+            now = time.time()
+            if key in self._cache:
+                self._remove(key)
+            
+            # قيمة أكبر من الحد المسموح - لا تُخزن (كانت ستُخرج كل ما عداها)
+            if size > self.max_bytes:
+                self._evictions += 1
+                return
+            
+            self._sequence += 1
             self._cache[key] = {
                 'value': value,
-                'expires_at': time.time() + ttl,
-                'created_at': time.time()
+                'expires_at': now + ttl,
+                'stale_until': now + ttl + stale_ttl,
+                'created_at': now,
+                'size': size,
+                'sequence': self._sequence,
+                'tags': tags
             }
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (now + ttl + stale_ttl, self._sequence, key))
+            
+            self._sweep_expired(now)
+            self._evict_to_limits()
+    
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        stale_ttl: int = 0,
+        refresh: Optional[Callable[[], Any]] = None
+    ) -> Tuple[Any, bool]:
+        """إرجاع القيمة المخزنة أو حسابها مرة واحدة فقط مهما كان عدد المستدعين
+        
+        - أول مستدعٍ لمفتاح غير موجود يحسب القيمة، والمستدعون في نفس اللحظة
+          ينتظرون نتيجته بدلاً من تنفيذ نفس الاستعلامات على SQLite بالتوازي
+        - إذا انتهت الصلاحية وما زلنا ضمن stale_ttl تُرجع القيمة القديمة فوراً
+          ويُحدّثها خيط واحد في الخلفية باستخدام refresh (أو compute)
+        - القيم None لا تُخزن
+        
+        Returns:
+            (القيمة، هل جاءت من الـ cache)
+        """
+        tags = list(tags)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and self._tags_current(entry['tags']):
+                now = time.time()
+                if now < entry['expires_at']:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                    return entry['value'], True
+                if now < entry['stale_until']:
+                    self._hits += 1
+                    self._stale_hits += 1
+                    if key not in self._inflight:
+                        flight = self._inflight[key] = _Flight()
+                        threading.Thread(
+                            target=self._run_flight,
+                            args=(key, flight, refresh or compute, ttl, tags, stale_ttl),
+                            daemon=True
+                        ).start()
+                    return entry['value'], True
+            
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._misses += 1
+            else:
+                self._coalesced += 1
+        
+        if leader:
+            self._run_flight(key, flight, compute, ttl, tags, stale_ttl)
+        else:
+            flight.event.wait()
+        
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, not leader
+    
+    def _run_flight(self, key: str, flight: "_Flight", compute: Callable[[], Any],
+                    ttl: Optional[int], tags: List[str], stale_ttl: int) -> None:
+        """تنفيذ الحساب وحفظ النتيجة ثم إيقاظ المنتظرين"""
+        try:
+            # أجيال الوسوم قبل الحساب - كتابة أثناء الحساب تُبطل النتيجة فوراً
+            generations = self.tag_generations(tags)
+            flight.value = compute()
+            if flight.value is not None:
+                self.set(key, flight.value, ttl, tags=generations, stale_ttl=stale_ttl)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.event.set()
+    
+    def tag_generations(self, tags: Iterable[str]) -> Dict[str, int]:
+        """الجيل الحالي لكل وسم"""
+        with self._lock:
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+    
+    def _tags_current(self, tags: Optional[Dict[str, int]]) -> bool:
+        if not tags:
+            return True
+        generations = self._generations
+        return all(generations.get(tag, 0) == generation for tag, generation in tags.items())
+    
+    def bump(self, *tags: str) -> None:
+        """إبطال كل الإدخالات الموسومة بأي من tags - O(1) لكل وسم
+        
+        الإدخالات القديمة تُحذف عند قراءتها أو عند انتهاء صلاحيتها أو بالإخراج (LRU)
+        """
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+    
+    def _remove(self, key: str) -> None:
+        """حذف إدخال وتحديث الحجم (المدخل القديم في الـ heap يُتجاهل لاحقاً)"""
+        entry = self._cache.pop(key)
+        self._bytes -= entry['size']
+    
+    def _sweep_expired(self, now: float) -> None:
+        """حذف الإدخالات المنتهية من رأس الـ heap"""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, sequence, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            # تجاهل مدخلات الـ heap لإدخالات حُذفت أو استُبدلت
+            if entry is not None and entry['sequence'] == sequence:
+                self._remove(key)
+                self._expirations += 1
+        
+        # الـ heap يحتفظ بمدخلات قديمة للمفاتيح المحذوفة - إعادة بنائه إذا تضخم
+        if len(heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [
+                (entry['stale_until'], entry['sequence'], key)
+                for key, entry in self._cache.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+    
+    def _evict_to_limits(self) -> None:
+        """إخراج الأقدم استخداماً حتى يعود العدد والحجم ضمن الحدود"""
+        while self._cache and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._cache))
+            self._remove(key)
+            self._evictions += 1
     
     def delete(self, key: str) -> None:
         """حذف مفتاح من الـ cache"""
         with self._lock:
             if key in self._cache:
-                del self._cache[key]
+                self._remove(key)
     
     def clear(self) -> None:
         """مسح جميع الـ cache"""
         with self._lock:
             self._cache.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
             self._hits = 0
             self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
+            self._invalidations = 0
+            self._coalesced = 0
+            self._stale_hits = 0
+            self._method_stats.clear()
     
     def invalidate_pattern(self, pattern: str) -> None:
-        """حذف جميع المفاتيح التي تحتوي على pattern"""
+        """حذف جميع المفاتيح التي تحتوي على pattern (مسح O(n) - يُفضّل bump للوسوم)"""
         with self._lock:
             keys_to_delete = [k for k in self._cache.keys() if pattern in k]
             for key in keys_to_delete:
-                del self._cache[key]
+                self._remove(key)
+    
+    def record_call(self, method_name: str, hit: bool) -> None:
+        """تسجيل إصابة/إخفاق لدالة مخزنة عبر @cached"""
+        with self._lock:
+            stats = self._method_stats.setdefault(method_name, [0, 0])
+            stats[0 if hit else 1] += 1
+    
+    def get_method_stats(self) -> Dict[str, Dict[str, Any]]:
+        """نسبة الإصابة لكل دالة مخزنة"""
+        with self._lock:
+            return {
+                name: {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': (hits / (hits + misses) * 100) if hits + misses > 0 else 0
+                }
+                for name, (hits, misses) in self._method_stats.items()
+            }
     
     def get_stats(self) -> Dict[str, Any]:
         """الحصول على إحصائيات الـ cache"""
@@ -78,57 +334,138 @@ class SmartCache:
                 'hits': self._hits,
                 'misses': self._misses,
                 'hit_rate': hit_rate,
-                'size': len(self._cache)
+                'size': len(self._cache),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'coalesced': self._coalesced,
+                'stale_hits': self._stale_hits,
+                'in_flight': len(self._inflight),
+                'tags': dict(self._generations),
+                'methods': self.get_method_stats()
             }
     
     def cleanup_expired(self) -> None:
         """تنظيف الإدخالات المنتهية"""
         with self._lock:
-            now = time.time()
-            expired_keys = [
-                k for k, v in self._cache.items()
-                if now >= v['expires_at']
-            ]
-            for key in expired_keys:
-                del self._cache[key]
+            self._sweep_expired(time.time())
 
 # Cache عام للتطبيق
-app_cache = SmartCache(default_ttl=30)
+app_cache = SmartCache(
+    default_ttl=30,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    max_bytes=config.CACHE_MAX_MB * 1024 * 1024
+)
+
+# وسائط لا تدخل في مفتاح الـ cache (الكائن نفسه وجلسة قاعدة البيانات)
+_UNKEYED_PARAMETERS = {"self", "cls", "db", "session"}
+
+
+def _normalize_key_value(value: Any) -> Any:
+    """تحويل قيمة وسيط إلى شكل ثابت قابل للتسلسل في مفتاح الـ cache"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _normalize_key_value(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_normalize_key_value(v) for v in value]
+        return sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items
+    if hasattr(value, 'id'):
+        return f"{type(value).__name__}:{value.id}"
+    return str(value)
+
+
+def build_method_key(func: Callable, signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+    """مفتاح مستقل عن الكائن: اسم الدالة + الوسائط بعد ربطها بالتوقيع وتطبيق القيم الافتراضية
+    
+    f(1) و f(x=1) و f() (إذا كانت القيمة الافتراضية 1) تعطي نفس المفتاح
+    """
+    try:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments.items()
+    except TypeError:
+        # توقيع غير متطابق - ستفشل الدالة نفسها، نستخدم الوسائط كما هي
+        arguments = list(enumerate(args)) + sorted(kwargs.items())
+    
+    key_data = {
+        str(name): _normalize_key_value(value)
+        for name, value in arguments
+        if name not in _UNKEYED_PARAMETERS and not isinstance(value, Session)
+    }
+    digest = hashlib.md5(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{func.__module__}.{func.__qualname__}:{digest}"
 
-def cached(ttl: int = 30, key_func: Optional[Callable] = None):
+
+def cached(
+    ttl: int = 30,
+    key_func: Optional[Callable] = None,
+    tags: Union[Iterable[str], Callable[..., Iterable[str]]] = (),
+    stale_ttl: int = 0
+):
     """
     ديكوريتر للـ cache تلقائي
     
+    المفتاح الافتراضي لا يتضمن self ولا جلسة قاعدة البيانات، لذلك تتشارك كل
+    نسخ MaintenanceService(db) نفس النتائج (كل طلب Flask ينشئ نسخة جديدة).
+    المستدعون لنفس المفتاح في نفس اللحظة ينتظرون حساباً واحداً (single-flight).
+    
+    tags: وسوم تُبطل النتيجة عند app_cache.bump(tag)، أو دالة تستقبل نفس
+          الوسائط وتعيد الوسوم (مثل lambda self, job_id: [f"job:{job_id}"])
+    stale_ttl: بعد انتهاء ttl تُرجع القيمة القديمة لمدة stale_ttl ثانية بينما
+               يُحدّثها خيط في الخلفية. إذا كان للكائن دالة detached_copy() (مدير
+               سياق يعيد نسخة بجلسة مستقلة) يستخدمها التحديث بدلاً من جلسة المستدعي
+    
     Usage:
-        @cached(ttl=60)
+        @cached(ttl=60, tags=("jobs",))
         def my_function(arg1, arg2):
             return expensive_operation()
     """
     def decorator(func: Callable) -> Callable:
+        method_name = f"{func.__module__}.{func.__qualname__}"
+        signature = inspect.signature(func)
+        # وسم خاص بالدالة حتى يعمل cache_clear مهما كان شكل المفتاح
+        function_tag = f"fn:{method_name}"
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             # إنشاء مفتاح فريد
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                # مفتاح افتراضي من اسم الدالة والوسائط
-                key_parts = [func.__name__]
-                key_parts.extend([str(arg) for arg in args])
-                key_parts.extend([f"{k}={v}" for k, v in sorted(kwargs.items())])
-                cache_key = hashlib.md5("|".join(key_parts).encode()).hexdigest()
+                cache_key = build_method_key(func, signature, args, kwargs)
             
-            # محاولة الحصول من الـ cache
-            cached_value = app_cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+            entry_tags = list(tags(*args, **kwargs) if callable(tags) else tags)
+            
+            if stale_ttl and args and hasattr(args[0], 'detached_copy'):
+                def refresh():
+                    # جلسة المستدعي قد تُغلق قبل انتهاء التحديث في الخلفية
+                    with args[0].detached_copy() as instance:
+                        return func(instance, *args[1:], **kwargs)
+            else:
+                refresh = None
             
-            # تنفيذ الدالة وحفظ النتيجة
-            result = func(*args, **kwargs)
-            app_cache.set(cache_key, result, ttl)
+            result, hit = app_cache.get_or_compute(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl=ttl,
+                tags=entry_tags + [function_tag],
+                stale_ttl=stale_ttl,
+                refresh=refresh
+            )
+            app_cache.record_call(method_name, hit=hit)
             return result
         
         # إضافة دالة لإلغاء الـ cache
-        wrapper.cache_clear = lambda: app_cache.invalidate_pattern(func.__name__)
+        wrapper.cache_clear = lambda: app_cache.bump(function_tag)
+        wrapper.cache_stats = lambda: app_cache.get_method_stats().get(method_name, {'hits': 0, 'misses': 0, 'hit_rate': 0})
         return wrapper
     return decorator
 
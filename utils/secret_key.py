@@ -0,0 +1,46 @@
+"""
+مفتاح توقيع جلسات الويب الثابت
+
+مفتاح عشوائي جديد مع كل تشغيل (secrets.token_hex) يُبطل كل الجلسات عند إعادة
+التشغيل، ومع عدة عمليات لكل عملية مفتاحها فتُرفض جلسة أنشأتها عملية أخرى.
+المفتاح يُقرأ من SECRET_KEY أو يُنشأ مرة واحدة ويُحفظ في ملف.
+"""
+
+import os
+import secrets
+import time
+
+# انتظار عملية أخرى تكتب الملف في نفس اللحظة
+_READ_RETRIES = 50
+_READ_RETRY_DELAY = 0.02
+
+
+def _read_key(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def load_or_create_secret_key(path: str) -> str:
+    """قراءة المفتاح من path أو إنشاؤه (آمن عند تشغيل عدة عمليات معاً)"""
+    try:
+        key = _read_key(path)
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+
+    key = secrets.token_hex(32)
+    try:
+        # O_EXCL: عملية واحدة فقط تنشئ الملف، والباقي تقرأ مفتاحها
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(_READ_RETRIES):
+            existing_key = _read_key(path)
+            if existing_key:
+                return existing_key
+            time.sleep(_READ_RETRY_DELAY)
+        raise RuntimeError(f"ملف مفتاح الجلسات فارغ: {path}")
+
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key)
+    return key
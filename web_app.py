@@ -2,18 +2,30 @@
 تطبيق ويب للتحكم بنظام الصيانة من الهاتف
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, make_response
+from flask.globals import app_ctx
 from flask_cors import CORS
-from database.connection import get_db
-from services.maintenance_service import MaintenanceService
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session
+from database.connection import engine, init_db, DB_INITIALIZED_ENV, SessionLocal, pool_metrics
+from database.change_log import ChangeWatcher, ENTITY_PAYMENTS, record_change, latest_version
+from services.maintenance_service import MaintenanceService, CACHE_TAG_PAYMENTS, BULK_ACTIONS
+from services.customer_lookup_service import CustomerLookupService, MAX_SUGGESTIONS
+from services.job_event_service import JobEventService, JobEvent, EVENT_READY
+from utils.performance_cache import app_cache
+from utils.secret_key import load_or_create_secret_key
+from utils.json_provider import install_json_provider
+from utils.compression import install_compression, etag_variants
 from database.models import MaintenanceJob, Customer
 from datetime import datetime, timedelta
 import urllib.parse
-import secrets
 import hashlib
+import os
 import config
 import warnings
 import logging
+import threading
+import time
 
 # إخفاء تحذير development server
 warnings.filterwarnings('ignore', message='.*development server.*')
@@ -23,8 +35,52 @@ logging.getLogger('werkzeug').setLevel(logging.ERROR)
 app = Flask(__name__)
 CORS(app)  # للسماح بالوصول من أي جهاز
 
+# JSON سريع (orjson) وضغط الردود الكبيرة (brotli / gzip)
+install_json_provider(app)
+install_compression(app)
+
+# التأكد من وجود الجداول الجديدة (مثل tracking_code_sequences) عند التشغيل بدون الواجهة
+# (web_server.py يهيئ القاعدة مرة واحدة قبل بدء العمليات)
+if os.environ.get(DB_INITIALIZED_ENV) != "1":
+    init_db()
+
+# تغييرات واجهة سطح المكتب (أو عمليات أخرى) تُبطل الـ cache المحلي قبل الطلب التالي
+change_watcher = ChangeWatcher(engine, min_interval=1.0)
+
+
+def warm_customer_index():
+    """بناء فهرس اقتراحات العملاء في الخلفية قبل أول طلب"""
+    db = SessionLocal()
+    try:
+        CustomerLookupService(db).warm()
+    finally:
+        db.close()
+
+
+threading.Thread(target=warm_customer_index, name="customer-index", daemon=True).start()
+
+
+# جلسة واحدة لكل طلب (app context): تُنشأ عند أول db_session() وتُغلق في teardown
+# حتى لو فشل الطلب، فيعود الاتصال للمجموعة وتنتهي معاملة القراءة على SQLite
+db_session = scoped_session(SessionLocal, scopefunc=lambda: id(app_ctx._get_current_object()))
+
+
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    db_session.remove()
+
+
+@app.before_request
+def poll_changes():
+    """إبطال وسوم الـ cache التي تغيرت في عمليات أخرى"""
+    try:
+        change_watcher.poll()
+    except Exception as e:
+        print(f"⚠️ تعذر فحص سجل التغييرات: {e}")
+
 # إعدادات الأمان
-app.secret_key = secrets.token_hex(32)
+# مفتاح ثابت: الجلسة صالحة في كل العمليات وبعد إعادة التشغيل
+app.secret_key = config.SECRET_KEY or load_or_create_secret_key(config.SECRET_KEY_FILE)
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
 # كلمة مرور الوصول عن بُعد (من متغيرات البيئة)
@@ -48,10 +104,50 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# ETag للقراءات التي يستطلعها التطبيق دورياً: إصدار البيانات = آخر رقم في change_log
+# (مشترك بين كل العمليات) + المسار والمعاملات. أقصى مدة لنفس الـ ETag مثل مدة
+# الـ cache، حتى لا تبقى بيانات تتغير مع الوقت (إحصائيات "اليوم") أو كتابة لم
+# تُسجل في change_log قديمة أكثر من ذلك.
+ETAG_MAX_AGE = 60
+
+
+def data_etag() -> str:
+    """ETag الطلب الحالي بدون تنفيذ استعلام الخدمة"""
+    version = latest_version(db_session())
+    period = int(time.time() // ETAG_MAX_AGE)
+    path_hash = hashlib.sha1(request.full_path.encode("utf-8")).hexdigest()[:16]
+    return f"{version}-{period}-{path_hash}"
+
+
+def conditional_get(f):
+    """ديكوريتر: If-None-Match مطابق لإصدار البيانات → 304 بدون استعلام أو JSON"""
+    def decorated_function(*args, **kwargs):
+        # الإصدار قبل الاستعلام: كتابة أثناءه تعطي ETag مختلفاً في الطلب التالي
+        try:
+            etag = data_etag()
+        except SQLAlchemyError as e:
+            print(f"⚠️ تعذر قراءة إصدار البيانات: {e}")
+            return f(*args, **kwargs)
+        # ETag المحفوظ عند العميل قد يحمل لاحقة الضغط (-br / -gzip)
+        matched = next((variant for variant in etag_variants(etag) if request.if_none_match.contains(variant)), None)
+        if matched:
+            response = make_response("", 304)
+            response.set_etag(matched)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.set_etag(etag)
+        # المتصفح يخزن الرد لكن يتحقق من الخادم في كل مرة (If-None-Match تلقائياً)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 def generate_whatsapp_notification(job_id, status, price="", price_currency=None):
     """إنشاء رابط إشعار WhatsApp"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # استخدام الرسالة المخصصة
@@ -76,8 +172,6 @@ def generate_whatsapp_notification(job_id, status, price="", price_currency=None
     except Exception as e:
         print(f"خطأ في إنشاء رابط WhatsApp: {e}")
         return None
-    finally:
-        db.close()
 
 # صفحة تسجيل الدخول
 @app.route('/login', methods=['GET', 'POST'])
@@ -127,26 +221,31 @@ def offline():
 # API: الحصول على جميع الطلبات
 @app.route('/api/jobs', methods=['GET'])
 @require_auth
+@conditional_get
 def get_jobs():
     """الحصول على جميع طلبات الصيانة"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # البحث إذا كان موجود
         query = request.args.get('search', '')
         status = request.args.get('status', '')
+        cursor = request.args.get('cursor', '')
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
         
-        success, message, jobs = service.search_jobs(
+        success, message, jobs, next_cursor = service.search_jobs_page(
             query=query if query else None,
             status=status if status else None,
-            limit=100
+            limit=limit,
+            cursor=cursor if cursor else None
         )
         
         if success:
             return jsonify({
                 'success': True,
-                'jobs': jobs
+                'jobs': jobs,
+                'next_cursor': next_cursor
             })
         else:
             return jsonify({
@@ -159,15 +258,14 @@ def get_jobs():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: الحصول على تفاصيل طلب معين
 @app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@conditional_get
 def get_job(job_id):
     """الحصول على تفاصيل طلب معين"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, job = service.get_job_details(job_id)
@@ -188,8 +286,6 @@ def get_job(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: إضافة طلب جديد
 @app.route('/api/jobs', methods=['POST'])
@@ -207,7 +303,7 @@ def create_job():
                     'message': f'الحقل {field} مطلوب'
                 }), 400
         
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, job = service.create_maintenance_job(
@@ -230,10 +326,15 @@ def create_job():
                 # تحديث طريقة الدفع في قاعدة البيانات
                 try:
                     from database.models import MaintenanceJob
+                    from database.daily_stats import job_snapshot, apply_job_change
                     job_obj = db.query(MaintenanceJob).filter_by(id=job['id']).first()
                     if job_obj:
+                        before = job_snapshot(job_obj)
                         job_obj.payment_method = payment_method
+                        apply_job_change(db, before, job_snapshot(job_obj))
+                        record_change(db, ENTITY_PAYMENTS, [job_obj.id])
                         db.commit()
+                        app_cache.bump(CACHE_TAG_PAYMENTS)
                 except Exception as e:
                     print(f"تحذير: فشل في تحديث طريقة الدفع: {e}")
         
@@ -277,8 +378,6 @@ def create_job():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تحديث حالة طلب
 @app.route('/api/jobs/<int:job_id>/status', methods=['PUT'])
@@ -293,7 +392,7 @@ def update_job_status(job_id):
                 'message': 'الحقل status مطلوب'
             }), 400
         
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # إنشاء ملاحظات مع السعر ونوع العطل
@@ -364,8 +463,6 @@ def update_job_status(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 
 # API: حذف طلب
@@ -373,7 +470,7 @@ def update_job_status(job_id):
 def delete_job(job_id):
     """حذف طلب صيانة"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message = service.delete_job(job_id)
@@ -394,15 +491,13 @@ def delete_job(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تحديث بيانات الطلب
 @app.route('/api/jobs/<int:job_id>', methods=['PUT'])
 def update_job(job_id):
     """تحديث بيانات طلب الصيانة"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         data = request.get_json()
@@ -435,15 +530,13 @@ def update_job(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تحديث حالة الدفع
 @app.route('/api/jobs/<int:job_id>/payment', methods=['PUT'])
 def update_payment_status(job_id):
     """تحديث حالة الدفع"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         data = request.get_json()
@@ -472,15 +565,69 @@ def update_payment_status(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
+
+# API: عملية جماعية على عدة طلبات (معاملة واحدة)
+@app.route('/api/jobs/bulk', methods=['POST'])
+@require_auth
+def bulk_jobs():
+    """حذف / تغيير حالة / تغيير حالة الدفع لعدة طلبات
+
+    {"action": "delete" | "status" | "payment", "job_ids": [1, 2, 3],
+     "status": "...", "notes": "...", "payment_status": "...", "payment_method": "..."}
+    """
+    try:
+        db = db_session()
+        service = MaintenanceService(db)
+        
+        data = request.get_json(silent=True) or {}
+        action = data.get('action')
+        job_ids = data.get('job_ids')
+        if action not in BULK_ACTIONS:
+            return jsonify({
+                'success': False,
+                'message': f"عملية غير معروفة. العمليات المتاحة: {', '.join(BULK_ACTIONS)}"
+            }), 400
+        # type() وليس isinstance: true/false في JSON تصبح bool وهو فرع من int
+        if not isinstance(job_ids, list) or not all(type(job_id) is int for job_id in job_ids):
+            return jsonify({
+                'success': False,
+                'message': 'job_ids يجب أن تكون قائمة أرقام'
+            }), 400
+        
+        success, message, count = service.bulk_apply(
+            action,
+            job_ids,
+            new_status=data.get('status'),
+            notes=data.get('notes'),
+            payment_status=data.get('payment_status'),
+            payment_method=data.get('payment_method')
+        )
+        
+        if success:
+            return jsonify({
+                'success': True,
+                'message': message,
+                'count': count
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'message': message
+            }), 400
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
 
 # API: الحصول على قائمة الديون
 @app.route('/api/debts', methods=['GET'])
+@conditional_get
 def get_debts():
     """الحصول على قائمة الديون"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, debts = service.get_unpaid_jobs()
@@ -501,15 +648,14 @@ def get_debts():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: ملخص المدفوعات
 @app.route('/api/payment-summary', methods=['GET'])
+@conditional_get
 def get_payment_summary():
     """الحصول على ملخص المدفوعات"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, summary = service.get_payment_summary()
@@ -530,15 +676,14 @@ def get_payment_summary():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: إحصائيات
 @app.route('/api/stats', methods=['GET'])
+@conditional_get
 def get_stats():
     """الحصول على إحصائيات النظام"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, stats = service.get_dashboard_stats()
@@ -559,15 +704,14 @@ def get_stats():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: إدارة إعدادات النظام
 @app.route('/api/settings', methods=['GET'])
+@conditional_get
 def get_settings():
     """الحصول على إعدادات النظام"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         settings = {
@@ -589,8 +733,6 @@ def get_settings():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 @app.route('/api/settings', methods=['POST'])
 def update_settings():
@@ -598,7 +740,7 @@ def update_settings():
     try:
         data = request.json
         
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # تحديث قالب رسالة الواتساب
@@ -624,8 +766,6 @@ def update_settings():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تحديث كود التتبع
 @app.route('/api/jobs/<int:job_id>/tracking-code', methods=['PUT'])
@@ -640,7 +780,7 @@ def update_tracking_code(job_id):
                 'message': 'الحقل tracking_code مطلوب'
             }), 400
         
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message = service.update_maintenance_job(
@@ -664,15 +804,13 @@ def update_tracking_code(job_id):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: الحصول على أكواد التتبع المتاحة
 @app.route('/api/tracking-codes/<code_type>', methods=['GET'])
 def get_available_tracking_codes(code_type):
     """الحصول على قائمة بالأكواد المتاحة لنوع معين"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         available_codes = service.get_available_tracking_codes(code_type)
@@ -687,8 +825,168 @@ def get_available_tracking_codes(code_type):
             'success': False,
             'message': str(e)
         }), 500
+
+# API: اقتراحات العملاء أثناء الكتابة (الاسم أو الهاتف)
+@app.route('/api/customers/suggest', methods=['GET'])
+@require_auth
+def suggest_customers():
+    """اقتراحات العملاء من الفهرس في الذاكرة"""
+    try:
+        db = db_session()
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', 10, type=int), MAX_SUGGESTIONS))
+
+        success, message, customers = CustomerLookupService(db).suggest(query, limit)
+        if not success:
+            return jsonify({
+                'success': False,
+                'message': message
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'customers': customers
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+# API: إشغال مجموعة اتصالات قاعدة البيانات (مراقبة تسرب الاتصالات)
+@app.route('/api/db-pool', methods=['GET'])
+@require_auth
+def get_db_pool_status():
+    """الاتصالات المستخدمة الآن وأعلى قيمة منذ التشغيل لهذه العملية"""
+    return jsonify({
+        'success': True,
+        'pool': pool_metrics.snapshot()
+    })
+
+# Server-Sent Events: مع خادم التطوير كل اتصال مفتوح يشغل خيطاً طوال مدته، وفي
+# web_server.py يُبث في حلقة ASGI (EventStreamApp). العدد محدود في الحالتين ومدة
+# الاتصال محدودة (EventSource يعيد الاتصال تلقائياً مع Last-Event-ID فلا يضيع حدث)
+EVENTS_RETRY_MS = 3000
+event_streams = threading.BoundedSemaphore(config.EVENTS_MAX_STREAMS or max(1, config.WEB_THREADS // 2))
+
+# web_server.py يضع dict بهذا المفتاح في environ: المسار يكتفي بالترويسات ويضع
+# فيه since و resumed و slot، والبث نفسه في حلقة ASGI
+ASYNC_EVENT_STREAM_KEY = "adr.async_event_stream"
+
+
+def parse_event_id(value):
+    """Last-Event-ID كرقم - None إذا لم يُرسل أو لم يكن رقماً"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sse(event: JobEvent) -> str:
+    """حدث بصيغة text/event-stream (نفس JSON ردود الـ API)"""
+    return f"id: {event.id}\nevent: {event.type}\ndata: {app.json.dumps(event.data)}\n\n"
+
+
+def event_stream_start(since: int, resumed: bool) -> str:
+    """أول ما يُرسل في الاتصال: مدة إعادة الاتصال وحدث ready"""
+    # id أول حدث: EventSource يستأنف منه حتى لو لم يصل أي تغيير قبل انقطاع الاتصال.
+    # resumed=False: ما تغير قبل الاتصال لن يصل كأحداث (العميل يحدّث قائمته مرة)
+    return f"retry: {EVENTS_RETRY_MS}\n\n" + format_sse(JobEvent(since, EVENT_READY, {'resumed': resumed}))
+
+
+def read_job_events(since: int):
+    """فحص واحد لـ change_log بجلسة قصيرة (لا اتصال محجوز بين الفحوص)
+
+    Returns:
+        (الأحداث بصيغة SSE أو "" إذا لم يتغير شيء، since للفحص التالي)
+    """
+    db = SessionLocal()
+    try:
+        success, message, events, since = JobEventService(db).events_since(since)
     finally:
         db.close()
+    if not success:
+        print(f"⚠️ {message}")
+    return "".join(format_sse(event) for event in events), since
+
+
+class EventStreamSlot:
+    """مكان اتصال واحد في event_streams - يُحرر مرة واحدة أياً كان من أنهى الاتصال"""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._semaphore.release()
+
+
+def job_event_stream(since: int, resumed: bool, slot: EventStreamSlot):
+    """الأحداث بعد since حتى EVENTS_MAX_DURATION (خادم التطوير)
+
+    المكان يُحرر عند انتهاء المولد أو إغلاقه. خادم التطوير يكشف العميل الذي
+    أغلق الاتصال عند الكتابة التالية (حدث أو تعليق كل EVENTS_HEARTBEAT).
+    """
+    try:
+        yield event_stream_start(since, resumed)
+
+        deadline = time.monotonic() + config.EVENTS_MAX_DURATION
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            time.sleep(config.EVENTS_POLL_INTERVAL)
+            chunk, since = read_job_events(since)
+            if chunk:
+                yield chunk
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= config.EVENTS_HEARTBEAT:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+    finally:
+        slot.release()
+
+
+# API: بث تغييرات الطلبات (إنشاء، حالة، دفع، تعديل، حذف)
+@app.route('/api/events', methods=['GET'])
+@require_auth
+def job_events():
+    """Server-Sent Events - يُستأنف من Last-Event-ID (أو ?last_event_id=)"""
+    since = parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    resumed = since is not None
+    if not resumed:
+        try:
+            since = JobEventService(db_session()).latest_event_id()
+        except SQLAlchemyError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 500
+
+    if not event_streams.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'message': 'عدد الاتصالات المباشرة كبير، أعد المحاولة لاحقاً'
+        }), 503, {'Retry-After': str(EVENTS_RETRY_MS // 1000)}
+
+    slot = EventStreamSlot(event_streams)
+    async_stream = request.environ.get(ASYNC_EVENT_STREAM_KEY)
+    if async_stream is not None:
+        # EventStreamApp يبث الأحداث ويحرر المكان
+        async_stream.update(since=since, resumed=resumed, slot=slot)
+        response = Response(iter(()), mimetype='text/event-stream')
+    else:
+        response = Response(job_event_stream(since, resumed, slot), mimetype='text/event-stream')
+        # إغلاق الرد قبل بدء المولد (لا يمر بـ finally داخله)
+        response.call_on_close(slot.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # بدون تخزين مؤقت في nginx: كل حدث يصل فوراً
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # API: الحصول على بيانات التقرير
 @app.route('/api/reports', methods=['GET'])
@@ -696,7 +994,7 @@ def get_available_tracking_codes(code_type):
 def get_reports():
     """الحصول على بيانات التقرير"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # الحصول على معاملات التقرير
@@ -751,15 +1049,13 @@ def get_reports():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تتبع الجهاز للعملاء (بدون مصادقة)
 @app.route('/api/track/<tracking_code>', methods=['GET'])
 def track_device(tracking_code):
     """تتبع جهاز باستخدام رقم التتبع - للعملاء"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, device = service.get_job_by_tracking_code(tracking_code)
@@ -781,8 +1077,6 @@ def track_device(tracking_code):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: إنشاء QR Code للجهاز
 @app.route('/api/qr/<tracking_code>', methods=['GET'])
@@ -794,7 +1088,7 @@ def generate_qr_code(tracking_code):
         from flask import send_file
         
         # التحقق من وجود الطلب
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, device = service.get_job_by_tracking_code(tracking_code)
@@ -842,8 +1136,6 @@ def generate_qr_code(tracking_code):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # API: تحميل QR Code كملف
 @app.route('/api/qr/<tracking_code>/download', methods=['GET'])
@@ -854,7 +1146,7 @@ def download_qr_code(tracking_code):
         import os
         
         # التحقق من وجود الطلب
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         success, message, device = service.get_job_by_tracking_code(tracking_code)
@@ -892,8 +1184,6 @@ def download_qr_code(tracking_code):
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 # صفحة الشركة الرئيسية (للعملاء)
 @app.route('/home')
@@ -919,7 +1209,7 @@ def about():
 def get_pending_old_jobs():
     """الحصول على قائمة الأجهزة القديمة المعلقة"""
     try:
-        db = next(get_db())
+        db = db_session()
         service = MaintenanceService(db)
         
         # الحصول على عدد الأيام من المعاملات (افتراضي: 30 يوم)
@@ -950,8 +1240,6 @@ def get_pending_old_jobs():
             'success': False,
             'message': str(e)
         }), 500
-    finally:
-        db.close()
 
 if __name__ == '__main__':
     # تشغيل السيرفر
@@ -989,5 +1277,12 @@ if __name__ == '__main__':
     if os.environ.get('PORT'):
         debug_mode = False  # تعطيل debug في الإنتاج (Railway, Render, etc.)
     
-    app.run(host='0.0.0.0', port=port, debug=debug_mode)
+    # الإنتاج: عدة عمليات عبر uvicorn (web_server.py) بدلاً من خادم التطوير
+    from web_server import UVICORN_AVAILABLE, serve
+    if not debug_mode and UVICORN_AVAILABLE:
+        serve(port=port)
+    else:
+        if not debug_mode:
+            print("⚠️ uvicorn غير مثبت - تشغيل خادم التطوير (pip install -r requirements.txt)")
+        app.run(host='0.0.0.0', port=port, debug=debug_mode)
 
@@ -0,0 +1,261 @@
+"""
+تشغيل تطبيق الويب للإنتاج: عدة عمليات (uvicorn) بدلاً من خادم التطوير
+
+    python web_server.py                                  # العمليات = عدد الأنوية
+    python web_server.py --workers 4 --threads 16 --port 8000
+    python web_server.py --bench http://localhost:5000    # اختبار الحمل
+
+- كل عملية تشغّل web_app (WSGI) داخل uvicorn بمجموعة خيوط WEB_THREADS،
+  فالطلبات تتوزع على كل الأنوية بدلاً من عملية Python واحدة.
+- تهيئة قاعدة البيانات (الجداول، الأعمدة والفهارس الجديدة، التجميع اليومي)
+  مرة واحدة هنا قبل بدء العمليات، وليس في كل عملية بالتوازي.
+- مفتاح الجلسات يُحدد هنا ويُمرر لكل العمليات (SECRET_KEY): الجلسة صالحة
+  أياً كانت العملية التي تخدم الطلب وبعد إعادة التشغيل.
+- لكل عملية cache خاص بها؛ ChangeWatcher في web_app يبطله عند الكتابة من عملية
+  أخرى، و SQLite في وضع WAL مع busy_timeout (قراءات متوازية وكاتب واحد).
+- /api/events (Server-Sent Events) مسار ASGI (EventStreamApp): لا يشغل خيطاً
+  من WEB_THREADS، وينتهي فور انقطاع العميل (http.disconnect) فيتحرر مكانه.
+  عدد الاتصالات محدود بـ EVENTS_MAX_STREAMS (افتراضياً نصف WEB_THREADS) لكل عملية.
+- Linux: kill -HUP <pid> يعيد تشغيل العمليات واحدة بعد الأخرى بدون انقطاع
+  (لتطبيق تحديث الكود)، والإيقاف ينتظر الطلبات الجارية حتى WEB_GRACEFUL_TIMEOUT.
+
+المقارنة بين عدد العمليات: تشغيل الخادم بـ --workers 1 ثم بعدد الأنوية، و --bench
+على نفس الرابط في كل مرة - من جهاز آخر، لأن --bench على نفس الجهاز يأخذ من نفس
+الأنوية. عمليات أكثر من الأنوية أبطأ لا أسرع (على نواة واحدة: عمليتان ~60% من
+عملية واحدة).
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+from utils.secret_key import load_or_create_secret_key
+
+try:
+    import uvicorn
+    UVICORN_AVAILABLE = True
+except ImportError:
+    UVICORN_AVAILABLE = False
+
+DEFAULT_PORT = 5000
+
+# المسارات التي يقيسها --bench
+BENCH_PATHS = ("/api/jobs", "/api/stats")
+
+
+def default_workers() -> int:
+    return config.WEB_WORKERS or os.cpu_count() or 1
+
+
+def create_asgi_app():
+    """تُستدعى داخل كل عملية: web_app كتطبيق ASGI مع WEB_THREADS خيط"""
+    from uvicorn.middleware.wsgi import WSGIMiddleware
+    from web_app import app
+    return EventStreamApp(app, WSGIMiddleware(app, workers=config.WEB_THREADS))
+
+
+async def wait_for_disconnect(receive) -> None:
+    """ينتهي عندما يغلق العميل الاتصال"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+class EventStreamApp:
+    """ASGI: /api/events في حلقة الأحداث، وباقي الطلبات إلى تطبيق WSGI
+
+    WSGIMiddleware لا يكشف انقطاع العميل، فاتصال SSE مغلق كان يبقى حتى
+    EVENTS_MAX_DURATION. هنا يمر الطلب على Flask أولاً (المصادقة، Last-Event-ID،
+    مكان في event_streams) ثم يُبث من هنا: فحص change_log في خيط منفصل كل
+    EVENTS_POLL_INTERVAL، والتوقف فور وصول http.disconnect.
+    """
+
+    def __init__(self, flask_app, wsgi_app):
+        self.flask_app = flask_app
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/api/events" or scope["method"] != "GET":
+            await self.wsgi_app(scope, receive, send)
+            return
+
+        from uvicorn.middleware.wsgi import build_environ
+        from web_app import ASYNC_EVENT_STREAM_KEY
+
+        stream = {}
+        environ = build_environ(scope, {}, io.BytesIO())
+        environ[ASYNC_EVENT_STREAM_KEY] = stream
+        try:
+            status, headers, body = await asyncio.get_running_loop().run_in_executor(
+                None, self._call_flask, environ)
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            if "slot" not in stream:
+                # رد Flask كاملاً (تحويل لتسجيل الدخول، 503، خطأ)
+                await send({"type": "http.response.body", "body": body})
+                return
+            await self._stream_events(receive, send, stream["since"], stream["resumed"])
+        finally:
+            if "slot" in stream:
+                stream["slot"].release()
+
+    def _call_flask(self, environ):
+        """الطلب عبر Flask في خيط: (الحالة، الترويسات، الجسم)"""
+        started = []
+
+        def start_response(status, response_headers, exc_info=None):
+            started[:] = [status, response_headers]
+
+        response = self.flask_app(environ, start_response)
+        try:
+            body = b"".join(response)
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+        status, response_headers = started
+        headers = [(name.encode("latin1"), value.encode("latin1")) for name, value in response_headers]
+        return int(status.split(" ", 1)[0]), headers, body
+
+    async def _stream_events(self, receive, send, since: int, resumed: bool) -> None:
+        from web_app import event_stream_start, read_job_events
+
+        async def send_chunk(chunk: str) -> None:
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send_chunk(event_stream_start(since, resumed))
+            deadline = loop.time() + config.EVENTS_MAX_DURATION
+            last_sent = loop.time()
+            while loop.time() < deadline:
+                await asyncio.wait({disconnected}, timeout=config.EVENTS_POLL_INTERVAL)
+                if disconnected.done():
+                    return
+                chunk, since = await loop.run_in_executor(None, read_job_events, since)
+                if chunk:
+                    await send_chunk(chunk)
+                    last_sent = loop.time()
+                elif loop.time() - last_sent >= config.EVENTS_HEARTBEAT:
+                    # تعليق فارغ يبقي الاتصال مفتوحاً عبر الوكلاء
+                    await send_chunk(": ping\n\n")
+                    last_sent = loop.time()
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            disconnected.cancel()
+
+
+def prepare_workers(threads: int) -> None:
+    """ما يجب أن يتم مرة واحدة في العملية الأم قبل بدء العمليات
+
+    العمليات تُنشأ بـ spawn وترث متغيرات البيئة فقط.
+    """
+    from database.connection import DB_INITIALIZED_ENV, engine, init_db
+
+    init_db()
+    # لا اتصالات مفتوحة من العملية الأم
+    engine.dispose()
+    os.environ[DB_INITIALIZED_ENV] = "1"
+    os.environ["SECRET_KEY"] = config.SECRET_KEY or load_or_create_secret_key(config.SECRET_KEY_FILE)
+    os.environ["WEB_THREADS"] = str(threads)
+
+
+def serve(host: str = "0.0.0.0", port: int = DEFAULT_PORT, workers: Optional[int] = None,
+          threads: Optional[int] = None) -> None:
+    """تشغيل الخادم (يعود عند الإيقاف)"""
+    if not UVICORN_AVAILABLE:
+        raise RuntimeError("uvicorn غير مثبت: pip install -r requirements.txt")
+
+    workers = workers or default_workers()
+    threads = threads or config.WEB_THREADS
+    prepare_workers(threads)
+
+    print("\n" + "=" * 60)
+    print("🌐 تطبيق الويب يعمل (وضع الإنتاج)")
+    print(f"   http://{host}:{port}")
+    print(f"   ⚙️ {workers} عملية × {threads} خيط")
+    if sys.platform != "win32":
+        print(f"   🔄 إعادة التحميل بدون انقطاع: kill -HUP {os.getpid()}")
+    print("=" * 60 + "\n")
+
+    uvicorn.run(
+        "web_server:create_asgi_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=config.WEB_GRACEFUL_TIMEOUT,
+        log_level="warning",
+    )
+
+
+def run_load_test(base_url: str, paths=BENCH_PATHS, requests_per_path: int = 2000,
+                  concurrency: int = 32, password: Optional[str] = None) -> Dict[str, float]:
+    """طلبات متزامنة على كل مسار - يعيد عدد الطلبات في الثانية لكل مسار"""
+    import requests
+
+    base_url = base_url.rstrip("/")
+    results: Dict[str, float] = {}
+    for path in paths:
+        remaining = [requests_per_path]
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        def worker():
+            session = requests.Session()
+            if password:
+                session.post(f"{base_url}/login", data={"password": password})
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                try:
+                    response = session.get(f"{base_url}{path}", timeout=30)
+                    if response.status_code != 200:
+                        errors.append(str(response.status_code))
+                except requests.RequestException as e:
+                    errors.append(type(e).__name__)
+
+        # طلب أول خارج القياس (تعبئة الـ cache وفتح الاتصالات)
+        requests.get(f"{base_url}{path}", timeout=30)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        results[path] = requests_per_path / elapsed
+        print(f"{path}: {results[path]:.0f} طلب/ث ({requests_per_path} طلب، {concurrency} متزامن، "
+              f"{elapsed:.1f}ث، {len(errors)} خطأ)")
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="تشغيل تطبيق الويب للإنتاج")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=None, help="عدد العمليات (افتراضياً عدد الأنوية)")
+    parser.add_argument("--threads", type=int, default=None, help="خيوط كل عملية")
+    parser.add_argument("--bench", metavar="URL", help="اختبار حمل على خادم يعمل بدلاً من التشغيل")
+    parser.add_argument("--requests", type=int, default=2000, help="عدد الطلبات لكل مسار في الاختبار")
+    parser.add_argument("--concurrency", type=int, default=32, help="الطلبات المتزامنة في الاختبار")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        run_load_test(args.bench, requests_per_path=args.requests, concurrency=args.concurrency,
+                      password=config.REMOTE_ACCESS_PASSWORD or None)
+    else:
+        serve(args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == "__main__":
+    main()